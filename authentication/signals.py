@@ -1,9 +1,11 @@
 import logging
 from django.contrib.auth.signals import user_logged_in, user_login_failed
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
+from user_access.user_test_functions import invalidate_permission_snapshot
+
 # log
 logger = logging.getLogger('audit')
 
@@ -47,3 +49,20 @@ def log_user_changes(sender, instance, created, dir_created=None, **kwargs):
     else:
         if instance.is_superuser:
             logger.info(f"USER UPDATE: '{instance.username}' is now SUPERUSER")
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_permissions_on_group_change(sender, instance, action, reverse, **kwargs):
+    """
+    Périme les instantanés de droits (user_access) dès qu'une appartenance à
+    un groupe change, côté utilisateur comme côté groupe.
+    """
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    invalidate_permission_snapshot(None if reverse else instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_permissions_on_user_save(sender, instance, **kwargs):
+    """Les drapeaux is_superuser / is_staff font aussi partie de l'instantané."""
+    invalidate_permission_snapshot(instance)
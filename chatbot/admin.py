@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatbotQuery
+from .models import ChatbotQuery, LLMCacheEntry
 
 
 @admin.register(ChatbotQuery)
@@ -42,4 +42,20 @@ class ChatbotQueryAdmin(admin.ModelAdmin):
         return False
 
     def has_change_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(LLMCacheEntry)
+class LLMCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("key", "model", "size", "hit_count", "last_used_at", "expires_at")
+    list_filter = ("model",)
+    search_fields = ("key", "content")
+    readonly_fields = ("key", "model", "content", "size", "hit_count", "created_at", "last_used_at", "expires_at")
+    ordering = ("-last_used_at",)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
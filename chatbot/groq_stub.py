@@ -0,0 +1,140 @@
+"""
+Serveur HTTP local imitant l'API chat/completions de Groq, pour les tests et
+les benchmarks sans accès réseau.
+
+    with GroqStubServer(latency=0.2, requests_per_minute=60) as stub:
+        with override_settings(LLM_API_URL=stub.url):
+            summarize_document(texte)
+
+Chaque réponse renvoie `responder(payload)` (par défaut un résumé JSON qui
+reprend le début du message utilisateur). Au-delà de `requests_per_minute`
+sur une fenêtre glissante d'une minute, le serveur répond 429 avec un
+en-tête Retry-After, comme Groq.
+"""
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(payload):
+    user_content = payload["messages"][-1]["content"]
+    excerpt = " ".join(user_content.split()[:6])
+    return json.dumps({
+        "resume": f"- {excerpt}",
+        "prix": "",
+        "dates": "",
+        "conditions_suspensives": "",
+        "penalites": "",
+        "delais": "",
+        "clauses_importantes": [],
+    }, ensure_ascii=False)
+
+
+class GroqStubServer:
+    def __init__(self, latency=0.0, requests_per_minute=None, responder=default_responder):
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.responder = responder
+        self.calls = 0
+        self.rejected = 0
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def _admit(self):
+        """Renvoie None si la requête est acceptée, sinon le Retry-After en secondes."""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+                self.rejected += 1
+                return max(self._window[0] + 60 - now, 0.1)
+            self._window.append(now)
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 : connexions persistantes, comme l'API réelle
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                retry_after = stub._admit()
+                if retry_after is not None:
+                    self._send(
+                        429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": f"{retry_after:.2f}"}
+                    )
+                    return
+                try:
+                    time.sleep(stub.latency)
+                    content = stub.responder(payload)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+                prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+                completion_tokens = len(content) // 4
+                self._send(200, {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,174 @@
+"""
+Cache des réponses LLM (Groq), adressé par le contenu de la requête.
+
+La clé est l'empreinte SHA-256 du modèle, de la température, de max_tokens et
+des messages (prompt système et contenu utilisateur) : un document réimporté,
+une pièce jointe retraitée ou une question reposée ne relancent pas d'appel.
+
+Les réponses sont stockées en base (LLMCacheEntry) avec une durée de vie
+(LLM_CACHE_TTL_SECONDS), une taille maximale par réponse et un plafond global
+(LLM_CACHE_MAX_ENTRIES / LLM_CACHE_MAX_BYTES) au-delà duquel les réponses les
+moins récemment utilisées sont supprimées. Ces plafonds sont appliqués par la
+tâche planifiée chatbot.tasks.evict_llm_cache_entries (ou `manage.py llm_cache
+--evict`), pas à chaque enregistrement. Les compteurs de succès/échecs sont
+tenus en base (LLMCacheCounter, incréments F()), voir llm_cache_stats.
+
+Un succès n'écrit sur la réponse (last_used_at, hit_count) qu'une fois par
+LLM_CACHE_TOUCH_INTERVAL_SECONDS : entre-temps, le processus compte les succès
+de la réponse en mémoire et les reporte sur hit_count à l'écriture suivante.
+
+    content = get_cached_response(payload, bypass=refresh)
+    if content is None:
+        content = appel_api(payload)
+        store_response(payload, content)
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from chatbot.models import LLMCacheCounter, LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Succès par réponse pas encore reportés sur hit_count (voir _touch)
+_pending_entry_hits = Counter()
+_pending_lock = threading.Lock()
+
+
+def cache_key(payload):
+    """Empreinte du modèle, des paramètres de génération et des messages."""
+    material = {
+        "model": payload.get("model"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+        "messages": [
+            {"role": message.get("role"), "content": message.get("content")}
+            for message in payload.get("messages", [])
+        ],
+    }
+    encoded = json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _count(name):
+    """Incrémente un compteur global en base (UPDATE ... SET value = value + 1)."""
+    if LLMCacheCounter.objects.filter(name=name).update(value=F("value") + 1):
+        return
+    try:
+        with transaction.atomic():
+            LLMCacheCounter.objects.create(name=name, value=1)
+    except IntegrityError:
+        # Créé entre-temps par un autre worker
+        LLMCacheCounter.objects.filter(name=name).update(value=F("value") + 1)
+
+
+def get_cached_response(payload, bypass=False):
+    """
+    Renvoie la réponse en cache pour ce payload, ou None (absente, expirée,
+    cache désactivé ou bypass=True pour forcer un nouvel appel).
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if bypass:
+        _count("bypass")
+        return None
+
+    key = cache_key(payload)
+    now = timezone.now()
+    entry = (
+        LLMCacheEntry.objects.filter(key=key, expires_at__gt=now)
+        .only("pk", "content", "last_used_at")
+        .first()
+    )
+    if entry is None:
+        _count("misses")
+        return None
+
+    _count("hits")
+    _touch(entry, now)
+    return entry.content
+
+
+def _touch(entry, now):
+    """Reporte les succès en attente et last_used_at, au plus une fois par intervalle."""
+    with _pending_lock:
+        _pending_entry_hits[entry.pk] += 1
+        if entry.last_used_at > now - timedelta(seconds=settings.LLM_CACHE_TOUCH_INTERVAL_SECONDS):
+            return
+        pending = _pending_entry_hits.pop(entry.pk)
+    LLMCacheEntry.objects.filter(pk=entry.pk).update(hit_count=F("hit_count") + pending, last_used_at=now)
+
+
+def store_response(payload, content):
+    """Enregistre (ou rafraîchit) la réponse ; les plafonds sont appliqués par evict_llm_cache."""
+    if not settings.LLM_CACHE_ENABLED or not content:
+        return None
+    size = len(content.encode("utf-8"))
+    if size > settings.LLM_CACHE_MAX_ENTRY_BYTES:
+        logger.info("Réponse LLM non mise en cache : %s octets", size)
+        return None
+
+    now = timezone.now()
+    entry, _ = LLMCacheEntry.objects.update_or_create(
+        key=cache_key(payload),
+        defaults={
+            "model": payload.get("model") or "",
+            "content": content,
+            "size": size,
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS),
+        },
+    )
+    return entry
+
+
+def evict_llm_cache(now=None):
+    """
+    Supprime les réponses expirées, puis les moins récemment utilisées tant que
+    le nombre d'entrées ou la taille totale dépassent les plafonds.
+    Renvoie le nombre de réponses supprimées.
+    """
+    now = now or timezone.now()
+    deleted, _ = LLMCacheEntry.objects.filter(expires_at__lte=now).delete()
+
+    max_entries = settings.LLM_CACHE_MAX_ENTRIES
+    max_bytes = settings.LLM_CACHE_MAX_BYTES
+    count = LLMCacheEntry.objects.count()
+    total = LLMCacheEntry.objects.aggregate(total=Sum("size"))["total"] or 0
+    if count <= max_entries and total <= max_bytes:
+        return deleted
+
+    evicted = []
+    for pk, size in LLMCacheEntry.objects.order_by("last_used_at", "pk").values_list("pk", "size"):
+        if count <= max_entries and total <= max_bytes:
+            break
+        evicted.append(pk)
+        count -= 1
+        total -= size
+    LLMCacheEntry.objects.filter(pk__in=evicted).delete()
+    return deleted + len(evicted)
+
+
+def llm_cache_stats():
+    """Compteurs d'utilisation et occupation du cache."""
+    counters = dict(LLMCacheCounter.objects.values_list("name", "value"))
+    hits = counters.get("hits", 0)
+    misses = counters.get("misses", 0)
+    usage = LLMCacheEntry.objects.aggregate(total=Sum("size"), entry_hits=Sum("hit_count"))
+    return {
+        "hits": hits,
+        "misses": misses,
+        "bypass": counters.get("bypass", 0),
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "entries": LLMCacheEntry.objects.count(),
+        "size_bytes": usage["total"] or 0,
+        "stored_entry_hits": usage["entry_hits"] or 0,
+    }
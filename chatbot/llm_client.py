@@ -0,0 +1,283 @@
+"""
+Client LLM partagé par tous les appels Groq (résumés, classement des emails,
+chatbot).
+
+    response = get_llm_client().chat(messages, temperature=0.1, max_tokens=300,
+                                     purpose="classement", use_cache=True)
+    response.content
+
+Le client regroupe ce que chaque appel faisait à sa façon :
+- une session HTTP persistante (keep-alive, pool de LLM_MAX_CONCURRENT_REQUESTS
+  connexions) ;
+- une politique de relance commune : 429 → pause Retry-After partagée par le
+  limiteur de débit, 5xx et erreurs réseau → backoff exponentiel, autres 4xx →
+  échec immédiat ;
+- un plafond d'appels simultanés par processus ;
+- le cache des réponses (chatbot.llm_cache), sur demande ;
+- des métriques par usage : appels, erreurs, succès du cache, latence, tokens
+  (client.metrics(), et une ligne par appel dans le logger performance.llm).
+
+Le transport est choisi par LLM_BACKEND (chemin pointé d'une classe) et
+LLM_API_URL : les tests et benchmarks pointent le client vers un serveur local
+(chatbot.groq_stub) sans accès réseau.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from chatbot.llm_cache import get_cached_response, store_response
+from chatbot.rate_limit import groq_rate_limiter, parse_retry_after, reset_groq_rate_limiter
+
+# Journalisé avec les autres mesures (daily_file), voir LOGGING
+logger = logging.getLogger("performance.llm")
+
+CHARS_PER_TOKEN = 4
+
+
+class LLMHTTPError(requests.exceptions.HTTPError):
+    """Réponse HTTP en erreur de l'API, après épuisement des relances."""
+
+    def __init__(self, status_code, detail=""):
+        super().__init__(f"{status_code} {detail}".strip())
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LLMBusyError(LLMHTTPError):
+    """Quota local épuisé : l'appel n'aurait pu partir qu'après `acquire_timeout`."""
+
+    def __init__(self):
+        super().__init__(429, "Service occupé, réessayez dans quelques instants.")
+
+
+@dataclass(frozen=True)
+class LLMResponse:
+    content: str
+    cached: bool = False
+    latency_ms: float = 0.0
+    attempts: int = 0
+    usage: dict = field(default_factory=dict)
+
+
+class GroqBackend:
+    """Transport HTTP vers une API chat/completions compatible OpenAI."""
+
+    def __init__(self, url, api_key, pool_size=4):
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def post(self, payload, timeout):
+        return self.session.post(self.url, json=payload, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class LLMClient:
+    def __init__(self, backend, model, max_concurrency=4, max_retries=3, backoff_seconds=2.0, limiter=None):
+        self.backend = backend
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._limiter = limiter
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    @property
+    def limiter(self):
+        return self._limiter or groq_rate_limiter()
+
+    def chat(
+        self,
+        messages,
+        *,
+        temperature=0.2,
+        max_tokens=800,
+        model=None,
+        timeout=30,
+        max_retries=None,
+        acquire_timeout=None,
+        use_cache=False,
+        bypass_cache=False,
+        purpose="chat",
+    ):
+        """
+        Envoie les messages et renvoie un LLMResponse. Lève LLMHTTPError si
+        l'API répond en erreur, ou l'exception réseau de requests (Timeout,
+        ConnectionError) si la dernière tentative échoue. `acquire_timeout`
+        borne l'attente du limiteur de débit (vues web) : au-delà, LLMBusyError.
+        """
+        payload = {
+            "model": model or self.model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": messages,
+        }
+        if use_cache:
+            cached = get_cached_response(payload, bypass=bypass_cache)
+            if cached is not None:
+                self._record(purpose, cache_hit=True)
+                return LLMResponse(cached, cached=True)
+
+        if max_retries is None:
+            max_retries = self.max_retries
+        # Au moins une tentative : max_retries=0 désactive seulement les relances
+        max_retries = max(max_retries, 1)
+        estimated_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN + max_tokens
+        for attempt in range(1, max_retries + 1):
+            last_attempt = attempt == max_retries
+            try:
+                self.limiter.acquire(estimated_tokens, timeout=acquire_timeout)
+            except TimeoutError:
+                self._record(purpose, latency_ms=0.0, error=True)
+                logger.warning("Appel LLM %s abandonné : quota local atteint", purpose)
+                raise LLMBusyError()
+            start = time.perf_counter()
+            try:
+                with self._semaphore:
+                    response = self.backend.post(payload, timeout)
+            except requests.exceptions.RequestException as exc:
+                self._record(purpose, latency_ms=_elapsed_ms(start), error=True)
+                logger.warning("Appel LLM %s en échec (tentative %s/%s) : %s", purpose, attempt, max_retries, exc)
+                if last_attempt:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            latency_ms = _elapsed_ms(start)
+            status = response.status_code
+            if status == 200:
+                data = response.json()
+                content = data["choices"][0]["message"]["content"].strip()
+                usage = data.get("usage") or {}
+                if not isinstance(usage, dict):
+                    usage = {}
+                self._record(purpose, latency_ms=latency_ms, usage=usage)
+                logger.info(
+                    "Appel LLM %s : %.0f ms, %s+%s tokens", purpose, latency_ms,
+                    usage.get("prompt_tokens", "?"), usage.get("completion_tokens", "?"),
+                )
+                if use_cache:
+                    store_response(payload, content)
+                return LLMResponse(content, latency_ms=latency_ms, attempts=attempt, usage=usage)
+
+            self._record(purpose, latency_ms=latency_ms, error=True)
+            retryable = status == 429 or status >= 500
+            logger.warning("Appel LLM %s : HTTP %s (tentative %s/%s)", purpose, status, attempt, max_retries)
+            if last_attempt or not retryable:
+                raise LLMHTTPError(status, _error_detail(response))
+            if status == 429:
+                headers = getattr(response, "headers", None) or {}
+                self.limiter.defer(parse_retry_after(headers.get("Retry-After"), self._backoff(attempt)))
+            else:
+                time.sleep(self._backoff(attempt))
+        raise LLMHTTPError(0, "aucune tentative")
+
+    def _backoff(self, attempt):
+        return self.backoff_seconds * 2 ** (attempt - 1)
+
+    def _record(self, purpose, latency_ms=None, usage=None, error=False, cache_hit=False):
+        with self._lock:
+            metrics = self._metrics.setdefault(purpose, {
+                "calls": 0,
+                "errors": 0,
+                "cache_hits": 0,
+                "latency_ms_total": 0.0,
+                "latency_ms_max": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            })
+            if cache_hit:
+                metrics["cache_hits"] += 1
+                return
+            metrics["calls"] += 1
+            metrics["errors"] += int(error)
+            metrics["latency_ms_total"] += latency_ms
+            metrics["latency_ms_max"] = max(metrics["latency_ms_max"], latency_ms)
+            for key in ("prompt_tokens", "completion_tokens"):
+                value = (usage or {}).get(key)
+                if isinstance(value, int):
+                    metrics[key] += value
+
+    def metrics(self):
+        """Métriques du processus par usage, avec la latence moyenne."""
+        with self._lock:
+            return {
+                purpose: {
+                    **values,
+                    "latency_ms_avg": round(values["latency_ms_total"] / values["calls"], 1) if values["calls"] else 0.0,
+                }
+                for purpose, values in self._metrics.items()
+            }
+
+    def close(self):
+        close = getattr(self.backend, "close", None)
+        if close:
+            close()
+
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def _error_detail(response):
+    try:
+        return str(response.json())
+    except Exception:
+        return str(getattr(response, "text", ""))[:500]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Client partagé par tous les threads du processus, construit depuis les settings."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            backend_class = import_string(settings.LLM_BACKEND)
+            backend = backend_class(
+                settings.LLM_API_URL,
+                settings.GROQ_API_KEY,
+                pool_size=settings.LLM_MAX_CONCURRENT_REQUESTS,
+            )
+            _client = LLMClient(
+                backend,
+                model=settings.LLM_MODEL,
+                max_concurrency=settings.LLM_MAX_CONCURRENT_REQUESTS,
+                max_retries=settings.LLM_MAX_RETRIES,
+                backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+            )
+        return _client
+
+
+def reset_llm_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith(("LLM_", "GROQ_")):
+        reset_llm_client()
+        reset_groq_rate_limiter()
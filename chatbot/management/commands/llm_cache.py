@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.llm_cache import evict_llm_cache, llm_cache_stats
+from chatbot.models import LLMCacheEntry
+
+
+class Command(BaseCommand):
+    help = "Affiche les statistiques du cache des réponses LLM, le purge ou applique ses plafonds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--evict", action="store_true", help="Supprime les réponses expirées ou hors plafonds.")
+        parser.add_argument("--clear", action="store_true", help="Vide entièrement le cache.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted, _ = LLMCacheEntry.objects.all().delete()
+            self.stdout.write(f"{deleted} réponse(s) supprimée(s).")
+        elif options["evict"]:
+            self.stdout.write(f"{evict_llm_cache()} réponse(s) supprimée(s).")
+
+        stats = llm_cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['entries']} réponse(s), {stats['size_bytes']} octets ; "
+            f"{stats['hits']} succès, {stats['misses']} échecs, {stats['bypass']} contournements "
+            f"(taux de succès {stats['hit_rate']:.1%})."
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('content', models.TextField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Réponse LLM en cache',
+                'verbose_name_plural': 'Réponses LLM en cache',
+                'indexes': [models.Index(fields=['last_used_at'], name='llm_cache_lru_idx'), models.Index(fields=['expires_at'], name='llm_cache_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_llm_cache_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Compteur du cache LLM',
+                'verbose_name_plural': 'Compteurs du cache LLM',
+            },
+        ),
+    ]
@@ -35,4 +35,48 @@ class ChatbotQuery(models.Model):
         verbose_name_plural = "Historique chatbot"
 
     def __str__(self):
-        return f"{self.user} - {self.query_type} - {self.created_at:%d/%m/%Y %H:%M}"
\ No newline at end of file
+        return f"{self.user} - {self.query_type} - {self.created_at:%d/%m/%Y %H:%M}"
+
+class LLMCacheEntry(models.Model):
+    """
+    Réponse mise en cache d'un appel LLM (voir chatbot.llm_cache).
+
+    La clé est l'empreinte SHA-256 du modèle, de la température, du nombre
+    maximal de tokens et des messages envoyés.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    content = models.TextField()
+    size = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_used_at"], name="llm_cache_lru_idx"),
+            models.Index(fields=["expires_at"], name="llm_cache_expiry_idx"),
+        ]
+        verbose_name = "Réponse LLM en cache"
+        verbose_name_plural = "Réponses LLM en cache"
+
+    def __str__(self):
+        return f"{self.model} - {self.key[:12]}"
+
+
+class LLMCacheCounter(models.Model):
+    """
+    Compteur global du cache LLM (succès, échecs, contournements), incrémenté
+    en base avec F() pour que des workers concurrents ne perdent pas de mises
+    à jour (voir chatbot.llm_cache).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Compteur du cache LLM"
+        verbose_name_plural = "Compteurs du cache LLM"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,114 @@
+"""
+Limiteur de débit partagé des appels Groq (seau à jetons).
+
+Deux seaux se remplissent en continu : requêtes par minute et tokens par
+minute. acquire() bloque le thread appelant jusqu'à ce que les deux seaux
+contiennent de quoi payer l'appel, au lieu d'une pause fixe entre appels :
+tant que le quota le permet, les appels partent immédiatement. Les vues
+interactives passent un timeout pour ne pas bloquer la requête HTTP.
+
+Après un 429, defer(retry_after) suspend tous les appels du processus
+pendant la durée indiquée par Groq (en-tête Retry-After).
+
+Le limiteur est propre au processus : avec plusieurs workers Celery, réglez
+GROQ_REQUESTS_PER_MINUTE / GROQ_TOKENS_PER_MINUTE sur la part de quota de
+chacun.
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class TokenBucketLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic):
+        self.requests_per_minute = max(float(requests_per_minute), 1.0)
+        self.tokens_per_minute = max(float(tokens_per_minute), 1.0)
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = max(now - self._updated_at, 0.0) / 60
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute)
+        self._updated_at = now
+
+    def _wait_time(self, tokens, now):
+        return max(
+            self._blocked_until - now,
+            (1 - self._requests) / self.requests_per_minute * 60,
+            (tokens - self._tokens) / self.tokens_per_minute * 60,
+            0.0,
+        )
+
+    def acquire(self, tokens=0, timeout=None):
+        """
+        Réserve une requête et `tokens` tokens, en attendant si nécessaire.
+        Un appel plus gros que le quota par minute attend le seau plein.
+        Renvoie le temps d'attente en secondes. Avec `timeout`, lève
+        TimeoutError sans rien réserver si l'attente devait le dépasser.
+        """
+        tokens = min(max(tokens, 0), self.tokens_per_minute)
+        waited = 0.0
+        with self._condition:
+            while True:
+                now = self._clock()
+                self._refill(now)
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return waited
+                if timeout is not None and waited + wait > timeout:
+                    raise TimeoutError(f"quota Groq atteint, attente estimée {wait:.1f} s")
+                self._condition.wait(wait)
+                waited += self._clock() - now
+
+    def defer(self, seconds):
+        """Suspend tous les appels pendant `seconds` secondes (429 / Retry-After)."""
+        with self._condition:
+            self._blocked_until = max(self._blocked_until, self._clock() + max(seconds, 0.0))
+            self._condition.notify_all()
+
+
+def parse_retry_after(value, default):
+    """Délai de l'en-tête Retry-After (secondes ou date HTTP), sinon `default`."""
+    if not isinstance(value, str) or not value.strip():
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def groq_rate_limiter():
+    """Limiteur partagé par tous les threads du processus."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucketLimiter(
+                settings.GROQ_REQUESTS_PER_MINUTE,
+                settings.GROQ_TOKENS_PER_MINUTE,
+            )
+        return _limiter
+
+
+def reset_groq_rate_limiter():
+    """Recrée le limiteur partagé au prochain appel (quota modifié, tests)."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from chatbot.llm_cache import evict_llm_cache
+
+
+@shared_task
+def evict_llm_cache_entries():
+    """Supprime les réponses LLM expirées ou au-delà des plafonds du cache."""
+    return {"success": True, "supprimees": evict_llm_cache()}
@@ -9,6 +9,7 @@ import requests
 
 from invoices.models import Facture
 from .legifrance import legifrance_search_generic, format_legifrance_context
+from .llm_client import LLMBusyError, LLMHTTPError, get_llm_client
 from .models import ChatbotQuery
 
 
@@ -70,11 +71,12 @@ _ROUTER_SYSTEM = (
 )
 
 
-def _route_message(message: str) -> str:
+def _route_message(message: str, bypass_cache: bool = False) -> str:
     """
     Appelle Groq pour classifier l'intention du message.
     Retourne 'invoice', 'document' ou 'legal'.
     Fallback sur 'legal' en cas d'erreur ou de réponse inattendue.
+    Une question déjà routée est servie par le cache LLM.
     """
     api_key = getattr(settings, "GROQ_API_KEY", None)
     if not api_key:
@@ -82,30 +84,28 @@ def _route_message(message: str) -> str:
         return _route_fallback(message)
 
     try:
-        r = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "temperature": 0.0,
-                "max_tokens": 10,
-                "messages": [
-                    {"role": "system", "content": _ROUTER_SYSTEM},
-                    {"role": "user",   "content": message},
-                ],
-            },
+        intent = get_llm_client().chat(
+            [
+                {"role": "system", "content": _ROUTER_SYSTEM},
+                {"role": "user",   "content": message},
+            ],
+            temperature=0.0,
+            max_tokens=10,
             timeout=10,
-        )
-        if r.status_code == 200:
-            intent = r.json()["choices"][0]["message"]["content"].strip().lower()
-            if intent in ("invoice", "document", "legal"):
-                return intent
-        # Réponse inattendue : fallback
-        return _route_fallback(message)
-
+            max_retries=1,
+            acquire_timeout=settings.LLM_WEB_ACQUIRE_TIMEOUT_SECONDS,
+            use_cache=True,
+            bypass_cache=bypass_cache,
+            purpose="chatbot_routage",
+        ).content.strip().lower()
     except Exception:
         return _route_fallback(message)
 
+    if intent in ("invoice", "document", "legal"):
+        return intent
+    # Réponse inattendue : fallback
+    return _route_fallback(message)
+
 
 def _route_fallback(message: str) -> str:
     """
@@ -131,89 +131,64 @@ def _route_fallback(message: str) -> str:
 #  et les injecte dans le prompt Groq.
 # ══════════════════════════════════════════════════════════════════
 
-def _build_rag_context(question: str, max_docs: int = 4, max_chars_per_doc: int = 1200) -> str:
+def _document_extras(doc) -> str:
+    """Champs structurés du résumé, lorsqu'ils sont renseignés."""
+    extras = []
+    for label, value in (
+        ("Prix/montants", doc.prix),
+        ("Dates clés", doc.dates),
+        ("Conditions suspensives", doc.conditions_suspensives),
+        ("Pénalités", doc.penalites),
+    ):
+        if value and value not in ("—", "Non identifié"):
+            extras.append(f"{label} : {value}")
+    return "\n".join(extras)
+
+
+def _build_rag_context(question: str, max_passages: int = 4, max_chars_per_passage: int = 1200) -> str:
     """
-    Recherche dans DocumentTechnique les documents dont le résumé ou le texte
-    contient des mots de la question, et construit un bloc de contexte textuel.
-
-    Stratégie simple (pas de vecteurs) :
-      1. On extrait les mots significatifs de la question (> 3 caractères).
-      2. On filtre les documents qui matchent au moins un mot dans le titre,
-         le contenu ou le dossier associé.
-      3. On tronque le texte_brut pour rester dans les limites du contexte.
+    Sélectionne dans l'index des documents techniques les passages les plus
+    pertinents pour la question et construit un bloc de contexte textuel.
+
+    Les documents sont découpés en passages à l'import et classés par BM25
+    (voir technique.services.chunk_index) : le prompt reçoit les extraits qui
+    répondent à la question, pas seulement le début des documents.
+    Les champs structurés du résumé sont ajoutés une fois par document.
     """
     try:
-        from technique.models import DocumentTechnique
+        from technique.services.chunk_index import search_chunks
     except ImportError:
         return ""
 
-    # Mots-clés de la question (> 3 lettres, hors stop-words courants)
-    stopwords = {"pour", "avec", "dans", "quel", "quoi", "est", "les", "des", "une", "que",
-                 "pas", "plus", "tout", "mais", "cette", "sont", "quel", "quels", "quelle",
-                 "quelles", "comment", "quand", "peut", "peut-on", "doit", "doit-on"}
-    words = [w for w in re.findall(r'\b\w{4,}\b', question.lower()) if w not in stopwords]
-
-    if not words:
-        return ""
-
-    from django.db.models import Q
-    q_filter = Q()
-    for w in words[:6]:          # On limite à 6 mots pour ne pas surcharger la requête
-        q_filter |= (
-            Q(resume__icontains=w)
-            | Q(texte_brut__icontains=w)
-            | Q(titre__icontains=w)
-            | Q(project__reference__icontains=w)
-            | Q(project__name__icontains=w)
-        )
-
-    docs = (
-        DocumentTechnique.objects.select_related("project")
-        .filter(q_filter)
-        .order_by("-created_at")[:max_docs]
-    )
-
-    if not docs:
+    chunks = search_chunks(question, limit=max_passages)
+    if not chunks:
         return ""
 
     blocks = []
-    for doc in docs:
-        # On préfère le résumé structuré (plus dense) au texte brut complet
-        content = doc.resume or doc.texte_brut or ""
-        if not content.strip():
-            continue
-
-        # Ajouter les champs structurés si disponibles
-        extras = []
-        if doc.prix and doc.prix not in ("—", "Non identifié"):
-            extras.append(f"Prix/montants : {doc.prix}")
-        if doc.dates and doc.dates not in ("—", "Non identifié"):
-            extras.append(f"Dates clés : {doc.dates}")
-        if doc.conditions_suspensives and doc.conditions_suspensives not in ("—", "Non identifié"):
-            extras.append(f"Conditions suspensives : {doc.conditions_suspensives}")
-        if doc.penalites and doc.penalites not in ("—", "Non identifié"):
-            extras.append(f"Pénalités : {doc.penalites}")
-
-        extra_text = "\n".join(extras)
-        full = f"{content}\n{extra_text}".strip()[:max_chars_per_doc]
-
+    seen_documents = set()
+    for chunk in chunks:
+        doc = chunk.document
+        content = chunk.text
+        if doc.pk not in seen_documents:
+            seen_documents.add(doc.pk)
+            content = f"{content}\n{_document_extras(doc)}".strip()
         blocks.append(
-            f"--- Document : {doc.titre} | Dossier : {doc.project or '—'} ---\n{full}"
+            f"--- Document : {doc.titre} | Dossier : {doc.project or '—'} | "
+            f"Extrait {chunk.position + 1} ---\n{content[:max_chars_per_passage]}"
         )
 
-    if not blocks:
-        return ""
-
     return (
         "Extraits de documents internes Benjamin Immobilier pertinents pour cette question :\n\n"
         + "\n\n".join(blocks)
     )
 
 
-def _handle_document_query(message: str) -> str:
+def _handle_document_query(message: str, bypass_cache: bool = False) -> str:
     """
     Répond à une question sur les documents techniques internes.
-    Injecte le contexte RAG dans le prompt Groq.
+    Injecte le contexte RAG dans le prompt Groq. Le contexte faisant partie de
+    la clé du cache LLM, une réponse n'est réutilisée que pour des extraits
+    identiques : une réindexation des documents invalide naturellement le cache.
     """
     api_key = getattr(settings, "GROQ_API_KEY", None)
     if not api_key:
@@ -249,20 +224,19 @@ def _handle_document_query(message: str) -> str:
     messages_payload.append({"role": "user", "content": message})
 
     try:
-        r = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "temperature": 0.2,
-                "max_tokens": 800,
-                "messages": messages_payload,
-            },
-            timeout=30,
-        )
-        if r.status_code == 200:
-            return r.json()["choices"][0]["message"]["content"].strip()
-        return f"Erreur API Groq ({r.status_code})"
+        return get_llm_client().chat(
+            messages_payload,
+            temperature=0.2,
+            max_tokens=800,
+            acquire_timeout=settings.LLM_WEB_ACQUIRE_TIMEOUT_SECONDS,
+            use_cache=True,
+            bypass_cache=bypass_cache,
+            purpose="chatbot_documents",
+        ).content
+    except LLMBusyError as e:
+        return e.detail
+    except LLMHTTPError as e:
+        return f"Erreur API Groq ({e.status_code})"
     except requests.exceptions.Timeout:
         return "⏱️ Délai d'attente dépassé."
     except Exception as e:
@@ -288,6 +262,7 @@ def chatbot_query(request):
       - invoice  → interroge la base de données des factures
       - document → RAG sur les documents techniques internes
       - legal    → Légifrance + Groq
+    "refresh": true dans le corps JSON ignore les réponses du cache LLM.
     """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'response': 'Méthode non autorisée'}, status=405)
@@ -296,12 +271,13 @@ def chatbot_query(request):
     try:
         data = json.loads(request.body or '{}')
         message = (data.get('message') or '').strip()
+        refresh = bool(data.get('refresh'))
 
         if not message:
             return JsonResponse({'success': False, 'response': 'Message vide.'}, status=400)
 
         # ── Routing IA ────────────────────────────────────────────
-        route = _route_message(message)
+        route = _route_message(message, bypass_cache=refresh)
 
         if route == "invoice":
             resp = _handle_invoice_query(message, request.user)
@@ -311,7 +287,7 @@ def chatbot_query(request):
                 resp = _handle_legal_query(message)
 
         elif route == "document":
-            resp = _handle_document_query(message)
+            resp = _handle_document_query(message, bypass_cache=refresh)
 
         else:  # legal
             resp = _handle_legal_query(message)
@@ -469,7 +445,6 @@ def _handle_legal_query(message: str) -> str:
     except Exception as e:
         legifrance_context = f"(Impossible de récupérer des résultats Légifrance : {e})"
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
     base_system_prompt = (
         "Tu es un assistant juridique spécialisé en droit immobilier en France. "
         "Tu t'adresses à des professionnels d'une agence immobilière.\n\n"
@@ -491,31 +466,21 @@ def _handle_legal_query(message: str) -> str:
         })
     messages_list.append({"role": "user", "content": message})
 
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": messages_list,
-        "temperature": 0.2,
-        "max_tokens": 700,
-        "stream": False,
-    }
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
-        if r.status_code == 200:
-            data = r.json()
-            answer = data["choices"][0]["message"]["content"].strip()
-            if legifrance_context and legifrance_context.startswith("Résultats Légifrance"):
-                answer += (
-                    "\n\n---\n📚 **Sources Légifrance (métadonnées)**\n"
-                    + legifrance_context.replace("Résultats Légifrance (métadonnées) :", "").strip()
-                )
-            return answer
-        try:
-            err = r.json()
-        except Exception:
-            err = r.text
-        return f"Erreur API Groq ({r.status_code}) : {err}"
+        answer = get_llm_client().chat(
+            messages_list, temperature=0.2, max_tokens=700, purpose="chatbot_juridique",
+            acquire_timeout=settings.LLM_WEB_ACQUIRE_TIMEOUT_SECONDS,
+        ).content
+        if legifrance_context and legifrance_context.startswith("Résultats Légifrance"):
+            answer += (
+                "\n\n---\n📚 **Sources Légifrance (métadonnées)**\n"
+                + legifrance_context.replace("Résultats Légifrance (métadonnées) :", "").strip()
+            )
+        return answer
+    except LLMBusyError as e:
+        return e.detail
+    except LLMHTTPError as e:
+        return f"Erreur API Groq ({e.status_code}) : {e.detail}"
     except requests.exceptions.Timeout:
         return "Délai d'attente dépassé."
     except requests.exceptions.ConnectionError as e:
@@ -667,7 +632,6 @@ def _handle_legal_query(message: str) -> str:
         legifrance_context = f"(Impossible de récupérer des résultats sur Légifrance pour cette question : {e})"
 
     # 2) On contextualise la réponse via Groq
-    url = "https://api.groq.com/openai/v1/chat/completions"
 
     base_system_prompt = (
         "Tu es un assistant juridique spécialisé en droit immobilier en France. "
@@ -700,35 +664,25 @@ def _handle_legal_query(message: str) -> str:
 
     messages.append({"role": "user", "content": message})
 
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": messages,
-        "temperature": 0.2,
-        "max_tokens": 700,
-        "stream": False,
-    }
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
-        if r.status_code == 200:
-            data = r.json()
-            answer = data["choices"][0]["message"]["content"].strip()
-
-            # On ajoute les sources Légifrance à la fin
-            if legifrance_context and legifrance_context.startswith("Résultats Légifrance"):
-                answer += (
-                    "\n\n---\n"
-                    "📚 **Sources Légifrance (métadonnées)**\n"
-                    + legifrance_context.replace("Résultats Légifrance (métadonnées) :", "").strip()
-                )
-
-            return answer
-        try:
-            err = r.json()
-        except Exception:
-            err = r.text
-        return f" Erreur API Groq ({r.status_code}) : {err}"
+        answer = get_llm_client().chat(
+            messages, temperature=0.2, max_tokens=700, purpose="chatbot_juridique",
+            acquire_timeout=settings.LLM_WEB_ACQUIRE_TIMEOUT_SECONDS,
+        ).content
+
+        # On ajoute les sources Légifrance à la fin
+        if legifrance_context and legifrance_context.startswith("Résultats Légifrance"):
+            answer += (
+                "\n\n---\n"
+                "📚 **Sources Légifrance (métadonnées)**\n"
+                + legifrance_context.replace("Résultats Légifrance (métadonnées) :", "").strip()
+            )
+
+        return answer
+    except LLMBusyError as e:
+        return e.detail
+    except LLMHTTPError as e:
+        return f" Erreur API Groq ({e.status_code}) : {e.detail}"
     except requests.exceptions.Timeout:
         return "⏱️ Délai d’attente dépassé."
     except requests.exceptions.ConnectionError as e:
@@ -0,0 +1,220 @@
+"""
+Cache à deux niveaux : un LRU borné en mémoire du processus devant un cache
+partagé (DatabaseCache par défaut, aucun service supplémentaire requis).
+
+    CACHES = {
+        "default": {
+            "BACKEND": "config.cache.TwoTierCache",
+            "OPTIONS": {"SHARED_ALIAS": "shared", "MAX_ENTRIES": 1000, "LOCAL_TIMEOUT": 30},
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "my_cache_table",
+        },
+    }
+
+Les lectures servies par le niveau local évitent l'aller-retour vers le cache
+partagé. Une entrée locale vit au plus LOCAL_TIMEOUT secondes : c'est la durée
+maximale pendant laquelle un autre processus peut lire une valeur périmée.
+Une valeur écrite par ce processus (set, add) ne survit pas non plus à son
+TTL. En revanche, une valeur relue depuis le cache partagé (get, get_many)
+est gardée LOCAL_TIMEOUT secondes, car l'API de cache Django ne donne pas le
+TTL restant : elle peut être servie jusqu'à LOCAL_TIMEOUT secondes après son
+expiration dans le cache partagé. Pour une valeur dont l'expiration doit être
+exacte, la supprimer (delete) plutôt que de compter sur son TTL.
+
+add et incr sont transmis au cache partagé, sans passer par le niveau local.
+Avec DatabaseCache, add est arbitré par l'unicité de la clé en base (deux
+processus ne peuvent pas l'emporter tous les deux), mais incr est une lecture
+suivie d'une écriture : il n'est pas atomique, et des incréments concurrents
+peuvent se perdre. Les compteurs qui doivent être exacts se tiennent en base
+(F()), pas dans ce cache.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache as default_cache
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED_ALIAS", "shared")
+        self._local_timeout = float(options.get("LOCAL_TIMEOUT", 30))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # --- Niveau local -----------------------------------------------------
+
+    def _local_expiry(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return time.monotonic() + self._local_timeout
+        return time.monotonic() + min(max(timeout - time.time(), 0), self._local_timeout)
+
+    def _local_get(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            self._stats["local_hits"] += 1
+        return pickle.loads(payload)
+
+    def _local_set(self, local_key, value, expires_at):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (expires_at, payload)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    # --- API Django -------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            with self._lock:
+                self._stats["misses"] += 1
+            return default
+        with self._lock:
+            self._stats["shared_hits"] += 1
+        # TTL restant inconnu : on se limite à LOCAL_TIMEOUT
+        self._local_set(local_key, value, time.monotonic() + self._local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout=timeout, version=version)
+        if timeout is not None and timeout <= 0:
+            self._local_delete(local_key)
+            return
+        self._local_set(local_key, value, self._local_expiry(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added and (timeout is None or timeout > 0):
+            self._local_set(local_key, value, self._local_expiry(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta=delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            shared_values = self.shared.get_many(remaining, version=version)
+            expires_at = time.monotonic() + self._local_timeout
+            for key, value in shared_values.items():
+                self._local_set(self.make_and_validate_key(key, version=version), value, expires_at)
+            with self._lock:
+                self._stats["shared_hits"] += len(shared_values)
+                self._stats["misses"] += len(remaining) - len(shared_values)
+            found.update(shared_values)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout=timeout, version=version)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.clear_local()
+        self.shared.clear()
+
+    # --- Outils -----------------------------------------------------------
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "local_entries": len(self._local)}
+
+
+def _namespace_version_key(namespace):
+    return f"cache-namespace:{namespace}"
+
+
+def _version_cache(cache):
+    # Version lue dans le cache partagé : une invalidation faite par un autre
+    # processus est vue immédiatement, pas après LOCAL_TIMEOUT.
+    cache = cache or default_cache
+    return getattr(cache, "shared", cache)
+
+
+def namespace_key(namespace, key, cache=None):
+    """
+    Clé versionnée par espace de noms : invalidate_namespace(namespace) rend
+    obsolètes toutes les clés construites avant l'appel, sans les parcourir.
+    La version est toujours lue dans le cache partagé (un aller-retour).
+    """
+    cache = _version_cache(cache)
+    version_key = _namespace_version_key(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, 1, timeout=None)
+        version = cache.get(version_key) or 1
+    return f"{namespace}:{version}:{key}"
+
+
+def invalidate_namespace(namespace, cache=None):
+    cache = _version_cache(cache)
+    version_key = _namespace_version_key(namespace)
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, 2, timeout=None)
+        return cache.get(version_key) or 2
@@ -35,6 +35,18 @@ app.conf.beat_schedule = {
         'task': 'invoices.tasks.check_and_send_invoice_reminders',
         'schedule': crontab(minute='*/30'),
     },
+    'import-technique-mailboxes': {
+        'task': 'technique.tasks.import_technique_mailboxes',
+        'schedule': crontab(minute='*/10'),
+    },
+    'purge-old-export-jobs': {
+        'task': 'management.tasks.purge_old_export_jobs',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'evict-llm-cache': {
+        'task': 'chatbot.tasks.evict_llm_cache_entries',
+        'schedule': crontab(minute=15),
+    },
 }
 app.conf.timezone = 'Europe/Paris'
 
@@ -0,0 +1,56 @@
+"""
+Mesures légères des requêtes SQL (nombre et durée) via connection.execute_wrapper
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class QueryCounter:
+    """
+    Wrapper d'exécution qui compte les requêtes SQL et cumule leur durée.
+
+    Avec track_statements=True, chaque texte SQL (paramètres exclus) est
+    aussi compté : une même requête répétée signale un motif N+1.
+    """
+
+    def __init__(self, track_statements=False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter() if track_statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            if self.statements is not None:
+                self.statements[sql] += 1
+
+    def repeated_statements(self, min_count=2, limit=None):
+        """Requêtes exécutées au moins min_count fois, les plus fréquentes d'abord."""
+        if not self.statements:
+            return []
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common(limit)
+            if count >= min_count
+        ]
+
+
+@contextmanager
+def count_queries():
+    """
+    Compte les requêtes exécutées dans le bloc, sans activer DEBUG :
+
+        with count_queries() as queries:
+            ...
+        logger.info("%s requête(s)", queries.count)
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
@@ -1,6 +1,9 @@
 import os
 import datetime
 import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
 class DailyDateFileHandler(logging.FileHandler):
     """
@@ -30,3 +33,179 @@ class DailyDateFileHandler(logging.FileHandler):
                 self.stream = None
                             
         super().emit(record)
+
+    def emit_batch(self, records):
+        """
+        Écrit plusieurs enregistrements avec une seule écriture et un seul
+        flush, en conservant la bascule de fichier à minuit.
+        """
+        self.acquire()
+        try:
+            new_date = datetime.date.today()
+            if new_date != self.current_date:
+                self.current_date = new_date
+                self.baseFilename = self._get_filename(self.current_date)
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+            if self.stream is None:
+                self.stream = self._open()
+            lines = []
+            for record in records:
+                try:
+                    lines.append(self.format(record) + self.terminator)
+                except Exception:
+                    self.handleError(record)
+            self.stream.write("".join(lines))
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener qui dépile jusqu'à batch_size enregistrements à la fois et
+    les transmet en un seul lot au handler cible (emit_batch).
+    """
+
+    def __init__(self, queue, handler, batch_size=100, on_batch=None):
+        super().__init__(queue, handler, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+
+    def _monitor(self):
+        q = self.queue
+        has_task_done = hasattr(q, 'task_done')
+        stop = False
+        while not stop:
+            batch = []
+            record = self.dequeue(True)
+            while True:
+                if record is self._sentinel:
+                    stop = True
+                    if has_task_done:
+                        q.task_done()
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.dequeue(False)
+                except queue.Empty:
+                    break
+            dequeued = len(batch)
+            if self.on_batch is not None:
+                batch.extend(self.on_batch())
+            if batch:
+                self.handle_batch(batch)
+            if has_task_done:
+                for _ in range(dequeued):
+                    q.task_done()
+
+    def handle_batch(self, records):
+        handler = self.handlers[0]
+        records = [
+            self.prepare(record)
+            for record in records
+            if record.levelno >= handler.level and handler.filter(record)
+        ]
+        if records:
+            handler.emit_batch(records)
+
+    def enqueue_sentinel(self):
+        # Bloquant : le sentinel doit passer même si la file est pleine
+        self.queue.put(self._sentinel)
+
+
+class QueuedDailyFileHandler(QueueHandler):
+    """
+    Variante non bloquante de DailyDateFileHandler : l'appelant (requête HTTP,
+    signal...) dépose l'enregistrement dans une file bornée et un thread
+    l'écrit sur disque par lots.
+
+    Si la file est pleine, l'enregistrement est abandonné et compté dans
+    `dropped` ; le nombre de pertes est ensuite écrit dans le fichier.
+    La file est vidée à l'arrêt (logging.shutdown appelle close()).
+    """
+
+    def __init__(self, log_dir, encoding='utf-8', queue_size=10000, batch_size=100):
+        self.file_handler = DailyDateFileHandler(log_dir, encoding=encoding)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._drops_lock = threading.Lock()
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self._start_listener()
+        # Les workers Celery (prefork) n'héritent pas du thread d'écriture
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start_listener(self):
+        self.listener = BatchingQueueListener(
+            self.queue,
+            self.file_handler,
+            batch_size=self.batch_size,
+            on_batch=self._drop_report,
+        )
+        self.listener.start()
+
+    def _restart_after_fork(self):
+        if self.listener is None:
+            return
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self._drops_lock = threading.Lock()
+        self._start_listener()
+
+    def setFormatter(self, fmt):
+        # Le formatage est fait par le handler fichier, dans le thread d'écriture
+        self.file_handler.setFormatter(fmt)
+
+    def setLevel(self, level):
+        super().setLevel(level)
+        self.file_handler.setLevel(level)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drops_lock:
+                self.dropped += 1
+                self._unreported_drops += 1
+
+    def _drop_report(self):
+        with self._drops_lock:
+            count, self._unreported_drops = self._unreported_drops, 0
+        if not count:
+            return []
+        return [logging.LogRecord(
+            name=__name__,
+            level=logging.WARNING,
+            pathname=__file__,
+            lineno=0,
+            msg="%s enregistrement(s) de log perdu(s) : file d'écriture pleine",
+            args=(count,),
+            exc_info=None,
+        )]
+
+    def flush(self, timeout=5):
+        """Attend (au plus timeout secondes) que la file soit écrite sur disque."""
+        if self.listener is None:
+            return
+        with self.queue.all_tasks_done:
+            self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, timeout=timeout)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+                for record in self._drop_report():
+                    self.file_handler.emit(record)
+            self.file_handler.close()
+        finally:
+            self.release()
+        super().close()
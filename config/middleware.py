@@ -1,6 +1,20 @@
+import cProfile
+import json
 import logging
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+from config.db_metrics import QueryCounter
 
 logger = logging.getLogger('audit')
+performance_logger = logging.getLogger('performance')
+slow_request_logger = logging.getLogger('performance.slow_requests')
 
 class AuditLogMiddleware:
     """
@@ -42,3 +56,87 @@ class AuditLogMiddleware:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class RequestProfilingMiddleware:
+    """
+    Middleware optionnel (REQUEST_PROFILING_ENABLED) mesurant pour chaque requête
+    la durée totale, le nombre de requêtes SQL et leur durée cumulée.
+
+    - Les requêtes répétées au moins REQUEST_PROFILING_DUPLICATE_THRESHOLD fois
+      sont signalées comme N+1 probables.
+    - Les requêtes plus lentes que REQUEST_PROFILING_SLOW_MS sont écrites dans
+      le journal "slow_requests" avec les requêtes SQL les plus répétées.
+    - Un superutilisateur peut ajouter ?_profile=1 pour obtenir un dump cProfile
+      dans REQUEST_PROFILING_DUMP_DIR (nom renvoyé dans l'en-tête X-Profile-Dump).
+    """
+    PROFILE_PARAM = '_profile'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = settings.REQUEST_PROFILING_SLOW_MS
+        self.duplicate_threshold = settings.REQUEST_PROFILING_DUPLICATE_THRESHOLD
+        self.top_statements = settings.REQUEST_PROFILING_TOP_STATEMENTS
+
+    def __call__(self, request):
+        counter = QueryCounter(track_statements=True)
+        profiler = cProfile.Profile() if self.wants_profile(request) else None
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        sql_ms = counter.duration * 1000
+
+        response['Server-Timing'] = (
+            f'app;dur={elapsed_ms:.1f}, sql;dur={sql_ms:.1f};desc="{counter.count} requetes"'
+        )
+        if profiler is not None:
+            response['X-Profile-Dump'] = self.dump_profile(profiler, request)
+        self.report(request, response, counter, elapsed_ms, sql_ms)
+        return response
+
+    def wants_profile(self, request):
+        user = getattr(request, 'user', None)
+        return (
+            request.GET.get(self.PROFILE_PARAM) == '1'
+            and user is not None
+            and user.is_superuser
+        )
+
+    def dump_profile(self, profiler, request):
+        dump_dir = Path(settings.REQUEST_PROFILING_DUMP_DIR)
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'racine'
+        filename = f"{timezone.now():%Y%m%d-%H%M%S}-{slug[:80]}.prof"
+        profiler.dump_stats(dump_dir / filename)
+        performance_logger.info("PROFILE DUMP: %s %s -> %s", request.method, request.path, filename)
+        return filename
+
+    def report(self, request, response, counter, elapsed_ms, sql_ms):
+        duplicates = counter.repeated_statements(min_count=self.duplicate_threshold)
+        for sql, count in duplicates:
+            performance_logger.warning(
+                "N+1 PROBABLE: %s %s | %s exécutions de : %s",
+                request.method, request.path, count, sql[:300],
+            )
+
+        if elapsed_ms < self.slow_ms:
+            return
+        slow_request_logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            'duration_ms': round(elapsed_ms, 1),
+            'sql_count': counter.count,
+            'sql_ms': round(sql_ms, 1),
+            'top_statements': [
+                {'count': count, 'sql': sql}
+                for sql, count in counter.repeated_statements(limit=self.top_statements)
+            ],
+        }, ensure_ascii=False))
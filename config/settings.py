@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_mailbox',
     'invoices',
     'django_filters',
@@ -81,6 +82,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     # --- AJOUT MIDDLEWARE AUDIT (Log Actions + IP) ---
     'config.middleware.AuditLogMiddleware',
+    # --- PROFILAGE DES REQUÊTES (désactivé sauf REQUEST_PROFILING_ENABLED=True) ---
+    'config.middleware.RequestProfilingMiddleware',
     
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # --- AJOUT A2F ---
@@ -223,11 +226,123 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Paris'
 CELERY_ENABLE_UTC = True
 
+# Relances Gmail automatiques : "chord" (une sous-tâche par utilisateur),
+# "threads" (pool de threads borné dans le worker) ou "serial"
+GMAIL_RELANCE_EXECUTION = os.getenv("GMAIL_RELANCE_EXECUTION", "chord")
+GMAIL_RELANCE_THREADS = int(os.getenv("GMAIL_RELANCE_THREADS", "4"))
+# Durée de vie (secondes) d'un service Gmail construit et mis en cache par processus
+GMAIL_SERVICE_CACHE_TTL = int(os.getenv("GMAIL_SERVICE_CACHE_TTL", "1800"))
+
+# Exports XLSX / PDF en arrière-plan : "celery" (tâche asynchrone) ou "sync"
+EXPORT_JOB_EXECUTION = os.getenv("EXPORT_JOB_EXECUTION", "celery")
+# Une demande identique dans cette fenêtre réutilise le fichier déjà rendu
+EXPORT_JOB_REUSE_SECONDS = int(os.getenv("EXPORT_JOB_REUSE_SECONDS", "300"))
+EXPORT_JOB_RETENTION_HOURS = int(os.getenv("EXPORT_JOB_RETENTION_HOURS", "24"))
+
+# Classement IA des emails en masse : "celery" (tâche asynchrone) ou "sync"
+EMAIL_CLASSIFICATION_EXECUTION = os.getenv("EMAIL_CLASSIFICATION_EXECUTION", "celery")
+# Un job actif sans progression depuis ce délai est considéré comme interrompu
+EMAIL_CLASSIFICATION_JOB_STALE_MINUTES = int(os.getenv("EMAIL_CLASSIFICATION_JOB_STALE_MINUTES", "30"))
+# Pré-classement local (technique.services.project_ranking) : dossiers proposés
+# au LLM, et avance suffisante pour classer un email sans l'appeler
+EMAIL_CLASSIFY_CANDIDATES = int(os.getenv("EMAIL_CLASSIFY_CANDIDATES", "8"))
+# Score minimal d'un candidat pour restreindre le prompt ; en dessous, le prompt
+# reprend les 30 premiers dossiers en plus des candidats
+EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE = float(os.getenv("EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE", "6"))
+EMAIL_CLASSIFY_SHORTCUT_MIN_SCORE = float(os.getenv("EMAIL_CLASSIFY_SHORTCUT_MIN_SCORE", "10"))
+EMAIL_CLASSIFY_SHORTCUT_MARGIN = float(os.getenv("EMAIL_CLASSIFY_SHORTCUT_MARGIN", "2"))
+# Emails envoyés au LLM dans un même appel par le classement en masse
+EMAIL_CLASSIFY_BATCH_SIZE = int(os.getenv("EMAIL_CLASSIFY_BATCH_SIZE", "10"))
+# Règles d'affinité (technique.services.email_affinity) : emails classés et part
+# minimale d'un expéditeur ou d'un domaine pour rattacher sans appel au LLM
+EMAIL_AFFINITY_MIN_COUNT = int(os.getenv("EMAIL_AFFINITY_MIN_COUNT", "2"))
+EMAIL_AFFINITY_MIN_SHARE = float(os.getenv("EMAIL_AFFINITY_MIN_SHARE", "0.8"))
+
+# Import Gmail du pôle technique (technique.services.gmail_import) : messages
+# lus par page et plafond d'un import complet (premier passage ou curseur expiré)
+TECHNIQUE_GMAIL_IMPORT_PAGE_SIZE = int(os.getenv("TECHNIQUE_GMAIL_IMPORT_PAGE_SIZE", "100"))
+TECHNIQUE_GMAIL_IMPORT_LIMIT = int(os.getenv("TECHNIQUE_GMAIL_IMPORT_LIMIT", "500"))
+# Réindexation des passages du chatbot après l'enregistrement d'un document :
+# "celery" (tâche asynchrone) ou "sync"
+CHUNK_INDEX_EXECUTION = os.getenv("CHUNK_INDEX_EXECUTION", "celery")
+# Bouton « Importer Gmail » : "celery" (tâche asynchrone) ou "sync"
+TECHNIQUE_GMAIL_IMPORT_EXECUTION = os.getenv("TECHNIQUE_GMAIL_IMPORT_EXECUTION", "celery")
+# Pièces jointes importées : taille maximale d'un fichier (au-delà, ignoré sans
+# téléchargement) et volume annoncé maximal d'une requête groupée, en octets
+TECHNIQUE_ATTACHMENT_MAX_BYTES = int(os.getenv("TECHNIQUE_ATTACHMENT_MAX_BYTES", str(50 * 1024 * 1024)))
+TECHNIQUE_ATTACHMENT_BATCH_BYTES = int(os.getenv("TECHNIQUE_ATTACHMENT_BATCH_BYTES", str(20 * 1024 * 1024)))
+
+# Nombre maximal de résultats par source dans la recherche globale
+GLOBAL_SEARCH_SOURCE_LIMIT = int(os.getenv("GLOBAL_SEARCH_SOURCE_LIMIT", "10"))
+# Indexation de la recherche globale après un enregistrement : "celery" (tâche
+# asynchrone) ou "sync"
+SEARCH_INDEX_EXECUTION = os.getenv("SEARCH_INDEX_EXECUTION", "celery")
+
+# Profilage des requêtes HTTP (config.middleware.RequestProfilingMiddleware)
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "False") == "True"
+# Au-delà de ce seuil, la requête est écrite dans logs/slow_requests.log
+REQUEST_PROFILING_SLOW_MS = int(os.getenv("REQUEST_PROFILING_SLOW_MS", "500"))
+# Une même requête SQL répétée autant de fois est signalée comme N+1 probable
+REQUEST_PROFILING_DUPLICATE_THRESHOLD = int(os.getenv("REQUEST_PROFILING_DUPLICATE_THRESHOLD", "5"))
+REQUEST_PROFILING_TOP_STATEMENTS = 5
+REQUEST_PROFILING_DUMP_DIR = BASE_DIR / 'logs' / 'profiles'
+
+# Client LLM partagé (voir chatbot/llm_client.py). LLM_API_URL peut pointer
+# vers un serveur compatible OpenAI (ou le faux serveur chatbot.groq_stub).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "chatbot.llm_client.GroqBackend")
+LLM_API_URL = os.getenv("LLM_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+# Appels simultanés et connexions gardées ouvertes, par processus
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Backoff exponentiel des erreurs réseau et 5xx (les 429 suivent Retry-After)
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "2.0"))
+# Attente maximale du quota pour les vues du chatbot, en secondes : au-delà,
+# l'utilisateur reçoit « service occupé » au lieu d'une requête bloquée
+LLM_WEB_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("LLM_WEB_ACQUIRE_TIMEOUT_SECONDS", "5"))
+
+# Cache des réponses Groq adressé par le contenu (voir chatbot/llm_cache.py)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True") == "True"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Plafonds globaux : au-delà, les réponses les moins récemment utilisées sont
+# supprimées par la tâche planifiée chatbot.tasks.evict_llm_cache_entries
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+LLM_CACHE_MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", str(64 * 1024)))
+# Un succès ne met à jour last_used_at (ordre LRU) qu'une fois par intervalle
+LLM_CACHE_TOUCH_INTERVAL_SECONDS = int(os.getenv("LLM_CACHE_TOUCH_INTERVAL_SECONDS", "3600"))
+
+# Quota Groq partagé par les threads d'un processus (voir chatbot/rate_limit.py)
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "60000"))
+# Extraits d'un document résumés en parallèle
+AI_SUMMARY_MAX_WORKERS = int(os.getenv("AI_SUMMARY_MAX_WORKERS", "4"))
+
+# Cache à deux niveaux : LRU en mémoire du processus devant la table de cache
+# PostgreSQL partagée (voir config/cache.py)
 CACHES = {
     'default': {
+        'BACKEND': 'config.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            # Durée de vie maximale d'une entrée locale : une valeur peut être
+            # servie périmée (ou expirée dans le cache partagé) au pire d'autant
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '30')),
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'my_cache_table',
-    }
+        # Verrous de relance et versions d'espaces de noms partagent la table :
+        # le plafond par défaut (300, purge aléatoire) les supprimerait en cours
+        # de traitement. Au-delà du plafond, les entrées expirées partent
+        # d'abord, puis 1/CULL_FREQUENCY des clés.
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_SHARED_MAX_ENTRIES', '100000')),
+            'CULL_FREQUENCY': int(os.getenv('CACHE_SHARED_CULL_FREQUENCY', '10')),
+        },
+    },
 }
 
 
@@ -268,13 +383,26 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'standard',
         },
-        # Fichier nommé "AAAA-MM-JJ.log" 
+        # Fichier nommé "AAAA-MM-JJ.log", écrit par lots depuis une file bornée
+        # pour ne pas bloquer les requêtes sur les entrées/sorties disque
         'daily_file': {
             'level': 'INFO', 
-            'class': 'config.log_handlers.DailyDateFileHandler',
+            'class': 'config.log_handlers.QueuedDailyFileHandler',
             'log_dir': BASE_DIR / 'logs',
             'formatter': 'standard',
             'encoding': 'utf-8',
+            'queue_size': int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+            'batch_size': 100,
+        },
+        # Journal tournant des requêtes lentes (une ligne JSON par requête)
+        'slow_requests_file': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'slow_requests.log',
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
         },
     },
     'loggers': {
@@ -301,7 +429,18 @@ LOGGING = {
             'handlers': ['daily_file', 'console'],
             'level': 'INFO',
             'propagate': False,
-        }
+        },
+        # Profilage des requêtes (N+1 probables, dumps cProfile)
+        'performance': {
+            'handlers': ['daily_file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'performance.slow_requests': {
+            'handlers': ['slow_requests_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -22,4 +22,18 @@ CACHES = {
 # Optionnel : accélérer les tests en utilisant un hasher de mot de passe plus simple
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
-]
\ No newline at end of file
+]
+
+# Relances Gmail traitées dans le processus de test, sans broker Celery
+GMAIL_RELANCE_EXECUTION = "serial"
+
+# Exports rendus dans la requête de test
+EXPORT_JOB_EXECUTION = "sync"
+EMAIL_CLASSIFICATION_EXECUTION = "sync"
+CHUNK_INDEX_EXECUTION = "sync"
+SEARCH_INDEX_EXECUTION = "sync"
+
+# Appels LLM toujours mockés : le cache est activé explicitement par ses tests
+LLM_CACHE_ENABLED = False
+GROQ_REQUESTS_PER_MINUTE = 100_000
+GROQ_TOKENS_PER_MINUTE = 100_000_000
@@ -13,6 +13,7 @@ from management.views import administratif_view, send_reply_view, generate_auto_
     admin_dossiers_export_pdf_view, admin_dossiers_import_view, create_custom_field_view, \
     update_custom_field_view
 from management.views import sync_gmail_journal_view, update_gmail_conversation_status, add_gmail_conversation_note
+from management.export_views import export_job_create_view, export_job_download_view, export_job_status_view
 from technique import views as technique_views
 from home.views import dashboard_view, global_search
 
@@ -39,6 +40,10 @@ urlpatterns = [
     path('api/gmail-journal/sync/', sync_gmail_journal_view, name='gmail_journal_sync'),
     path('api/gmail-journal/<int:conversation_id>/status/', update_gmail_conversation_status, name='gmail_journal_status'),
     path('api/gmail-journal/<int:conversation_id>/notes/', add_gmail_conversation_note, name='gmail_journal_note'),
+    # API des exports en arrière-plan
+    path('api/exports/', export_job_create_view, name='export_job_create'),
+    path('api/exports/<int:job_id>/', export_job_status_view, name='export_job_status'),
+    path('api/exports/<int:job_id>/download/', export_job_download_view, name='export_job_download'),
     # API pour le calendrier
     path('api/calendar-activities/', get_calendar_activities, name='calendar_activities'),
     path('administratif/calendrier/export.ics', export_calendar_ics_view, name='calendar_export_ics'),
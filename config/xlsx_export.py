@@ -0,0 +1,54 @@
+"""
+Export XLSX en flux : classeur openpyxl en écriture seule, sauvegardé dans un
+fichier temporaire (en mémoire jusqu'à XLSX_SPOOL_MAX_SIZE, sur disque au-delà)
+puis renvoyé par morceaux avec FileResponse.
+
+La mémoire reste stable quel que soit le nombre de lignes exportées, à
+condition de fournir les lignes sous forme d'itérateur
+(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)).
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_CHUNK_SIZE = 500
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def _header_width(label):
+    # Les largeurs doivent être fixées avant la première ligne en mode écriture seule
+    return min(max(len(str(label)) + 2, 12), 42)
+
+
+def write_xlsx(output, sheets):
+    """
+    Écrit un classeur en écriture seule dans output.
+
+    sheets : itérable de tuples (titre, en-têtes, lignes), les lignes étant
+    consommées une par une.
+    """
+    workbook = Workbook(write_only=True)
+    for title, headers, rows in sheets:
+        sheet = workbook.create_sheet(title=title)
+        for index, label in enumerate(headers, start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = _header_width(label)
+        sheet.append(list(headers))
+        for row in rows:
+            sheet.append(row)
+    workbook.save(output)
+
+
+def xlsx_streaming_response(filename, sheets):
+    """Construit la réponse d'un export XLSX (voir write_xlsx pour sheets)."""
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    write_xlsx(output, sheets)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
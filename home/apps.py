@@ -6,5 +6,5 @@ class HomeConfig(AppConfig):
     name = 'home'
 
     def ready(self):
-        pass
+        from . import search_signals  # noqa: F401
 
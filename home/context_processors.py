@@ -1,17 +1,20 @@
 """
 Context processors pour rendre des variables disponibles dans tous les templates
 """
+from user_access.user_test_functions import POLE_GROUPS, get_permission_snapshot
+
 
 def user_role_context(request):
     """
     Ajoute les rôles de navigation au contexte de tous les templates.
     """
     if request.user.is_authenticated:
-        user_groups = set(request.user.groups.values_list('name', flat=True))
-        is_ceo = request.user.is_superuser or "CEO" in user_groups
+        snapshot = get_permission_snapshot(request.user)
+        user_groups = snapshot.groups
+        is_ceo = snapshot.is_superuser or "CEO" in user_groups
         is_only_collaborator = (
-            not request.user.is_superuser
-            and not request.user.is_staff
+            not snapshot.is_superuser
+            and not snapshot.is_staff
             and (not user_groups or user_groups == {"COLLABORATEUR"})
         )
         can_finance = is_ceo or "POLE_FINANCIER" in user_groups
@@ -19,20 +22,11 @@ def user_role_context(request):
         can_administratif = is_ceo or "POLE_ADMINISTRATIF" in user_groups
         can_view_technical_dossiers = can_manage_technique or can_administratif
         can_signatures = bool(
-            request.user.is_superuser
-            or request.user.is_staff
-            or user_groups.intersection(
-                {
-                    "CEO",
-                    "POLE_FINANCIER",
-                    "POLE_TECHNIQUE",
-                    "POLE_ADMINISTRATIF",
-                    "POLE_PROMOTION",
-                    "POLE_DEVELOPPEMENT",
-                    "POLE_INVESTISSEMENT",
-                }
-            )
+            snapshot.is_superuser
+            or snapshot.is_staff
+            or snapshot.in_group("CEO", *POLE_GROUPS)
         )
+        user_group_names = sorted(user_groups)
     else:
         is_only_collaborator = False
         is_ceo = False
@@ -41,6 +35,7 @@ def user_role_context(request):
         can_administratif = False
         can_view_technical_dossiers = False
         can_signatures = False
+        user_group_names = []
 
     return {
         "is_only_collaborator": is_only_collaborator,
@@ -50,4 +45,5 @@ def user_role_context(request):
         "nav_can_administratif": can_administratif,
         "nav_can_view_technical_dossiers": can_view_technical_dossiers,
         "nav_can_signatures": can_signatures,
+        "nav_user_groups": user_group_names,
     }
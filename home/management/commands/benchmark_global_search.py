@@ -0,0 +1,113 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from home.search import rebuild_index, search
+from invoices.models import ActeurExterne, Client, Entreprise, Facture, Fournisseur
+from signatures.models import Document
+from technique.models import DocumentTechnique, TechnicalProject
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la recherche globale indexée aux anciens filtres icontains sur un jeu "
+        "de données généré. Les données sont créées dans une transaction annulée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=2000, help="Objets générés par source.")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--query", action="append", help="Recherche à mesurer (répétable).")
+
+    def handle(self, *args, **options):
+        queries = options["query"] or ["BENCH-0042", "charpente", "Fournisseur 7"]
+        with transaction.atomic():
+            user = self._seed(options["seed"])
+            self.stdout.write(
+                f"{options['seed']} objet(s) par source, {options['repeat']} répétition(s), "
+                f"base {connection.vendor}"
+            )
+            for query in queries:
+                legacy_ms = self._timed(lambda: self._legacy_search(query), options["repeat"])
+                indexed_ms = self._timed(lambda: search(user, query), options["repeat"])
+                self.stdout.write(
+                    f"{query!r} : icontains {legacy_ms:.2f} ms, index {indexed_ms:.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def _timed(self, run, repeat):
+        run()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def _legacy_search(self, query):
+        """Filtres de l'ancienne vue, lookups corrigés."""
+        return [
+            list(Facture.objects.filter(
+                Q(id__icontains=query)
+                | Q(titre__icontains=query)
+                | Q(fournisseur__nom__icontains=query)
+                | Q(client__entreprise__nom__icontains=query)
+            )[:10]),
+            list(Document.objects.filter(titre__icontains=query)[:10]),
+            list(TechnicalProject.objects.filter(
+                Q(name__icontains=query) | Q(reference__icontains=query)
+            )[:10]),
+            list(DocumentTechnique.objects.filter(
+                Q(titre__icontains=query)
+                | Q(project__reference__icontains=query)
+                | Q(project__name__icontains=query)
+            )[:10]),
+        ]
+
+    def _seed(self, count):
+        user = get_user_model().objects.create_superuser(
+            username="benchmark-recherche", email="benchmark-recherche@example.com"
+        )
+        words = ["charpente", "toiture", "électricité", "plomberie", "façade", "étanchéité"]
+        suppliers = []
+        for index in range(10):
+            actor = ActeurExterne.objects.create(id=f"BENCH-SUP-{index}")
+            suppliers.append(Fournisseur.objects.create(id=actor, nom=f"Fournisseur {index}"))
+        actor = ActeurExterne.objects.create(id="BENCH-CLI")
+        client = Client.objects.create(id=actor)
+        Entreprise.objects.create(id=client, nom="Client benchmark")
+
+        projects = TechnicalProject.objects.bulk_create(
+            TechnicalProject(
+                reference=f"BENCH-{index:04d}",
+                name=f"Dossier {words[index % len(words)]} {index}",
+                adresse_bien=f"{index} rue de la Paix",
+            )
+            for index in range(count)
+        )
+        Facture.objects.bulk_create(
+            Facture(
+                id=f"BENCH-FAC-{index:05d}",
+                numero_facture=f"FA-{index:05d}",
+                titre=f"Travaux de {words[index % len(words)]}",
+                fournisseur=suppliers[index % len(suppliers)],
+                client=client,
+            )
+            for index in range(count)
+        )
+        Document.objects.bulk_create(
+            Document(titre=f"Contrat {words[index % len(words)]} {index}", fichier="bench.pdf")
+            for index in range(count)
+        )
+        DocumentTechnique.objects.bulk_create(
+            DocumentTechnique(
+                titre=f"Devis {words[index % len(words)]} {index}",
+                fichier="bench.pdf",
+                project=projects[index],
+                texte_brut=f"Devis de {words[index % len(words)]} pour le dossier {index}.",
+            )
+            for index in range(count)
+        )
+        rebuild_index()
+        return user
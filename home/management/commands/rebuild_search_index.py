@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.search import SEARCH_SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de la recherche globale (home.SearchEntry)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            choices=list(SEARCH_SOURCES),
+            help="Source à réindexer (répétable, toutes par défaut).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = rebuild_index(options["source"], batch_size=options["batch_size"])
+        for source, count in counts.items():
+            self.stdout.write(f"{source} : {count} objet(s) indexé(s)")
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
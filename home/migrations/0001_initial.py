@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:37
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations, models
+
+
+# Configuration plein texte française insensible aux accents
+SEARCH_CONFIG_SQL = """
+CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french);
+ALTER TEXT SEARCH CONFIGURATION french_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+"""
+
+SEARCH_INDEXES_SQL = """
+CREATE INDEX search_entry_vector_gin ON home_searchentry USING gin (search_vector);
+CREATE INDEX search_entry_reference_trgm ON home_searchentry USING gin (reference gin_trgm_ops);
+CREATE INDEX search_entry_object_id_trgm ON home_searchentry USING gin (object_id gin_trgm_ops);
+-- Expressions produites par les lookups icontains de Django
+CREATE INDEX search_entry_reference_upper_trgm
+    ON home_searchentry USING gin (UPPER(reference::text) gin_trgm_ops);
+CREATE INDEX search_entry_object_id_upper_trgm
+    ON home_searchentry USING gin (UPPER(object_id::text) gin_trgm_ops);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS search_entry_object_id_upper_trgm;
+DROP INDEX IF EXISTS search_entry_reference_upper_trgm;
+DROP INDEX IF EXISTS search_entry_object_id_trgm;
+DROP INDEX IF EXISTS search_entry_reference_trgm;
+DROP INDEX IF EXISTS search_entry_vector_gin;
+DROP TEXT SEARCH CONFIGURATION IF EXISTS french_unaccent;
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(SEARCH_CONFIG_SQL)
+    schema_editor.execute(SEARCH_INDEXES_SQL)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('facture', 'Facture'), ('document', 'Document à signer'), ('projet', 'Dossier technique'), ('document_technique', 'Document technique')], max_length=30)),
+                ('object_id', models.CharField(max_length=255)),
+                ('reference', models.CharField(blank=True, default='', max_length=255)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+                'constraints': [models.UniqueConstraint(fields=('source', 'object_id'), name='search_entry_unique_object')],
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def backfill_search_index(apps, schema_editor):
+    """
+    Remplit l'index des objets existants, sans quoi la recherche ne renvoie
+    rien jusqu'au premier `rebuild_search_index`. Passe la main si l'index
+    contient déjà des entrées ou s'il n'y a rien à indexer (nouvelle base).
+
+    Les entrées sont construites par home.search, avec les modèles courants :
+    si cette migration échoue sur une base restée à un schéma plus ancien,
+    la faker (`migrate home 0002 --fake`) puis lancer `rebuild_search_index`.
+    """
+    alias = schema_editor.connection.alias
+    if apps.get_model("home", "SearchEntry").objects.using(alias).exists():
+        return
+    sources = [
+        ("invoices", "Facture"),
+        ("signatures", "Document"),
+        ("technique", "TechnicalProject"),
+        ("technique", "DocumentTechnique"),
+    ]
+    if not any(apps.get_model(app, name).objects.using(alias).exists() for app, name in sources):
+        return
+
+    from home.search import rebuild_index
+
+    rebuild_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0001_initial"),
+        ("invoices", "0009_remove_unused_legacy_models"),
+        ("signatures", "0009_unique_tampon_per_societe"),
+        ("technique", "0017_attachment_sha256"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
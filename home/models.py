@@ -0,0 +1,38 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchEntry(models.Model):
+    """
+    Index dénormalisé de la recherche globale : une ligne par facture, document
+    à signer, dossier technique ou document technique (voir home.search).
+
+    Sous PostgreSQL, la migration ajoute l'index GIN de search_vector
+    (configuration french_unaccent) et les index trigrammes de reference et
+    object_id. Ces index ne sont pas déclarés dans Meta.indexes afin que le
+    schéma reste créable sur les autres bases (tests SQLite).
+    """
+    SOURCES = [
+        ("facture", "Facture"),
+        ("document", "Document à signer"),
+        ("projet", "Dossier technique"),
+        ("document_technique", "Document technique"),
+    ]
+
+    source = models.CharField(max_length=30, choices=SOURCES)
+    object_id = models.CharField(max_length=255)
+    reference = models.CharField(max_length=255, blank=True, default="")
+    title = models.CharField(max_length=255, blank=True, default="")
+    body = models.TextField(blank=True, default="")
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "object_id"], name="search_entry_unique_object"),
+        ]
+        verbose_name = "Entrée de recherche"
+        verbose_name_plural = "Entrées de recherche"
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.object_id}"
@@ -0,0 +1,340 @@
+"""
+Moteur de la recherche globale.
+
+Chaque objet indexable (facture, document à signer, dossier technique,
+document technique) est recopié dans home.SearchEntry : référence, titre et
+texte libre dénormalisés. Sous PostgreSQL, la recherche combine le plein texte
+(search_vector, configuration french_unaccent) et la similarité trigramme sur
+les références et identifiants ; sur les autres bases, un repli icontains
+garde le même comportement fonctionnel.
+
+Les résultats sont classés toutes sources confondues, limités par source et
+filtrés selon les droits de l'utilisateur.
+
+L'indexation est faite par une tâche Celery mise en file après la transaction
+(enqueue_search_indexing), y compris quand un objet dont le nom est repris dans
+des entrées (fournisseur, client, société, dossier, auteur) est modifié.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber
+
+from home.models import SearchEntry
+from invoices.models import Entreprise, Facture, Fournisseur, Particulier, Societe
+from signatures.models import Document
+from technique.models import DocumentTechnique, TechnicalProject
+from user_access.user_test_functions import has_finance_access, has_technique_access
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "french_unaccent"
+# Au-delà, le texte extrait d'un document n'apporte plus rien au classement
+BODY_MAX_LENGTH = 100_000
+
+
+def _join(*parts):
+    return " ".join(str(part) for part in parts if part)
+
+
+def _related(obj, name):
+    """Objet lié, ou None si la clé étrangère pointe vers une ligne absente."""
+    try:
+        return getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def _facture_queryset():
+    return Facture.objects.select_related(
+        "fournisseur", "client__entreprise", "client__particulier", "dossier", "societe"
+    )
+
+
+def _facture_entry(facture):
+    return {
+        "reference": facture.numero_facture,
+        "title": facture.titre or facture.numero_facture or facture.pk,
+        "body": _join(
+            _related(facture, "fournisseur"),
+            _related(facture, "client"),
+            facture.affaire,
+            facture.societe,
+            facture.dossier and facture.dossier.reference,
+            facture.dossier and facture.dossier.name,
+            facture.commentaire_compta,
+        ),
+    }
+
+
+def _document_queryset():
+    return Document.objects.select_related("uploaded_by")
+
+
+def _document_entry(document):
+    uploaded_by = document.uploaded_by
+    return {
+        "reference": "",
+        "title": document.titre,
+        "body": _join(
+            document.signature_mention,
+            uploaded_by and (uploaded_by.get_full_name() or uploaded_by.get_username()),
+        ),
+    }
+
+
+def _projet_queryset():
+    return TechnicalProject.objects.all()
+
+
+def _projet_entry(projet):
+    return {
+        "reference": projet.reference,
+        "title": projet.name,
+        "body": _join(
+            projet.affaire,
+            projet.adresse_bien,
+            projet.lot_etage,
+            projet.parcelles,
+            projet.vendeur,
+            projet.beneficiaire,
+            projet.locataire,
+        ),
+    }
+
+
+def _document_technique_queryset():
+    return DocumentTechnique.objects.select_related("project")
+
+
+def _document_technique_entry(document):
+    project = document.project
+    return {
+        "reference": project.reference if project else "",
+        "title": document.titre,
+        "body": _join(
+            project and project.name,
+            document.resume,
+            document.texte_brut,
+        )[:BODY_MAX_LENGTH],
+    }
+
+
+# source -> (test d'accès, queryset d'indexation/affichage, construction de l'entrée)
+SEARCH_SOURCES = {
+    "facture": (has_finance_access, _facture_queryset, _facture_entry),
+    "document": (has_finance_access, _document_queryset, _document_entry),
+    "projet": (has_technique_access, _projet_queryset, _projet_entry),
+    "document_technique": (has_technique_access, _document_technique_queryset, _document_technique_entry),
+}
+
+MODEL_SOURCES = {
+    Facture: "facture",
+    Document: "document",
+    TechnicalProject: "projet",
+    DocumentTechnique: "document_technique",
+}
+
+# Modèle lié -> [(source, lookup vers ce modèle, champs repris dans l'entrée)].
+# Entreprise et Particulier partagent la clé primaire du client.
+RELATED_SOURCES = {
+    Fournisseur: [("facture", "fournisseur", {"nom"})],
+    Entreprise: [("facture", "client", {"nom"})],
+    Particulier: [("facture", "client", {"nom", "prenom"})],
+    Societe: [("facture", "societe", {"nom"})],
+    TechnicalProject: [
+        ("facture", "dossier", {"reference", "name"}),
+        ("document_technique", "project", {"reference", "name"}),
+    ],
+    get_user_model(): [("document", "uploaded_by", {"first_name", "last_name", "username"})],
+}
+
+
+# --- Indexation -------------------------------------------------------------
+
+def uses_postgres_search():
+    return connection.vendor == "postgresql"
+
+
+def search_vector_expression():
+    return (
+        SearchVector("reference", "object_id", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("title", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("body", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def index_objects(source, objects):
+    """
+    Crée ou met à jour les entrées d'index des objets donnés (un INSERT ... ON
+    CONFLICT, puis un UPDATE des vecteurs sous PostgreSQL). Renvoie le nombre
+    d'objets indexés.
+    """
+    _, _, build_entry = SEARCH_SOURCES[source]
+    entries = [
+        SearchEntry(source=source, object_id=str(obj.pk), **build_entry(obj))
+        for obj in objects
+    ]
+    if not entries:
+        return 0
+    for entry in entries:
+        entry.title = str(entry.title)[:255]
+        entry.reference = str(entry.reference)[:255]
+    SearchEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=["source", "object_id"],
+        update_fields=["reference", "title", "body", "updated_at"],
+    )
+    if uses_postgres_search():
+        SearchEntry.objects.filter(
+            source=source, object_id__in=[entry.object_id for entry in entries]
+        ).update(search_vector=search_vector_expression())
+    return len(entries)
+
+
+def index_queryset(source, queryset, batch_size=500):
+    """Indexe les objets du queryset par lots. Renvoie le nombre d'objets indexés."""
+    count = 0
+    batch = []
+    for obj in queryset.order_by("pk").iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            count += index_objects(source, batch)
+            batch = []
+    return count + index_objects(source, batch)
+
+
+def index_matching(source, filters):
+    """
+    Réindexe les objets de `source` qui répondent aux filtres, par exemple
+    {"pk__in": [...]} ou {"client": 12}. Renvoie le nombre d'objets indexés.
+    """
+    _, queryset, _ = SEARCH_SOURCES[source]
+    return index_queryset(source, queryset().filter(**filters))
+
+
+def enqueue_search_indexing(source, filters):
+    """
+    Met en file la réindexation des objets de `source` répondant aux filtres,
+    après la transaction en cours (SEARCH_INDEX_EXECUTION="sync" : tout de suite).
+    """
+    if settings.SEARCH_INDEX_EXECUTION == "sync":
+        index_matching(source, filters)
+        return
+
+    from home.tasks import index_search_entries
+
+    def _send():
+        try:
+            index_search_entries.delay(source, filters)
+        except Exception:
+            logger.exception("Impossible de mettre en file l'indexation %s %s", source, filters)
+
+    transaction.on_commit(_send)
+
+
+def index_instance(instance):
+    source = MODEL_SOURCES[type(instance)]
+    return index_objects(source, [instance])
+
+
+def remove_instance(instance):
+    SearchEntry.objects.filter(
+        source=MODEL_SOURCES[type(instance)], object_id=str(instance.pk)
+    ).delete()
+
+
+def rebuild_index(sources=None, batch_size=500):
+    """
+    Réindexe entièrement les sources demandées (toutes par défaut), par lots.
+    Renvoie {source: nombre d'objets indexés}.
+    """
+    counts = {}
+    for source in sources or SEARCH_SOURCES:
+        _, queryset, _ = SEARCH_SOURCES[source]
+        SearchEntry.objects.filter(source=source).delete()
+        counts[source] = index_queryset(source, queryset(), batch_size=batch_size)
+    return counts
+
+
+# --- Recherche --------------------------------------------------------------
+
+def _ranked_entries(text, sources):
+    entries = SearchEntry.objects.filter(source__in=sources)
+    if uses_postgres_search():
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return entries.filter(
+            Q(search_vector=query)
+            | Q(reference__trigram_word_similar=text)
+            | Q(object_id__trigram_word_similar=text)
+            | Q(reference__icontains=text)
+            | Q(object_id__icontains=text)
+        ).annotate(
+            score=SearchRank(F("search_vector"), query)
+            + Greatest(
+                TrigramWordSimilarity(text, "reference"),
+                TrigramWordSimilarity(text, "object_id"),
+            )
+        )
+
+    exact = Q(reference__iexact=text) | Q(object_id__iexact=text)
+    strong = Q(reference__icontains=text) | Q(object_id__icontains=text) | Q(title__icontains=text)
+    return entries.filter(strong | Q(body__icontains=text)).annotate(
+        score=Case(
+            When(exact, then=Value(3.0)),
+            When(strong, then=Value(2.0)),
+            default=Value(1.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def search(user, text, limit_per_source=None):
+    """
+    Recherche `text` dans les sources accessibles à l'utilisateur.
+
+    Renvoie une liste de (source, [objets]) ordonnée par meilleur score, les
+    objets de chaque source étant eux-mêmes classés par pertinence.
+    """
+    limit_per_source = limit_per_source or settings.GLOBAL_SEARCH_SOURCE_LIMIT
+    text = (text or "").strip()
+    sources = [
+        source for source, (can_access, _, _) in SEARCH_SOURCES.items() if can_access(user)
+    ]
+    if not text or not sources:
+        return []
+
+    ranked = (
+        _ranked_entries(text, sources)
+        .annotate(
+            source_rank=Window(
+                RowNumber(),
+                partition_by=F("source"),
+                order_by=[F("score").desc(), F("title").asc()],
+            )
+        )
+        .filter(source_rank__lte=limit_per_source)
+        .order_by("-score", "title")
+        .values_list("source", "object_id")
+    )
+
+    ids_by_source = {}
+    for source, object_id in ranked:
+        ids_by_source.setdefault(source, []).append(object_id)
+
+    results = []
+    for source, object_ids in ids_by_source.items():
+        _, queryset, _ = SEARCH_SOURCES[source]
+        objects = {str(obj.pk): obj for obj in queryset().filter(pk__in=object_ids)}
+        # Une entrée orpheline (objet supprimé hors signaux) est ignorée
+        hits = [objects[object_id] for object_id in object_ids if object_id in objects]
+        if hits:
+            results.append((source, hits))
+    return results
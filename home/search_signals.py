@@ -0,0 +1,38 @@
+"""
+Tient l'index de la recherche globale (home.SearchEntry) à jour lors des
+enregistrements et suppressions. La réindexation est mise en file après la
+transaction (enqueue_search_indexing) ; renommer un objet repris dans des
+entrées (RELATED_SOURCES) réindexe les entrées qui en dépendent. Les mises à
+jour en masse (queryset.update, bulk_create) ne passent pas par ces signaux :
+lancer alors `python manage.py rebuild_search_index`.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from home.search import MODEL_SOURCES, RELATED_SOURCES, enqueue_search_indexing, remove_instance
+
+
+def update_search_entry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    enqueue_search_indexing(MODEL_SOURCES[sender], {"pk__in": [instance.pk]})
+
+
+def delete_search_entry(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+def update_related_entries(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    for source, lookup, fields in RELATED_SOURCES[sender]:
+        if update_fields is not None and not fields & set(update_fields):
+            continue
+        enqueue_search_indexing(source, {lookup: instance.pk})
+
+
+for model in MODEL_SOURCES:
+    post_save.connect(update_search_entry, sender=model, dispatch_uid=f"search_index_save_{model.__name__}")
+    post_delete.connect(delete_search_entry, sender=model, dispatch_uid=f"search_index_delete_{model.__name__}")
+
+for model in RELATED_SOURCES:
+    post_save.connect(update_related_entries, sender=model, dispatch_uid=f"search_index_related_{model.__name__}")
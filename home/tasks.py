@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from home.search import index_matching
+
+
+@shared_task
+def index_search_entries(source, filters):
+    """Réindexe dans la recherche globale les objets répondant aux filtres (voir home.search)."""
+    return {"source": source, "indexed": index_matching(source, filters)}
@@ -1,26 +1,25 @@
 from django.shortcuts import render
-from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 
-from invoices.models import Facture
-from signatures.models import Document
-from technique.models import TechnicalProject, DocumentTechnique
+from home.search import search
 from user_access.user_test_functions import (has_administratif_access,
                                              has_finance_access,
                                              has_technique_access,
                                              has_collaborateur_access,
-                                             can_create_facture)
+                                             can_create_facture,
+                                             get_permission_snapshot)
 
 def is_only_collaborator(user):
     """
     Retourne True si l'utilisateur est UNIQUEMENT collaborateur
     (pas superuser, pas staff, et n'a que le groupe COLLABORATEUR ou aucun groupe)
     """
-    if user.is_superuser or user.is_staff:
+    snapshot = get_permission_snapshot(user)
+    if snapshot.is_superuser or snapshot.is_staff:
         return False
     
     # Récupère tous les groupes de l'utilisateur
-    user_groups = set(user.groups.values_list('name', flat=True))
+    user_groups = snapshot.groups
     
     # Si pas de groupe ou seulement COLLABORATEUR
     if not user_groups or user_groups == {'COLLABORATEUR'}:
@@ -45,54 +44,22 @@ def dashboard_view(request):
 @login_required
 def global_search(request):
     """
-    Affiche les résultats de la recherche globale.
+    Affiche les résultats de la recherche globale, classés par pertinence
+    toutes sources confondues (voir home.search).
     """
     query = request.GET.get('q', '').strip()
     context = {'query': query}
 
     if query:
-        if has_finance_access(request.user):
-            # 1. Factures (ID, Titre, Client, Fournisseur)
-            factures = Facture.objects.filter(
-                Q(id__icontains=query) |
-                Q(titre__icontains=query) |
-                Q(fournisseur__icontains=query) |
-                Q(client__nom__icontains=query)
-            )[:10]
-        else:
-            factures = []
-        if has_finance_access(request.user):
-            # 2. Documents (Signatures) (Titre)
-            documents = Document.objects.filter(
-                titre__icontains=query
-            )[:10]
-
-        else:
-            documents = []
-
-        if has_technique_access(request.user):
-            # 3. Projets Techniques (Nom, Reference)
-            projets = TechnicalProject.objects.filter(
-                Q(name__icontains=query) |
-                Q(reference__icontains=query)
-            )[:10]
-
-            # 4. Documents Techniques (Titre, Projet)
-            docs_tech = DocumentTechnique.objects.filter(
-                 Q(titre__icontains=query) |
-                 Q(project__reference__icontains=query) |
-                 Q(project__name__icontains=query)
-            )[:10]
-        else :
-            projets = []
-            docs_tech = []
-
+        sections = search(request.user, query)
+        results = dict(sections)
         context.update({
-            'factures': factures,
-            'documents': documents,
-            'projets': projets,
-            'docs_tech': docs_tech,
-            'results_count': len(factures) + len(documents) + len(projets) + len(docs_tech)
+            'sections': [source for source, _ in sections],
+            'factures': results.get('facture', []),
+            'documents': results.get('document', []),
+            'projets': results.get('projet', []),
+            'docs_tech': results.get('document_technique', []),
+            'results_count': sum(len(hits) for _, hits in sections),
         })
 
     return render(request, 'home/search_results.html', context)
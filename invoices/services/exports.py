@@ -0,0 +1,136 @@
+from django.db.models import F, Q
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from config.xlsx_export import EXPORT_CHUNK_SIZE
+from invoices.filters import FactureFilter
+from invoices.models import Facture
+from user_access.user_test_functions import has_all_poles_access
+
+
+FACTURE_EXCEL_HEADERS = [
+    'ID',
+    'N° facture',
+    'Société',
+    'Affaire',
+    'Dossier',
+    'Service',
+    'Fournisseur',
+    'Montant TTC',
+    'Statut',
+    'Date facture',
+    'Échéance',
+    'Priorité',
+    'Demandeur',
+]
+
+FACTURE_PDF_HEADERS = [
+    'ID',
+    'N° facture',
+    'Société',
+    'Affaire',
+    'Dossier',
+    'Service',
+    'Montant',
+    'Statut',
+    'Échéance',
+]
+
+
+def facture_queryset_for_user(user):
+    """
+    Factures visibles par l'utilisateur, dans l'ordre de la liste.
+
+    Tous les pôles ont une vue d'ensemble ; sinon seules les factures
+    assignées, créées ou demandées par l'utilisateur sont visibles.
+    """
+    qs = (
+        Facture.objects.all()
+        .select_related('collaborateur', 'demandeur', 'dossier', 'societe')
+        .order_by(
+            F('date_facture').desc(nulls_last=True),
+            '-date_soumission',
+            '-id',
+        )
+    )
+    if has_all_poles_access(user):
+        return qs
+    return qs.filter(Q(collaborateur=user) | Q(created_by=user) | Q(demandeur=user))
+
+
+def facture_export_queryset(user, params):
+    """Applique les filtres de la liste (params : QueryDict ou MultiValueDict)."""
+    return FactureFilter(params, queryset=facture_queryset_for_user(user)).qs
+
+
+def facture_excel_rows(queryset):
+    services = dict(Facture.SERVICE_CHOICES)
+    statuses = dict(Facture.STATUS)
+    priorities = dict(Facture.PRIORITY_CHOICES)
+    rows = queryset.values_list(
+        'id',
+        'numero_facture',
+        'societe__nom',
+        'affaire',
+        'dossier__reference',
+        'dossier__name',
+        'service',
+        'fournisseur_id',
+        'fournisseur__nom',
+        'montant',
+        'statut',
+        'date_facture',
+        'echeance',
+        'priorite',
+        'demandeur__username',
+    )
+    for (
+        invoice_id, numero, societe, affaire, dossier_reference, dossier_name, service,
+        fournisseur_id, fournisseur_nom, montant, statut, date_facture, echeance,
+        priorite, demandeur,
+    ) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            invoice_id,
+            numero or '',
+            societe or '',
+            affaire or '',
+            f"{dossier_reference} - {dossier_name}" if dossier_reference is not None else '',
+            services.get(service, service) if service else '',
+            (fournisseur_nom or str(fournisseur_id)) if fournisseur_id else '',
+            montant or '',
+            statuses.get(statut, statut),
+            date_facture.strftime('%Y-%m-%d') if date_facture else '',
+            echeance.strftime('%Y-%m-%d') if echeance else '',
+            priorities.get(priorite, priorite) if priorite else '',
+            demandeur or '',
+        ]
+
+
+def facture_pdf_rows(queryset):
+    for invoice in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            invoice.id,
+            invoice.numero_facture or '',
+            str(invoice.societe) if invoice.societe else '',
+            invoice.affaire or '',
+            str(invoice.dossier) if invoice.dossier else '',
+            invoice.get_service_display() if invoice.service else '',
+            f"{invoice.montant:.2f}" if invoice.montant is not None else '',
+            invoice.get_statut_display(),
+            invoice.echeance.strftime('%Y-%m-%d') if invoice.echeance else '',
+        ]
+
+
+def write_factures_pdf(rows, output):
+    """Écrit le tableau PDF des factures dans output."""
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    table = Table([FACTURE_PDF_HEADERS, *rows], repeatRows=1, hAlign='LEFT')
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ]))
+    doc.build([table])
@@ -1,6 +1,6 @@
 from collections import defaultdict
 
-from django.db.models import Count
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 
 from invoices.models import Facture
@@ -9,6 +9,47 @@ from invoices.models import Facture
 OPEN_STATUSES = ["received", "ongoing"]
 
 
+def _duplicate_groups(queryset):
+    return (
+        queryset.values("societe", "affaire", "montant", "numero_facture")
+        .exclude(societe__isnull=True)
+        .exclude(affaire="")
+        .exclude(numero_facture="")
+        .exclude(montant__isnull=True)
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+
+
+def anomaly_count_aggregates(now):
+    """
+    Agrégats SQL des anomalies par facture de get_invoice_anomalies, hors
+    doublons (voir duplicate_anomaly_count), à combiner dans un aggregate().
+    """
+    return {
+        "anomaly_missing_amount": Count("id", filter=Q(montant__isnull=True)),
+        "anomaly_missing_due_date": Count("id", filter=Q(echeance__isnull=True)),
+        "anomaly_missing_supplier": Count(
+            "id", filter=Q(fournisseur__isnull=True) | Q(fournisseur="")
+        ),
+        "anomaly_overdue_open": Count(
+            "id", filter=Q(statut__in=OPEN_STATUSES, echeance__lt=now)
+        ),
+    }
+
+
+def duplicate_anomaly_count(queryset):
+    """Nombre de factures signalées comme doublon potentiel, en une requête."""
+    return _duplicate_groups(queryset).aggregate(total=Sum("count"))["total"] or 0
+
+
+def count_invoice_anomalies(queryset=None):
+    """Même total que len(get_invoice_anomalies(queryset)), sans charger les factures."""
+    qs = Facture.objects.all() if queryset is None else queryset
+    counts = qs.aggregate(**anomaly_count_aggregates(timezone.now()))
+    return sum(counts.values()) + duplicate_anomaly_count(qs)
+
+
 def get_invoice_anomalies(queryset=None):
     qs = queryset or Facture.objects.all()
     qs = qs.select_related("dossier", "fournisseur")
@@ -25,15 +66,7 @@ def get_invoice_anomalies(queryset=None):
             }
         )
 
-    duplicate_keys = (
-        qs.values("societe", "affaire", "montant", "numero_facture")
-        .exclude(societe__isnull=True)
-        .exclude(affaire="")
-        .exclude(numero_facture="")
-        .exclude(montant__isnull=True)
-        .annotate(count=Count("id"))
-        .filter(count__gt=1)
-    )
+    duplicate_keys = _duplicate_groups(qs)
     duplicate_lookup = {
         (row["societe"], row["affaire"], row["montant"], row["numero_facture"])
         for row in duplicate_keys
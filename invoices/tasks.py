@@ -1,13 +1,16 @@
 import logging
+import time
 
 from celery import shared_task
+from django.db.models import Max
 from django.utils import timezone
 
+from config.db_metrics import count_queries
+
 from management.gmail_service import send_message
 from management.oauth_utils import get_valid_credentials
 
 from .models import (
-    Contact,
     EmailFournisseur,
     Facture,
     FactureHistorique,
@@ -39,15 +42,21 @@ def _invoice_sender():
     return sender
 
 
-def _supplier_email(facture):
-    contacts = Contact.objects.filter(acteur=facture.fournisseur_id)
-    return (
-        EmailFournisseur.objects.filter(contact__in=contacts)
+def _supplier_emails(fournisseur_ids):
+    """
+    Premier e-mail de chaque fournisseur (ordre de la clé contact, email),
+    en une requête.
+    """
+    emails = {}
+    rows = (
+        EmailFournisseur.objects.filter(contact__acteur_id__in=fournisseur_ids)
         .exclude(email="")
-        .values_list("email", flat=True)
-        .first()
-        or ""
+        .order_by("contact_id", "email")
+        .values_list("contact__acteur_id", "email")
     )
+    for fournisseur_id, email in rows:
+        emails.setdefault(fournisseur_id, email)
+    return emails
 
 
 def _format_message(facture, template, days_overdue):
@@ -114,21 +123,41 @@ def send_invoice_reminder(facture, to_email, message_text, days_overdue, sender=
         return {"success": False, "message": str(exc)}
 
 
-def _last_successful_reminder_delay(facture):
-    return (
+def _last_successful_reminder_delays(facture_ids):
+    """Dernier délai de relance envoyée par facture, en une requête agrégée."""
+    return dict(
         FactureHistorique.objects.filter(
-        facture=facture,
-        action="reminder_sent",
-        days_overdue__isnull=False,
+            facture_id__in=facture_ids,
+            action="reminder_sent",
+            days_overdue__isnull=False,
         )
-        .order_by("-days_overdue", "-created_at")
-        .values_list("days_overdue", flat=True)
-        .first()
+        .values("facture_id")
+        .annotate(last_delay=Max("days_overdue"))
+        .values_list("facture_id", "last_delay")
     )
 
 
 @shared_task
 def check_and_send_invoice_reminders(delai_relance=None):
+    started = time.perf_counter()
+    with count_queries() as queries:
+        result = _run_invoice_reminders(delai_relance)
+    result["requetes_sql"] = queries.count
+    result["duree_secondes"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Relances factures : %s traitée(s), %s envoyée(s), %s ignorée(s), "
+        "%s erreur(s) - %s requête(s) SQL en %.3f s",
+        result.get("factures_traitees", 0),
+        result.get("relances_envoyees", 0),
+        result.get("relances_ignorees", 0),
+        result.get("erreurs", 0),
+        result["requetes_sql"],
+        result["duree_secondes"],
+    )
+    return result
+
+
+def _run_invoice_reminders(delai_relance):
     if delai_relance is not None:
         if delai_relance < 1:
             return {"success": False, "message": "Le délai doit être supérieur ou égal à 1."}
@@ -152,7 +181,7 @@ def check_and_send_invoice_reminders(delai_relance=None):
         return {"success": False, "message": str(exc)}
 
     today = timezone.localdate()
-    invoices = (
+    invoices = list(
         Facture.objects.filter(
             statut__in=["received", "ongoing"],
             echeance__date__lt=today,
@@ -160,6 +189,9 @@ def check_and_send_invoice_reminders(delai_relance=None):
         .select_related("client", "fournisseur")
         .order_by("echeance", "id")
     )
+    last_delays = _last_successful_reminder_delays([facture.pk for facture in invoices])
+    supplier_emails = _supplier_emails({facture.fournisseur_id for facture in invoices})
+    history = []
 
     sent = 0
     processed = 0
@@ -169,20 +201,22 @@ def check_and_send_invoice_reminders(delai_relance=None):
     for facture in invoices:
         processed += 1
         days_overdue = (today - facture.echeance.date()).days
-        last_delay = _last_successful_reminder_delay(facture)
+        last_delay = last_delays.get(facture.pk)
         if last_delay is None and days_overdue < interval:
             continue
         if last_delay is not None and days_overdue < last_delay + interval:
             skipped += 1
             continue
 
-        recipient = _supplier_email(facture)
+        recipient = supplier_emails.get(facture.fournisseur_id, "")
         if not recipient:
-            _record_history(
-                facture,
-                "reminder_skipped",
-                f"Relance ignorée à J+{days_overdue}: aucun e-mail fournisseur",
-                days_overdue=days_overdue,
+            history.append(
+                FactureHistorique(
+                    facture=facture,
+                    action="reminder_skipped",
+                    details=f"Relance ignorée à J+{days_overdue}: aucun e-mail fournisseur",
+                    days_overdue=days_overdue,
+                )
             )
             skipped += 1
             continue
@@ -197,15 +231,19 @@ def check_and_send_invoice_reminders(delai_relance=None):
         if result.get("success"):
             sent += 1
         else:
-            _record_history(
-                facture,
-                "reminder_error",
-                result.get("message", "Erreur Gmail inconnue"),
-                recipient_email=recipient,
-                days_overdue=days_overdue,
+            history.append(
+                FactureHistorique(
+                    facture=facture,
+                    action="reminder_error",
+                    details=result.get("message", "Erreur Gmail inconnue"),
+                    recipient_email=recipient,
+                    days_overdue=days_overdue,
+                )
             )
             errors += 1
 
+    FactureHistorique.objects.bulk_create(history)
+
     return {
         "success": True,
         "factures_traitees": processed,
@@ -2,7 +2,7 @@ import io
 
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Count, F, Q, Sum
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -12,11 +12,7 @@ from django.utils.decorators import method_decorator
 from django_filters.views import FilterView
 from django.views.generic import DetailView, CreateView, UpdateView, TemplateView
 
-from openpyxl import Workbook
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-
+from config.xlsx_export import xlsx_streaming_response
 from user_access.user_test_functions import (
     has_finance_access,
     has_ceo_access,
@@ -26,6 +22,7 @@ from user_access.user_test_functions import (
     can_edit_facture,
     can_change_facture_status,
     has_collaborateur_access,
+    get_permission_snapshot,
 )
 from .filters import FactureFilter
 from .forms import FactureForm, PieceJointeForm, SocieteForm
@@ -37,6 +34,13 @@ from .models import (
     Societe,
 )
 from .services.email import send_invoice_submission_email
+from .services.exports import (
+    FACTURE_EXCEL_HEADERS,
+    facture_excel_rows,
+    facture_pdf_rows,
+    facture_queryset_for_user,
+    write_factures_pdf,
+)
 from .services.quality import get_invoice_anomalies
 
 
@@ -51,7 +55,7 @@ USER_GROUP_TO_INVOICE_SERVICE = {
 
 
 def get_invoice_service_for_user(user):
-    group_names = set(user.groups.values_list("name", flat=True))
+    group_names = get_permission_snapshot(user).groups
     for group_name, service in USER_GROUP_TO_INVOICE_SERVICE.items():
         if group_name in group_names:
             return service
@@ -75,24 +79,7 @@ class FactureListView(FilterView):
     template_name = 'invoices/invoice_list.html'
 
     def get_queryset(self):
-        qs = (
-            super()
-            .get_queryset()
-            .select_related('collaborateur', 'demandeur', 'dossier', 'societe')
-            .order_by(
-                F('date_facture').desc(nulls_last=True),
-                '-date_soumission',
-                '-id',
-            )
-        )
-        user = self.request.user
-        
-        # Tous les pôles ont une vue d'ensemble des factures.
-        if has_all_poles_access(user):
-            return qs
-            
-        # Sinon -> Voir seulement ses factures
-        return qs.filter(Q(collaborateur=user) | Q(created_by=user) | Q(demandeur=user))
+        return facture_queryset_for_user(self.request.user)
 
     def get(self, request, *args, **kwargs):
         # Vérifier si c'est une demande d'export
@@ -113,95 +100,14 @@ class FactureListView(FilterView):
         return super().get(request, *args, **kwargs)
 
     def export_to_excel(self, queryset):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Factures'
-
-        headers = [
-            'ID',
-            'N° facture',
-            'Société',
-            'Affaire',
-            'Dossier',
-            'Service',
-            'Fournisseur',
-            'Montant TTC',
-            'Statut',
-            'Date facture',
-            'Échéance',
-            'Priorité',
-            'Demandeur',
-        ]
-        ws.append(headers)
-
-        for invoice in queryset:
-            ws.append([
-                invoice.id,
-                invoice.numero_facture or '',
-                str(invoice.societe) if invoice.societe else '',
-                invoice.affaire or '',
-                str(invoice.dossier) if invoice.dossier else '',
-                invoice.get_service_display() if invoice.service else '',
-                str(invoice.fournisseur) if invoice.fournisseur else '',
-                invoice.montant or '',
-                invoice.get_statut_display(),
-                invoice.date_facture.strftime('%Y-%m-%d') if invoice.date_facture else '',
-                invoice.echeance.strftime('%Y-%m-%d') if invoice.echeance else '',
-                invoice.get_priorite_display() if invoice.priorite else '',
-                invoice.demandeur.username if invoice.demandeur else '',
-            ])
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return xlsx_streaming_response(
+            'factures.xlsx',
+            [('Factures', FACTURE_EXCEL_HEADERS, facture_excel_rows(queryset))],
         )
-        response['Content-Disposition'] = 'attachment; filename="factures.xlsx"'
-        return response
 
     def export_to_pdf(self, queryset):
         output = io.BytesIO()
-        doc = SimpleDocTemplate(output, pagesize=letter)
-
-        data = [[
-            'ID',
-            'N° facture',
-            'Société',
-            'Affaire',
-            'Dossier',
-            'Service',
-            'Montant',
-            'Statut',
-            'Échéance',
-        ]]
-
-        for invoice in queryset:
-            data.append([
-                invoice.id,
-                invoice.numero_facture or '',
-                str(invoice.societe) if invoice.societe else '',
-                invoice.affaire or '',
-                str(invoice.dossier) if invoice.dossier else '',
-                invoice.get_service_display() if invoice.service else '',
-                f"{invoice.montant:.2f}" if invoice.montant is not None else '',
-                invoice.get_statut_display(),
-                invoice.echeance.strftime('%Y-%m-%d') if invoice.echeance else '',
-            ])
-
-        table = Table(data, repeatRows=1, hAlign='LEFT')
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ])
-        table.setStyle(table_style)
-
-        doc.build([table])
+        write_factures_pdf(facture_pdf_rows(queryset), output)
 
         output.seek(0)
         response = HttpResponse(output.getvalue(), content_type='application/pdf')
@@ -4,15 +4,16 @@ from typing import Any, Dict
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-from django.db.models import Sum, Count, Q
+from django.db.models import Count, F, Min, Q, Sum, Value
+from django.db.models.functions import Concat
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 
 from user_access.user_test_functions import can_change_facture_status
-from .models import Facture
+from .models import Facture, FactureHistorique
 from django.db.models.functions import TruncMonth
-from .services.quality import get_invoice_anomalies
+from .services.quality import anomaly_count_aggregates, duplicate_anomaly_count
 
 
 OPEN_STATUSES = ["ongoing", "received"]
@@ -61,32 +62,14 @@ class DashboardView(TemplateView):
         overdue_filter = Q(statut__in=OPEN_STATUSES, echeance__lt=now)
         pending_filter = ~Q(statut__in=INACTIVE_STATUSES)
 
-        # 2. KPIs
-        # Total facturé (Toutes factures confondues)
-        total_aggregate = qs.aggregate(
-            total=Sum('montant'),
-            count=Count('id')
-        )
-        total_amount = total_aggregate['total'] or 0
-        total_count = total_aggregate['count'] or 0
-
-        # Montant Payé
-        paid_aggregate = qs.filter(statut='paid').aggregate(total=Sum('montant'))
-        paid_amount = paid_aggregate['total'] or 0
-
-        # En attente (Tout ce qui n'est pas payé ni annulé/archivé)
-        pending_qs = qs.filter(pending_filter)
-        pending_aggregate = pending_qs.aggregate(total=Sum('montant'))
-        pending_amount = pending_aggregate['total'] or 0
-
-        # En Retard (Non payée et date dépassée) OU Statut explicitement 'En retard'
-        overdue_qs = qs.filter(overdue_filter)
-        overdue_aggregate = overdue_qs.aggregate(
-            total=Sum('montant'),
-            count=Count('id')
-        )
-        overdue_amount = overdue_aggregate['total'] or 0
-        overdue_count = overdue_aggregate['count'] or 0
+        # 2. KPIs, alertes métier et compteurs d'anomalies en une seule requête
+        aggregates = self._kpi_aggregates(qs, now, pending_filter, overdue_filter)
+        total_amount = _total(aggregates['total'])
+        total_count = aggregates['count'] or 0
+        paid_amount = _total(aggregates['paid_total'])
+        pending_amount = _total(aggregates['pending_total'])
+        overdue_amount = _total(aggregates['overdue_total'])
+        overdue_count = aggregates['overdue_count'] or 0
 
         context['kpi'] = {
             'total_amount': total_amount,
@@ -150,7 +133,7 @@ class DashboardView(TemplateView):
         # 5. Risk Analysis: Top Suppliers with Overdue Invoices
         # Group by fournisseur, filter overdue
         risky_suppliers = (
-            overdue_qs.values('fournisseur', 'fournisseur__nom')
+            qs.filter(overdue_filter).values('fournisseur', 'fournisseur__nom')
             .annotate(
                 total_retard=Sum('montant'),
                 count_retard=Count('id')
@@ -164,11 +147,12 @@ class DashboardView(TemplateView):
             .annotate(total=Sum('montant'), count=Count('id'))
             .order_by('-total')[:5]
         )
-        anomalies = get_invoice_anomalies(qs)
-        context['anomaly_count'] = len(anomalies)
+        context['anomaly_count'] = sum(
+            aggregates[key] for key in anomaly_count_aggregates(now)
+        ) + duplicate_anomaly_count(qs)
         context["company_rows"] = self._company_rows(qs, pending_filter, overdue_filter)
         context["project_rows"] = self._project_rows(qs, pending_filter, overdue_filter)
-        context["business_alerts"] = self._business_alerts(qs, overdue_filter)
+        context["business_alerts"] = self._business_alerts(aggregates)
 
         return context
 
@@ -254,21 +238,37 @@ class DashboardView(TemplateView):
             for row in rows
         ]
 
-    def _business_alerts(self, queryset, overdue_filter):
-        missing_company_count = queryset.filter(societe__isnull=True).count()
-        missing_project_count = queryset.filter(dossier__isnull=True).count()
-        inconsistent_project_count = sum(
-            1
-            for invoice in queryset.exclude(dossier__isnull=True)
-            if invoice.affaire and invoice.affaire != str(invoice.dossier)
+    def _kpi_aggregates(self, queryset, now, pending_filter, overdue_filter):
+        """
+        KPIs, compteurs des alertes métier et anomalies par facture, calculés
+        par agrégation conditionnelle en une seule requête.
+        """
+        inconsistent_project = (
+            Q(dossier__isnull=False)
+            & ~Q(affaire="")
+            & ~Q(affaire=F("dossier_label"))
         )
-        overdue_project_count = (
-            queryset.filter(overdue_filter)
-            .exclude(dossier__isnull=True)
-            .values("dossier")
-            .distinct()
-            .count()
+        return queryset.annotate(
+            dossier_label=Concat("dossier__reference", Value(" - "), "dossier__name"),
+        ).aggregate(
+            total=Sum("montant"),
+            count=Count("id"),
+            paid_total=Sum("montant", filter=Q(statut="paid")),
+            pending_total=Sum("montant", filter=pending_filter),
+            overdue_total=Sum("montant", filter=overdue_filter),
+            overdue_count=Count("id", filter=overdue_filter),
+            missing_company_count=Count("id", filter=Q(societe__isnull=True)),
+            missing_project_count=Count("id", filter=Q(dossier__isnull=True)),
+            inconsistent_project_count=Count("id", filter=inconsistent_project),
+            overdue_project_count=Count("dossier", filter=overdue_filter, distinct=True),
+            **anomaly_count_aggregates(now),
         )
+
+    def _business_alerts(self, aggregates):
+        missing_company_count = aggregates["missing_company_count"]
+        missing_project_count = aggregates["missing_project_count"]
+        inconsistent_project_count = aggregates["inconsistent_project_count"]
+        overdue_project_count = aggregates["overdue_project_count"]
         return [
             {
                 "label": "Factures sans société",
@@ -304,14 +304,19 @@ class DashboardView(TemplateView):
         return reference or name or "Dossier sans libellé"
 
     def _average_processing_days(self, queryset):
-        durations = []
-        paid_invoices = queryset.filter(statut='paid').prefetch_related('historique')
-        for invoice in paid_invoices:
-            history = list(invoice.historique.all().order_by('created_at'))
-            paid_event = next((event for event in history if event.new_status == 'paid'), None)
-            if not paid_event or not history:
-                continue
-            durations.append((paid_event.created_at - history[0].created_at).total_seconds() / 86400)
+        # Première entrée d'historique et premier passage à "payée", par facture
+        durations = [
+            (row["paid_at"] - row["started_at"]).total_seconds() / 86400
+            for row in FactureHistorique.objects.filter(
+                facture__in=queryset.filter(statut='paid').values('pk')
+            )
+            .values('facture')
+            .annotate(
+                started_at=Min('created_at'),
+                paid_at=Min('created_at', filter=Q(new_status='paid')),
+            )
+            if row["paid_at"]
+        ]
         if not durations:
             return None
         return sum(durations) / len(durations)
@@ -4,6 +4,7 @@ from django.contrib import admin
 from .models import (
     Activite,
     CategorieDossierAdministratif,
+    ExportJob,
     ChampPersonnaliseDossier,
     HistoriqueRappelActivite,
     NotificationInterne,
@@ -95,3 +96,10 @@ class GmailConversationEventAdmin(admin.ModelAdmin):
         "external_message_id",
         "created_at",
     )
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "format", "status", "progress", "requested_by", "created_at", "finished_at")
+    list_filter = ("kind", "format", "status")
+    search_fields = ("requested_by__username", "error")
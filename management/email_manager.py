@@ -10,6 +10,7 @@ from management.oauth_utils import (
 )
 from management.gmail_service import (
     get_message as get_gmail_message,
+    list_message_refs as list_gmail_message_refs,
     list_messages as list_gmail_messages,
     reply_to_message as reply_to_gmail_message,
     send_message as send_gmail_message,
@@ -41,7 +42,8 @@ def fetch_new_emails(user):
 
     try:
         del token
-        return len(list_gmail_messages(user, label_ids=["INBOX", "UNREAD"], limit=100))
+        # Le comptage ne nécessite que les identifiants : aucun appel par message.
+        return len(list_gmail_message_refs(user, label_ids=["INBOX", "UNREAD"], limit=100))
     except Exception as e:
         print(f"Erreur fetch emails Gmail : {e}")
         return 0
@@ -82,7 +84,7 @@ def check_if_replies_exist(user, limit=200):
     try:
         return {
             message.get("threadId")
-            for message in list_gmail_messages(user, label_ids=["INBOX"], limit=limit)
+            for message in list_gmail_message_refs(user, label_ids=["INBOX"], limit=limit)
             if message.get("threadId")
         }
     except Exception as e:
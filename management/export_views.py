@@ -0,0 +1,65 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+
+from management.exports import can_request_export, request_export_job
+from management.models import ExportJob
+
+
+def _serialize_export_job(job):
+    payload = {
+        "id": job.pk,
+        "kind": job.kind,
+        "format": job.format,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "status_url": reverse("export_job_status", args=[job.pk]),
+        "download_url": "",
+    }
+    if job.status == "done":
+        payload["download_url"] = reverse("export_job_download", args=[job.pk])
+    return payload
+
+
+@require_http_methods(["POST"])
+@login_required
+def export_job_create_view(request):
+    """
+    Demande un export en arrière-plan.
+
+    POST : kind, format et les filtres de la liste concernée.
+    Réponse : état du job ; le client interroge status_url jusqu'à obtenir
+    download_url.
+    """
+    kind = (request.POST.get("kind") or "").strip()
+    export_format = (request.POST.get("format") or "").strip()
+    if not can_request_export(request.user, kind, export_format):
+        return JsonResponse({"success": False, "message": "Export non autorisé."}, status=403)
+
+    job, reused = request_export_job(request.user, kind, export_format, request.POST)
+    job.refresh_from_db()
+    return JsonResponse(
+        {"success": True, "reused": reused, "job": _serialize_export_job(job)},
+        status=200 if reused else 202,
+    )
+
+
+@login_required
+def export_job_status_view(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id, requested_by=request.user)
+    return JsonResponse({"success": True, "job": _serialize_export_job(job)})
+
+
+@login_required
+def export_job_download_view(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id, requested_by=request.user)
+    if job.status != "done" or not job.file:
+        raise Http404("Export non disponible.")
+    return FileResponse(
+        job.file.open("rb"),
+        as_attachment=True,
+        filename=job.file.name.rsplit("/", 1)[-1],
+    )
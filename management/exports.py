@@ -0,0 +1,276 @@
+"""
+Exports XLSX / PDF en arrière-plan.
+
+La requête HTTP crée un ExportJob (paramètres de filtre, statut, progression)
+puis une tâche Celery rend le fichier. Une demande identique du même
+utilisateur dans la fenêtre EXPORT_JOB_REUSE_SECONDS réutilise le job existant
+au lieu de relancer le rendu.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from config.xlsx_export import XLSX_SPOOL_MAX_SIZE, write_xlsx
+from user_access.user_test_functions import (
+    can_read_facture,
+    can_view_technical_dossiers,
+    has_administratif_access,
+    has_technique_access,
+)
+
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Paramètres propres à l'interface, ignorés dans la clé de réutilisation
+IGNORED_EXPORT_PARAMS = {"kind", "format", "export", "page", "csrfmiddlewaretoken"}
+
+# Nombre de lignes entre deux mises à jour de la progression
+EXPORT_PROGRESS_STEP = 500
+
+
+def _render_factures_xlsx(job, params, output, progress):
+    from invoices.services.exports import (
+        FACTURE_EXCEL_HEADERS,
+        facture_excel_rows,
+        facture_export_queryset,
+    )
+
+    queryset = facture_export_queryset(job.requested_by, params)
+    rows = _tracked(facture_excel_rows(queryset), queryset.count(), progress)
+    write_xlsx(output, [("Factures", FACTURE_EXCEL_HEADERS, rows)])
+    return "factures.xlsx"
+
+
+def _render_factures_pdf(job, params, output, progress):
+    from invoices.services.exports import (
+        facture_export_queryset,
+        facture_pdf_rows,
+        write_factures_pdf,
+    )
+
+    queryset = facture_export_queryset(job.requested_by, params)
+    rows = list(_tracked(facture_pdf_rows(queryset), queryset.count(), progress))
+    write_factures_pdf(rows, output)
+    return "factures.pdf"
+
+
+def _render_dossiers_xlsx(job, params, output, progress):
+    from .views import (
+        ADMIN_PROJECT_OTHER_SHEET,
+        ADMIN_PROJECT_PROMOTION_SHEET,
+        _admin_project_queryset,
+        _admin_project_sheet,
+    )
+
+    queryset = _admin_project_queryset(params.get("q"))
+    total = queryset.count()
+    sheets = []
+    done = 0
+    for title, subset in (
+        (ADMIN_PROJECT_PROMOTION_SHEET, queryset.filter(activite_metier="promotion_immobiliere")),
+        (ADMIN_PROJECT_OTHER_SHEET, queryset.exclude(activite_metier="promotion_immobiliere")),
+    ):
+        title, headers, rows = _admin_project_sheet(title, subset)
+        sheets.append((title, headers, _tracked(rows, total, progress, offset=done)))
+        done += subset.count()
+    write_xlsx(output, sheets)
+    return "dossiers_administratifs.xlsx"
+
+
+def _render_dossiers_pdf(job, params, output, progress):
+    from .views import _admin_project_queryset, _build_admin_project_pdf
+
+    output.write(_build_admin_project_pdf(_admin_project_queryset(params.get("q"))).getvalue())
+    return "dossiers_administratifs.pdf"
+
+
+def _render_budget_pdf(job, params, output, progress):
+    from technique.models import TechnicalProject
+    from technique.views import draw_financial_project_pdf
+
+    project = TechnicalProject.objects.get(pk=params.get("pk"))
+    draw_financial_project_pdf(project, output)
+    return f"budget_{project.reference}.pdf"
+
+
+def _render_resume_pdf(job, params, output, progress):
+    from technique.models import DocumentTechnique
+    from technique.views import draw_document_resume_pdf
+
+    document = DocumentTechnique.objects.get(pk=params.get("pk"))
+    draw_document_resume_pdf(document, output)
+    return f"resume_{document.pk}.pdf"
+
+
+# kind -> (test d'accès, {format: fonction de rendu})
+EXPORT_KINDS = {
+    "factures": (
+        can_read_facture,
+        {"xlsx": _render_factures_xlsx, "pdf": _render_factures_pdf},
+    ),
+    "dossiers_administratifs": (
+        has_administratif_access,
+        {"xlsx": _render_dossiers_xlsx, "pdf": _render_dossiers_pdf},
+    ),
+    "budget_dossier": (can_view_technical_dossiers, {"pdf": _render_budget_pdf}),
+    "resume_document": (has_technique_access, {"pdf": _render_resume_pdf}),
+}
+
+
+def _tracked(rows, total, progress, offset=0):
+    """Itère sur rows en remontant la progression tous les EXPORT_PROGRESS_STEP éléments."""
+    done = offset
+    for row in rows:
+        yield row
+        done += 1
+        if done % EXPORT_PROGRESS_STEP == 0:
+            progress(done, total)
+
+
+def normalize_export_params(data):
+    """
+    Paramètres de filtre sous forme stable : {clé: [valeurs triées]}, sans les
+    valeurs vides ni les paramètres d'interface.
+    """
+    params = {}
+    for key in sorted(data.keys()):
+        if key in IGNORED_EXPORT_PARAMS:
+            continue
+        values = data.getlist(key) if hasattr(data, "getlist") else data[key]
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        values = sorted(str(value).strip() for value in values if str(value).strip())
+        if values:
+            params[key] = values
+    return params
+
+
+def export_params_hash(kind, export_format, params):
+    payload = json.dumps(
+        {"kind": kind, "format": export_format, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def can_request_export(user, kind, export_format):
+    if kind not in EXPORT_KINDS:
+        return False
+    access_test, renderers = EXPORT_KINDS[kind]
+    return export_format in renderers and access_test(user)
+
+
+def request_export_job(user, kind, export_format, data):
+    """
+    Crée (ou réutilise) le job d'export correspondant aux filtres.
+
+    Retourne (job, reused).
+    """
+    params = normalize_export_params(data)
+    params_hash = export_params_hash(kind, export_format, params)
+    window = timedelta(seconds=getattr(settings, "EXPORT_JOB_REUSE_SECONDS", 300))
+
+    existing = (
+        ExportJob.objects.filter(
+            requested_by=user,
+            params_hash=params_hash,
+            created_at__gte=timezone.now() - window,
+            status__in=["pending", "running", "done"],
+        )
+        .order_by("-created_at", "-id")
+        .first()
+    )
+    if existing:
+        return existing, True
+
+    job = ExportJob.objects.create(
+        kind=kind,
+        format=export_format,
+        params=params,
+        params_hash=params_hash,
+        requested_by=user,
+    )
+    enqueue_export_job(job)
+    return job, False
+
+
+def enqueue_export_job(job):
+    if getattr(settings, "EXPORT_JOB_EXECUTION", "celery") == "sync":
+        render_export_job(job.pk)
+        return
+
+    from .tasks import run_export_job
+
+    def _send():
+        try:
+            run_export_job.delay(job.pk)
+        except Exception as exc:
+            logger.exception("Impossible de mettre en file l'export %s", job.pk)
+            ExportJob.objects.filter(pk=job.pk).update(
+                status="failed",
+                error=f"Mise en file impossible : {exc}",
+                finished_at=timezone.now(),
+            )
+
+    transaction.on_commit(_send)
+
+
+def render_export_job(job_id):
+    """Rend le fichier d'un job et met à jour son statut."""
+    job = ExportJob.objects.select_related("requested_by").get(pk=job_id)
+    if job.status in ("done", "running"):
+        return job
+
+    ExportJob.objects.filter(pk=job.pk).update(status="running", progress=0)
+    last_reported = {"value": 0}
+
+    def progress(done, total):
+        value = min(99, int(done * 100 / total)) if total else 0
+        if value > last_reported["value"]:
+            last_reported["value"] = value
+            ExportJob.objects.filter(pk=job.pk).update(progress=value)
+
+    _, renderers = EXPORT_KINDS[job.kind]
+    params = MultiValueDict(job.params)
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE) as output:
+            filename = renderers[job.format](job, params, output, progress)
+            output.seek(0)
+            job.file.save(filename, File(output), save=False)
+    except Exception as exc:
+        logger.exception("Échec de l'export %s", job.pk)
+        job.status = "failed"
+        job.error = str(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return job
+
+    job.status = "done"
+    job.progress = 100
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "status", "progress", "error", "finished_at"])
+    return job
+
+
+def purge_export_jobs(now=None):
+    """Supprime les jobs (et leurs fichiers) plus anciens que la rétention."""
+    now = now or timezone.now()
+    retention = timedelta(hours=getattr(settings, "EXPORT_JOB_RETENTION_HOURS", 24))
+    deleted = 0
+    for job in ExportJob.objects.filter(created_at__lt=now - retention).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
@@ -1,4 +1,6 @@
 import base64
+import logging
+import time
 from datetime import datetime, timezone as dt_timezone
 from email.message import EmailMessage
 from email.utils import make_msgid, parseaddr, parsedate_to_datetime
@@ -12,6 +14,8 @@ from management.models import (
 )
 from management.oauth_utils import get_gmail_service
 
+logger = logging.getLogger(__name__)
+
 
 def _headers(payload):
     return {
@@ -47,7 +51,75 @@ def _get_google_token(user):
     return token
 
 
-def list_messages(user, label_ids=None, query=None, limit=50):
+METADATA_HEADERS = [
+    "Subject",
+    "From",
+    "To",
+    "Date",
+    "Message-ID",
+    "In-Reply-To",
+    "References",
+]
+
+# Gmail accepte jusqu'à 100 appels par requête batch.
+GMAIL_BATCH_SIZE = 100
+GMAIL_BATCH_MAX_RETRIES = 4
+GMAIL_BATCH_BACKOFF_SECONDS = 1.0
+GMAIL_RETRYABLE_STATUSES = {429, 500, 503}
+
+
+def _error_status(exc):
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+def execute_batched(service, requests, batch_size=GMAIL_BATCH_SIZE, max_retries=GMAIL_BATCH_MAX_RETRIES):
+    """
+    Exécute des requêtes Gmail non lancées en les regroupant par BatchHttpRequest.
+
+    `requests` associe une clé texte à une requête (objet retourné par
+    `.get(...)` sans `.execute()`). Retourne `(results, errors)` indexés par clé.
+    Les erreurs 429 / 5xx sont rejouées avec un backoff exponentiel ; les autres
+    erreurs sont renvoyées sans interrompre le reste du lot.
+    """
+    results = {}
+    errors = {}
+    pending = dict(requests)
+
+    for attempt in range(max_retries + 1):
+        retry = {}
+        can_retry = attempt < max_retries
+
+        def _callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif can_retry and _error_status(exception) in GMAIL_RETRYABLE_STATUSES:
+                retry[request_id] = pending[request_id]
+            else:
+                errors[request_id] = exception
+
+        keys = list(pending)
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=_callback)
+            for key in chunk:
+                batch.add(pending[key], request_id=key)
+            try:
+                batch.execute()
+            except Exception as exc:
+                if not (can_retry and _error_status(exc) in GMAIL_RETRYABLE_STATUSES):
+                    raise
+                retry.update({key: pending[key] for key in chunk})
+
+        if not retry:
+            break
+        time.sleep(GMAIL_BATCH_BACKOFF_SECONDS * (2 ** attempt))
+        pending = retry
+
+    return results, errors
+
+
+def list_message_refs(user, label_ids=None, query=None, limit=50):
+    """Liste les identifiants `{id, threadId}` sans récupérer les messages."""
     _get_google_token(user)
     service = get_gmail_service(user)
     kwargs = {"userId": "me", "maxResults": min(limit, 100)}
@@ -56,41 +128,47 @@ def list_messages(user, label_ids=None, query=None, limit=50):
     if query:
         kwargs["q"] = query
 
-    response = service.users().messages().list(**kwargs).execute()
-    messages = []
-    for ref in response.get("messages", [])[:limit]:
-        messages.append(
-            service.users().messages().get(
-                userId="me",
-                id=ref["id"],
-                format="metadata",
-                metadataHeaders=[
-                    "Subject",
-                    "From",
-                    "To",
-                    "Date",
-                    "Message-ID",
-                    "In-Reply-To",
-                    "References",
-                ],
-            ).execute()
-        )
-    return messages
+    refs = []
+    while len(refs) < limit:
+        response = service.users().messages().list(**kwargs).execute()
+        refs.extend(response.get("messages", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+        kwargs["pageToken"] = page_token
+    return refs[:limit]
+
+
+def get_messages(user, message_ids, format="metadata"):
+    """Récupère plusieurs messages en requêtes groupées, dans l'ordre demandé."""
+    if not message_ids:
+        return []
+    service = get_gmail_service(user)
+    kwargs = {"userId": "me", "format": format}
+    if format == "metadata":
+        kwargs["metadataHeaders"] = METADATA_HEADERS
+    results, errors = execute_batched(
+        service,
+        {
+            message_id: service.users().messages().get(id=message_id, **kwargs)
+            for message_id in message_ids
+        },
+    )
+    for message_id, exc in errors.items():
+        logger.warning("Message Gmail %s ignoré : %s", message_id, exc)
+    return [results[message_id] for message_id in message_ids if message_id in results]
+
+
+def list_messages(user, label_ids=None, query=None, limit=50):
+    refs = list_message_refs(user, label_ids=label_ids, query=query, limit=limit)
+    return get_messages(user, [ref["id"] for ref in refs])
 
 
 def get_message(user, message_id, format="metadata"):
     _get_google_token(user)
     kwargs = {"userId": "me", "id": message_id, "format": format}
     if format == "metadata":
-        kwargs["metadataHeaders"] = [
-            "Subject",
-            "From",
-            "To",
-            "Date",
-            "Message-ID",
-            "In-Reply-To",
-            "References",
-        ]
+        kwargs["metadataHeaders"] = METADATA_HEADERS
     return get_gmail_service(user).users().messages().get(**kwargs).execute()
 
 
@@ -105,6 +183,33 @@ def get_thread(user, thread_id):
     )
 
 
+def get_threads(user, thread_ids):
+    """
+    Récupère plusieurs threads en requêtes groupées. Retourne `(threads, errors)`
+    indexés par thread_id, comme execute_batched.
+    """
+    thread_ids = list(dict.fromkeys(thread_ids))
+    if not thread_ids:
+        return {}, {}
+    _get_google_token(user)
+    service = get_gmail_service(user)
+    results, errors = execute_batched(
+        service,
+        {
+            thread_id: service.users().threads().get(userId="me", id=thread_id, format="metadata")
+            for thread_id in thread_ids
+        },
+    )
+    for thread_id, exc in errors.items():
+        logger.warning("Thread Gmail %s ignoré : %s", thread_id, exc)
+    return results, errors
+
+
+def _fetch_failed(errors):
+    """Vrai si un appel a échoué autrement que par un 404 (thread supprimé depuis)."""
+    return any(_error_status(exc) != 404 for exc in errors.values())
+
+
 def _build_raw_message(sender, to_email, subject, body, in_reply_to="", references=""):
     message = EmailMessage()
     message["From"] = sender
@@ -190,72 +295,192 @@ def _thread_has_external_reply(messages, own_email):
     return bool(replies), max(replies) if replies else None
 
 
-def sync_conversation_journal(user, limit=100):
-    token = _get_google_token(user)
+def _is_own_sent_message(message, own_email):
+    if "SENT" in message.get("labelIds", []):
+        return True
+    headers = _headers(message.get("payload", {}))
+    return _first_address(headers.get("from")).lower() == (own_email or "").lower()
+
+
+def _apply_thread_to_journal(user, token, message, thread_messages):
+    """
+    Met à jour la conversation du journal à partir d'un message envoyé et des
+    messages de son thread. Retourne le nombre de réponses détectées (0 ou 1).
+    """
+    headers = _headers(message.get("payload", {}))
+    thread_id = message.get("threadId") or message.get("id")
+    sent_at = _parse_gmail_date(message, headers)
+    # Le thread Gmail est chronologique : son premier message envoyé ouvre la conversation
+    first_sent = next(
+        (item for item in thread_messages if _is_own_sent_message(item, token.email)),
+        message,
+    )
+    conversation, created = GmailConversation.objects.get_or_create(
+        owner=user,
+        thread_id=thread_id,
+        defaults={
+            "initial_message_id": first_sent.get("id", ""),
+            "last_message_id": message.get("id", ""),
+            "subject": headers.get("subject", "(Sans objet)"),
+            "recipient": _first_address(headers.get("to")),
+            "preview": message.get("snippet", ""),
+            "sent_at": sent_at,
+            "last_synced_at": timezone.now(),
+        },
+    )
+
+    has_reply, replied_at = _thread_has_external_reply(thread_messages, token.email)
+    old_status = conversation.status
+    conversation.last_message_id = (
+        thread_messages[-1].get("id", message.get("id", ""))
+        if thread_messages
+        else message.get("id", "")
+    )
+    conversation.subject = headers.get("subject", conversation.subject)
+    conversation.recipient = _first_address(headers.get("to")) or conversation.recipient
+    conversation.preview = message.get("snippet", conversation.preview)
+    conversation.sent_at = min(filter(None, [conversation.sent_at, sent_at]))
+    conversation.last_synced_at = timezone.now()
+    if has_reply:
+        conversation.status = "replied"
+        conversation.replied_at = replied_at
+    conversation.save()
+
+    if created:
+        GmailConversationEvent.objects.create(
+            conversation=conversation,
+            event_type="synced",
+            external_message_id=message.get("id", ""),
+        )
+    if has_reply and old_status != "replied":
+        GmailConversationEvent.objects.create(
+            conversation=conversation,
+            event_type="reply_detected",
+            old_status=old_status,
+            new_status="replied",
+            external_message_id=conversation.last_message_id,
+        )
+        return 1
+    return 0
+
+
+def history_cursor_expired(exc):
+    """Gmail répond 404 lorsque le startHistoryId est trop ancien."""
+    return getattr(getattr(exc, "resp", None), "status", None) == 404
+
+
+def _save_history_cursor(token, history_id):
+    if history_id and str(history_id) != token.gmail_history_id:
+        token.gmail_history_id = str(history_id)
+        token.save(update_fields=["gmail_history_id", "updated_at"])
+
+
+def _current_history_id(user):
+    """historyId courant de la boîte : point de départ du prochain passage incrémental."""
+    profile = get_gmail_service(user).users().getProfile(userId="me").execute()
+    return str(profile.get("historyId", ""))
+
+
+def _full_journal_sync(user, token, limit):
+    # Relevé avant le parcours : les messages arrivés pendant la
+    # resynchronisation seront rejoués au prochain passage, sans effet.
+    history_id = _current_history_id(user)
     sent_messages = list_messages(user, label_ids=["SENT"], limit=limit)
+    threads, errors = get_threads(
+        user,
+        [message.get("threadId") or message.get("id") for message in sent_messages],
+    )
     synced = 0
     replied = 0
 
     for message in sent_messages:
-        headers = _headers(message.get("payload", {}))
         thread_id = message.get("threadId") or message.get("id")
-        if not thread_id:
+        if not thread_id or thread_id not in threads:
             continue
+        thread_messages = threads[thread_id].get("messages", [])
+        replied += _apply_thread_to_journal(user, token, message, thread_messages)
+        synced += 1
 
-        sent_at = _parse_gmail_date(message, headers)
-        conversation, created = GmailConversation.objects.get_or_create(
-            owner=user,
-            thread_id=thread_id,
-            defaults={
-                "initial_message_id": message.get("id", ""),
-                "last_message_id": message.get("id", ""),
-                "subject": headers.get("subject", "(Sans objet)"),
-                "recipient": _first_address(headers.get("to")),
-                "preview": message.get("snippet", ""),
-                "sent_at": sent_at,
-                "last_synced_at": timezone.now(),
-            },
-        )
+    if not _fetch_failed(errors):
+        _save_history_cursor(token, history_id)
+    return {"synced": synced, "replied": replied}
 
-        thread = get_thread(user, thread_id)
-        thread_messages = thread.get("messages", [])
-        has_reply, replied_at = _thread_has_external_reply(thread_messages, token.email)
-        old_status = conversation.status
-        conversation.last_message_id = (
-            thread_messages[-1].get("id", message.get("id", ""))
-            if thread_messages
-            else message.get("id", "")
+
+def _incremental_journal_sync(user, token):
+    """
+    Applique uniquement les deltas messagesAdded / labelsAdded depuis le
+    dernier historyId connu. Lève l'exception Gmail si le curseur a expiré.
+    """
+    service = get_gmail_service(user)
+    kwargs = {
+        "userId": "me",
+        "startHistoryId": token.gmail_history_id,
+        "historyTypes": ["messageAdded", "labelAdded"],
+    }
+    touched = {}
+    history_id = token.gmail_history_id
+    while True:
+        response = service.users().history().list(**kwargs).execute()
+        history_id = response.get("historyId", history_id)
+        for record in response.get("history", []):
+            for change in record.get("messagesAdded", []) + record.get("labelsAdded", []):
+                message = change.get("message", {})
+                thread_id = message.get("threadId")
+                if thread_id:
+                    touched.setdefault(thread_id, set()).update(message.get("labelIds", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+        kwargs["pageToken"] = page_token
+
+    known_threads = set(
+        GmailConversation.objects.filter(owner=user, thread_id__in=touched).values_list(
+            "thread_id", flat=True
         )
-        conversation.subject = headers.get("subject", conversation.subject)
-        conversation.recipient = _first_address(headers.get("to")) or conversation.recipient
-        conversation.preview = message.get("snippet", conversation.preview)
-        conversation.sent_at = min(filter(None, [conversation.sent_at, sent_at]))
-        conversation.last_synced_at = timezone.now()
-        if has_reply:
-            conversation.status = "replied"
-            conversation.replied_at = replied_at
-        conversation.save()
-
-        if created:
-            GmailConversationEvent.objects.create(
-                conversation=conversation,
-                event_type="synced",
-                external_message_id=message.get("id", ""),
-            )
-        if has_reply and old_status != "replied":
-            GmailConversationEvent.objects.create(
-                conversation=conversation,
-                event_type="reply_detected",
-                old_status=old_status,
-                new_status="replied",
-                external_message_id=conversation.last_message_id,
-            )
-            replied += 1
+    )
+    threads, errors = get_threads(
+        user,
+        [
+            thread_id
+            for thread_id, label_ids in touched.items()
+            if "SENT" in label_ids or thread_id in known_threads
+        ],
+    )
+    synced = 0
+    replied = 0
+    for thread in threads.values():
+        thread_messages = thread.get("messages", [])
+        sent = [item for item in thread_messages if _is_own_sent_message(item, token.email)]
+        if not sent:
+            continue
+        replied += _apply_thread_to_journal(user, token, sent[-1], thread_messages)
         synced += 1
 
+    # Un thread non récupéré (429, 5xx...) doit être rejoué au prochain passage :
+    # le curseur reste en place, les threads déjà appliqués le seront sans effet.
+    if not _fetch_failed(errors):
+        _save_history_cursor(token, history_id)
     return {"synced": synced, "replied": replied}
 
 
+def sync_conversation_journal(user, limit=100, incremental=True):
+    """
+    Synchronise le journal des conversations Gmail.
+
+    Avec un curseur historyId enregistré sur l'OAuthToken, seuls les nouveaux
+    messages et labels sont appliqués ; la resynchronisation complète des
+    messages envoyés n'a lieu qu'au premier passage ou si le curseur a expiré.
+    """
+    token = _get_google_token(user)
+    if incremental and token.gmail_history_id:
+        try:
+            return _incremental_journal_sync(user, token)
+        except Exception as exc:
+            if not history_cursor_expired(exc):
+                raise
+    return _full_journal_sync(user, token, limit)
+
+
 def send_conversation_reminder(conversation, user, body, source="manual"):
     if conversation.status == "replied":
         raise ValueError(
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("management", "0021_reset_admin_category_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="oauthtoken",
+            name="gmail_history_id",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("management", "0022_oauthtoken_gmail_history_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activite",
+            index=models.Index(fields=["date"], name="activite_date_idx"),
+        ),
+    ]
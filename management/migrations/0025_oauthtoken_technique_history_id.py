@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("management", "0024_exportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="oauthtoken",
+            name="technique_history_id",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
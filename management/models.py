@@ -260,6 +260,10 @@ class Activite(models.Model):
     class Meta:
         db_table = 'activite'
         ordering = ['date']
+        indexes = [
+            # Sélection des rappels à échéance par plage de dates
+            models.Index(fields=["date"], name="activite_date_idx"),
+        ]
 
     def __str__(self):
         date_label = self.date.strftime('%Y-%m-%d') if self.date else "sans date"
@@ -433,6 +437,10 @@ class OAuthToken(models.Model):
 
     token_expiry = models.DateTimeField()
 
+    # Curseur Gmail History API : dernier historyId appliqué au journal
+    gmail_history_id = models.CharField(max_length=64, blank=True, default="")
+    # Curseur Gmail History API : dernier historyId importé dans TechnicalEmail
+    technique_history_id = models.CharField(max_length=64, blank=True, default="")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -540,3 +548,47 @@ class GmailConversationEvent(models.Model):
 
     def __str__(self):
         return f"{self.conversation_id} - {self.get_event_type_display()}"
+
+
+class ExportJob(models.Model):
+    """Export XLSX ou PDF rendu en arrière-plan puis téléchargé."""
+
+    STATUS_CHOICES = [
+        ("pending", "En attente"),
+        ("running", "En cours"),
+        ("done", "Terminé"),
+        ("failed", "Échec"),
+    ]
+    FORMAT_CHOICES = [
+        ("xlsx", "Excel"),
+        ("pdf", "PDF"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to="exports/%Y/%m/", blank=True)
+    error = models.TextField(blank=True, default="")
+    requested_by = models.ForeignKey(
+        Utilisateur,
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "export_job"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["requested_by", "params_hash", "created_at"],
+                name="export_job_reuse_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Export {self.kind}.{self.format} #{self.pk} ({self.get_status_display()})"
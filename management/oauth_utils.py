@@ -2,10 +2,13 @@
 Utilitaires OAuth2 pour l'authentification Microsoft/Outlook et Google/Gmail
 """
 import os
+import threading
+import time
 from datetime import timedelta
 from urllib.parse import urlencode
 
 import requests
+from django.conf import settings
 from django.utils import timezone
 
 MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
@@ -210,10 +213,62 @@ def send_email_via_graph_api(user, to_email, subject, message_text):
     return {"success": False, "error": response.text}
 
 
-def get_gmail_service(user):
+# Cache des services Gmail par (utilisateur, thread) : les objets httplib2
+# sous-jacents ne sont pas thread-safe et ne sont donc jamais partagés.
+_gmail_services = {}
+_gmail_services_lock = threading.Lock()
+_gmail_service_stats = {"builds": 0, "hits": 0, "credential_swaps": 0, "evictions": 0}
+
+
+class _CachedGmailService:
+    def __init__(self, service, credentials, oauth_token):
+        self.service = service
+        self.credentials = credentials
+        self.oauth_token = oauth_token
+        self.expires_at = time.monotonic() + settings.GMAIL_SERVICE_CACHE_TTL
+
+
+def _count(key):
+    with _gmail_services_lock:
+        _gmail_service_stats[key] += 1
+
+
+def get_gmail_service_stats():
+    """
+    Compteurs du cache de services Gmail : `builds` (discovery construite),
+    `hits` (service réutilisé), `credential_swaps` (token rafraîchi sans
+    reconstruction) et `evictions`.
+    """
+    with _gmail_services_lock:
+        return {**_gmail_service_stats, "cached": len(_gmail_services)}
+
+
+def clear_gmail_service_cache():
+    with _gmail_services_lock:
+        _gmail_services.clear()
+        for key in _gmail_service_stats:
+            _gmail_service_stats[key] = 0
+
+
+def evict_gmail_service(user_id, oauth_token=None):
     """
-    Retourne un service Gmail API pour l'utilisateur
+    Retire les services en cache d'un utilisateur. Si `oauth_token` est fourni,
+    les entrées dont le token est identique (simple sauvegarde) sont conservées.
     """
+    with _gmail_services_lock:
+        for key in [key for key in _gmail_services if key[0] == user_id]:
+            cached = _gmail_services[key].oauth_token
+            if oauth_token is not None and (
+                cached.provider == oauth_token.provider
+                and cached.access_token == oauth_token.access_token
+                and cached.refresh_token == oauth_token.refresh_token
+            ):
+                continue
+            del _gmail_services[key]
+            _gmail_service_stats["evictions"] += 1
+
+
+def _build_gmail_service(user):
     from googleapiclient.discovery import build
     from management.models import OAuthToken
 
@@ -233,5 +288,62 @@ def get_gmail_service(user):
         scopes=GOOGLE_SCOPES
     )
 
-    service = build('gmail', 'v1', credentials=creds)
-    return service
+    # Document de discovery embarqué : aucun appel réseau à la construction.
+    service = build(
+        'gmail',
+        'v1',
+        credentials=creds,
+        static_discovery=True,
+        cache_discovery=False,
+    )
+    _count("builds")
+    return _CachedGmailService(service, creds, oauth_token)
+
+
+def get_gmail_service(user):
+    """
+    Retourne un service Gmail API pour l'utilisateur.
+
+    Le service est réutilisé pendant settings.GMAIL_SERVICE_CACHE_TTL secondes ; un
+    access token proche de l'expiration est rafraîchi et injecté dans les
+    credentials existants sans reconstruire le client, sauf si Google a
+    renouvelé le refresh token.
+    """
+    key = (user.pk, threading.get_ident())
+    with _gmail_services_lock:
+        entry = _gmail_services.get(key)
+    if entry is not None and entry.expires_at <= time.monotonic():
+        evict_gmail_service(user.pk)
+        entry = None
+
+    if entry is None:
+        return _store_gmail_service(key, _build_gmail_service(user))
+
+    oauth_token = entry.oauth_token
+    if timezone.now() >= (oauth_token.token_expiry - timedelta(minutes=5)):
+        # Un autre processus a pu rafraîchir le token entre-temps.
+        oauth_token.refresh_from_db()
+        access_token = get_valid_credentials(oauth_token)
+        if oauth_token.refresh_token != entry.credentials.refresh_token:
+            # Refresh token renouvelé par Google : les credentials ne
+            # permettent pas de le remplacer, le client est reconstruit.
+            evict_gmail_service(user.pk)
+            return _store_gmail_service(key, _build_gmail_service(user))
+        entry.credentials.token = access_token
+        _count("credential_swaps")
+    _count("hits")
+    return entry.service
+
+
+def _store_gmail_service(key, entry):
+    """
+    Met le service en cache et retire au passage les entrées expirées, dont
+    celles laissées par des threads terminés qui ne seront plus relues.
+    """
+    now = time.monotonic()
+    with _gmail_services_lock:
+        for expired in [k for k, cached in _gmail_services.items() if cached.expires_at <= now]:
+            del _gmail_services[expired]
+            _gmail_service_stats["evictions"] += 1
+        _gmail_services[key] = entry
+    return entry.service
@@ -150,6 +150,8 @@ def oauth_callback(request):
                 'access_token':  tokens['access_token'],
                 'refresh_token': refresh_token,
                 'token_expiry':  tokens['token_expiry'],
+                'gmail_history_id': '',
+                'technique_history_id': '',
             }
         )
 
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import OAuthToken
+from .oauth_utils import evict_gmail_service
+
+
+@receiver(post_save, sender=OAuthToken)
+def evict_gmail_service_on_token_change(sender, instance, **kwargs):
+    """
+    Invalide les services Gmail en cache quand le token change (reconnexion,
+    changement de compte). Une sauvegarde sans changement de token les garde.
+    """
+    evict_gmail_service(instance.user_id, oauth_token=instance)
+
+
+@receiver(post_delete, sender=OAuthToken)
+def evict_gmail_service_on_token_delete(sender, instance, **kwargs):
+    evict_gmail_service(instance.user_id)
@@ -0,0 +1,91 @@
+// Exports en arrière-plan : un lien portant data-export-kind et
+// data-export-format demande un job à /api/exports/, suit sa progression puis
+// lance le téléchargement. Les filtres sont repris de la query string du lien
+// (et data-export-pk pour les exports d'un seul objet). En cas d'échec de
+// l'API, le lien synchrone d'origine est suivi.
+(function () {
+    const EXPORT_API_URL = '/api/exports/';
+    const POLL_INTERVAL = 1500;
+
+    function getCookie(name) {
+        let cookieValue = null;
+        document.cookie.split(';').forEach(cookie => {
+            cookie = cookie.trim();
+            if (cookie.startsWith(name + '=')) cookieValue = decodeURIComponent(cookie.slice(name.length + 1));
+        });
+        return cookieValue;
+    }
+
+    function exportData(link) {
+        const url = new URL(link.href, window.location.href);
+        const data = new FormData();
+        url.searchParams.forEach((value, key) => data.append(key, value));
+        data.set('kind', link.dataset.exportKind);
+        data.set('format', link.dataset.exportFormat);
+        if (link.dataset.exportPk) data.set('pk', link.dataset.exportPk);
+        return data;
+    }
+
+    function setBusy(link, progress) {
+        if (link.dataset.exportLabel === undefined) link.dataset.exportLabel = link.innerHTML;
+        link.classList.add('disabled');
+        link.setAttribute('aria-busy', 'true');
+        link.innerHTML = '<i class="bi bi-hourglass-split"></i> Export… ' + (progress ? progress + '%' : '');
+    }
+
+    function resetLink(link) {
+        if (link.dataset.exportLabel !== undefined) link.innerHTML = link.dataset.exportLabel;
+        delete link.dataset.exportLabel;
+        link.classList.remove('disabled');
+        link.removeAttribute('aria-busy');
+    }
+
+    async function fetchJob(url, options) {
+        const resp = await fetch(url, Object.assign({ headers: { 'Accept': 'application/json' } }, options));
+        if (!resp.ok) throw new Error('HTTP ' + resp.status);
+        return (await resp.json()).job;
+    }
+
+    async function followJob(link, job) {
+        while (job.status === 'pending' || job.status === 'running') {
+            setBusy(link, job.progress);
+            await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL));
+            job = await fetchJob(job.status_url);
+        }
+        resetLink(link);
+        if (job.status === 'done') {
+            window.location.href = job.download_url;
+        } else {
+            alert(job.error || "L'export a échoué.");
+        }
+    }
+
+    document.addEventListener('click', async function (event) {
+        const link = event.target.closest('a[data-export-kind]');
+        if (!link || event.ctrlKey || event.metaKey || event.shiftKey) return;
+        event.preventDefault();
+        if (link.getAttribute('aria-busy') === 'true') return;
+
+        setBusy(link, 0);
+        let job;
+        try {
+            job = await fetchJob(EXPORT_API_URL, {
+                method: 'POST',
+                headers: { 'Accept': 'application/json', 'X-CSRFToken': getCookie('csrftoken') },
+                body: exportData(link),
+            });
+        } catch (error) {
+            console.error('Export en arrière-plan indisponible :', error);
+            resetLink(link);
+            window.location.href = link.href;
+            return;
+        }
+        try {
+            await followJob(link, job);
+        } catch (error) {
+            console.error('Erreur de suivi de l\'export :', error);
+            resetLink(link);
+            alert("Impossible de suivre l'export, réessayez dans quelques instants.");
+        }
+    });
+})();
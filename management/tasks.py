@@ -1,14 +1,19 @@
 import os
 import logging
 import traceback
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
 
-from celery import shared_task
+from celery import chord, shared_task
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from config.db_metrics import count_queries
 from .models import (
     DefaultModeleRelance,
     DefaultTempsRelance,
@@ -22,22 +27,140 @@ from .models import (
     GmailConversation,
     GmailConversationEvent,
 )
+from .exports import purge_export_jobs, render_export_job
 from .gmail_service import send_conversation_reminder, sync_conversation_journal
 
 Utilisateur = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+# Durée maximale du verrou par boîte mail (inférieure à l'intervalle de beat)
+GMAIL_RELANCE_LOCK_TIMEOUT = 25 * 60
 
-@shared_task
-def check_and_send_auto_relances():
-    today = timezone.now().date()
-    relances_envoyees = 0
-    emails_traites = 0
-    erreurs = 0
 
+def _normalize_recipient(recipient):
+    if recipient and '<' in recipient and '>' in recipient:
+        return recipient.split('<')[1].split('>')[0].strip()
+    return recipient
+
+
+def plan_auto_relances(user_ids, today, default_temps_relance, blocked_at):
+    """
+    Planifie les relances automatiques des conversations ouvertes.
+
+    Les délais, la correspondance EmailClient -> métier, les modèles de relance
+    et les relances déjà envoyées aujourd'hui sont chargés en quelques requêtes
+    groupées ; l'éligibilité est ensuite décidée en mémoire. Retourne
+    `(conversations, planned)` où `planned` liste des couples
+    `(conversation, message)`.
+    """
+    conversations = list(
+        GmailConversation.objects.filter(
+            owner_id__in=user_ids,
+            status__in=["open", "reminded"],
+        ).select_related("owner")
+    )
+    if not conversations:
+        return conversations, []
+
+    intervals = dict(
+        TempsRelance.objects.filter(id__in=user_ids).values_list("id", "temps")
+    )
+    recipients = {
+        _normalize_recipient(conversation.recipient)
+        for conversation in conversations
+        if conversation.recipient
+    }
+    # Premier EmailClient par email dans l'ordre de la clé primaire, comme le
+    # faisait EmailClient.objects.filter(email=...).first()
+    metier_by_email = {}
+    for email, metier in (
+        EmailClient.objects.filter(email__in=recipients)
+        .order_by("pk")
+        .values_list("email", "metier")
+    ):
+        metier_by_email.setdefault(email, metier)
+    messages = {
+        (utilisateur, metier): message
+        for utilisateur, metier, message in ModeleRelance.objects.filter(
+            utilisateur_id__in=user_ids,
+        ).values_list("utilisateur", "metier", "message")
+    }
+    default_messages = dict(
+        DefaultModeleRelance.objects.values_list("metier", "message")
+    )
+    sent_today = set(
+        GmailConversationEvent.objects.filter(
+            conversation__in=[conversation.pk for conversation in conversations],
+            event_type="reminder_sent",
+            created_at__date=today,
+        ).values_list("conversation_id", flat=True)
+    )
+
+    planned = []
+    for conversation in conversations:
+        date_envoi = conversation.sent_at
+        if not date_envoi:
+            blocked_at['date_missing'] += 1
+            continue
+
+        if hasattr(date_envoi, 'date'):
+            date_envoi = date_envoi.date()
+        nb_jours = (today - date_envoi).days
+        if nb_jours < 1:
+            blocked_at['nb_jours_check'] += 1
+            continue
+
+        destinataire_email = _normalize_recipient(conversation.recipient)
+        if not destinataire_email:
+            blocked_at['email_missing'] += 1
+            continue
+
+        if conversation.owner_id in intervals:
+            intervalle = intervals[conversation.owner_id]
+        else:
+            blocked_at['temps_relance_not_found'] += 1
+            if blocked_at['default_temps_relance_not_found']:
+                continue
+            intervalle = default_temps_relance
+
+        if not intervalle or intervalle <= 0:
+            continue
+
+        if nb_jours % intervalle != 0:
+            blocked_at['modulo_check'] += 1
+            continue
+
+        if destinataire_email not in metier_by_email:
+            blocked_at['client_not_found'] += 1
+            continue
+
+        metier = metier_by_email[destinataire_email]
+
+        if (conversation.owner_id, metier) in messages:
+            message_relance = messages[(conversation.owner_id, metier)]
+        else:
+            blocked_at['modele_relance_not_found'] += 1
+            if metier not in default_messages:
+                blocked_at['default_modele_relance_not_found'] += 1
+                continue
+            message_relance = default_messages[metier]
+
+        if not message_relance:
+            blocked_at['message_empty'] += 1
+            continue
+
+        if conversation.pk in sent_today:
+            continue
+
+        planned.append((conversation, message_relance))
+
+    return conversations, planned
+
+
+def _new_blocked_at():
     # Compteurs de debug
-    blocked_at = {
+    return {
         'status_replied': 0,
         'date_missing': 0,
         'nb_jours_check': 0,
@@ -54,10 +177,190 @@ def check_and_send_auto_relances():
         'utilisateur_not_found': 0,
     }
 
+
+def _user_relance_lock_key(user_id):
+    return f"gmail-auto-relance-lock:{user_id}"
+
+
+def _process_user_auto_relances(user_id):
+    """
+    Synchronise le journal Gmail d'un utilisateur puis envoie ses relances.
+
+    Un verrou en cache empêche deux exécutions de beat qui se chevauchent de
+    traiter la même boîte mail en même temps.
+    """
+    lock_key = _user_relance_lock_key(user_id)
+    if not cache.add(lock_key, timezone.now().isoformat(), GMAIL_RELANCE_LOCK_TIMEOUT):
+        print(f"Relances déjà en cours pour l'utilisateur {user_id}, ignoré")
+        return {'success': True, 'utilisateurs': 1, 'utilisateurs_verrouilles': 1}
+
+    try:
+        with count_queries() as queries:
+            result = _run_user_auto_relances(user_id)
+        result['queries'] = queries.count
+        return result
+    except Exception as e:
+        traceback.print_exc()
+        return {'success': False, 'utilisateurs': 1, 'message': str(e)}
+    finally:
+        cache.delete(lock_key)
+
+
+def _run_user_auto_relances(user_id):
+    today = timezone.now().date()
+    relances_envoyees = 0
+    erreurs = 0
+    blocked_at = _new_blocked_at()
+    result = {
+        'success': True,
+        'utilisateurs': 1,
+        'emails_traites': 0,
+        'relances_envoyees': 0,
+        'erreurs': 0,
+        'debug': blocked_at,
+    }
+
+    oauth_token = OAuthToken.objects.select_related("user").filter(
+        user_id=user_id,
+        provider="google",
+    ).first()
+    if oauth_token is None:
+        blocked_at['utilisateur_not_found'] += 1
+        return result
+
+    user = oauth_token.user
+    print(f"Traitement de {user.username} ({oauth_token.email})")
+
+    default_temps_relance_obj = DefaultTempsRelance.objects.first()
+    default_temps_relance = default_temps_relance_obj.temps if default_temps_relance_obj else None
+
+    if default_temps_relance is None:
+        blocked_at['default_temps_relance_not_found'] = True
+
+    try:
+        sync_conversation_journal(user, limit=100)
+    except Exception as e:
+        print(f"   Erreur pour {user.username} : {e}")
+        traceback.print_exc()
+        return result
+
+    conversations, planned = plan_auto_relances(
+        [user.pk],
+        today,
+        default_temps_relance,
+        blocked_at,
+    )
+
+    for conversation, message_relance in planned:
+        try:
+            sent = send_conversation_reminder(
+                conversation=conversation,
+                user=user,
+                body=message_relance,
+                source="automatic",
+            )
+
+            if sent['success']:
+                blocked_at['sent_successfully'] += 1
+                relances_envoyees += 1
+            else:
+                blocked_at['send_failed'] += 1
+                erreurs += 1
+
+        except Exception as exc:
+            GmailConversationEvent.objects.create(
+                conversation=conversation,
+                event_type="error",
+                user=user,
+                note=str(exc),
+            )
+            traceback.print_exc()
+            erreurs += 1
+            continue
+
+    result.update({
+        'emails_traites': len(conversations),
+        'relances_envoyees': relances_envoyees,
+        'erreurs': erreurs,
+    })
+    return result
+
+
+def _process_user_auto_relances_in_thread(user_id):
+    try:
+        return _process_user_auto_relances(user_id)
+    finally:
+        # Chaque thread ouvre sa propre connexion : on la libère en sortant.
+        connection.close()
+
+
+@shared_task
+def process_user_auto_relances(user_id):
+    return _process_user_auto_relances(user_id)
+
+
+@shared_task
+def merge_auto_relance_results(results):
+    """
+    Fusionne les résultats par utilisateur en un seul résumé de passage.
+    """
+    merged = {
+        'success': True,
+        'utilisateurs': 0,
+        'utilisateurs_verrouilles': 0,
+        'emails_traites': 0,
+        'relances_envoyees': 0,
+        'erreurs': 0,
+        'queries': 0,
+        'debug': _new_blocked_at(),
+    }
+    for result in results:
+        merged['success'] = merged['success'] and result.get('success', False)
+        for key in (
+            'utilisateurs',
+            'utilisateurs_verrouilles',
+            'emails_traites',
+            'relances_envoyees',
+            'erreurs',
+            'queries',
+        ):
+            merged[key] += result.get(key, 0)
+        for key, value in result.get('debug', {}).items():
+            if isinstance(value, bool):
+                merged['debug'][key] = merged['debug'][key] or value
+            else:
+                merged['debug'][key] += value
+
+    logger.info(
+        "check_and_send_auto_relances : %s utilisateur(s), %s relance(s), "
+        "%s erreur(s), %s requête(s) SQL",
+        merged['utilisateurs'],
+        merged['relances_envoyees'],
+        merged['erreurs'],
+        merged['queries'],
+    )
+    return merged
+
+
+@shared_task
+def check_and_send_auto_relances(mode=None):
+    """
+    Relances automatiques Gmail, un traitement indépendant par utilisateur.
+
+    `mode` (par défaut settings.GMAIL_RELANCE_EXECUTION) :
+    - "chord" : une sous-tâche Celery par utilisateur, résultats fusionnés
+      par merge_auto_relance_results ;
+    - "threads" : pool de GMAIL_RELANCE_THREADS threads dans le worker ;
+    - "serial" : utilisateurs traités l'un après l'autre.
+    """
+    mode = mode or getattr(settings, "GMAIL_RELANCE_EXECUTION", "chord")
+
     try:
-        oauth_users = OAuthToken.objects.filter(provider="google").select_related("user")
+        user_ids = list(
+            OAuthToken.objects.filter(provider="google").values_list("user_id", flat=True)
+        )
 
-        if oauth_users.count() == 0:
+        if not user_ids:
             return {
                 'success': True,
                 'emails_traites': 0,
@@ -65,132 +368,25 @@ def check_and_send_auto_relances():
                 'erreurs': 0
             }
 
-        default_temps_relance_obj = DefaultTempsRelance.objects.first()
-        default_temps_relance = default_temps_relance_obj.temps if default_temps_relance_obj else None
-
-        if default_temps_relance is None:
-            blocked_at['default_temps_relance_not_found'] = True
-
-        for oauth_token in oauth_users:
-            user = oauth_token.user
-            print(f"Traitement de {user.username} ({oauth_token.email})")
-
+        if mode == "chord":
+            async_result = chord(
+                process_user_auto_relances.s(user_id) for user_id in user_ids
+            )(merge_auto_relance_results.s())
+            return {
+                'success': True,
+                'mode': mode,
+                'utilisateurs': len(user_ids),
+                'task_id': async_result.id,
+            }
 
-            try:
-                sync_conversation_journal(user, limit=100)
-                conversations = GmailConversation.objects.filter(
-                    owner=user,
-                    status__in=["open", "reminded"],
-                )
-
-                for conversation in conversations:
-                    emails_traites += 1
-                    try:
-                        date_envoi = conversation.sent_at
-                        if not date_envoi:
-                            blocked_at['date_missing'] += 1
-                            continue
-
-                        if hasattr(date_envoi, 'date'):
-                            date_envoi = date_envoi.date()
-                        nb_jours = (today - date_envoi).days
-                        if nb_jours < 1:
-                            blocked_at['nb_jours_check'] += 1
-                            continue
-
-
-                        destinataire_email = conversation.recipient
-
-                        if not destinataire_email:
-                            blocked_at['email_missing'] += 1
-                            continue
-
-                        if '<' in destinataire_email and '>' in destinataire_email:
-                            destinataire_email = destinataire_email.split('<')[1].split('>')[0].strip()
-
-                        try:
-                            intervalle = TempsRelance.objects.get(id=user).temps
-                        except TempsRelance.DoesNotExist:
-                            blocked_at['temps_relance_not_found'] += 1
-                            if blocked_at['default_temps_relance_not_found']:
-                                continue
-                            intervalle = default_temps_relance
-
-                        if not intervalle or intervalle <= 0:
-                            continue
-
-
-                        if nb_jours % intervalle != 0:
-                            blocked_at['modulo_check'] += 1
-                            continue
-
-                        emails = EmailClient.objects.filter(email=destinataire_email)
-
-                        if emails.count() == 0:
-                            blocked_at['client_not_found'] += 1
-                            continue
-
-                        metier = emails.first().metier
-
-                        try:
-                            message_relance = ModeleRelance.objects.get(utilisateur=user, metier=metier).message
-                        except ModeleRelance.DoesNotExist:
-                            blocked_at['modele_relance_not_found'] += 1
-                            try:
-                                message_relance = DefaultModeleRelance.objects.get(metier=metier).message
-                            except DefaultModeleRelance.DoesNotExist:
-                                blocked_at['default_modele_relance_not_found'] += 1
-                                continue
-
-                        if not message_relance:
-                            blocked_at['message_empty'] += 1
-                            continue
-
-                        already_sent_today = GmailConversationEvent.objects.filter(
-                            conversation=conversation,
-                            event_type="reminder_sent",
-                            created_at__date=today,
-                        ).exists()
-                        if already_sent_today:
-                            continue
-
-                        result = send_conversation_reminder(
-                            conversation=conversation,
-                            user=user,
-                            body=message_relance,
-                            source="automatic",
-                        )
-
-                        if result['success']:
-                            blocked_at['sent_successfully'] += 1
-                            relances_envoyees += 1
-                        else:
-                            blocked_at['send_failed'] += 1
-                            erreurs += 1
-
-                    except Exception as exc:
-                        GmailConversationEvent.objects.create(
-                            conversation=conversation,
-                            event_type="error",
-                            user=user,
-                            note=str(exc),
-                        )
-                        traceback.print_exc()
-                        erreurs += 1
-                        continue
+        if mode == "threads":
+            max_workers = max(1, getattr(settings, "GMAIL_RELANCE_THREADS", 4))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_process_user_auto_relances_in_thread, user_ids))
+        else:
+            results = [_process_user_auto_relances(user_id) for user_id in user_ids]
 
-            except Exception as e:
-                print(f"   Erreur pour {user.username} : {e}")
-                traceback.print_exc()
-                continue
-
-        return {
-            'success': True,
-            'emails_traites': emails_traites,
-            'relances_envoyees': relances_envoyees,
-            'erreurs': erreurs,
-            'debug': blocked_at
-        }
+        return merge_auto_relance_results(results)
 
     except Exception as e:
         traceback.print_exc()
@@ -201,24 +397,35 @@ def check_and_send_auto_relances():
         }
 
 
-@shared_task
-def check_and_send_activite_reminders():
-    """
-    Tâche périodique qui vérifie les activités et envoie les rappels configurés
-    sans doublon.
+def _due_activite_reminders(today):
     """
-    logger.info("\n" + "=" * 60)
-    logger.info("DÉBUT - Vérification des rappels d'activités")
-    logger.info("=" * 60)
+    Rappels actifs dont l'échéance tombe aujourd'hui.
 
-    today = timezone.localdate()
-    logger.info(f"Date actuelle : {today}")
-
-    planned_reminders = list(
-        RappelActivite.objects.filter(
-            is_active=True,
-            activite__date__isnull=False,
+    Chaque décalage (timing, days) distinct devient une plage sur
+    activite.date : le filtrage se fait en SQL et s'appuie sur l'index de
+    activite.date au lieu de parcourir tous les rappels en Python.
+    """
+    offsets = set(
+        RappelActivite.objects.filter(is_active=True).values_list("timing", "days").distinct()
+    )
+    if not offsets:
+        return []
+
+    due = Q()
+    for timing, days in offsets:
+        signed_days = days if timing == "before" else -days
+        jour = today + timedelta(days=signed_days)
+        due |= Q(
+            timing=timing,
+            days=days,
+            activite__date__gte=timezone.make_aware(datetime.combine(jour, time.min)),
+            activite__date__lt=timezone.make_aware(
+                datetime.combine(jour + timedelta(days=1), time.min)
+            ),
         )
+
+    return list(
+        RappelActivite.objects.filter(due, is_active=True)
         .exclude(activite__statut__in=["done", "cancelled"])
         .select_related(
             "activite",
@@ -229,8 +436,66 @@ def check_and_send_activite_reminders():
         )
         .order_by("activite__date", "timing", "days")
     )
-    if not planned_reminders:
-        logger.info("Aucun rappel individuel actif.")
+
+
+def _activite_reminder_recipient(activite):
+    if activite.responsable and activite.responsable.email:
+        return activite.responsable.email
+    if activite.created_by and activite.created_by.email:
+        return activite.created_by.email
+    return getattr(settings, "EMAIL_HOST_USER", "") or os.getenv("EMAIL_HOST_USER", "")
+
+
+def _activite_reminder_message(activite, rule):
+    date_activite = timezone.localtime(activite.date).date()
+    if rule.days == 0:
+        echeance_label = "aujourd'hui"
+    elif rule.timing == "before":
+        echeance_label = f"dans {rule.days} jour(s)"
+    else:
+        echeance_label = f"échue depuis {rule.days} jour(s)"
+
+    message = f"""Bonjour,
+
+Ceci est un rappel automatique concernant l'activité suivante :
+
+- Titre : {activite.titre or activite.type}
+- Dossier : {activite.dossier}
+- Type : {activite.type}
+- Statut : {activite.get_statut_display()}
+- Priorité : {activite.get_priorite_display()}
+- Date prévue : {date_activite.strftime('%d/%m/%Y')} à {timezone.localtime(activite.date).strftime('%H:%M')}
+- Créneau : {activite.get_duree_minutes_display()}
+- Échéance : {echeance_label}
+
+"""
+
+    if activite.commentaire:
+        message += f"Commentaire : {activite.commentaire}\n\n"
+
+    message += """Merci de prendre les dispositions nécessaires.
+
+Cordialement,
+Système de rappel Benjamin Immobilier"""
+    return message
+
+
+@shared_task
+def check_and_send_activite_reminders():
+    """
+    Tâche périodique qui vérifie les activités et envoie les rappels configurés
+    sans doublon.
+    """
+    logger.info("\n" + "=" * 60)
+    logger.info("DÉBUT - Vérification des rappels d'activités")
+    logger.info("=" * 60)
+
+    today = timezone.localdate()
+    logger.info(f"Date actuelle : {today}")
+
+    due_reminders = _due_activite_reminders(today)
+    if not due_reminders:
+        logger.info("Aucun rappel individuel à envoyer aujourd'hui.")
         return {
             'success': True,
             'activites_traitees': 0,
@@ -239,142 +504,103 @@ def check_and_send_activite_reminders():
             'erreurs': 0,
         }
 
-    logger.info(f"Rappels individuels actifs : {len(planned_reminders)}")
+    logger.info(f"Rappels individuels à échéance : {len(due_reminders)}")
 
-    activites_traitees = 0
+    activites_traitees = len({reminder.activite_id for reminder in due_reminders})
     rappels_envoyes = 0
     doublons_ignores = 0
     erreurs = 0
 
-    processed_activity_ids = set()
-    for reminder in planned_reminders:
-        activite = reminder.activite
+    already_sent = set(
+        HistoriqueRappelActivite.objects.filter(
+            activite_id__in={reminder.activite_id for reminder in due_reminders},
+            canal="email",
+            statut="sent",
+        ).values_list("activite_id", "destinataire", "jours_avant_echeance", "date_echeance")
+    )
+
+    historique = []
+    from_email = getattr(settings, "EMAIL_HOST_USER", "") or os.getenv("EMAIL_HOST_USER")
+    # Une seule connexion SMTP pour tous les rappels du passage. L'historique
+    # est écrit dans le finally : un rappel parti n'est jamais renvoyé au
+    # passage suivant, même si la tâche s'interrompt en cours de route.
+    smtp_connection = get_connection()
+    try:
+        connection_error = ""
         try:
-            if activite.pk not in processed_activity_ids:
-                activites_traitees += 1
-                processed_activity_ids.add(activite.pk)
-
-            date_activite = timezone.localtime(activite.date).date()
-            jours_restants = (date_activite - today).days
-
-            logger.info(f"\n Activité #{activite.id}")
-            logger.info(f"   Dossier: {activite.dossier}")
-            logger.info(f"   Type: {activite.type}")
-            logger.info(f"   Date: {date_activite}")
-            logger.info(f"   Jours restants: {jours_restants}")
-
-            matches_today = (
-                reminder.timing == "before" and jours_restants == reminder.days
-            ) or (
-                reminder.timing == "after" and jours_restants == -reminder.days
-            )
-            if not matches_today:
-                logger.info("   Pas de rappel configuré pour cette échéance")
-                continue
+            smtp_connection.open()
+        except Exception as e:
+            logger.error(f"Connexion SMTP impossible : {e}")
+            connection_error = str(e)
 
-            for rule in [reminder]:
-                recipient_email = ""
-                if activite.responsable and activite.responsable.email:
-                    recipient_email = activite.responsable.email
-                elif activite.created_by and activite.created_by.email:
-                    recipient_email = activite.created_by.email
-                else:
-                    recipient_email = getattr(settings, "EMAIL_HOST_USER", "") or os.getenv("EMAIL_HOST_USER", "")
+        for rule in due_reminders:
+            activite = rule.activite
+            logger.info(f"\n Activité #{activite.id} - {rule.label}")
 
+            try:
+                recipient_email = _activite_reminder_recipient(activite)
                 if not recipient_email:
                     logger.warning("   Aucun destinataire email disponible")
                     continue
 
-                email_already_sent = HistoriqueRappelActivite.objects.filter(
-                    activite=activite,
-                    canal="email",
-                    destinataire=recipient_email,
-                    jours_avant_echeance=rule.signed_days,
-                    date_echeance=activite.date,
-                    statut="sent",
-                ).exists()
-                if email_already_sent:
+                key = (activite.pk, recipient_email, rule.signed_days, activite.date)
+                if key in already_sent:
                     doublons_ignores += 1
                     logger.info("   Rappel déjà envoyé, doublon ignoré")
                     continue
 
                 objet = f"Rappel d'activité - {rule.label}"
-                if rule.days == 0:
-                    echeance_label = "aujourd'hui"
-                elif rule.timing == "before":
-                    echeance_label = f"dans {rule.days} jour(s)"
-                else:
-                    echeance_label = f"échue depuis {rule.days} jour(s)"
-
-                message = f"""Bonjour,
-
-Ceci est un rappel automatique concernant l'activité suivante :
-
-- Titre : {activite.titre or activite.type}
-- Dossier : {activite.dossier}
-- Type : {activite.type}
-- Statut : {activite.get_statut_display()}
-- Priorité : {activite.get_priorite_display()}
-- Date prévue : {date_activite.strftime('%d/%m/%Y')} à {timezone.localtime(activite.date).strftime('%H:%M')}
-- Créneau : {activite.get_duree_minutes_display()}
-- Échéance : {echeance_label}
-
-"""
-
-                if activite.commentaire:
-                    message += f"Commentaire : {activite.commentaire}\n\n"
-
-                message += """Merci de prendre les dispositions nécessaires.
+                message = _activite_reminder_message(activite, rule)
+            except Exception as e:
+                logger.error(f"   Erreur de préparation du rappel : {e}")
+                erreurs += 1
+                continue
 
-Cordialement,
-Système de rappel Benjamin Immobilier"""
+            entry = HistoriqueRappelActivite(
+                activite=activite,
+                canal="email",
+                destinataire=recipient_email,
+                jours_avant_echeance=rule.signed_days,
+                date_echeance=activite.date,
+                objet=objet,
+                contenu=message,
+                statut="sent",
+                erreur="",
+            )
+            historique.append(entry)
 
-                try:
-                    email = EmailMessage(
-                        subject=objet,
-                        body=message,
-                        from_email=getattr(settings, "EMAIL_HOST_USER", "") or os.getenv("EMAIL_HOST_USER"),
-                        to=[recipient_email],
-                    )
-
-                    email.send()
-                    HistoriqueRappelActivite.objects.update_or_create(
-                        activite=activite,
-                        canal="email",
-                        destinataire=recipient_email,
-                        jours_avant_echeance=rule.signed_days,
-                        date_echeance=activite.date,
-                        defaults={
-                            "objet": objet,
-                            "contenu": message,
-                            "statut": "sent",
-                            "erreur": "",
-                        },
-                    )
-                    rappels_envoyes += 1
-                    logger.info("   Rappel envoyé avec succès")
-                except Exception as e:
-                    logger.error(f"   Erreur envoi email : {e}")
-                    erreurs += 1
-                    HistoriqueRappelActivite.objects.update_or_create(
-                        activite=activite,
-                        canal="email",
-                        destinataire=recipient_email,
-                        jours_avant_echeance=rule.signed_days,
-                        date_echeance=activite.date,
-                        defaults={
-                            "objet": objet,
-                            "contenu": message,
-                            "statut": "failed",
-                            "erreur": str(e),
-                        },
-                    )
+            if connection_error:
+                erreurs += 1
+                entry.statut = "failed"
+                entry.erreur = connection_error
+                continue
 
+            try:
+                EmailMessage(
+                    subject=objet,
+                    body=message,
+                    from_email=from_email,
+                    to=[recipient_email],
+                    connection=smtp_connection,
+                ).send()
+                rappels_envoyes += 1
+                logger.info("   Rappel envoyé avec succès")
+            except Exception as e:
+                logger.error(f"   Erreur envoi email : {e}")
+                erreurs += 1
+                entry.statut = "failed"
+                entry.erreur = str(e)
+    finally:
+        try:
+            smtp_connection.close()
         except Exception as e:
-            erreurs += 1
-            logger.error(f"Erreur traitement activité {activite.id}: {e}")
-            traceback.print_exc()
-            continue
+            logger.error(f"Fermeture de la connexion SMTP : {e}")
+        HistoriqueRappelActivite.objects.bulk_create(
+            historique,
+            update_conflicts=True,
+            unique_fields=["activite", "canal", "destinataire", "jours_avant_echeance", "date_echeance"],
+            update_fields=["objet", "contenu", "statut", "erreur"],
+        )
 
     logger.info("\n" + "=" * 60)
     logger.info("FIN - Rappels d'activités")
@@ -391,3 +617,16 @@ Système de rappel Benjamin Immobilier"""
         'doublons_ignores': doublons_ignores,
         'erreurs': erreurs,
     }
+
+
+@shared_task
+def run_export_job(job_id):
+    """Rend un export XLSX / PDF demandé depuis l'interface."""
+    job = render_export_job(job_id)
+    return {'success': job.status == "done", 'job_id': job.pk, 'status': job.status}
+
+
+@shared_task
+def purge_old_export_jobs():
+    """Supprime les exports arrivés au terme de leur rétention."""
+    return {'success': True, 'supprimes': purge_export_jobs()}
@@ -15,16 +15,17 @@ from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
-from openpyxl import Workbook, load_workbook
+from openpyxl import load_workbook
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
+from config.xlsx_export import EXPORT_CHUNK_SIZE, xlsx_streaming_response
 from invoices.models import Facture, Societe
 from technique.models import TechnicalProject, TechnicalProjectHistory
-from user_access.user_test_functions import has_administratif_access
+from user_access.user_test_functions import get_permission_snapshot, has_administratif_access
 
 from .email_manager import (
     create_outlook_event,
@@ -271,8 +272,12 @@ def _import_amount_value(value):
 
 
 def _admin_project_queryset_from_request(request):
+    return _admin_project_queryset(request.GET.get("q"))
+
+
+def _admin_project_queryset(q=""):
     queryset = TechnicalProject.objects.filter(archived_at__isnull=True).select_related("categorie").order_by("reference")
-    q = (request.GET.get("q") or "").strip()
+    q = (q or "").strip()
     if q:
         queryset = queryset.filter(
             Q(reference__icontains=q)
@@ -308,21 +313,13 @@ def _admin_project_export_row(project, columns):
     return row
 
 
-def _size_admin_project_sheet(sheet):
-    for column_cells in sheet.columns:
-        max_length = max(len(str(cell.value or "")) for cell in column_cells)
-        sheet.column_dimensions[column_cells[0].column_letter].width = min(max(max_length + 2, 12), 42)
-
-
-def _append_admin_project_sheet(workbook, title, queryset, use_active=False):
-    sheet = workbook.active if use_active else workbook.create_sheet(title=title)
-    sheet.title = title
+def _admin_project_sheet(title, queryset):
     columns = _admin_project_export_columns()
-    sheet.append([label for label, _ in columns])
-    for project in queryset:
-        sheet.append(_admin_project_export_row(project, columns))
-    _size_admin_project_sheet(sheet)
-    return sheet
+    rows = (
+        _admin_project_export_row(project, columns)
+        for project in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return title, [label for label, _ in columns], rows
 
 
 def _admin_project_pdf_paragraph(value, style):
@@ -584,7 +581,7 @@ def _can_archive_admin_dossier(user):
         user
         and (
             user.is_superuser
-            or user.groups.filter(name="CEO").exists()
+            or get_permission_snapshot(user).in_group("CEO")
         )
     )
 
@@ -1710,29 +1707,19 @@ def admin_dossiers_view(request):
 @user_passes_test(has_administratif_access, login_url="/", redirect_field_name=None)
 def admin_dossiers_export_view(request):
     queryset = _admin_project_queryset_from_request(request)
-
-    workbook = Workbook()
-    _append_admin_project_sheet(
-        workbook,
-        ADMIN_PROJECT_PROMOTION_SHEET,
-        queryset.filter(activite_metier="promotion_immobiliere"),
-        use_active=True,
-    )
-    _append_admin_project_sheet(
-        workbook,
-        ADMIN_PROJECT_OTHER_SHEET,
-        queryset.exclude(activite_metier="promotion_immobiliere"),
-    )
-
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    response = HttpResponse(
-        output.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    return xlsx_streaming_response(
+        "dossiers_administratifs.xlsx",
+        [
+            _admin_project_sheet(
+                ADMIN_PROJECT_PROMOTION_SHEET,
+                queryset.filter(activite_metier="promotion_immobiliere"),
+            ),
+            _admin_project_sheet(
+                ADMIN_PROJECT_OTHER_SHEET,
+                queryset.exclude(activite_metier="promotion_immobiliere"),
+            ),
+        ],
     )
-    response["Content-Disposition"] = 'attachment; filename="dossiers_administratifs.xlsx"'
-    return response
 
 
 @login_required
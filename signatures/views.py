@@ -34,6 +34,7 @@ from user_access.user_test_functions import (
     has_administratif_access,
     has_all_poles_access,
     has_ceo_access,
+    get_permission_snapshot,
 )
 
 
@@ -55,7 +56,7 @@ SIGNATURE_MENTION_MAX_LENGTH = 160
 
 
 def _has_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return get_permission_snapshot(user).in_group(group_name)
 
 
 def _can_manage_signature_assets(user):
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import (
     DocumentTechnique,
+    EmailAffinity,
     TechnicalEmail,
     TechnicalEmailAttachment,
     TechnicalProject,
@@ -104,3 +105,11 @@ class TechnicalEmailAttachmentAdmin(admin.ModelAdmin):
     )
     list_filter = ("processing_status", "content_type", "processed_at")
     search_fields = ("original_name", "email__subject", "processing_error")
+
+
+@admin.register(EmailAffinity)
+class EmailAffinityAdmin(admin.ModelAdmin):
+    list_display = ("kind", "key", "project", "count", "updated_at")
+    list_filter = ("kind",)
+    search_fields = ("key", "project__reference", "project__name")
+    raw_id_fields = ("project",)
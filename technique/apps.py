@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TechniqueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'technique'
+
+    def ready(self):
+        from . import chunk_index_signals  # noqa: F401
@@ -0,0 +1,60 @@
+"""
+Tient l'index des passages du chatbot (technique.services.chunk_index) à jour
+quand un document technique ou le dossier qui le porte est modifié : le titre,
+la référence et le nom du dossier sont indexés avec chaque passage. La
+réindexation est mise en file après la transaction (enqueue_document_indexing). Les mises
+à jour en masse (queryset.update, bulk_create) ne passent pas par ces signaux :
+lancer alors `python manage.py rebuild_chunk_index`.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from technique.models import DocumentTechnique, TechnicalProject
+from technique.services.chunk_index import enqueue_document_indexing
+
+DOCUMENT_INDEXED_FIELDS = {"titre", "project", "project_id", "resume", "texte_brut"}
+PROJECT_INDEXED_FIELDS = ("reference", "name")
+
+
+def reindex_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not DOCUMENT_INDEXED_FIELDS & set(update_fields):
+        return
+    enqueue_document_indexing([instance.pk])
+
+
+def remember_project_header(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Relève la référence et le nom enregistrés avant la sauvegarde du dossier."""
+    instance._chunk_index_header = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not set(PROJECT_INDEXED_FIELDS) & set(update_fields):
+        return
+    instance._chunk_index_header = (
+        TechnicalProject.objects.filter(pk=instance.pk).values_list(*PROJECT_INDEXED_FIELDS).first()
+    )
+
+
+def reindex_project_documents(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    previous = getattr(instance, "_chunk_index_header", None)
+    if previous is None or previous == tuple(getattr(instance, field) for field in PROJECT_INDEXED_FIELDS):
+        return
+    enqueue_document_indexing(instance.documents.values_list("pk", flat=True))
+
+
+def remember_project_documents(sender, instance, **kwargs):
+    # Le détachement des documents (SET_NULL) passe par un UPDATE, sans signal
+    instance._chunk_index_documents = list(instance.documents.values_list("pk", flat=True))
+
+
+def reindex_detached_documents(sender, instance, **kwargs):
+    enqueue_document_indexing(getattr(instance, "_chunk_index_documents", []))
+
+
+post_save.connect(reindex_document, sender=DocumentTechnique, dispatch_uid="chunk_index_document_save")
+pre_save.connect(remember_project_header, sender=TechnicalProject, dispatch_uid="chunk_index_project_pre_save")
+post_save.connect(reindex_project_documents, sender=TechnicalProject, dispatch_uid="chunk_index_project_save")
+pre_delete.connect(remember_project_documents, sender=TechnicalProject, dispatch_uid="chunk_index_project_pre_delete")
+post_delete.connect(reindex_detached_documents, sender=TechnicalProject, dispatch_uid="chunk_index_project_delete")
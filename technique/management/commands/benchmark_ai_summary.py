@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from chatbot.groq_stub import GroqStubServer
+from technique.services import ai_summary
+
+# Pause fixe qui séparait les extraits avant le limiteur partagé
+LEGACY_SLEEP_BETWEEN_CHUNKS = 5.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la durée du résumé d'un long document contre un faux serveur Groq local : "
+        "extraits traités un par un, puis en parallèle sous le limiteur de débit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunks", type=int, default=40)
+        parser.add_argument("--latency", type=float, default=0.5, help="Latence simulée par appel (s).")
+        parser.add_argument("--rpm", type=int, default=120, help="Quota du serveur et du limiteur.")
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        texte = "".join(
+            f"Extrait {index} " + "clause " * (ai_summary.CHUNK_SIZE_CHARS // 7)
+            for index in range(options["chunks"])
+        )[: options["chunks"] * ai_summary.CHUNK_SIZE_CHARS]
+
+        sequential = self._run(texte, options, workers=1)
+        concurrent = self._run(texte, options, workers=options["workers"])
+        legacy = sequential + (options["chunks"] - 1) * LEGACY_SLEEP_BETWEEN_CHUNKS
+        self.stdout.write(
+            f"{options['chunks']} extraits, latence {options['latency']} s, quota {options['rpm']} req/min"
+        )
+        self.stdout.write(f"  ancien (séquentiel + pauses de {LEGACY_SLEEP_BETWEEN_CHUNKS:g} s, estimé) : {legacy:.1f} s")
+        self.stdout.write(f"  séquentiel sans pause : {sequential:.1f} s")
+        self.stdout.write(self.style.SUCCESS(
+            f"  {options['workers']} threads + limiteur : {concurrent:.1f} s"
+        ))
+
+    def _run(self, texte, options, workers):
+        # Le client LLM et le limiteur sont recréés à chaque changement de settings
+        with (
+            GroqStubServer(latency=options["latency"], requests_per_minute=options["rpm"]) as stub,
+            override_settings(
+                LLM_API_URL=stub.url,
+                AI_SUMMARY_MAX_WORKERS=workers,
+                GROQ_REQUESTS_PER_MINUTE=options["rpm"],
+                LLM_CACHE_ENABLED=False,
+            ),
+        ):
+            start = time.perf_counter()
+            result = ai_summary.summarize_document(texte)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"[{workers} thread(s)] {stub.calls} appel(s), {stub.rejected} refus 429, "
+                f"{stub.max_in_flight} en parallèle au plus, résumé de {len(result['resume'])} caractères"
+            )
+        return elapsed
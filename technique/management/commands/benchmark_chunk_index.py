@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from technique.models import DocumentTechnique
+from technique.services.chunk_index import index_document, search_chunks
+
+VOCABULARY = (
+    "acte acquéreur avenant bail bénéficiaire cadastre charpente clause compromis condition "
+    "copropriété délai dépôt diagnostic échéance étanchéité façade financement garantie indemnité "
+    "lot mandat notaire parcelle pénalité permis plomberie prêt promesse réception réitération "
+    "servitude signature suspensive toiture urbanisme vendeur versement"
+).split()
+
+QUESTIONS = [
+    "Quelle est la pénalité de retard pour la réception de la toiture ?",
+    "Délai de réitération de la promesse",
+    "servitude cadastre parcelle",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence du RAG (index BM25 par passages) face à l'ancien filtre icontains "
+        "sur un corpus généré. Les données sont créées dans une transaction annulée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=10000)
+        parser.add_argument("--words", type=int, default=400, help="Mots par document.")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            self._seed(options["documents"], options["words"])
+            self.stdout.write(
+                f"{options['documents']} document(s) générés et indexés en "
+                f"{time.perf_counter() - start:.1f} s (base {connection.vendor})"
+            )
+            for question in QUESTIONS:
+                legacy_ms = self._timed(lambda: self._legacy_search(question), options["repeat"])
+                bm25_ms = self._timed(lambda: search_chunks(question), options["repeat"])
+                self.stdout.write(f"{question!r} : icontains {legacy_ms:.1f} ms, BM25 {bm25_ms:.1f} ms")
+            transaction.set_rollback(True)
+
+    def _timed(self, run, repeat):
+        run()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def _legacy_search(self, question):
+        """Filtre de l'ancien _build_rag_context."""
+        words = [word for word in question.lower().split() if len(word) > 3][:6]
+        q_filter = Q()
+        for word in words:
+            q_filter |= Q(resume__icontains=word) | Q(texte_brut__icontains=word) | Q(titre__icontains=word)
+        return list(DocumentTechnique.objects.filter(q_filter).order_by("-created_at")[:4])
+
+    def _seed(self, count, words):
+        generator = random.Random(42)
+        # Vocabulaire de remplissage à distribution de Zipf, termes métier plus rares
+        filler = [f"terme{index}" for index in range(5000)]
+        vocabulary = filler + VOCABULARY
+        weights = [1 / (rank + 1) for rank in range(len(filler))] + [0.002] * len(VOCABULARY)
+        documents = DocumentTechnique.objects.bulk_create(
+            DocumentTechnique(
+                titre=f"Document benchmark {index}",
+                fichier="bench.pdf",
+                texte_brut=" ".join(generator.choices(vocabulary, weights=weights, k=words)),
+            )
+            for index in range(count)
+        )
+        for document in documents:
+            index_document(document)
@@ -0,0 +1,177 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from technique.models import EmailAffinity, TechnicalEmail, TechnicalProject
+from technique.services.ai_classify import (
+    MAX_PROJECTS_IN_PROMPT,
+    build_project_catalog,
+    project_prompt_block,
+    prompt_projects,
+)
+from technique.services.project_ranking import clear_winner
+
+STREETS = (
+    "Lilas Tilleuls Peupliers Acacias Marronniers Platanes Glycines Hortensias Magnolias "
+    "Cerisiers Mimosas Orangers Oliviers Pins Saules Sorbiers Érables Chênes Bouleaux Cèdres"
+).split()
+CITIES = (
+    "Lyon Villeurbanne Vénissieux Bron Caluire Écully Oullins Vaulx-en-Velin Meyzieu Rillieux "
+    "Tassin Givors Décines Saint-Priest Francheville Craponne"
+).split()
+SURNAMES = (
+    "Martin Bernard Dubois Thomas Robert Richard Petit Durand Leroy Moreau Simon Laurent "
+    "Lefebvre Michel Garcia David Bertrand Roux Vincent Fournier Morel Girard André Mercier"
+).split()
+FILLER = (
+    "Bonjour, veuillez trouver ci-joint les éléments demandés. Le rendez-vous de chantier est "
+    "confirmé pour la semaine prochaine, merci de nous transmettre les diagnostics et l'avenant "
+    "signé. Nous restons à votre disposition. Cordialement."
+)
+# Sujets des emails sans dossier identifiable
+NOISE_SUBJECTS = (
+    "Newsletter du mois", "Invitation salon de l'immobilier", "Facture hébergement",
+    "Mise à jour des conditions générales", "Relance cotisation",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la précision et la latence du pré-classement local des emails sur un jeu "
+        "étiqueté généré, face à l'ancien prompt (30 premiers dossiers par référence). "
+        "Les données sont créées dans une transaction annulée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=300)
+        parser.add_argument("--emails", type=int, default=500)
+        parser.add_argument(
+            "--llm-latency", type=float, default=1.5,
+            help="Durée estimée d'un appel Groq (s), pour la durée totale.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            generator = random.Random(42)
+            projects, known_senders = self._seed_projects(generator, options["projects"])
+            emails = self._labeled_emails(generator, projects, known_senders, options["emails"])
+
+            start = time.perf_counter()
+            catalog = build_project_catalog(
+                TechnicalProject.objects.filter(archived_at__isnull=True).order_by("reference")
+            )
+            build_ms = (time.perf_counter() - start) * 1000
+            self._report(catalog, emails, build_ms, options)
+            transaction.set_rollback(True)
+
+    def _report(self, catalog, emails, build_ms, options):
+        limit = settings.EMAIL_CLASSIFY_CANDIDATES
+        legacy_ids = {project.id for project in catalog.projects[:MAX_PROJECTS_IN_PROMPT]}
+        legacy_chars = len(project_prompt_block(catalog.projects[:MAX_PROJECTS_IN_PROMPT]))
+
+        latencies = []
+        top1 = recall = legacy_recall = shortcuts = shortcut_hits = 0
+        prompt_chars = []
+        labeled = [(email, expected) for email, expected in emails if expected]
+        for email, expected in emails:
+            start = time.perf_counter()
+            candidates = catalog.index.rank(email, limit=limit)
+            winner = clear_winner(candidates)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            ids = [candidate.project.id for candidate in candidates]
+            prompt = prompt_projects(candidates, catalog)
+            if winner:
+                shortcuts += 1
+                shortcut_hits += winner.project.id == expected
+            else:
+                prompt_chars.append(len(project_prompt_block(prompt)))
+            if expected:
+                top1 += bool(ids) and ids[0] == expected
+                recall += (winner.project.id if winner else None) == expected or expected in {p.id for p in prompt}
+                legacy_recall += expected in legacy_ids
+
+        count = len(emails)
+        llm_calls = count - shortcuts
+        self.stdout.write(
+            f"{len(catalog.projects)} dossier(s), {count} email(s) dont {len(labeled)} étiqueté(s) ; "
+            f"index construit en {build_ms:.0f} ms"
+        )
+        self.stdout.write(
+            f"  pré-classement : {statistics.mean(latencies):.2f} ms/email en moyenne, "
+            f"{max(latencies):.2f} ms au plus"
+        )
+        self.stdout.write(
+            f"  bon dossier en tête : {_percent(top1, len(labeled))}, "
+            f"dans le prompt (ou classé sans LLM) : {_percent(recall, len(labeled))} "
+            f"(ancien prompt, 30 premiers dossiers : {_percent(legacy_recall, len(labeled))})"
+        )
+        self.stdout.write(
+            f"  classés sans LLM : {_percent(shortcuts, count)}, "
+            f"dont corrects : {_percent(shortcut_hits, shortcuts)}"
+        )
+        average_chars = statistics.mean(prompt_chars) if prompt_chars else 0
+        self.stdout.write(
+            f"  bloc projets du prompt : {average_chars:.0f} caractères en moyenne (ancien : {legacy_chars})"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"  appels Groq : {llm_calls} au lieu de {count}, soit ~{llm_calls * options['llm_latency']:.0f} s "
+            f"au lieu de ~{count * options['llm_latency']:.0f} s à {options['llm_latency']:g} s par appel"
+        ))
+
+    def _seed_projects(self, generator, count):
+        projects = TechnicalProject.objects.bulk_create(
+            TechnicalProject(
+                reference=f"BENCH-{index:04d}",
+                name=f"Résidence {generator.choice(STREETS)} {generator.choice(CITIES)}",
+                affaire=f"{generator.choice(SURNAMES)} / {generator.choice(SURNAMES)}",
+                adresse_bien=(
+                    f"{generator.randint(1, 90)} rue des {generator.choice(STREETS)}, "
+                    f"{69000 + generator.randint(1, 99)} {generator.choice(CITIES)}"
+                ),
+            )
+            for index in range(count)
+        )
+        # Historique d'expéditeurs : un dossier sur trois a un interlocuteur attitré
+        known_senders = {project.pk for project in projects[::3]}
+        EmailAffinity.objects.bulk_create(
+            EmailAffinity(kind="sender", key=f"notaire{project.pk}@example.com", project=project, count=1)
+            for project in projects[::3]
+        )
+        return projects, known_senders
+
+    def _labeled_emails(self, generator, projects, known_senders, count):
+        """Emails non enregistrés, chacun avec le dossier attendu (None pour le bruit)."""
+        emails = []
+        for _ in range(count):
+            project = generator.choice(projects)
+            kind = generator.choice(("reference", "name", "address", "sender", "noise"))
+            sender = "contact@example.com"
+            subject, mention = "Suivi du dossier", ""
+            if kind == "reference":
+                subject = f"Re: {project.reference.replace('-', ' ')} - compromis"
+            elif kind == "name":
+                mention = f"Concernant la {project.name}, "
+            elif kind == "address":
+                mention = f"Pour le bien situé {project.adresse_bien}, "
+            elif kind == "sender" and project.pk in known_senders:
+                sender = f"notaire{project.pk}@example.com"
+            elif kind == "noise":
+                subject = generator.choice(NOISE_SUBJECTS)
+                project = None
+            else:
+                # Expéditeur sans historique et sans indice : non classable
+                project = None
+            emails.append((
+                TechnicalEmail(subject=subject, sender=sender, body=f"{mention}{FILLER}"),
+                project.pk if project else None,
+            ))
+        return emails
+
+
+def _percent(part, total):
+    return f"{100 * part / total:.0f} %" if total else "n/a"
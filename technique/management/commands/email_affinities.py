@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from technique.services.email_affinity import affinity_stats, rebuild_affinities
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche les règles d'affinité des emails (fil, expéditeur, domaine → dossier) et la part "
+        "des emails non classés qu'elles résolvent sans appel au LLM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Recalcule les règles depuis tous les emails classés."
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            self.stdout.write(f"{rebuild_affinities()} association(s) recalculée(s).")
+
+        stats = affinity_stats()
+        rules = stats["rules"]
+        self.stdout.write(
+            f"{rules['thread']} fil(s), {rules['sender']} expéditeur(s), {rules['domain']} domaine(s) associés."
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['resolvable']} email(s) non classé(s) sur {stats['unassigned']} résolus par les règles "
+            f"({stats['llm_avoided_rate']:.0%} d'appels LLM évités)."
+        ))
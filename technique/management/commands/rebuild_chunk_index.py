@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from technique.services.chunk_index import rebuild_chunk_index
+
+
+class Command(BaseCommand):
+    help = "Redécoupe tous les documents techniques en passages et reconstruit l'index BM25 du chatbot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        documents, passages = rebuild_chunk_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{documents} document(s) indexé(s), {passages} passage(s)."
+        ))
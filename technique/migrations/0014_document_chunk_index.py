@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('technique', '0013_technicalproject_societe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='technique.documenttechnique')),
+            ],
+            options={
+                'db_table': 'document_technique_chunk',
+                'ordering': ['document_id', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChunkTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='technique.documentchunk')),
+            ],
+            options={
+                'db_table': 'document_technique_chunk_term',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentchunk',
+            constraint=models.UniqueConstraint(fields=('document', 'position'), name='document_chunk_unique_position'),
+        ),
+        migrations.AddIndex(
+            model_name='chunkterm',
+            index=models.Index(fields=['term', 'chunk'], name='chunk_term_lookup_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('technique', '0014_document_chunk_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailClassificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('cancelled', 'Annulé'), ('failed', 'Échec')], default='pending', max_length=20, verbose_name='Statut')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Emails à traiter')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Emails traités')),
+                ('classified', models.PositiveIntegerField(default=0, verbose_name='Classés')),
+                ('pending', models.PositiveIntegerField(default=0, verbose_name='À valider')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Non attribués')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Erreurs')),
+                ('attachment_processing_launched', models.PositiveIntegerField(default=0, verbose_name='Pièces jointes lancées')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Annulation demandée')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_classification_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'db_table': 'technical_email_classification_job',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['requested_by', 'status'], name='email_classif_job_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('technique', '0015_email_classification_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailclassificationjob',
+            name='llm_calls',
+            field=models.PositiveIntegerField(default=0, verbose_name='Appels LLM'),
+        ),
+        migrations.AddField(
+            model_name='emailclassificationjob',
+            name='resolved_without_llm',
+            field=models.PositiveIntegerField(default=0, verbose_name='Résolus sans LLM'),
+        ),
+        migrations.CreateModel(
+            name='EmailAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('thread', 'Fil de discussion'), ('sender', 'Expéditeur'), ('domain', 'Domaine')], max_length=10, verbose_name='Type')),
+                ('key', models.CharField(max_length=255, verbose_name='Clé')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Emails classés')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_affinities', to='technique.technicalproject', verbose_name='Dossier')),
+            ],
+            options={
+                'db_table': 'technical_email_affinity',
+                'ordering': ['kind', 'key', '-count'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key', 'project'), name='email_affinity_unique')],
+            },
+        ),
+    ]
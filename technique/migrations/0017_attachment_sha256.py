@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('technique', '0016_email_affinity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='technicalemailattachment',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256'),
+        ),
+    ]
@@ -55,6 +55,55 @@ class DocumentTechnique(models.Model):
         return f"{self.titre} ({self.project or 'Sans dossier'})"
 
 
+class DocumentChunk(models.Model):
+    """
+    Passage d'un document technique, indexé pour la recherche BM25 du chatbot
+    (voir technique.services.chunk_index).
+
+    Attributes:
+        document (ForeignKey): Document découpé
+        position (int): Rang du passage dans le document (0 = résumé s'il existe)
+        text (str): Texte du passage, tel qu'injecté dans le prompt
+        length (int): Nombre de termes indexés du passage
+    """
+    document = models.ForeignKey(
+        DocumentTechnique,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+    )
+    position = models.PositiveIntegerField()
+    text = models.TextField()
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "document_technique_chunk"
+        ordering = ["document_id", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "position"], name="document_chunk_unique_position"),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} #{self.position}"
+
+
+class ChunkTerm(models.Model):
+    """
+    Entrée de l'index inversé : fréquence d'un terme dans un passage.
+    """
+    chunk = models.ForeignKey(DocumentChunk, on_delete=models.CASCADE, related_name="terms")
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "document_technique_chunk_term"
+        indexes = [
+            models.Index(fields=["term", "chunk"], name="chunk_term_lookup_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.frequency})"
+
+
 class TechnicalProject(models.Model):
     """
     Modèle représentant un dossier du pôle technique
@@ -500,6 +549,8 @@ class TechnicalEmailAttachment(models.Model):
     original_name = models.CharField("Nom d'origine", max_length=255)
     content_type = models.CharField("Type MIME", max_length=150, blank=True)
     size = models.PositiveIntegerField("Taille", default=0)
+    # Empreinte du contenu : une pièce déjà reçue par l'utilisateur réutilise le fichier stocké
+    sha256 = models.CharField("SHA-256", max_length=64, blank=True, db_index=True)
     extracted_text = models.TextField("Texte extrait", blank=True)
     linked_document = models.ForeignKey(
         "DocumentTechnique", null=True, blank=True, on_delete=models.SET_NULL,
@@ -521,3 +572,98 @@ class TechnicalEmailAttachment(models.Model):
 
     def __str__(self):
         return self.original_name
+
+
+class EmailClassificationJob(models.Model):
+    """Classement IA en masse des emails non classés, exécuté en arrière-plan."""
+
+    STATUS_CHOICES = [
+        ("pending", "En attente"),
+        ("running", "En cours"),
+        ("done", "Terminé"),
+        ("cancelled", "Annulé"),
+        ("failed", "Échec"),
+    ]
+    ACTIVE_STATUSES = ("pending", "running")
+
+    requested_by = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name="email_classification_jobs", verbose_name="Demandé par",
+    )
+    status = models.CharField("Statut", max_length=20, choices=STATUS_CHOICES, default="pending")
+    total = models.PositiveIntegerField("Emails à traiter", default=0)
+    processed = models.PositiveIntegerField("Emails traités", default=0)
+    classified = models.PositiveIntegerField("Classés", default=0)
+    pending = models.PositiveIntegerField("À valider", default=0)
+    skipped = models.PositiveIntegerField("Non attribués", default=0)
+    errors = models.PositiveIntegerField("Erreurs", default=0)
+    attachment_processing_launched = models.PositiveIntegerField("Pièces jointes lancées", default=0)
+    resolved_without_llm = models.PositiveIntegerField("Résolus sans LLM", default=0)
+    llm_calls = models.PositiveIntegerField("Appels LLM", default=0)
+    cancel_requested = models.BooleanField("Annulation demandée", default=False)
+    error = models.TextField("Erreur", blank=True, default="")
+    created_at = models.DateTimeField("Créé le", auto_now_add=True)
+    started_at = models.DateTimeField("Démarré le", null=True, blank=True)
+    # Mis à jour à chaque email traité : un job actif sans nouvelles est abandonné
+    updated_at = models.DateTimeField("Mis à jour le", auto_now=True)
+    finished_at = models.DateTimeField("Terminé le", null=True, blank=True)
+
+    class Meta:
+        db_table = "technical_email_classification_job"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["requested_by", "status"], name="email_classif_job_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"Classement IA #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 100 if not self.is_active else 0
+        return min(100, int(self.processed * 100 / self.total))
+
+    @property
+    def llm_avoided_percent(self):
+        """Part des emails résolus par les règles d'affinité ou le pré-classement local."""
+        resolved = self.resolved_without_llm + self.llm_calls
+        return round(self.resolved_without_llm * 100 / resolved) if resolved else 0
+
+
+class EmailAffinity(models.Model):
+    """
+    Association apprise entre un expéditeur, son domaine ou un fil Gmail et un
+    dossier, avec le nombre d'emails classés qui la confirment.
+    """
+
+    KIND_CHOICES = [
+        ("thread", "Fil de discussion"),
+        ("sender", "Expéditeur"),
+        ("domain", "Domaine"),
+    ]
+
+    kind = models.CharField("Type", max_length=10, choices=KIND_CHOICES)
+    # Adresse ou domaine en minuscules ; "<utilisateur>:<thread_id>" pour un fil
+    key = models.CharField("Clé", max_length=255)
+    project = models.ForeignKey(
+        TechnicalProject, on_delete=models.CASCADE,
+        related_name="email_affinities", verbose_name="Dossier",
+    )
+    count = models.PositiveIntegerField("Emails classés", default=0)
+    updated_at = models.DateTimeField("Mis à jour le", auto_now=True)
+
+    class Meta:
+        db_table = "technical_email_affinity"
+        ordering = ["kind", "key", "-count"]
+        constraints = [
+            # L'index unique sert aussi la recherche par (kind, key)
+            models.UniqueConstraint(fields=["kind", "key", "project"], name="email_affinity_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.key} → {self.project_id} ({self.count})"
@@ -109,6 +109,8 @@ def oauth_callback(request):
                 'access_token':  tokens['access_token'],
                 'refresh_token': tokens['refresh_token'],
                 'token_expiry':  tokens['token_expiry'],
+                'gmail_history_id': '',
+                'technique_history_id': '',
             }
         )
 
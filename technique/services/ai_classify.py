@@ -1,20 +1,21 @@
 import json
 import time
-import requests
 import traceback
+from dataclasses import dataclass
+from itertools import chain
 
 from django.conf import settings
 
+from chatbot.llm_client import get_llm_client
+from technique.services.email_affinity import learn_from_email, resolve_affinity
+from technique.services.project_ranking import ProjectIndex, build_project_index, clear_winner
+
 GROQ_API_KEY  = getattr(settings, "GROQ_API_KEY", None)
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
-MODEL         = "llama-3.3-70b-versatile"
 
-# Nombre de projets max envoyés au LLM pour éviter de dépasser la fenêtre de contexte
+# Projets envoyés au LLM quand le pré-classement local ne trouve aucun candidat sûr
 MAX_PROJECTS_IN_PROMPT = 30
 
-MAX_RETRIES = 3     # tentatives max par appel en cas de 429
-RETRY_SLEEP = 10.0  # secondes d'attente de base après un 429 (backoff linéaire)
-BULK_SLEEP  = 6.0   # pause entre chaque email lors du classement en masse
+MAX_RETRIES = 3     # tentatives max par appel (429, 5xx, erreurs reseau)
 
 SYSTEM_PROMPT = (
     "Tu es un assistant de gestion de projets immobiliers pour l'entreprise Benjamin Immobilier. "
@@ -34,14 +35,70 @@ SYSTEM_PROMPT = (
     "- Reponds UNIQUEMENT en JSON valide.\n"
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "Tu es un assistant de gestion de projets immobiliers pour l'entreprise Benjamin Immobilier. "
+    "Ton rôle est d'analyser plusieurs emails et de déterminer, pour chacun, à quel projet technique "
+    "il appartient, en te basant sur la liste des projets fournis.\n\n"
+    "Tu DOIS répondre STRICTEMENT par un tableau JSON, SANS AUCUN TEXTE AUTOUR, avec un objet par "
+    "email et EXACTEMENT ces clés :\n"
+    "[\n"
+    "  {\n"
+    '    "email_id": <id de l\'email>,\n'
+    '    "project_id": <entier ou null>,\n'
+    '    "confidence": <"high" | "medium" | "low">,\n'
+    '    "reason": "<explication courte en français (1 phrase)>"\n'
+    "  }\n"
+    "]\n\n"
+    "REGLES :\n"
+    "- Chaque email est independant : ne deduis rien d'un email pour un autre.\n"
+    "- Si tu trouves un projet tres probable, mets son id dans project_id et confidence 'high' ou 'medium'.\n"
+    "- Si aucun projet ne correspond clairement, mets project_id: null et confidence: 'low'.\n"
+    "- Ne mets JAMAIS un project_id qui n'est pas dans la liste fournie.\n"
+    "- Reponds pour TOUS les emails, UNIQUEMENT en JSON valide.\n"
+)
+
+# Taille du bloc projets partagé d'un appel groupé : au-delà, le lot est coupé
+MAX_PROJECTS_IN_BATCH_PROMPT = 60
+# Tokens de réponse prévus par email d'un appel groupé
+BATCH_TOKENS_PER_EMAIL = 120
+
+
+@dataclass(frozen=True)
+class ProjectCatalog:
+    """Projets classables et leur index de pré-classement, construits une fois par lot d'emails."""
+    projects: tuple
+    index: ProjectIndex
+
 
-def classify_email(email, projects: list) -> dict:
+def build_project_catalog(projects) -> ProjectCatalog:
+    projects_list = tuple(projects)
+    return ProjectCatalog(projects=projects_list, index=build_project_index(projects_list))
+
+
+def project_prompt_block(projects) -> str:
+    return "\n".join(
+        f'- id={p.id} | ref="{p.reference}" | nom="{p.name}" | type="{p.get_type_display()}"'
+        for p in projects
+    )
+
+
+def classify_email(email, projects, bypass_cache: bool = False) -> dict:
     """
     Analyse un TechnicalEmail et retourne le projet le plus probable.
 
+    Les règles d'affinité (technique.services.email_affinity) sont appliquées
+    d'abord. Sinon les projets sont notés localement
+    (technique.services.project_ranking) : seuls les EMAIL_CLASSIFY_CANDIDATES
+    meilleurs sont proposés au LLM, et l'appel est évité quand l'un d'eux
+    l'emporte nettement.
+
     Args:
         email    : instance TechnicalEmail
-        projects : liste de TechnicalProject (QuerySet ou list)
+        projects : liste de TechnicalProject (QuerySet ou list), ou ProjectCatalog
+                   deja construit (classement en masse)
+        bypass_cache : ignore la réponse en cache pour un email et une liste
+                       de projets identiques, et les règles d'affinité
+                       (reclassement forcé)
 
     Returns:
         dict : {
@@ -50,90 +107,245 @@ def classify_email(email, projects: list) -> dict:
             'reason'     : str,
             'success'    : bool,
             'error'      : str | None,
+            'method'     : 'affinity' | 'local' | 'llm',
         }
     """
+    catalog = _as_catalog(projects)
+    if not catalog.projects:
+        return _err("Aucun projet disponible pour le classement.")
+
+    resolved, candidates = _resolve_locally(email, catalog, bypass_cache)
+    if resolved:
+        return resolved
+
     if not GROQ_API_KEY:
         return _err("Cle GROQ_API_KEY manquante dans les parametres Django.")
 
-    projects_list = list(projects)[:MAX_PROJECTS_IN_PROMPT]
-    if not projects_list:
-        return _err("Aucun projet disponible pour le classement.")
+    return _classify_with_llm(email, prompt_projects(candidates, catalog), bypass_cache)
 
-    projects_block = "\n".join(
-        f'- id={p.id} | ref="{p.reference}" | nom="{p.name}" | type="{p.get_type_display()}"'
-        for p in projects_list
-    )
 
-    body_preview = (email.body or "")[:1500].strip()
+def classify_emails(emails, projects, bypass_cache: bool = False) -> dict:
+    """
+    Classe plusieurs emails en groupant les appels au LLM.
 
-    user_message = (
-        f"## Email a classer\n"
+    Les emails non résolus localement (affinité, pré-classement) sont envoyés
+    par lots de EMAIL_CLASSIFY_BATCH_SIZE : un seul prompt système et un seul
+    bloc projets (l'union de leurs candidats) par appel, réponse en tableau
+    JSON indexé par email_id. Un email absent ou illisible dans la réponse est
+    reclassé seul.
+
+    Returns:
+        dict : {email.pk: resultat au format de classify_email}
+    """
+    catalog = _as_catalog(projects)
+    if not catalog.projects:
+        return {email.pk: _err("Aucun projet disponible pour le classement.") for email in emails}
+
+    results = {}
+    pending = []
+    for email in emails:
+        resolved, candidates = _resolve_locally(email, catalog, bypass_cache)
+        if resolved:
+            results[email.pk] = resolved
+        else:
+            pending.append((email, prompt_projects(candidates, catalog)))
+    if not pending:
+        return results
+    if not GROQ_API_KEY:
+        results.update({email.pk: _err("Cle GROQ_API_KEY manquante dans les parametres Django.") for email, _ in pending})
+        return results
+
+    for batch in _llm_batches(pending, settings.EMAIL_CLASSIFY_BATCH_SIZE):
+        if len(batch) == 1:
+            email, email_projects = batch[0]
+            results[email.pk] = _classify_with_llm(email, email_projects, bypass_cache)
+        else:
+            results.update(_classify_batch_with_llm(batch, bypass_cache))
+    return results
+
+
+def _as_catalog(projects) -> ProjectCatalog:
+    return projects if isinstance(projects, ProjectCatalog) else build_project_catalog(projects)
+
+
+def _resolve_locally(email, catalog: ProjectCatalog, bypass_cache: bool):
+    """(resultat sans LLM ou None, candidats du pre-classement)."""
+    if not bypass_cache:
+        affinity = resolve_affinity(email, allowed_project_ids=catalog.index.projects.keys())
+        if affinity:
+            return _affinity_result(affinity, catalog.index.projects[affinity["project_id"]]), []
+
+    candidates = catalog.index.rank(email, limit=settings.EMAIL_CLASSIFY_CANDIDATES)
+    winner = clear_winner(candidates)
+    if winner:
+        return _local_result(winner), candidates
+    return None, candidates
+
+
+def prompt_projects(candidates, catalog: ProjectCatalog) -> list:
+    """
+    Projets proposés au LLM : les candidats d'un score au moins
+    EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE, complétés par les autres candidats puis
+    par les premiers projets du catalogue jusqu'à EMAIL_CLASSIFY_CANDIDATES
+    projets, ou MAX_PROJECTS_IN_PROMPT si aucun candidat n'atteint ce score.
+    Un mot courant (« résidence », un nom de rue) ne réduit donc pas la liste
+    au point d'en écarter le bon dossier.
+    """
+    strong = [c.project for c in candidates if c.score >= settings.EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE]
+    size = settings.EMAIL_CLASSIFY_CANDIDATES if strong else MAX_PROJECTS_IN_PROMPT
+    selected = {project.pk: project for project in strong}
+    for project in chain((candidate.project for candidate in candidates), catalog.projects):
+        if len(selected) >= size:
+            break
+        selected.setdefault(project.pk, project)
+    return list(selected.values())
+
+
+def _email_block(email) -> str:
+    body_preview = (email.body or "")[:1500].strip()
+    return (
         f"Objet : {email.subject or '(sans objet)'}\n"
         f"Expediteur : {email.sender or '(inconnu)'}\n"
         f"Destinataires : {email.recipients or ''}\n"
         f"Date de reception : {email.received_at.strftime('%d/%m/%Y %H:%M') if email.received_at else ''}\n"
-        f"Corps (extrait) :\n{body_preview}\n\n"
+        f"Corps (extrait) :\n{body_preview}\n"
+    )
+
+
+def _classify_with_llm(email, email_projects, bypass_cache: bool) -> dict:
+    user_message = (
+        f"## Email a classer\n"
+        f"{_email_block(email)}\n"
         f"## Projets disponibles\n"
-        f"{projects_block}\n\n"
+        f"{project_prompt_block(email_projects)}\n\n"
         "Quel est le project_id le plus probable ? Reponds en JSON."
     )
 
-    payload = {
-        "model": MODEL,
-        "temperature": 0.1,
-        "max_tokens": 300,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user",   "content": user_message},
-        ],
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user",   "content": user_message},
+    ]
+    try:
+        response = get_llm_client().chat(
+            messages,
+            temperature=0.1,
+            max_tokens=300,
+            max_retries=MAX_RETRIES,
+            use_cache=True,
+            bypass_cache=bypass_cache,
+            purpose="classement_email",
+        )
+    except Exception as exc:
+        traceback.print_exc()
+        return _err(f"Echec apres {MAX_RETRIES} tentatives : {exc}")
+
+    return _finalize_result(_parse_response(response.content), {p.id for p in email_projects})
+
+
+def _llm_batches(pending, batch_size):
+    """Lots d'au plus batch_size emails dont l'union des candidats reste sous MAX_PROJECTS_IN_BATCH_PROMPT."""
+    batch, project_ids = [], set()
+    for email, email_projects in pending:
+        ids = {p.id for p in email_projects}
+        if batch and (len(batch) >= batch_size or len(project_ids | ids) > MAX_PROJECTS_IN_BATCH_PROMPT):
+            yield batch
+            batch, project_ids = [], set()
+        batch.append((email, email_projects))
+        project_ids |= ids
+    if batch:
+        yield batch
+
+
+def _classify_batch_with_llm(batch, bypass_cache: bool) -> dict:
+    shared_projects = list({p.id: p for _, email_projects in batch for p in email_projects}.values())
+    emails_block = "\n".join(f"### Email email_id={email.pk}\n{_email_block(email)}" for email, _ in batch)
+    user_message = (
+        f"## Emails a classer ({len(batch)})\n"
+        f"{emails_block}\n"
+        f"## Projets disponibles\n"
+        f"{project_prompt_block(shared_projects)}\n\n"
+        "Pour chaque email, quel est le project_id le plus probable ? Reponds par un tableau JSON."
+    )
+    messages = [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user",   "content": user_message},
+    ]
+    try:
+        response = get_llm_client().chat(
+            messages,
+            temperature=0.1,
+            max_tokens=BATCH_TOKENS_PER_EMAIL * len(batch),
+            max_retries=MAX_RETRIES,
+            use_cache=True,
+            bypass_cache=bypass_cache,
+            purpose="classement_email_lot",
+        )
+        items = _parse_batch_response(response.content)
+    except Exception:
+        traceback.print_exc()
+        items = {}
+
+    allowed_ids = {p.id for p in shared_projects}
+    results = {}
+    for email, email_projects in batch:
+        item = items.get(email.pk)
+        if item is None:
+            # Absent ou illisible dans la réponse groupée : appel individuel
+            results[email.pk] = _classify_with_llm(email, email_projects, bypass_cache)
+        else:
+            results[email.pk] = _finalize_result(item, allowed_ids)
+    return results
+
+
+def _affinity_result(affinity: dict, project) -> dict:
+    labels = {"thread": "Fil de discussion", "sender": "Expediteur", "domain": "Domaine"}
+    return {
+        "project_id": project.id,
+        "confidence": "high",
+        "reason":     (
+            f"{labels[affinity['kind']]} deja rattache {affinity['count']} fois "
+            f"au dossier {project.reference} (regle d'affinite)."
+        ),
+        "success":    True,
+        "error":      None,
+        "method":     "affinity",
     }
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
+
+
+def _local_result(candidate) -> dict:
+    project = candidate.project
+    if candidate.reference_match:
+        reason = f"Reference {project.reference} citee dans l'email (pre-classement local)."
+    else:
+        reason = f"Dossier {project.reference} nettement en tete du pre-classement local."
+    return {
+        "project_id": project.id,
+        # Sans référence citée, le dossier reste à valider
+        "confidence": "high" if candidate.reference_match else "medium",
+        "reason":     reason,
+        "success":    True,
+        "error":      None,
+        "method":     "local",
     }
 
-    last_exc = None
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            response = requests.post(GROQ_CHAT_URL, json=payload, headers=headers, timeout=30)
-
-            if response.status_code == 429:
-                wait = RETRY_SLEEP * attempt
-                print(
-                    f"[ai_classify] 429 Too Many Requests — "
-                    f"pause {wait}s (tentative {attempt}/{MAX_RETRIES})"
-                )
-                time.sleep(wait)
-                last_exc = Exception("429 Too Many Requests")
-                continue
-
-            response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"].strip()
-            result  = _parse_response(content)
-
-            valid_ids = {p.id for p in projects_list}
-            if result.get("project_id") and result["project_id"] not in valid_ids:
-                result["project_id"] = None
-                result["confidence"] = "low"
-                result["reason"]     = "ID projet retourne par l'IA hors de la liste — classe ignoré."
-
-            result["success"] = True
-            result["error"]   = None
-            return result
-
-        except Exception as exc:
-            last_exc = exc
-            print(f"[ai_classify] Erreur tentative {attempt}/{MAX_RETRIES} : {exc}")
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_SLEEP)
-
-    traceback.print_exc()
-    return _err(f"Echec apres {MAX_RETRIES} tentatives : {last_exc}")
-
-
-def classify_and_save(email, projects: list, sleep: float = 0.0) -> dict:
+
+def _finalize_result(result: dict, allowed_ids: set) -> dict:
+    if result.get("project_id") and result["project_id"] not in allowed_ids:
+        result["project_id"] = None
+        result["confidence"] = "low"
+        result["reason"]     = "ID projet retourne par l'IA hors de la liste — classe ignoré."
+
+    result["success"] = True
+    result["error"]   = None
+    result["method"]  = "llm"
+    return result
+
+
+def classify_and_save(email, projects: list, sleep: float = 0.0, bypass_cache: bool = False) -> dict:
     """
     Classifie l'email et met a jour le modele en base si la confiance est suffisante.
+    Un classement automatique renforce les règles d'affinité, sauf s'il en
+    provient.
 
     - confidence 'high'   → status = 'classified'  (sauvegarde automatique)
     - confidence 'medium' → status = 'pending'      (suggere, a valider)
@@ -141,18 +353,36 @@ def classify_and_save(email, projects: list, sleep: float = 0.0) -> dict:
 
     Args:
         email    : instance TechnicalEmail
-        projects : liste ou QuerySet de TechnicalProject
+        projects : liste ou QuerySet de TechnicalProject, ou ProjectCatalog
         sleep    : pause en secondes APRES l'appel (utile pour le bulk, defaut 0)
+        bypass_cache : force un nouvel appel Groq (voir classify_email)
 
     Returns:
         dict : resultat de classify_email enrichi de 'saved' (bool)
     """
-    result = classify_email(email, projects)
+    result = classify_email(email, projects, bypass_cache=bypass_cache)
 
     # Pause post-appel si demandee (bulk uniquement)
     if sleep > 0:
         time.sleep(sleep)
 
+    return _save_result(email, result)
+
+
+def classify_and_save_batch(emails, projects, bypass_cache: bool = False) -> dict:
+    """
+    Version groupée de classify_and_save (voir classify_emails).
+
+    Returns:
+        dict : {email.pk: resultat de classify_and_save}
+    """
+    if len(emails) == 1:
+        return {emails[0].pk: classify_and_save(emails[0], projects, bypass_cache=bypass_cache)}
+    results = classify_emails(emails, projects, bypass_cache=bypass_cache)
+    return {email.pk: _save_result(email, results[email.pk]) for email in emails}
+
+
+def _save_result(email, result: dict) -> dict:
     if not result["success"]:
         result["saved"] = False
         return result
@@ -161,9 +391,12 @@ def classify_and_save(email, projects: list, sleep: float = 0.0) -> dict:
     confidence = result.get("confidence", "low")
 
     if project_id and confidence in ("high", "medium"):
+        previous_project_id = email.project_id if email.status == "classified" else None
         email.project_id = project_id
         email.status = "classified" if confidence == "high" else "pending"
         email.save(update_fields=["project", "status"])
+        if result.get("method") != "affinity":
+            learn_from_email(email, previous_project_id)
         result["saved"] = True
         print(
             f"[ai_classify] Email {email.pk} -> projet {project_id} "
@@ -176,7 +409,6 @@ def classify_and_save(email, projects: list, sleep: float = 0.0) -> dict:
     return result
 
 
-
 def _parse_response(content: str) -> dict:
     """Parse la reponse JSON du LLM avec fallback."""
     stripped  = content.strip()
@@ -200,6 +432,42 @@ def _parse_response(content: str) -> dict:
     }
 
 
+def _parse_batch_response(content: str) -> dict:
+    """
+    Parse le tableau JSON d'une reponse groupee : {email_id: resultat}.
+    Les elements illisibles sont ignores (l'email sera reclasse seul).
+    """
+    stripped = content.strip()
+    start    = stripped.find("[")
+    end      = stripped.rfind("]")
+    try:
+        data = json.loads(stripped[start : end + 1] if start != -1 and end != -1 else stripped)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("emails") or []
+    if not isinstance(data, list):
+        return {}
+
+    items = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            email_id = int(item.get("email_id"))
+        except (TypeError, ValueError):
+            continue
+        project_id = item.get("project_id")
+        if project_id is not None and not isinstance(project_id, int):
+            continue
+        items[email_id] = {
+            "project_id": project_id,
+            "confidence": item.get("confidence", "low"),
+            "reason":     item.get("reason", ""),
+        }
+    return items
+
+
 def _err(message: str) -> dict:
     return {
         "project_id": None,
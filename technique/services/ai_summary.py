@@ -1,11 +1,11 @@
 import json
-import time
-import requests
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
+from django.db import connection
 
-GROQ_API_KEY = getattr(settings, "GROQ_API_KEY", None)
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
-MODEL = "llama-3.3-70b-versatile"
+from chatbot.llm_client import get_llm_client
 
 TARGET_TOKENS_PER_CHUNK = 3000
 CHARS_PER_TOKEN = 4
@@ -14,9 +14,8 @@ CHUNK_SIZE_CHARS = TARGET_TOKENS_PER_CHUNK * CHARS_PER_TOKEN
 MAX_RESUME_CHARS = 3000
 MAX_FIELD_CHARS = 1000
 
-SLEEP_BETWEEN_CHUNKS = 5.0
 MAX_RETRIES_PER_CHUNK = 2
-RETRY_SLEEP_SECONDS = 5.0
+MAX_OUTPUT_TOKENS = 900
 
 
 SYSTEM_CHUNK = (
@@ -117,43 +116,55 @@ def _parse_json_or_fallback(content: str) -> dict:
     return data
 
 
-def _call_groq_chunk(chunk_text: str) -> dict:
-    payload = {
-        "model": MODEL,
-        "temperature": 0.1,
-        "max_tokens": 900,
-        "messages": [
+def _call_groq_chunk(chunk_text: str, bypass_cache: bool = False) -> dict:
+    """
+    Analyse un extrait via le client LLM partagé : cache des réponses,
+    limiteur de débit (429 / Retry-After) et relances communes. Lève
+    l'erreur de la dernière tentative.
+    """
+    response = get_llm_client().chat(
+        [
             {"role": "system", "content": SYSTEM_CHUNK},
             {"role": "user", "content": chunk_text},
         ],
-    }
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-    for attempt in range(MAX_RETRIES_PER_CHUNK):
-        try:
-            r = requests.post(GROQ_CHAT_URL, json=payload, headers=headers, timeout=60)
-            if r.status_code == 429:
-                last_error = requests.exceptions.HTTPError("429 Too Many Requests")
-                print(f"[AI] 429 Too Many Requests sur chunk (tentative {attempt+1}/{MAX_RETRIES_PER_CHUNK})")
-                if attempt == MAX_RETRIES_PER_CHUNK:
-                    raise last_error
-                print(f"[AI] Pause {RETRY_SLEEP_SECONDS}s avant retry...")
-                time.sleep(RETRY_SLEEP_SECONDS)
-                continue
-
-            r.raise_for_status()
-            content = r.json()["choices"][0]["message"]["content"].strip()
-            return _parse_json_or_fallback(content)
-        except Exception as e:
-            print(f"[AI] Erreur sur appel chunk (tentative {attempt+1}/{MAX_RETRIES_PER_CHUNK}): {e}")
-            if attempt == MAX_RETRIES_PER_CHUNK:
-                raise
-            time.sleep(RETRY_SLEEP_SECONDS)
-    return _parse_json_or_fallback("{}")
+        temperature=0.1,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        timeout=60,
+        max_retries=MAX_RETRIES_PER_CHUNK,
+        use_cache=True,
+        bypass_cache=bypass_cache,
+        purpose="resume_document",
+    )
+    return _parse_json_or_fallback(response.content)
+
+
+def _summarize_chunk(idx: int, total: int, chunk: str, bypass_cache: bool):
+    """Résultat d'un extrait, ou None si l'appel a définitivement échoué."""
+    print(f"[AI] Traitement du chunk {idx}/{total}...")
+    try:
+        return _call_groq_chunk(chunk, bypass_cache=bypass_cache)
+    except Exception as e:
+        print(f"[AI] Erreur DEFINITIVE sur le chunk {idx}: {e}")
+        traceback.print_exc()
+        # On continue avec les autres chunks pour ne pas tout perdre
+        return None
+
+
+def _summarize_chunk_in_thread(args):
+    try:
+        return _summarize_chunk(*args)
+    finally:
+        # Chaque thread ouvre sa propre connexion (cache LLM) : on la libère en sortant.
+        connection.close()
 
 
 # RESUME COMPLET DOCUMENT
 
-def summarize_document(texte: str) -> dict:
+def summarize_document(texte: str, bypass_cache: bool = False) -> dict:
+    """
+    Résume un document par extraits. Les extraits déjà analysés (même texte,
+    même prompt) sont servis par le cache LLM ; bypass_cache force un nouvel appel.
+    """
     if not texte or not texte.strip():
         return {
             "resume": "",
@@ -168,42 +179,38 @@ def summarize_document(texte: str) -> dict:
     print(f"[AI] Taille document : {len(texte)} caractères (~{_estimate_tokens(texte)} tokens estimés)")
     chunks = _split_into_chunks(texte)
     print(f"[AI] Document découpé en {len(chunks)} chunk(s) de ~{CHUNK_SIZE_CHARS} caractères.")
-    lastChunk = chunks[-1]
 
     resume_parts = []
     prix_parts, dates_parts = [], []
     conditions_parts, penalites_parts, delais_parts = [], [], []
     clauses_all = []
 
-    for idx, chunk in enumerate(chunks, start=1):
-        print(f"[AI] Traitement du chunk {idx}/{len(chunks)}...")
-        try:
-            res = _call_groq_chunk(chunk)
-        except Exception as e:
-            import traceback
-            print(f"[AI] Erreur DEFINITIVE sur le chunk {idx}: {e}")
-            traceback.print_exc()
-            # On continue avec les autres chunks pour ne pas tout perdre
-        else:
-            if res["resume"]:
-                resume_parts.append(res["resume"])
-            if res["prix"]:
-                prix_parts.append(res["prix"])
-            if res["dates"]:
-                dates_parts.append(res["dates"])
-            if res["conditions_suspensives"]:
-                conditions_parts.append(res["conditions_suspensives"])
-            if res["penalites"]:
-                penalites_parts.append(res["penalites"])
-            if res["delais"]:
-                delais_parts.append(res["delais"])
-            clauses_all.extend(res.get("clauses_importantes", []))
-
-        if chunk == lastChunk:
+    # Les appels partent en parallèle au rythme du limiteur partagé ;
+    # les résultats sont fusionnés dans l'ordre des extraits.
+    jobs = [(idx, len(chunks), chunk, bypass_cache) for idx, chunk in enumerate(chunks, start=1)]
+    max_workers = min(max(1, settings.AI_SUMMARY_MAX_WORKERS), len(jobs))
+    if max_workers == 1:
+        results = [_summarize_chunk(*job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_summarize_chunk_in_thread, jobs))
+
+    for res in results:
+        if res is None:
             continue
-        # 1 requête → on attend 5s → chunk suivant
-        print(f"[AI] Pause {SLEEP_BETWEEN_CHUNKS}s avant le prochain chunk...")
-        time.sleep(SLEEP_BETWEEN_CHUNKS)
+        if res["resume"]:
+            resume_parts.append(res["resume"])
+        if res["prix"]:
+            prix_parts.append(res["prix"])
+        if res["dates"]:
+            dates_parts.append(res["dates"])
+        if res["conditions_suspensives"]:
+            conditions_parts.append(res["conditions_suspensives"])
+        if res["penalites"]:
+            penalites_parts.append(res["penalites"])
+        if res["delais"]:
+            delais_parts.append(res["delais"])
+        clauses_all.extend(res.get("clauses_importantes", []))
 
     resume = _normalize_text("\n".join(resume_parts))[:MAX_RESUME_CHARS]
     clauses_all = list(set(clauses_all))
@@ -1,7 +1,6 @@
 import json
 from pathlib import Path
 
-from django.core.files.base import ContentFile
 from django.db import transaction
 from django.utils import timezone
 
@@ -37,6 +36,10 @@ def process_attachment(attachment_id):
     )
     project = attachment.email.project
 
+    if not attachment.file:
+        # Non téléchargée à l'import (taille) : rien à traiter
+        return {"status": "skipped", "attachment_id": attachment.pk}
+
     if not project:
         _mark(attachment, "pending", "")
         return {"status": "pending", "attachment_id": attachment.pk}
@@ -45,6 +48,8 @@ def process_attachment(attachment_id):
         document = attachment.linked_document
         if document.project_id != project.pk:
             document.project = project
+            # Réindexé par technique.chunk_index_signals : le dossier fait
+            # partie des termes indexés de chaque passage
             document.save(update_fields=["project"])
         _mark(attachment, "linked", "")
         return {
@@ -84,8 +89,6 @@ def process_attachment(attachment_id):
     attachment.refresh_from_db()
     try:
         attachment.file.open("rb")
-        raw_content = attachment.file.read()
-        attachment.file.seek(0)
         extracted_text = extract_text_from_file(attachment.file) or ""
         attachment.file.close()
 
@@ -128,11 +131,9 @@ def process_attachment(attachment_id):
                 )[:50000],
                 created_by=locked.email.imported_by,
             )
-            document.fichier.save(
-                locked.original_name,
-                ContentFile(raw_content),
-                save=False,
-            )
+            # Le document pointe vers le fichier déjà stocké de la pièce
+            # jointe : pas de nouvelle lecture ni de copie des octets.
+            document.fichier.name = locked.file.name
             document.save()
 
             locked.extracted_text = extracted_text[:500000]
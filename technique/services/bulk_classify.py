@@ -0,0 +1,183 @@
+"""
+Classement IA en masse des emails techniques non classés, en tâche de fond.
+
+La vue crée un EmailClassificationJob et rend la main aussitôt ; la tâche
+Celery traite les emails par lots de EMAIL_CLASSIFY_BATCH_SIZE (un appel
+groupé au LLM par lot, voir ai_classify.classify_emails), enregistre les
+compteurs après chaque lot (interrogés par l'interface) et s'arrête au lot
+suivant une demande d'annulation. La liste des projets et son index de
+pré-classement sont construits une seule fois pour tout le job ; le job compte
+les emails résolus sans appel au LLM (règles d'affinité, pré-classement
+local). Le débit des appels Groq est réglé par le limiteur partagé du client
+LLM : plus de pause fixe entre deux emails.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from technique.models import EmailClassificationJob, TechnicalEmail, TechnicalProject
+from technique.services import ai_classify
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "processed", "classified", "pending", "skipped", "errors", "attachment_processing_launched",
+    "resolved_without_llm", "llm_calls",
+)
+
+
+def _unassigned_emails(user):
+    return TechnicalEmail.objects.filter(status="unassigned", imported_by=user)
+
+
+def _abandon_stale_jobs(user):
+    stale_before = timezone.now() - timedelta(minutes=settings.EMAIL_CLASSIFICATION_JOB_STALE_MINUTES)
+    EmailClassificationJob.objects.filter(
+        requested_by=user,
+        status__in=EmailClassificationJob.ACTIVE_STATUSES,
+        updated_at__lt=stale_before,
+    ).update(status="failed", error="Job interrompu (aucune progression).", finished_at=timezone.now())
+
+
+def request_bulk_classification(user):
+    """
+    Crée le job de classement de l'utilisateur, ou renvoie celui déjà en cours.
+
+    Retourne (job, reused).
+    """
+    _abandon_stale_jobs(user)
+    active = (
+        EmailClassificationJob.objects.filter(
+            requested_by=user, status__in=EmailClassificationJob.ACTIVE_STATUSES
+        )
+        .order_by("-created_at", "-id")
+        .first()
+    )
+    if active:
+        return active, True
+
+    job = EmailClassificationJob.objects.create(
+        requested_by=user,
+        total=_unassigned_emails(user).count(),
+    )
+    enqueue_bulk_classification(job)
+    return job, False
+
+
+def enqueue_bulk_classification(job):
+    if settings.EMAIL_CLASSIFICATION_EXECUTION == "sync":
+        run_bulk_classification(job.pk)
+        return
+
+    from technique.tasks import run_email_classification_job
+
+    def _send():
+        try:
+            run_email_classification_job.delay(job.pk)
+        except Exception as exc:
+            logger.exception("Impossible de mettre en file le classement %s", job.pk)
+            EmailClassificationJob.objects.filter(pk=job.pk).update(
+                status="failed",
+                error=f"Mise en file impossible : {exc}",
+                finished_at=timezone.now(),
+            )
+
+    transaction.on_commit(_send)
+
+
+def cancel_bulk_classification(job):
+    """Annule un job en attente, ou demande l'arrêt d'un job en cours."""
+    now = timezone.now()
+    if EmailClassificationJob.objects.filter(pk=job.pk, status="pending").update(
+        status="cancelled", cancel_requested=True, finished_at=now, updated_at=now,
+    ):
+        return
+    EmailClassificationJob.objects.filter(pk=job.pk, status="running").update(
+        cancel_requested=True, updated_at=now,
+    )
+
+
+def _save_progress(job, counts, **fields):
+    EmailClassificationJob.objects.filter(pk=job.pk).update(
+        **counts, **fields, updated_at=timezone.now(),
+    )
+
+
+def _iter_batches(email_ids, batch_size):
+    """Lots d'emails dans l'ordre demandé ; ceux supprimés entre-temps valent None."""
+    for start in range(0, len(email_ids), batch_size):
+        batch = email_ids[start:start + batch_size]
+        emails = TechnicalEmail.objects.filter(pk__in=batch).in_bulk()
+        yield [emails.get(email_id) for email_id in batch]
+
+
+def _count_result(counts, email, result):
+    from technique.tasks import enqueue_email_attachment_processing
+
+    if result.get("method") == "llm":
+        counts["llm_calls"] += 1
+    elif result.get("method"):
+        counts["resolved_without_llm"] += 1
+    if not result["success"]:
+        counts["errors"] += 1
+    elif result["saved"] and email.status == "classified":
+        counts["classified"] += 1
+        processing = enqueue_email_attachment_processing(email)
+        if processing.get("launched"):
+            counts["attachment_processing_launched"] += processing.get("attachments", 0)
+    elif result["saved"]:
+        counts["pending"] += 1
+    else:
+        counts["skipped"] += 1
+
+
+def run_bulk_classification(job_id):
+    """Traite les emails non classés du demandeur et tient le job à jour."""
+    job = EmailClassificationJob.objects.select_related("requested_by").get(pk=job_id)
+    now = timezone.now()
+    if not EmailClassificationJob.objects.filter(pk=job.pk, status="pending").update(
+        status="running", started_at=now, updated_at=now,
+    ):
+        job.refresh_from_db()
+        return job
+
+    counts = dict.fromkeys(COUNTERS, 0)
+    try:
+        catalog = ai_classify.build_project_catalog(
+            TechnicalProject.objects.filter(archived_at__isnull=True).order_by("reference")
+        )
+        email_ids = list(
+            _unassigned_emails(job.requested_by).order_by("-received_at", "-id").values_list("pk", flat=True)
+        )
+        _save_progress(job, counts, total=len(email_ids))
+
+        for batch in _iter_batches(email_ids, max(settings.EMAIL_CLASSIFY_BATCH_SIZE, 1)):
+            if EmailClassificationJob.objects.filter(pk=job.pk, cancel_requested=True).exists():
+                _save_progress(job, counts, status="cancelled", finished_at=timezone.now())
+                job.refresh_from_db()
+                return job
+
+            counts["processed"] += len(batch)
+            emails = [email for email in batch if email is not None and email.status == "unassigned"]
+            counts["skipped"] += len(batch) - len(emails)
+            if emails:
+                try:
+                    results = ai_classify.classify_and_save_batch(emails, catalog)
+                except Exception:
+                    logger.exception("Classement des emails %s impossible", [email.pk for email in emails])
+                    counts["errors"] += len(emails)
+                else:
+                    for email in emails:
+                        _count_result(counts, email, results[email.pk])
+            _save_progress(job, counts)
+    except Exception as exc:
+        logger.exception("Échec du classement en masse %s", job.pk)
+        _save_progress(job, counts, status="failed", error=str(exc), finished_at=timezone.now())
+    else:
+        _save_progress(job, counts, status="done", finished_at=timezone.now())
+
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,225 @@
+"""
+Index lexical des documents techniques, par passages, pour le RAG du chatbot.
+
+Après chaque enregistrement (voir technique.chunk_index_signals), une tâche
+Celery découpe le document en passages qui se chevauchent (DocumentChunk). Pour chaque passage, la fréquence de ses termes est stockée
+dans ChunkTerm. La recherche classe les passages avec BM25, calculé en une
+requête SQL agrégée : le prompt reçoit les passages les plus pertinents, et
+non le début des documents les plus récents.
+"""
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from technique.models import ChunkTerm, DocumentChunk, DocumentTechnique
+
+logger = logging.getLogger(__name__)
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 40
+# Paramètres BM25 usuels
+BM25_K1 = 1.2
+BM25_B = 0.75
+TERM_MAX_LENGTH = 64
+MAX_QUERY_TERMS = 12
+STATS_CACHE_KEY = "chunk-index:stats"
+STATS_CACHE_TIMEOUT = 300
+
+FRENCH_STOPWORDS = {
+    "au", "aux", "avec", "ce", "ces", "cette", "comment", "dans", "de", "des", "doit",
+    "du", "elle", "en", "est", "et", "il", "ils", "la", "le", "les", "leur", "lui",
+    "mais", "ne", "nous", "ou", "par", "pas", "peut", "plus", "pour", "quand", "que",
+    "quel", "quelle", "quelles", "quels", "qui", "quoi", "sa", "se", "ses", "son",
+    "sont", "sur", "tout", "un", "une", "vous",
+}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    """Minuscules sans accents."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Termes indexés : minuscules, sans accents, hors mots vides."""
+    return [
+        word[:TERM_MAX_LENGTH]
+        for word in _WORD_RE.findall(fold(text or ""))
+        if len(word) > 1 and word not in FRENCH_STOPWORDS
+    ]
+
+
+def split_passages(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Découpe un texte en fenêtres de `size` mots qui se chevauchent de `overlap` mots."""
+    words = (text or "").split()
+    if not words:
+        return []
+    step = max(size - overlap, 1)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return passages
+
+
+def _document_header(document):
+    project = document.project
+    return " ".join(filter(None, [document.titre, project and project.reference, project and project.name]))
+
+
+def _invalidate_stats():
+    cache.delete(STATS_CACHE_KEY)
+
+
+def index_document(document, batch_size=1000):
+    """
+    (Re)construit les passages et l'index inversé d'un document. Le titre et le
+    dossier sont indexés avec chaque passage pour qu'une question citant le
+    dossier remonte ses extraits. Renvoie le nombre de passages.
+    """
+    passages = []
+    if (document.resume or "").strip():
+        passages.append(document.resume.strip())
+    passages.extend(split_passages(document.texte_brut))
+    header_terms = tokenize(_document_header(document))
+
+    with transaction.atomic():
+        DocumentChunk.objects.filter(document=document).delete()
+        chunks = []
+        chunk_terms = []
+        for position, passage in enumerate(passages):
+            terms = Counter(tokenize(passage))
+            terms.update(header_terms)
+            if not terms:
+                continue
+            chunks.append(DocumentChunk(
+                document=document,
+                position=position,
+                text=passage,
+                length=sum(terms.values()),
+            ))
+            chunk_terms.append(terms)
+        DocumentChunk.objects.bulk_create(chunks, batch_size=batch_size)
+        ChunkTerm.objects.bulk_create(
+            (
+                ChunkTerm(chunk=chunk, term=term, frequency=frequency)
+                for chunk, terms in zip(chunks, chunk_terms)
+                for term, frequency in terms.items()
+            ),
+            batch_size=batch_size,
+        )
+    _invalidate_stats()
+    return len(chunks)
+
+
+def index_documents(document_ids):
+    """(Re)construit l'index des documents encore présents. Renvoie le nombre de passages."""
+    passages = 0
+    queryset = DocumentTechnique.objects.filter(pk__in=document_ids).select_related("project").order_by("pk")
+    for document in queryset:
+        passages += index_document(document)
+    return passages
+
+
+def enqueue_document_indexing(document_ids):
+    """
+    Réindexe les documents après la validation de la transaction, dans une
+    tâche Celery : un document volumineux produit des milliers de passages, qui
+    n'ont pas à être écrits pendant la requête. CHUNK_INDEX_EXECUTION=sync
+    indexe immédiatement (tests, environnement sans worker).
+    """
+    document_ids = sorted(set(document_ids))
+    if not document_ids:
+        return
+    if settings.CHUNK_INDEX_EXECUTION == "sync":
+        index_documents(document_ids)
+        return
+
+    from technique.tasks import index_technique_documents
+
+    def _send():
+        try:
+            index_technique_documents.delay(document_ids)
+        except Exception:
+            logger.exception("Impossible de mettre en file l'indexation des documents %s", document_ids)
+
+    transaction.on_commit(_send)
+
+
+def rebuild_chunk_index(batch_size=200):
+    """Réindexe tous les documents techniques. Renvoie (documents, passages)."""
+    documents = passages = 0
+    queryset = DocumentTechnique.objects.select_related("project").order_by("pk")
+    for document in queryset.iterator(chunk_size=batch_size):
+        passages += index_document(document)
+        documents += 1
+    return documents, passages
+
+
+def _corpus_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        aggregate = DocumentChunk.objects.aggregate(count=Count("id"), average=Avg("length"))
+        stats = (aggregate["count"], float(aggregate["average"] or 0))
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def search_chunks(question, limit=4):
+    """
+    Renvoie les `limit` passages les plus pertinents pour la question (BM25),
+    avec leur score dans l'attribut `score`, document et dossier préchargés.
+    """
+    terms = list(dict.fromkeys(tokenize(question)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    chunk_count, average_length = _corpus_stats()
+    if not chunk_count:
+        return []
+
+    document_frequencies = dict(
+        ChunkTerm.objects.filter(term__in=terms)
+        .values("term")
+        .annotate(df=Count("id"))
+        .values_list("term", "df")
+    )
+    if not document_frequencies:
+        return []
+    idf = Case(
+        *[
+            When(term=term, then=Value(math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))))
+            for term, df in document_frequencies.items()
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    frequency = Cast("frequency", FloatField())
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * Cast(F("chunk__length"), FloatField()) / average_length)
+    ranked = list(
+        ChunkTerm.objects.filter(term__in=document_frequencies)
+        .values("chunk_id")
+        .annotate(score=Sum(idf * frequency * (BM25_K1 + 1) / (frequency + length_norm)))
+        .order_by("-score", "chunk_id")
+        .values_list("chunk_id", "score")[:limit]
+    )
+
+    chunks = DocumentChunk.objects.select_related("document__project").in_bulk(
+        [chunk_id for chunk_id, _ in ranked]
+    )
+    results = []
+    for chunk_id, score in ranked:
+        chunk = chunks[chunk_id]
+        chunk.score = score
+        results.append(chunk)
+    return results
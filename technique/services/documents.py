@@ -1,6 +1,3 @@
-from io import BytesIO
-
-
 def _read_pdf(file_obj) -> str:
     """Retourne le texte contenu dans un fichier PDF."""
     try:
@@ -31,13 +28,18 @@ def _read_docx(file_obj) -> str:
 def _extract_text(django_file) -> str:
     """Retourne le texte brut d'un fichier PDF, DOCX ou texte."""
     name = (getattr(django_file, "name", "") or "").lower()
+
+    if name.endswith((".pdf", ".docx")):
+        # Lecteurs alimentés directement par le flux, sans copie en mémoire
+        reader = _read_pdf if name.endswith(".pdf") else _read_docx
+        django_file.seek(0)
+        try:
+            return reader(django_file)
+        finally:
+            django_file.seek(0)
+
     data = django_file.read()
     django_file.seek(0)
-
-    if name.endswith(".pdf"):
-        return _read_pdf(BytesIO(data))
-    if name.endswith(".docx"):
-        return _read_docx(BytesIO(data))
     if name.endswith(".txt"):
         try:
             return data.decode("utf-8", errors="ignore")
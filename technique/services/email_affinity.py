@@ -0,0 +1,199 @@
+"""
+Règles d'affinité des emails techniques : expéditeur, domaine et fil Gmail.
+
+Chaque email classé (manuellement ou par l'IA) renforce les associations
+« adresse → dossier », « domaine → dossier » et « fil → dossier » de la table
+EmailAffinity. Un nouvel email est rattaché sans appel au LLM quand une de ses
+clés désigne un dossier avec assez d'emails confirmés
+(EMAIL_AFFINITY_MIN_COUNT, un seul pour un fil) et une part suffisante des
+emails de la clé (EMAIL_AFFINITY_MIN_SHARE). Le fil prime sur l'adresse, qui
+prime sur le domaine.
+
+Les emails classés par ces règles ne les renforcent pas, pour qu'une erreur
+ne s'auto-entretienne pas ; une correction manuelle retire l'ancien dossier.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from technique.models import EmailAffinity, TechnicalEmail, TechnicalProject
+from technique.services.project_ranking import sender_address
+
+# Un fil déjà rattaché suffit : ses messages concernent le même dossier
+THREAD_MIN_COUNT = 1
+
+# Messageries grand public : le domaine ne dit rien du dossier
+PUBLIC_EMAIL_DOMAINS = frozenset({
+    "free.fr", "gmail.com", "googlemail.com", "hotmail.com", "hotmail.fr", "icloud.com",
+    "laposte.net", "live.fr", "me.com", "msn.com", "neuf.fr", "orange.fr", "outlook.com",
+    "outlook.fr", "sfr.fr", "wanadoo.fr", "yahoo.com", "yahoo.fr",
+})
+
+
+def affinity_keys(email):
+    """Clés (kind, key) de l'email, par ordre de priorité."""
+    keys = []
+    max_length = EmailAffinity._meta.get_field("key").max_length
+    if email.thread_id and email.imported_by_id:
+        # Les identifiants de fil sont propres à chaque boîte Gmail
+        keys.append(("thread", f"{email.imported_by_id}:{email.thread_id}"[:max_length]))
+    address = sender_address(email.sender)
+    if address:
+        keys.append(("sender", address[:max_length]))
+        domain = address.rpartition("@")[2]
+        if domain and domain not in PUBLIC_EMAIL_DOMAINS:
+            keys.append(("domain", domain))
+    return keys
+
+
+def _increment(kind, key, project_id):
+    updated = EmailAffinity.objects.filter(kind=kind, key=key, project_id=project_id).update(
+        count=F("count") + 1
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            EmailAffinity.objects.create(kind=kind, key=key, project_id=project_id, count=1)
+    except IntegrityError:
+        # Créée entre-temps par un autre processus
+        EmailAffinity.objects.filter(kind=kind, key=key, project_id=project_id).update(count=F("count") + 1)
+
+
+def learn_from_email(email, previous_project_id=None):
+    """
+    Enregistre le classement d'un email. previous_project_id est le dossier
+    auquel l'email était rattaché avant une correction : son association est
+    affaiblie d'autant.
+    """
+    if email.status != "classified" or not email.project_id or email.project_id == previous_project_id:
+        return
+    for kind, key in affinity_keys(email):
+        if previous_project_id:
+            EmailAffinity.objects.filter(
+                kind=kind, key=key, project_id=previous_project_id, count__gt=0,
+            ).update(count=F("count") - 1)
+        _increment(kind, key, email.project_id)
+
+
+def _load_affinities(keys):
+    """{(kind, key): {project_id: count}} pour les clés données, en une requête."""
+    keys_by_kind = defaultdict(set)
+    for kind, key in keys:
+        keys_by_kind[kind].add(key)
+    if not keys_by_kind:
+        return {}
+    condition = Q()
+    for kind, kind_keys in keys_by_kind.items():
+        condition |= Q(kind=kind, key__in=kind_keys)
+    affinities = defaultdict(dict)
+    for kind, key, project_id, count in EmailAffinity.objects.filter(condition, count__gt=0).values_list(
+        "kind", "key", "project_id", "count"
+    ):
+        affinities[(kind, key)][project_id] = count
+    return affinities
+
+
+def _match(email, affinities, allowed_project_ids=None):
+    for kind, key in affinity_keys(email):
+        counts = affinities.get((kind, key))
+        if not counts:
+            continue
+        if allowed_project_ids is not None:
+            counts = {project_id: count for project_id, count in counts.items() if project_id in allowed_project_ids}
+            if not counts:
+                continue
+        project_id, count = max(counts.items(), key=lambda item: item[1])
+        min_count = THREAD_MIN_COUNT if kind == "thread" else settings.EMAIL_AFFINITY_MIN_COUNT
+        if count >= min_count and count >= settings.EMAIL_AFFINITY_MIN_SHARE * sum(counts.values()):
+            return {"project_id": project_id, "kind": kind, "key": key, "count": count}
+    return None
+
+
+def resolve_affinity(email, allowed_project_ids=None):
+    """
+    Dossier désigné par les règles pour l'email, ou None :
+    {"project_id", "kind", "key", "count"}.
+    """
+    return _match(email, _load_affinities(affinity_keys(email)), allowed_project_ids)
+
+
+def apply_affinities(emails):
+    """
+    Rattache les emails non classés que les règles résolvent, avec une seule
+    lecture de la table pour tout le lot. Renvoie les emails rattachés.
+    """
+    emails = [email for email in emails if email.status == "unassigned"]
+    affinities = _load_affinities(key for email in emails for key in affinity_keys(email))
+    active_ids = None
+    if affinities:
+        active_ids = set(
+            TechnicalProject.objects.filter(
+                pk__in={project_id for counts in affinities.values() for project_id in counts},
+                archived_at__isnull=True,
+            ).values_list("pk", flat=True)
+        )
+    matched = []
+    for email in emails:
+        match = _match(email, affinities, active_ids)
+        if match:
+            email.project_id = match["project_id"]
+            email.status = "classified"
+            email.save(update_fields=["project", "status"])
+            matched.append(email)
+    return matched
+
+
+def rebuild_affinities(batch_size=2000):
+    """Recalcule la table depuis tous les emails classés. Renvoie le nombre d'associations."""
+    counts = defaultdict(int)
+    queryset = TechnicalEmail.objects.filter(status="classified", project__isnull=False).only(
+        "sender", "thread_id", "imported_by", "project", "status"
+    )
+    for email in queryset.iterator(chunk_size=batch_size):
+        for kind, key in affinity_keys(email):
+            counts[(kind, key, email.project_id)] += 1
+    with transaction.atomic():
+        EmailAffinity.objects.all().delete()
+        EmailAffinity.objects.bulk_create(
+            (
+                EmailAffinity(kind=kind, key=key, project_id=project_id, count=count)
+                for (kind, key, project_id), count in counts.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+def affinity_stats(batch_size=500):
+    """
+    Associations par type, et part des emails non classés que les règles
+    résoudraient sans appel au LLM.
+    """
+    rules = dict(
+        EmailAffinity.objects.filter(count__gt=0).values("kind").annotate(total=Count("id")).values_list("kind", "total")
+    )
+    unassigned = resolved = 0
+    batch = []
+    queryset = TechnicalEmail.objects.filter(status="unassigned").only("sender", "thread_id", "imported_by", "status")
+    for email in queryset.iterator(chunk_size=batch_size):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            resolved += _count_resolved(batch)
+            unassigned += len(batch)
+            batch = []
+    resolved += _count_resolved(batch)
+    unassigned += len(batch)
+    return {
+        "rules": {kind: rules.get(kind, 0) for kind, _ in EmailAffinity.KIND_CHOICES},
+        "unassigned": unassigned,
+        "resolvable": resolved,
+        "llm_avoided_rate": resolved / unassigned if unassigned else 0.0,
+    }
+
+
+def _count_resolved(emails):
+    affinities = _load_affinities(key for email in emails for key in affinity_keys(email))
+    return sum(1 for email in emails if _match(email, affinities))
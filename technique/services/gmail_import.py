@@ -1,25 +1,44 @@
 import base64
+import hashlib
+import tempfile
 import traceback
 from email.utils import parsedate_to_datetime
 
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.core.files.base import ContentFile
 
+from management.gmail_service import execute_batched, history_cursor_expired
 from management.models import OAuthToken
 from management.oauth_utils import get_gmail_service
 from technique.models import TechnicalEmail, TechnicalEmailAttachment
+from technique.services.email_affinity import apply_affinities
 
+# Caractères base64 décodés à la fois (multiple de 4) : une pièce jointe n'est
+# jamais entièrement décodée en mémoire
+BASE64_CHUNK_CHARS = 4 * 64 * 1024
 
-def import_technique_emails(user, max_results: int = 50) -> dict:
+
+def import_technique_emails(user, max_results: int | None = None, incremental: bool = True) -> dict:
     """
     Importe les emails de la boîte Gmail de l'utilisateur dans TechnicalEmail.
 
     Chaque utilisateur a sa propre boîte — les emails sont strictement personnels.
     Dédoublonnage par (external_id, imported_by) : un même ID Gmail peut exister
     pour deux utilisateurs différents sans conflit.
+
+    Avec un curseur historyId (OAuthToken.technique_history_id), seuls les
+    messages arrivés dans INBOX depuis le dernier import sont lus, page après
+    page. Sans curseur, ou s'il a expiré, INBOX est parcourue du plus récent au
+    plus ancien jusqu'à une page entièrement connue ou max_results messages
+    (TECHNIQUE_GMAIL_IMPORT_LIMIT par défaut).
+
+    Les emails que les règles d'affinité résolvent (fil, expéditeur ou domaine
+    déjà rattachés à un dossier) sont classés dès l'import, sans appel au LLM.
     """
     try:
-        OAuthToken.objects.get(user=user, provider="google")
+        token = OAuthToken.objects.get(user=user, provider="google")
     except OAuthToken.DoesNotExist:
         raise ValueError(
             f"L'utilisateur {user.username} n'a pas synchronisé sa boîte mail. "
@@ -32,57 +51,36 @@ def import_technique_emails(user, max_results: int = 50) -> dict:
         "errors": 0,
         "attachments_imported": 0,
         "attachment_errors": 0,
+        "attachments_skipped": 0,
         "attachment_processing_launched": 0,
+        "affinity_classified": 0,
+        "pages": 0,
+        "mode": "full",
     }
 
     try:
         service = get_gmail_service(user)
 
-        results = service.users().messages().list(
-            userId="me",
-            maxResults=max_results,
-            labelIds=["INBOX"],
-        ).execute()
-
-        message_refs = results.get("messages", [])
-        print(f"[gmail_import] {len(message_refs)} message(s) trouvé(s) dans INBOX pour {user.username}")
-
-        for ref in message_refs:
-            gmail_id = ref["id"]
-
-            if TechnicalEmail.objects.filter(
-                external_id=gmail_id,
-                imported_by=user,
-            ).exists():
-                stats["skipped"] += 1
-                continue
-
+        history_id = None
+        if incremental and token.technique_history_id:
             try:
-                msg_data = service.users().messages().get(
-                    userId="me",
-                    id=gmail_id,
-                    format="full",
-                ).execute()
-
-                email_obj = _create_technical_email(msg_data, user)
-
-                if email_obj:
-                    attachment_stats = _process_attachments(
-                        service,
-                        gmail_id,
-                        msg_data,
-                        email_obj,
-                    )
-                    stats["attachments_imported"] += attachment_stats["imported"]
-                    stats["attachment_errors"] += attachment_stats["errors"]
-                    stats["imported"] += 1
-                else:
-                    stats["skipped"] += 1
-
+                history_id = _import_history(service, user, token.technique_history_id, stats)
+                stats["mode"] = "incremental"
             except Exception as exc:
-                print(f"[gmail_import] Erreur sur le message {gmail_id} : {exc}")
-                traceback.print_exc()
-                stats["errors"] += 1
+                if not history_cursor_expired(exc):
+                    raise
+                print(f"[gmail_import] Curseur expiré pour {user.username}, import complet")
+        if history_id is None:
+            # Relevé avant le parcours : les messages arrivés pendant l'import
+            # seront repris au prochain passage incrémental.
+            history_id = service.users().getProfile(userId="me").execute().get("historyId", "")
+            _import_inbox(service, user, max_results or settings.TECHNIQUE_GMAIL_IMPORT_LIMIT, stats)
+
+        # Un message en erreur sera relu au prochain passage : le curseur
+        # n'avance que si toute la plage a été importée.
+        if not stats["errors"] and history_id and str(history_id) != token.technique_history_id:
+            token.technique_history_id = str(history_id)
+            token.save(update_fields=["technique_history_id", "updated_at"])
 
     except Exception as exc:
         print(f"[gmail_import] Erreur globale : {exc}")
@@ -90,14 +88,134 @@ def import_technique_emails(user, max_results: int = 50) -> dict:
         raise
 
     print(
-        f"[gmail_import] {user.username} — "
+        f"[gmail_import] {user.username} ({stats['mode']}, {stats['pages']} page(s)) — "
         f"{stats['imported']} importé(s), "
+        f"{stats['affinity_classified']} classé(s) par affinité, "
         f"{stats['skipped']} ignoré(s), "
         f"{stats['errors']} erreur(s)"
     )
     return stats
 
 
+def _import_history(service, user, start_history_id, stats) -> str:
+    """Importe les messages ajoutés à INBOX depuis start_history_id ; renvoie le nouveau curseur."""
+    kwargs = {
+        "userId": "me",
+        "startHistoryId": start_history_id,
+        "historyTypes": ["messageAdded"],
+        "labelId": "INBOX",
+    }
+    while True:
+        response = service.users().history().list(**kwargs).execute()
+        gmail_ids = [
+            change["message"]["id"]
+            for record in response.get("history", [])
+            for change in record.get("messagesAdded", [])
+            if "INBOX" in change.get("message", {}).get("labelIds", [])
+        ]
+        _import_page(service, user, list(dict.fromkeys(gmail_ids)), stats)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return response.get("historyId", start_history_id)
+        kwargs["pageToken"] = page_token
+
+
+def _import_inbox(service, user, limit, stats):
+    """Parcourt INBOX du plus récent au plus ancien (voir import_technique_emails)."""
+    kwargs = {"userId": "me", "labelIds": ["INBOX"]}
+    listed = 0
+    while listed < limit:
+        kwargs["maxResults"] = min(settings.TECHNIQUE_GMAIL_IMPORT_PAGE_SIZE, limit - listed)
+        response = service.users().messages().list(**kwargs).execute()
+        gmail_ids = [ref["id"] for ref in response.get("messages", [])]
+        listed += len(gmail_ids)
+        new_count = _import_page(service, user, gmail_ids, stats)
+        page_token = response.get("nextPageToken")
+        if not page_token or not new_count:
+            # Page entièrement connue : les messages plus anciens le sont aussi
+            break
+        kwargs["pageToken"] = page_token
+
+
+def _import_page(service, user, gmail_ids, stats) -> int:
+    """
+    Importe une page de messages : une requête de dédoublonnage, un lot de
+    lectures Gmail, puis les pièces jointes et les règles d'affinité.
+    Renvoie le nombre de messages nouveaux.
+    """
+    stats["pages"] += 1
+    known = set(
+        TechnicalEmail.objects.filter(external_id__in=gmail_ids, imported_by=user).values_list(
+            "external_id", flat=True
+        )
+    )
+    new_ids = [gmail_id for gmail_id in gmail_ids if gmail_id not in known]
+    stats["skipped"] += len(gmail_ids) - len(new_ids)
+    if not new_ids:
+        return 0
+
+    full_messages, fetch_errors = execute_batched(
+        service,
+        {
+            gmail_id: service.users().messages().get(
+                userId="me",
+                id=gmail_id,
+                format="full",
+            )
+            for gmail_id in new_ids
+        },
+    )
+
+    created = []
+    for gmail_id in new_ids:
+        if gmail_id in fetch_errors:
+            if _message_deleted(fetch_errors[gmail_id]):
+                # Supprimé depuis son ajout à l'historique : rien à relire, le
+                # curseur peut avancer
+                print(f"[gmail_import] Message {gmail_id} supprimé entre-temps, ignoré")
+                stats["skipped"] += 1
+                continue
+            print(f"[gmail_import] Erreur sur le message {gmail_id} : {fetch_errors[gmail_id]}")
+            stats["errors"] += 1
+            continue
+
+        try:
+            msg_data = full_messages[gmail_id]
+            email_obj = _create_technical_email(msg_data, user)
+
+            if email_obj:
+                created.append((gmail_id, msg_data, email_obj))
+                stats["imported"] += 1
+            else:
+                stats["skipped"] += 1
+
+        except Exception as exc:
+            print(f"[gmail_import] Erreur sur le message {gmail_id} : {exc}")
+            traceback.print_exc()
+            stats["errors"] += 1
+
+    attachment_stats = _process_attachments(service, created)
+    stats["attachments_imported"] += attachment_stats["imported"]
+    stats["attachment_errors"] += attachment_stats["errors"]
+    stats["attachments_skipped"] += attachment_stats["skipped"]
+
+    matched = apply_affinities([email_obj for _, _, email_obj in created])
+    stats["affinity_classified"] += len(matched)
+    if matched:
+        from technique.tasks import enqueue_email_attachment_processing
+
+        for email_obj in matched:
+            if email_obj.has_attachments:
+                processing = enqueue_email_attachment_processing(email_obj)
+                if processing.get("launched"):
+                    stats["attachment_processing_launched"] += processing.get("attachments", 0)
+    return len(new_ids)
+
+
+def _message_deleted(exc) -> bool:
+    return getattr(getattr(exc, "resp", None), "status", None) == 404
+
+
 def _create_technical_email(msg_data: dict, user) -> TechnicalEmail | None:
     gmail_id = msg_data["id"]
     headers = {
@@ -119,19 +237,24 @@ def _create_technical_email(msg_data: dict, user) -> TechnicalEmail | None:
     body             = _extract_body(msg_data.get("payload", {}))
     has_attachments  = _has_attachments(msg_data.get("payload", {}))
 
-    return TechnicalEmail.objects.create(
-        external_id=gmail_id,
-        thread_id=msg_data.get("threadId", ""),
-        subject=subject,
-        sender=sender,
-        recipients=recipients,
-        cc=cc,
-        body=body,
-        received_at=received_at,
-        has_attachments=has_attachments,
-        status="unassigned",
-        imported_by=user,
-    )
+    try:
+        with transaction.atomic():
+            return TechnicalEmail.objects.create(
+                external_id=gmail_id,
+                thread_id=msg_data.get("threadId", ""),
+                subject=subject,
+                sender=sender,
+                recipients=recipients,
+                cc=cc,
+                body=body,
+                received_at=received_at,
+                has_attachments=has_attachments,
+                status="unassigned",
+                imported_by=user,
+            )
+    except IntegrityError:
+        # Importé entre-temps par un autre passage (tâche planifiée, bouton)
+        return None
 
 
 def _extract_body(payload: dict) -> str:
@@ -178,43 +301,52 @@ def _has_attachments(payload: dict) -> bool:
     return False
 
 
-def _process_attachments(service, gmail_id: str, msg_data: dict, email_obj: TechnicalEmail):
-    payload = msg_data.get("payload", {})
-    stats = {"imported": 0, "errors": 0}
-    _process_parts(service, gmail_id, payload.get("parts", []), email_obj, stats)
-    return stats
-
-
-def _process_parts(
-    service,
-    gmail_id: str,
-    parts: list,
-    email_obj: TechnicalEmail,
-    stats: dict,
-):
+def _attachment_parts(parts: list):
     for part in parts:
-        filename      = part.get("filename", "")
-        attachment_id = part.get("body", {}).get("attachmentId")
-        content_type  = part.get("mimeType", "")
-        size          = part.get("body", {}).get("size", 0)
-
-        if filename and attachment_id:
-            try:
-                attachment_data = service.users().messages().attachments().get(
-                    userId="me", messageId=gmail_id, id=attachment_id,
-                ).execute()
+        if part.get("filename") and part.get("body", {}).get("attachmentId"):
+            yield part
+        if part.get("parts"):
+            yield from _attachment_parts(part["parts"])
 
-                file_data = base64.urlsafe_b64decode(
-                    attachment_data.get("data", "") + "=="
-                )
 
-                attachment = TechnicalEmailAttachment(
-                    email=email_obj,
-                    original_name=filename,
-                    content_type=content_type,
-                    size=size,
+def _process_attachments(service, created: list):
+    """
+    Télécharge les pièces jointes des emails importés par requêtes groupées
+    d'au plus TECHNIQUE_ATTACHMENT_BATCH_BYTES (taille annoncée par Gmail) et
+    les enregistre avant de lancer le lot suivant. Une pièce au-delà de
+    TECHNIQUE_ATTACHMENT_MAX_BYTES est enregistrée comme ignorée, sans être
+    téléchargée.
+    """
+    stats = {"imported": 0, "errors": 0, "skipped": 0}
+    max_bytes = settings.TECHNIQUE_ATTACHMENT_MAX_BYTES
+    pending = {}
+    for gmail_id, msg_data, email_obj in created:
+        parts = _attachment_parts(msg_data.get("payload", {}).get("parts", []))
+        for index, part in enumerate(parts):
+            if _declared_size(part) > max_bytes:
+                _save_oversized_attachment(email_obj, part, max_bytes)
+                stats["skipped"] += 1
+                continue
+            pending[f"{gmail_id}:{index}"] = (gmail_id, email_obj, part)
+
+    for keys in _attachment_batches(pending, settings.TECHNIQUE_ATTACHMENT_BATCH_BYTES):
+        results, errors = execute_batched(
+            service,
+            {
+                key: service.users().messages().attachments().get(
+                    userId="me", messageId=pending[key][0], id=pending[key][2]["body"]["attachmentId"],
                 )
-                attachment.file.save(filename, ContentFile(file_data), save=True)
+                for key in keys
+            },
+        )
+        for key in keys:
+            _, email_obj, part = pending[key]
+            filename = part.get("filename", "")
+            try:
+                if key in errors:
+                    raise errors[key]
+                # Libère la chaîne base64 dès que la pièce est écrite
+                _store_attachment(email_obj, part, results.pop(key).get("data", ""), max_bytes)
                 print(f"[gmail_import] PJ sauvegardée : {filename}")
                 stats["imported"] += 1
 
@@ -222,5 +354,84 @@ def _process_parts(
                 print(f"[gmail_import] Erreur PJ {filename} : {exc}")
                 stats["errors"] += 1
 
-        if part.get("parts"):
-            _process_parts(service, gmail_id, part["parts"], email_obj, stats)
+    return stats
+
+
+def _declared_size(part: dict) -> int:
+    return part.get("body", {}).get("size", 0) or 0
+
+
+def _attachment_batches(pending: dict, max_batch_bytes: int):
+    """Clés groupées tant que la taille annoncée cumulée reste sous max_batch_bytes."""
+    batch, batch_bytes = [], 0
+    for key, (_, _, part) in pending.items():
+        size = _declared_size(part)
+        if batch and batch_bytes + size > max_batch_bytes:
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(key)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _decode_to_file(data: str, target, max_bytes: int):
+    """
+    Décode la chaîne base64url de Gmail par blocs dans target en calculant
+    son SHA-256. Renvoie (empreinte, taille) ; ValueError au-delà de max_bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for start in range(0, len(data), BASE64_CHUNK_CHARS):
+        chunk = data[start:start + BASE64_CHUNK_CHARS]
+        decoded = base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4))
+        size += len(decoded)
+        if size > max_bytes:
+            raise ValueError(f"Pièce jointe au-delà de {max_bytes} octets.")
+        digest.update(decoded)
+        target.write(decoded)
+    return digest.hexdigest(), size
+
+
+def _store_attachment(email_obj, part: dict, data: str, max_bytes: int) -> TechnicalEmailAttachment:
+    filename = part.get("filename", "")
+    with tempfile.TemporaryFile() as buffer:
+        digest, size = _decode_to_file(data, buffer, max_bytes)
+        attachment = TechnicalEmailAttachment(
+            email=email_obj,
+            original_name=filename,
+            content_type=part.get("mimeType", ""),
+            size=size,
+            sha256=digest,
+        )
+        stored_name = (
+            TechnicalEmailAttachment.objects.filter(email__imported_by=email_obj.imported_by, sha256=digest)
+            .exclude(file="")
+            .values_list("file", flat=True)
+            .first()
+        )
+        if stored_name and attachment.file.storage.exists(stored_name):
+            # Pièce déjà reçue (transfert, réponse) : le fichier stocké est réutilisé
+            attachment.file.name = stored_name
+            attachment.save()
+        else:
+            buffer.seek(0)
+            attachment.file.save(filename, File(buffer, name=filename), save=True)
+    return attachment
+
+
+def _save_oversized_attachment(email_obj, part: dict, max_bytes: int):
+    size = _declared_size(part)
+    TechnicalEmailAttachment.objects.create(
+        email=email_obj,
+        original_name=part.get("filename", ""),
+        content_type=part.get("mimeType", ""),
+        size=size,
+        processing_status="skipped",
+        processing_error=(
+            f"Pièce jointe de {size / 1_000_000:.1f} Mo non téléchargée "
+            f"(limite : {max_bytes / 1_000_000:.0f} Mo)."
+        ),
+        processed_at=timezone.now(),
+    )
+    print(f"[gmail_import] PJ ignorée (taille) : {part.get('filename', '')}")
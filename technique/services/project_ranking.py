@@ -0,0 +1,182 @@
+"""
+Pré-classement local des emails techniques, avant l'appel au LLM.
+
+L'index est construit une fois pour un lot d'emails (ou une requête) à partir
+des dossiers actifs : références, termes du nom, de l'affaire et de l'adresse
+(pondérés par leur rareté), et historique des expéditeurs (table EmailAffinity).
+Chaque email est noté contre cet index en mémoire, sans requête SQL :
+
+- seuls les EMAIL_CLASSIFY_CANDIDATES meilleurs dossiers sont proposés au LLM,
+  au lieu des 30 premiers par référence, sauf si aucun n'est assez sûr
+  (voir ai_classify.prompt_projects) ;
+- quand un dossier l'emporte nettement (score et écart suffisants), l'email
+  est classé sans appel au LLM.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from email.utils import parseaddr
+
+from django.conf import settings
+
+from technique.models import EmailAffinity
+from technique.services.chunk_index import fold, tokenize
+
+# Poids des champs d'un dossier dans le score lexical
+FIELD_WEIGHTS = {"name": 3.0, "affaire": 2.0, "adresse_bien": 1.0}
+SUBJECT_BOOST = 2.0
+REFERENCE_SCORE = 10.0
+SENDER_SCORE = 4.0
+# Au-delà, le corps de l'email n'apporte plus rien au pré-classement
+BODY_MAX_LENGTH = 5000
+# Une référence plus courte (après normalisation) est trop ambiguë
+REFERENCE_MIN_LENGTH = 3
+
+_ALNUM_RE = re.compile(r"[a-z0-9]+")
+
+
+def _reference_parts(text):
+    return _ALNUM_RE.findall(fold(text or ""))
+
+
+def _index_terms(text):
+    # Les petits nombres (numéro de rue, étage) se retrouvent dans tous les emails
+    return {term for term in tokenize(text) if not (term.isdigit() and len(term) < 3)}
+
+
+def sender_address(sender):
+    return parseaddr(sender or "")[1].strip().lower()
+
+
+@dataclass(frozen=True)
+class Candidate:
+    project: object
+    score: float
+    reference_match: bool = False
+
+
+@dataclass(frozen=True)
+class ProjectIndex:
+    projects: dict
+    postings: dict
+    references: dict
+    reference_max_parts: int
+    senders: dict
+
+    def rank(self, email, limit=None):
+        """Dossiers de score positif pour l'email, du plus probable au moins probable."""
+        subject = email.subject or ""
+        body = (email.body or "")[:BODY_MAX_LENGTH]
+        scores = defaultdict(float)
+
+        subject_terms = _index_terms(subject)
+        for term in subject_terms | _index_terms(body):
+            boost = SUBJECT_BOOST if term in subject_terms else 1.0
+            for project_id, weight in self.postings.get(term, {}).items():
+                scores[project_id] += weight * boost
+
+        referenced = self._referenced_projects(f"{subject} {body}")
+        for project_id in referenced:
+            scores[project_id] += REFERENCE_SCORE
+
+        history = self.senders.get(sender_address(email.sender))
+        if history:
+            total = sum(history.values())
+            for project_id, count in history.items():
+                scores[project_id] += SENDER_SCORE * count / total
+
+        ranked = sorted(
+            (
+                Candidate(self.projects[project_id], score, project_id in referenced)
+                for project_id, score in scores.items()
+                if score > 0
+            ),
+            key=lambda candidate: (-candidate.score, candidate.project.reference),
+        )
+        return ranked[:limit] if limit else ranked
+
+    def _referenced_projects(self, text):
+        parts = _reference_parts(text)
+        found = set()
+        # Une référence « TECH-001 » peut être écrite « TECH 001 » ou « tech001 »
+        for start in range(len(parts)):
+            key = ""
+            for part in parts[start:start + self.reference_max_parts]:
+                key += part
+                project_id = self.references.get(key)
+                if project_id is not None:
+                    found.add(project_id)
+        return found
+
+
+def build_project_index(projects, sender_history=True) -> ProjectIndex:
+    """
+    Indexe les dossiers donnés. Avec sender_history, les affinités
+    expéditeur → dossier apprises (technique.services.email_affinity) sont lues
+    en une requête.
+    """
+    projects = {project.pk: project for project in projects}
+    field_terms = {
+        project_id: {
+            field: _index_terms(getattr(project, field, "") or "")
+            for field in FIELD_WEIGHTS
+        }
+        for project_id, project in projects.items()
+    }
+
+    document_frequency = Counter()
+    for fields in field_terms.values():
+        document_frequency.update(set().union(*fields.values()))
+    project_count = len(projects)
+
+    postings = defaultdict(dict)
+    for project_id, fields in field_terms.items():
+        for field, terms in fields.items():
+            for term in terms:
+                idf = math.log(1 + project_count / document_frequency[term])
+                weight = FIELD_WEIGHTS[field] * idf
+                if weight > postings[term].get(project_id, 0.0):
+                    postings[term][project_id] = weight
+
+    references = {}
+    reference_max_parts = 1
+    for project_id, project in projects.items():
+        parts = _reference_parts(project.reference)
+        key = "".join(parts)
+        if len(key) >= REFERENCE_MIN_LENGTH:
+            references[key] = project_id
+            reference_max_parts = max(reference_max_parts, len(parts))
+
+    senders = defaultdict(Counter)
+    if sender_history and projects:
+        rows = EmailAffinity.objects.filter(
+            kind="sender", project_id__in=list(projects), count__gt=0,
+        ).values_list("key", "project_id", "count")
+        for address, project_id, count in rows:
+            senders[address][project_id] = count
+
+    return ProjectIndex(
+        projects=projects,
+        postings=dict(postings),
+        references=references,
+        reference_max_parts=reference_max_parts,
+        senders=dict(senders),
+    )
+
+
+def clear_winner(candidates):
+    """
+    Le premier candidat si son avance rend l'appel au LLM inutile, sinon None :
+    score au moins EMAIL_CLASSIFY_SHORTCUT_MIN_SCORE et au moins
+    EMAIL_CLASSIFY_SHORTCUT_MARGIN fois celui du second.
+    """
+    if not candidates:
+        return None
+    best = candidates[0]
+    second = candidates[1].score if len(candidates) > 1 else 0.0
+    if best.score < settings.EMAIL_CLASSIFY_SHORTCUT_MIN_SCORE:
+        return None
+    if second and best.score < settings.EMAIL_CLASSIFY_SHORTCUT_MARGIN * second:
+        return None
+    return best
@@ -1,7 +1,15 @@
+import traceback
+
 from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.db.models import Q
 
+from management.models import OAuthToken
 from technique.models import TechnicalEmail
 from technique.services.attachment_processing import process_attachment
+from technique.services.bulk_classify import run_bulk_classification
+from technique.services.chunk_index import index_documents
+from technique.services.gmail_import import import_technique_emails
 
 
 @shared_task
@@ -19,6 +27,44 @@ def process_email_attachments(email_id):
     }
 
 
+@shared_task
+def run_email_classification_job(job_id):
+    """Classement IA en masse demandé depuis la liste des emails."""
+    job = run_bulk_classification(job_id)
+    return {"success": job.status == "done", "job_id": job.pk, "status": job.status}
+
+
+@shared_task
+def import_technique_mailboxes():
+    """
+    Import planifié (beat) : une sous-tâche par boîte Gmail connectée d'un
+    membre du pôle technique, pour qu'une boîte en erreur ne bloque pas les autres.
+    """
+    user_ids = list(
+        OAuthToken.objects.filter(provider="google", user__is_active=True)
+        .filter(
+            Q(user__is_superuser=True) | Q(user__groups__name__in=["POLE_TECHNIQUE", "CEO"])
+        )
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    for user_id in user_ids:
+        import_technique_mailbox.delay(user_id)
+    return {"success": True, "utilisateurs": len(user_ids)}
+
+
+@shared_task
+def import_technique_mailbox(user_id):
+    """Import incrémental de la boîte Gmail d'un utilisateur (voir gmail_import)."""
+    user = get_user_model().objects.get(pk=user_id)
+    try:
+        stats = import_technique_emails(user)
+    except Exception as exc:
+        traceback.print_exc()
+        return {"success": False, "user_id": user_id, "message": str(exc)}
+    return {"success": True, "user_id": user_id, **stats}
+
+
 def enqueue_email_attachment_processing(email):
     if not email.project_id:
         return {"launched": False, "task_id": "", "attachments": 0}
@@ -36,3 +82,9 @@ def enqueue_email_attachment_processing(email):
             "attachments": 0,
             "error": str(exc),
         }
+
+
+@shared_task
+def index_technique_documents(document_ids):
+    """Reconstruit les passages du chatbot des documents modifiés (voir chunk_index)."""
+    return {"documents": len(document_ids), "passages": index_documents(document_ids)}
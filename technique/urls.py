@@ -15,7 +15,10 @@ urlpatterns = [
     # Emails
     path("email/",views.email_list,name="email_list"),
     path("email/import/",views.email_import_gmail,name="email_import"),
+    path("email/import/<str:task_id>/", views.email_import_status, name="email_import_status"),
     path("email/classify-bulk/",views.email_ai_classify_bulk,   name="email_classify_bulk"),
+    path("email/classify-bulk/<int:job_id>/", views.email_classify_job_status, name="email_classify_job_status"),
+    path("email/classify-bulk/<int:job_id>/cancel/", views.email_classify_job_cancel, name="email_classify_job_cancel"),
     path("email/<int:pk>/",views.email_detail,name="mail_detail"),
     path("email/<int:pk>/assign/",views.mail_assign_project,      name="mail_assign_project"),
     path("email/<int:pk>/classify/",     views.email_ai_classify,        name="email_classify"),
@@ -6,8 +6,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import get_user_model
 from django.contrib import messages
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
 from django.utils import timezone
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -19,6 +21,7 @@ from .services.ai_summary import summarize_document
 from invoices.models import Facture
 from .models import (
     DocumentTechnique,
+    EmailClassificationJob,
     TechnicalProject,
     ProjectExpense,
     TechnicalProjectAction,
@@ -294,8 +297,19 @@ def document_resume_pdf(request, pk):
     response = HttpResponse(content_type="application/pdf")
     filename = f"resume_{doc.pk}.pdf"
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    draw_document_resume_pdf(doc, response)
+    return response
+
 
-    p = canvas.Canvas(response, pagesize=A4)
+def draw_document_resume_pdf(doc, output):
+    """
+    Dessine le PDF de résumé d'un document dans output (réponse HTTP ou fichier).
+
+    Args:
+        doc (DocumentTechnique) : Document résumé
+        output : Flux binaire de destination
+    """
+    p = canvas.Canvas(output, pagesize=A4)
     width, height = A4
 
     x_margin = 2 * cm
@@ -422,7 +436,6 @@ def document_resume_pdf(request, pk):
 
     p.showPage()
     p.save()
-    return response
 
 
 @login_required
@@ -1041,13 +1054,25 @@ def financial_project_pdf(request, pk):
         pk (str): Identifiant du dossier
     """
     project = get_object_or_404(TechnicalProject, pk=pk)
-    project.refresh_amounts_from_expenses()
-    expenses = project.expenses.all().order_by("due_date", "id")
 
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="budget_{project.reference}.pdf"'
+    draw_financial_project_pdf(project, response)
+    return response
 
-    p = canvas.Canvas(response, pagesize=A4)
+
+def draw_financial_project_pdf(project, output):
+    """
+    Dessine le PDF de la vue financière d'un dossier dans output.
+
+    Args:
+        project (TechnicalProject): Dossier concerné
+        output: Flux binaire de destination (réponse HTTP ou fichier)
+    """
+    project.refresh_amounts_from_expenses()
+    expenses = project.expenses.all().order_by("due_date", "id")
+
+    p = canvas.Canvas(output, pagesize=A4)
     width, height = A4
 
     x_margin = 2 * cm
@@ -1120,7 +1145,6 @@ def financial_project_pdf(request, pk):
 
     p.showPage()
     p.save()
-    return response
 
 @login_required
 @user_passes_test(can_view_technical_dossiers, login_url="/", redirect_field_name=None)
@@ -1232,9 +1256,12 @@ def mail_assign_project(request, pk):
             project = get_object_or_404(
                 TechnicalProject, pk=project_id, archived_at__isnull=True
             )
+            previous_project_id = email.project_id if email.status == "classified" else None
             email.project = project
             email.status = "classified"
             email.save(update_fields=["project", "status"])
+            from technique.services.email_affinity import learn_from_email
+            learn_from_email(email, previous_project_id)
             from technique.tasks import enqueue_email_attachment_processing
             processing = enqueue_email_attachment_processing(email)
             if processing.get("launched"):
@@ -1252,12 +1279,38 @@ def mail_assign_project(request, pk):
     return redirect("technique:mail_detail", pk=email.pk)
 
 
+def _email_import_payload(stats):
+    return {
+        "imported": stats["imported"],
+        "skipped": stats["skipped"],
+        "errors": stats["errors"],
+        "affinity_classified": stats["affinity_classified"],
+        "attachments_imported": stats["attachments_imported"],
+        "attachment_errors": stats["attachment_errors"],
+        "attachments_skipped": stats["attachments_skipped"],
+        "attachment_processing_launched": stats["attachment_processing_launched"],
+        "message": (
+            f"{stats['imported']} email(s) importé(s) dont "
+            f"{stats['affinity_classified']} classé(s) par affinité, "
+            f"{stats['skipped']} déjà présent(s), "
+            f"{stats['errors']} erreur(s), "
+            f"{stats['attachments_imported']} pièce(s) jointe(s) enregistrée(s)."
+        ),
+    }
+
+
 @login_required
 @user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
 @require_http_methods(["POST"])
 def email_import_gmail(request):
     """
-    Déclenche l'import des emails Gmail vers TechnicalEmail.
+    Lance l'import des emails Gmail vers TechnicalEmail.
+
+    L'import tourne aussi en tâche planifiée (import_technique_mailboxes) ;
+    ce bouton met en file un import immédiat de la boîte de l'utilisateur
+    (tâche import_technique_mailbox), que le client suit via status_url.
+    Avec TECHNIQUE_GMAIL_IMPORT_EXECUTION=sync, l'import tourne dans la
+    requête, limité aux 50 messages les plus récents au premier passage.
 
     URL  : POST /technique/email/import/
     Auth : utilisateur du groupe POLE_TECHNIQUE
@@ -1265,39 +1318,43 @@ def email_import_gmail(request):
     Returns:
         JsonResponse : {
             'success': bool,
-            'imported': int,
-            'skipped':  int,
-            'errors':   int,
+            'queued': bool,
+            'status_url': str,   # si queued
             'message':  str   # résumé lisible
         }
     """
+    from management.models import OAuthToken
     from technique.services.gmail_import import import_technique_emails
+    from technique.tasks import import_technique_mailbox
+
+    if not OAuthToken.objects.filter(user=request.user, provider="google").exists():
+        return JsonResponse(
+            {
+                "success": False,
+                "message": (
+                    f"L'utilisateur {request.user.username} n'a pas synchronisé sa boîte mail. "
+                    "Cliquez sur « Synchroniser boîte mail » pour autoriser l'accès."
+                ),
+            },
+            status=400,
+        )
 
     try:
-        stats = import_technique_emails(user=request.user, max_results=50)
+        if settings.TECHNIQUE_GMAIL_IMPORT_EXECUTION == "sync":
+            stats = import_technique_emails(user=request.user, max_results=50)
+            return JsonResponse({"success": True, "queued": False, **_email_import_payload(stats)})
 
-        message = (
-            f"{stats['imported']} email(s) importé(s), "
-            f"{stats['skipped']} déjà présent(s), "
-            f"{stats['errors']} erreur(s), "
-            f"{stats['attachments_imported']} pièce(s) jointe(s) enregistrée(s)."
+        task = import_technique_mailbox.delay(request.user.pk)
+        return JsonResponse(
+            {
+                "success": True,
+                "queued": True,
+                "status_url": reverse("technique:email_import_status", args=[task.id]),
+                "message": "Import Gmail lancé en arrière-plan…",
+            },
+            status=202,
         )
 
-        return JsonResponse({
-            "success": True,
-            "imported": stats["imported"],
-            "skipped": stats["skipped"],
-            "errors": stats["errors"],
-            "attachments_imported": stats["attachments_imported"],
-            "attachment_errors": stats["attachment_errors"],
-            "attachment_processing_launched": stats["attachment_processing_launched"],
-            "message": message,
-        })
-
-    except ValueError as exc:
-        # Pas de token OAuth
-        return JsonResponse({"success": False, "message": str(exc)}, status=400)
-
     except Exception as exc:
         import traceback
         traceback.print_exc()
@@ -1307,6 +1364,33 @@ def email_import_gmail(request):
         )
 
 
+@login_required
+@user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
+def email_import_status(request, task_id):
+    """
+    État d'un import lancé par email_import_gmail.
+
+    URL    : GET /technique/email/import/<task_id>/
+    Return : JsonResponse { success, done, ...compteurs de l'import si done }
+    """
+    from celery.result import AsyncResult
+
+    result = AsyncResult(task_id)
+    if not result.ready():
+        return JsonResponse({"success": True, "done": False})
+    if result.failed():
+        return JsonResponse({"success": False, "done": True, "message": "L'import Gmail a échoué."})
+
+    data = result.result if isinstance(result.result, dict) else {}
+    if data.get("user_id") != request.user.pk:
+        raise Http404
+    if not data.get("success"):
+        return JsonResponse(
+            {"success": False, "done": True, "message": data.get("message") or "L'import Gmail a échoué."}
+        )
+    return JsonResponse({"success": True, "done": True, **_email_import_payload(data)})
+
+
 @login_required
 @user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
 def email_detail(request, pk):
@@ -1356,7 +1440,10 @@ def email_ai_classify(request, pk):
     projects = TechnicalProject.objects.filter(archived_at__isnull=True).order_by("reference")
 
     # sleep=0 : pas de pause pour un email individuel (l'utilisateur attend la reponse)
-    result = classify_and_save(email, projects, sleep=0)
+    # refresh=1 : ignore la reponse deja en cache pour ce meme email
+    result = classify_and_save(
+        email, projects, sleep=0, bypass_cache=request.POST.get("refresh") == "1"
+    )
     processing = {"launched": False, "attachments": 0, "task_id": ""}
     email.refresh_from_db(fields=["status", "project"])
     if result.get("saved") and email.status == "classified" and email.project_id:
@@ -1380,100 +1467,83 @@ def email_ai_classify(request, pk):
         "saved": result.get("saved", False),
         "status": email.status,
         "error": result.get("error"),
+        "method": result.get("method"),
         "attachment_processing": processing,
     })
 
 
 # ── Vue 2 : Classement IA en masse ───────────────────────────────────────────
 
+def _serialize_classification_job(job):
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "processed": job.processed,
+        "classified": job.classified,
+        "pending": job.pending,
+        "skipped": job.skipped,
+        "errors": job.errors,
+        "attachment_processing_launched": job.attachment_processing_launched,
+        "resolved_without_llm": job.resolved_without_llm,
+        "llm_calls": job.llm_calls,
+        "llm_avoided_percent": job.llm_avoided_percent,
+        "cancel_requested": job.cancel_requested,
+        "error": job.error,
+        "status_url": reverse("technique:email_classify_job_status", args=[job.pk]),
+        "cancel_url": reverse("technique:email_classify_job_cancel", args=[job.pk]),
+        "message": (
+            f"{job.classified} classé(s) automatiquement, "
+            f"{job.pending} à valider, "
+            f"{job.skipped} non attribué(s), "
+            f"{job.errors} erreur(s) "
+            f"— sur {job.processed}/{job.total} email(s) traité(s), "
+            f"{job.llm_avoided_percent} % sans appel IA."
+        ),
+    }
+
+
 @login_required
 @user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
 @require_http_methods(["POST"])
 def email_ai_classify_bulk(request):
     """
-    Lance la classification IA sur tous les emails au statut 'unassigned'.
-    Une pause de BULK_SLEEP secondes est inseree entre chaque appel Groq
-    pour eviter le rate limit 429.
+    Lance en arriere-plan la classification IA des emails au statut 'unassigned'
+    (voir technique.services.bulk_classify). Un seul job actif par utilisateur :
+    un second clic renvoie le job en cours.
 
     URL    : POST /technique/email/classify-bulk/
-    Return : JsonResponse {
-        success, classified, pending, skipped, errors, total, message
-    }
+    Return : JsonResponse { success, reused, job } ; le client interroge
+             job.status_url jusqu'a un statut final.
     """
-    from technique.services.ai_classify import classify_and_save, BULK_SLEEP
+    from technique.services.bulk_classify import request_bulk_classification
 
-    emails = TechnicalEmail.objects.filter(
-        status="unassigned",
-        imported_by=request.user,
-    ).order_by("-received_at")
-    projects = list(
-        TechnicalProject.objects.filter(archived_at__isnull=True).order_by("reference")
+    job, reused = request_bulk_classification(request.user)
+    job.refresh_from_db()
+    return JsonResponse(
+        {"success": True, "reused": reused, "job": _serialize_classification_job(job)},
+        status=200 if reused else 202,
     )
 
-    stats = {
-        "classified": 0,
-        "pending": 0,
-        "skipped": 0,
-        "errors": 0,
-        "attachment_processing_launched": 0,
-    }
-    total = emails.count()
-
-    print(f"[bulk_classify] Debut classement de {total} email(s) non classes (pause={BULK_SLEEP}s entre chaque)")
-
-    for i, email in enumerate(emails, 1):
-        try:
-            # La pause BULK_SLEEP est inseree APRES chaque appel Groq, sauf le dernier
-            sleep = BULK_SLEEP if i < total else 0
-            result = classify_and_save(email, projects, sleep=sleep)
-
-            if not result["success"]:
-                stats["errors"] += 1
-            elif result["saved"]:
-                # email.status a ete mis a jour en base par classify_and_save, on le relit
-                email.refresh_from_db(fields=["status"])
-                if email.status == "classified":
-                    stats["classified"] += 1
-                    from technique.tasks import enqueue_email_attachment_processing
-                    processing = enqueue_email_attachment_processing(email)
-                    if processing.get("launched"):
-                        stats["attachment_processing_launched"] += processing.get(
-                            "attachments",
-                            0,
-                        )
-                else:
-                    stats["pending"] += 1
-            else:
-                stats["skipped"] += 1
 
-        except Exception as exc:
-            print(f"[bulk_classify] Erreur email {email.pk} : {exc}")
-            stats["errors"] += 1
+@login_required
+@user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
+def email_classify_job_status(request, job_id):
+    job = get_object_or_404(EmailClassificationJob, pk=job_id, requested_by=request.user)
+    return JsonResponse({"success": True, "job": _serialize_classification_job(job)})
 
-    processed = stats["classified"] + stats["pending"] + stats["skipped"] + stats["errors"]
 
-    print(
-        f"[bulk_classify] Termine : "
-        f"{stats['classified']} classes, {stats['pending']} a valider, "
-        f"{stats['skipped']} non attribues, {stats['errors']} erreurs"
-    )
+@login_required
+@user_passes_test(has_technique_access, login_url="/", redirect_field_name=None)
+@require_http_methods(["POST"])
+def email_classify_job_cancel(request, job_id):
+    from technique.services.bulk_classify import cancel_bulk_classification
 
-    return JsonResponse({
-        "success": True,
-        "classified": stats["classified"],
-        "pending": stats["pending"],
-        "skipped": stats["skipped"],
-        "errors": stats["errors"],
-        "total": processed,
-        "attachment_processing_launched": stats["attachment_processing_launched"],
-        "message": (
-            f"{stats['classified']} classé(s) automatiquement, "
-            f"{stats['pending']} à valider, "
-            f"{stats['skipped']} non attribué(s), "
-            f"{stats['errors']} erreur(s) "
-            f"— sur {processed} email(s) traité(s)."
-        ),
-    })
+    job = get_object_or_404(EmailClassificationJob, pk=job_id, requested_by=request.user)
+    cancel_bulk_classification(job)
+    job.refresh_from_db()
+    return JsonResponse({"success": True, "job": _serialize_classification_job(job)})
 # ================== Archivage / restauration / suppression exceptionnelle ==================
 
 @login_required
@@ -195,6 +195,15 @@ def django_db_setup(django_db_setup, django_db_blocker):
 
 
 
+@pytest.fixture(autouse=True)
+def clear_gmail_service_cache():
+    """Les services Gmail en cache sont indexés par pk : on repart de zéro."""
+    from management.oauth_utils import clear_gmail_service_cache as clear
+    clear()
+    yield
+    clear()
+
+
 @pytest.fixture
 def client():
     """Client Django pour les tests de vues"""
@@ -0,0 +1,194 @@
+"""
+Faux service Gmail en mémoire pour les tests et mesures d'appels API.
+
+Chaque `.execute()` (requête simple ou batch) compte pour un aller-retour HTTP
+dans `round_trips` ; `calls` compte les appels unitaires par méthode.
+"""
+import base64
+from collections import Counter
+
+
+class StubHttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class _Request:
+    def __init__(self, stub, path, kwargs):
+        self.stub = stub
+        self.path = path
+        self.kwargs = kwargs
+
+    def run(self):
+        self.stub.calls[self.path] += 1
+        return self.stub.handle(self.path, self.kwargs)
+
+    def execute(self):
+        self.stub.round_trips += 1
+        return self.run()
+
+
+class _Batch:
+    def __init__(self, stub, callback):
+        self.stub = stub
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.stub.round_trips += 1
+        self.stub.batch_sizes.append(len(self.requests))
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request.run(), None
+            except StubHttpError as exc:
+                response, exception = None, exc
+            callback(request_id, response, exception)
+
+
+class _Resource:
+    RESOURCES = {
+        "users",
+        "users.messages",
+        "users.threads",
+        "users.history",
+        "users.messages.attachments",
+    }
+
+    def __init__(self, stub, prefix):
+        self.stub = stub
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        path = f"{self.prefix}.{name}"
+
+        def call(**kwargs):
+            if path in self.RESOURCES:
+                return _Resource(self.stub, path)
+            return _Request(self.stub, path, kwargs)
+
+        return call
+
+
+class StubGmailService:
+    def __init__(self, own_email):
+        self.own_email = own_email
+        self.messages = {}
+        self.attachments = {}
+        self.history = []
+        self.history_id = 1000
+        self.expired_before = 0
+        self.failures = {}
+        self.calls = Counter()
+        self.round_trips = 0
+        self.batch_sizes = []
+
+    def users(self):
+        return _Resource(self, "users")
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.round_trips = 0
+        self.batch_sizes = []
+
+    @property
+    def api_calls(self):
+        return sum(self.calls.values())
+
+    def add_message(self, message_id, thread_id, sender, to, labels, attachments=None):
+        self.history_id += 1
+        parts = [
+            {
+                "mimeType": "text/plain",
+                "body": {"data": base64.urlsafe_b64encode(b"Corps").decode()},
+            }
+        ]
+        for index, (filename, content) in enumerate(attachments or []):
+            attachment_id = f"{message_id}-att-{index}"
+            self.attachments[attachment_id] = content
+            parts.append(
+                {
+                    "filename": filename,
+                    "mimeType": "application/pdf",
+                    "body": {"attachmentId": attachment_id, "size": len(content)},
+                }
+            )
+        message = {
+            "id": message_id,
+            "threadId": thread_id,
+            "historyId": str(self.history_id),
+            "internalDate": str(1781521200000 + self.history_id * 1000),
+            "labelIds": labels,
+            "snippet": f"Message {message_id}",
+            "payload": {
+                "mimeType": "multipart/mixed",
+                "headers": [
+                    {"name": "From", "value": sender},
+                    {"name": "To", "value": to},
+                    {"name": "Subject", "value": f"Sujet {thread_id}"},
+                    {"name": "Date", "value": "Mon, 15 Jun 2026 10:00:00 +0000"},
+                ],
+                "parts": parts,
+            },
+        }
+        self.messages[message_id] = message
+        self.history.append(
+            {
+                "id": str(self.history_id),
+                "messagesAdded": [
+                    {"message": {"id": message_id, "threadId": thread_id, "labelIds": labels}}
+                ],
+            }
+        )
+        return message
+
+    def _maybe_fail(self, key):
+        statuses = self.failures.get(key)
+        if statuses:
+            raise StubHttpError(statuses.pop(0))
+
+    def handle(self, path, kwargs):
+        if path == "users.getProfile":
+            return {"emailAddress": self.own_email, "historyId": str(self.history_id)}
+        if path == "users.messages.list":
+            refs = [
+                {"id": item["id"], "threadId": item["threadId"]}
+                for item in reversed(self.messages.values())
+                if set(kwargs.get("labelIds", [])) <= set(item["labelIds"])
+            ]
+            offset = int(kwargs.get("pageToken") or 0)
+            size = kwargs.get("maxResults", 100)
+            response = {"messages": refs[offset:offset + size]}
+            if offset + size < len(refs):
+                response["nextPageToken"] = str(offset + size)
+            return response
+        if path == "users.messages.get":
+            self._maybe_fail(kwargs["id"])
+            return self.messages[kwargs["id"]]
+        if path == "users.threads.get":
+            self._maybe_fail(kwargs["id"])
+            return {
+                "id": kwargs["id"],
+                "messages": [
+                    item for item in self.messages.values() if item["threadId"] == kwargs["id"]
+                ],
+            }
+        if path == "users.messages.attachments.get":
+            self._maybe_fail(kwargs["id"])
+            content = self.attachments[kwargs["id"]]
+            return {"data": base64.urlsafe_b64encode(content).decode(), "size": len(content)}
+        if path == "users.history.list":
+            start = int(kwargs["startHistoryId"])
+            if start < self.expired_before:
+                raise StubHttpError(404)
+            return {
+                "history": [item for item in self.history if int(item["id"]) > start],
+                "historyId": str(self.history_id),
+            }
+        raise AssertionError(f"Appel Gmail inattendu : {path}")
@@ -0,0 +1,148 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+
+from config.cache import TwoTierCache, invalidate_namespace, namespace_key
+
+
+def _two_tier(shared_alias="shared", **options):
+    return TwoTierCache(
+        None,
+        {"OPTIONS": {"SHARED_ALIAS": shared_alias, "MAX_ENTRIES": 100, "LOCAL_TIMEOUT": 30, **options}},
+    )
+
+
+@pytest.fixture
+def shared_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "two-tier-tests"},
+    }
+    shared = caches["shared"]
+    shared.clear()
+    yield shared
+    shared.clear()
+
+
+def test_local_tier_serves_repeated_reads_and_counts_hits(shared_cache):
+    cache = _two_tier()
+    cache.set("dossier", {"reference": "ADM-1"})
+
+    with patch.object(type(shared_cache), "get", side_effect=AssertionError("cache partagé interrogé")):
+        value = cache.get("dossier")
+    value["reference"] = "modifié"
+
+    assert cache.get("dossier") == {"reference": "ADM-1"}
+    assert cache.get("absent", "défaut") == "défaut"
+    assert cache.stats() == {
+        "local_hits": 2,
+        "shared_hits": 0,
+        "misses": 1,
+        "evictions": 0,
+        "local_entries": 1,
+    }
+
+
+def test_lru_is_bounded_and_falls_back_to_shared_tier(shared_cache):
+    cache = _two_tier(MAX_ENTRIES=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["local_entries"] == 2
+    assert cache.get("a") == "A"
+    assert cache.stats()["shared_hits"] == 1
+
+
+def test_local_entries_expire_with_their_own_ttl_or_local_timeout(shared_cache):
+    writer = _two_tier(LOCAL_TIMEOUT=10)
+    reader = _two_tier(LOCAL_TIMEOUT=10)
+    writer.set("court", "v1", timeout=2)
+    writer.set("long", "v1", timeout=3600)
+    assert reader.get("long") == "v1"
+    writer.set("long", "v2", timeout=3600)
+
+    now = time.monotonic()
+    with patch("config.cache.time.monotonic", return_value=now + 5):
+        # TTL de 2 s dépassé en local ; la valeur périmée de l'autre processus reste lue
+        assert writer.stats()["local_entries"] == 2
+        assert writer.get("court") == "v1"  # relue depuis le cache partagé
+        assert reader.get("long") == "v1"
+    with patch("config.cache.time.monotonic", return_value=now + 11):
+        assert reader.get("long") == "v2"
+
+    assert writer.stats()["shared_hits"] == 1
+
+
+def test_value_read_from_shared_tier_is_kept_local_timeout_seconds(shared_cache):
+    reader = _two_tier(LOCAL_TIMEOUT=10)
+    shared_cache.set("court", "v1", timeout=60)
+    assert reader.get("court") == "v1"
+    shared_cache.delete("court")  # expirée côté partagé
+
+    now = time.monotonic()
+    with patch("config.cache.time.monotonic", return_value=now + 9):
+        # TTL restant inconnu à la relecture : servie jusqu'à LOCAL_TIMEOUT
+        assert reader.get("court") == "v1"
+    with patch("config.cache.time.monotonic", return_value=now + 11):
+        assert reader.get("court") is None
+
+
+def test_add_and_delete_are_arbitrated_by_shared_tier(shared_cache):
+    first = _two_tier()
+    second = _two_tier()
+
+    assert first.add("verrou", "worker-1", timeout=60) is True
+    assert second.add("verrou", "worker-2", timeout=60) is False
+    first.delete("verrou")
+    assert second.add("verrou", "worker-2", timeout=60) is True
+
+
+def test_namespace_invalidation_hides_previous_keys(shared_cache):
+    cache = _two_tier()
+    key = namespace_key("dashboard", "kpi", cache=cache)
+    cache.set(key, 42)
+
+    invalidate_namespace("dashboard", cache=cache)
+    new_key = namespace_key("dashboard", "kpi", cache=cache)
+
+    assert new_key != key
+    assert cache.get(new_key) is None
+    assert cache.get(key) == 42
+
+    # Invalidation faite par un autre processus : vue sans attendre LOCAL_TIMEOUT
+    other_process = _two_tier()
+    invalidate_namespace("dashboard", cache=other_process)
+    assert namespace_key("dashboard", "kpi", cache=cache) not in (key, new_key)
+
+
+@pytest.mark.django_db
+def test_cache_get_latency_benchmark(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "my_cache_table"},
+    }
+    call_command("createcachetable", "my_cache_table", verbosity=0)
+    database_cache = caches["shared"]
+    cache = _two_tier()
+    payload = {"kpi": list(range(50))}
+    cache.set("bench", payload)
+    rounds = 300
+
+    def timed(backend):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            assert backend.get("bench") == payload
+        return (time.perf_counter() - start) / rounds * 1e6
+
+    database_us = timed(database_cache)
+    two_tier_us = timed(cache)
+    print(
+        f"\n[bench cache.get] DatabaseCache={database_us:.1f} µs, "
+        f"deux niveaux={two_tier_us:.1f} µs ({rounds} lectures)"
+    )
+    assert cache.stats()["local_hits"] == rounds
+    assert two_tier_us < database_us
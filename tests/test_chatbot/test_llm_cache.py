@@ -0,0 +1,165 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chatbot.llm_cache import cache_key, get_cached_response, llm_cache_stats, store_response
+from chatbot.models import LLMCacheCounter, LLMCacheEntry
+from chatbot.tasks import evict_llm_cache_entries
+
+
+def _payload(content="Quel est le délai de rétractation ?", temperature=0.2):
+    return {
+        "model": "llama-3.3-70b-versatile",
+        "temperature": temperature,
+        "max_tokens": 800,
+        "messages": [
+            {"role": "system", "content": "Tu es un assistant."},
+            {"role": "user", "content": content},
+        ],
+    }
+
+
+def _groq_response(content):
+    response = Mock(status_code=200)
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+
+@pytest.fixture
+def llm_cache(settings):
+    settings.LLM_CACHE_ENABLED = True
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "llm-cache-tests"},
+    }
+    from django.core.cache import cache
+
+    from chatbot import llm_cache as llm_cache_module
+
+    cache.clear()
+    llm_cache_module._pending_entry_hits.clear()
+    yield settings
+    cache.clear()
+    llm_cache_module._pending_entry_hits.clear()
+
+
+def test_cache_key_depends_on_model_parameters_and_messages():
+    assert cache_key(_payload()) == cache_key(_payload())
+    assert cache_key(_payload()) != cache_key(_payload(temperature=0.0))
+    assert cache_key(_payload()) != cache_key(_payload(content="Autre question"))
+
+
+@pytest.mark.django_db
+def test_repeated_document_query_is_served_from_cache(llm_cache, monkeypatch):
+    from chatbot.views import _handle_document_query
+
+    llm_cache.LLM_CACHE_TOUCH_INTERVAL_SECONDS = 0
+    monkeypatch.setattr("chatbot.views._build_rag_context", lambda _message: "")
+    with patch("requests.Session.post", return_value=_groq_response("Dix jours.")) as post:
+        first = _handle_document_query("Délai de rétractation ?")
+        second = _handle_document_query("Délai de rétractation ?")
+
+    assert first == second == "Dix jours."
+    assert post.call_count == 1
+    assert LLMCacheEntry.objects.get().hit_count == 1
+    stats = llm_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == len("Dix jours.")
+
+
+@pytest.mark.django_db
+def test_counters_are_kept_in_the_database(llm_cache):
+    from django.core.cache import cache
+
+    store_response(_payload(), "Dix jours.")
+    get_cached_response(_payload())
+    get_cached_response(_payload("Autre question"))
+    get_cached_response(_payload(), bypass=True)
+    cache.clear()
+
+    assert dict(LLMCacheCounter.objects.values_list("name", "value")) == {"hits": 1, "misses": 1, "bypass": 1}
+    assert llm_cache_stats()["hit_rate"] == 0.5
+
+
+@pytest.mark.django_db
+def test_bypass_forces_a_new_call_and_refreshes_the_entry(llm_cache):
+    from technique.services.ai_summary import _call_groq_chunk
+
+    responses = [_groq_response('{"resume": "- v1"}'), _groq_response('{"resume": "- v2"}')]
+    with patch("requests.Session.post", side_effect=responses) as post:
+        assert _call_groq_chunk("Extrait")["resume"] == "- v1"
+        assert _call_groq_chunk("Extrait", bypass_cache=True)["resume"] == "- v2"
+        assert _call_groq_chunk("Extrait")["resume"] == "- v2"
+
+    assert post.call_count == 2
+    assert llm_cache_stats()["bypass"] == 1
+
+
+@pytest.mark.django_db
+def test_expired_and_oversized_responses_are_not_served(llm_cache):
+    llm_cache.LLM_CACHE_MAX_ENTRY_BYTES = 10
+    assert store_response(_payload("long"), "x" * 11) is None
+
+    store_response(_payload(), "court")
+    LLMCacheEntry.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert get_cached_response(_payload()) is None
+    assert get_cached_response(_payload(), bypass=True) is None
+
+
+@pytest.mark.django_db
+def test_hits_touch_the_entry_at_most_once_per_interval(llm_cache):
+    llm_cache.LLM_CACHE_TOUCH_INTERVAL_SECONDS = 3600
+    store_response(_payload(), "Dix jours.")
+
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(3):
+            assert get_cached_response(_payload()) == "Dix jours."
+    assert not [query for query in queries.captured_queries if query["sql"].startswith('UPDATE "chatbot_llmcacheentry"')]
+
+    LLMCacheEntry.objects.update(last_used_at=timezone.now() - timedelta(hours=2))
+    assert get_cached_response(_payload()) == "Dix jours."
+
+    entry = LLMCacheEntry.objects.get()
+    assert entry.hit_count == 4
+    assert entry.last_used_at > timezone.now() - timedelta(minutes=1)
+
+
+@pytest.mark.django_db
+def test_least_recently_used_entries_are_evicted(llm_cache):
+    llm_cache.LLM_CACHE_MAX_ENTRIES = 2
+    store_response(_payload("a"), "A")
+    store_response(_payload("b"), "B")
+    LLMCacheEntry.objects.filter(key=cache_key(_payload("a"))).update(
+        last_used_at=timezone.now() + timedelta(seconds=1)
+    )
+    store_response(_payload("c"), "C")
+    # Les enregistrements n'appliquent plus les plafonds : la tâche planifiée s'en charge
+    assert LLMCacheEntry.objects.count() == 3
+
+    assert evict_llm_cache_entries() == {"success": True, "supprimees": 1}
+    assert LLMCacheEntry.objects.count() == 2
+    assert get_cached_response(_payload("a")) == "A"
+    assert get_cached_response(_payload("b")) is None
+
+    llm_cache.LLM_CACHE_MAX_BYTES = 1
+    call_command("llm_cache", "--evict", verbosity=0)
+    assert LLMCacheEntry.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_disabled_cache_calls_the_api_every_time(settings):
+    from chatbot.views import _route_message
+
+    settings.LLM_CACHE_ENABLED = False
+    with patch("requests.Session.post", return_value=_groq_response("invoice")) as post:
+        assert _route_message("Factures impayées ?") == "invoice"
+        assert _route_message("Factures impayées ?") == "invoice"
+
+    assert post.call_count == 2
+    assert not LLMCacheEntry.objects.exists()
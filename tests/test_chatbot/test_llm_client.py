@@ -0,0 +1,121 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from chatbot.groq_stub import GroqStubServer
+from chatbot.llm_client import GroqBackend, LLMBusyError, LLMClient, LLMHTTPError, get_llm_client
+from chatbot.rate_limit import TokenBucketLimiter
+
+
+def _messages(text="Bonjour"):
+    return [{"role": "system", "content": "Tu es un assistant."}, {"role": "user", "content": text}]
+
+
+def _client(backend, **options):
+    options.setdefault("limiter", Mock())
+    return LLMClient(backend, model="modele-test", backoff_seconds=0.5, **options)
+
+
+def _response(status, content="", headers=None):
+    response = Mock(status_code=status, headers=headers or {})
+    response.json.return_value = {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3},
+    }
+    return response
+
+
+def test_shared_client_reuses_connections_and_records_metrics(settings):
+    with GroqStubServer() as stub:
+        settings.LLM_API_URL = stub.url
+        client = get_llm_client()
+        responses = [client.chat(_messages(f"Question {i}"), purpose="test") for i in range(5)]
+        assert get_llm_client() is client
+
+    assert stub.calls == 5
+    assert stub.connections == 1
+    assert responses[0].content.startswith('{"resume": "- Question 0')
+    assert responses[0].usage["completion_tokens"] > 0
+    metrics = client.metrics()["test"]
+    assert metrics["calls"] == 5
+    assert metrics["errors"] == 0
+    assert metrics["prompt_tokens"] > 0
+    assert metrics["latency_ms_avg"] > 0
+
+
+def test_concurrency_is_capped_per_process(settings):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with GroqStubServer(latency=0.05) as stub:
+        client = _client(GroqBackend(stub.url, "cle", pool_size=2), max_concurrency=2)
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            list(pool.map(lambda i: client.chat(_messages(str(i))), range(12)))
+
+    assert stub.calls == 12
+    assert stub.max_in_flight == 2
+
+
+def test_server_errors_are_retried_with_exponential_backoff():
+    backend = Mock()
+    backend.post.side_effect = [ConnectionError("coupure"), _response(503), _response(200, "ok")]
+    client = _client(backend)
+
+    with patch("time.sleep") as sleep:
+        response = client.chat(_messages(), purpose="test")
+
+    assert (response.content, response.attempts) == ("ok", 3)
+    assert [c.args[0] for c in sleep.call_args_list] == [0.5, 1.0]
+    assert client.metrics()["test"]["errors"] == 2
+
+
+def test_rate_limit_defers_all_callers_and_client_errors_fail_fast():
+    backend = Mock()
+    backend.post.side_effect = [_response(429, headers={"Retry-After": "4"}), _response(200, "ok")]
+    limiter = Mock()
+    client = _client(backend, limiter=limiter)
+
+    assert client.chat(_messages()).content == "ok"
+    limiter.defer.assert_called_once_with(4.0)
+    assert limiter.acquire.call_count == 2
+
+    backend.post.side_effect = [_response(400)]
+    with pytest.raises(LLMHTTPError) as error:
+        client.chat(_messages())
+    assert error.value.status_code == 400
+    assert backend.post.call_count == 3
+
+
+def test_last_network_error_is_raised_unchanged():
+    backend = Mock()
+    backend.post.side_effect = ConnectionError("coupure")
+
+    with patch("time.sleep"), pytest.raises(ConnectionError):
+        _client(backend).chat(_messages(), max_retries=2)
+
+    assert backend.post.call_count == 2
+
+
+def test_zero_retries_makes_a_single_attempt():
+    backend = Mock()
+    backend.post.side_effect = [_response(503), _response(200, "ok")]
+
+    with patch("time.sleep"), pytest.raises(LLMHTTPError):
+        _client(backend).chat(_messages(), max_retries=0)
+
+    assert backend.post.call_count == 1
+
+
+def test_acquire_timeout_fails_fast_with_busy_error():
+    backend = Mock()
+    backend.post.return_value = _response(200, "ok")
+    limiter = TokenBucketLimiter(requests_per_minute=1, tokens_per_minute=100_000)
+    client = _client(backend, limiter=limiter)
+    client.chat(_messages(), acquire_timeout=1)
+
+    with pytest.raises(LLMBusyError) as error:
+        client.chat(_messages(), acquire_timeout=1, purpose="test")
+
+    assert error.value.status_code == 429
+    assert backend.post.call_count == 1
+    assert client.metrics()["test"]["errors"] == 1
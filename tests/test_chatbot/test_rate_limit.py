@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from chatbot.rate_limit import TokenBucketLimiter, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_requests_beyond_the_burst_wait_for_refill():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(requests_per_minute=2, tokens_per_minute=1000, clock=clock)
+
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    assert limiter._wait_time(0, clock.now) == 30
+
+    clock.now += 30
+    assert limiter.acquire() == 0
+
+
+def test_token_budget_is_shared_and_capped():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(requests_per_minute=100, tokens_per_minute=600, clock=clock)
+
+    limiter.acquire(500)
+    assert limiter._wait_time(200, clock.now) == 10
+
+    # Un appel plus gros que le quota attend simplement le seau plein
+    clock.now += 50
+    assert limiter.acquire(10_000) == 0
+    assert limiter._tokens == 0
+
+
+def test_acquire_gives_up_when_the_wait_exceeds_the_timeout():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(requests_per_minute=1, tokens_per_minute=1000, clock=clock)
+    limiter.acquire()
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=5)
+
+    # Rien n'a été réservé : la requête suivante part dès le seau rempli
+    clock.now += 60
+    assert limiter.acquire(timeout=5) == 0
+
+
+def test_defer_blocks_waiting_threads_until_retry_after():
+    limiter = TokenBucketLimiter(requests_per_minute=1000, tokens_per_minute=1000)
+    limiter.defer(0.2)
+    waited = []
+
+    thread = threading.Thread(target=lambda: waited.append(limiter.acquire()))
+    thread.start()
+    thread.join(timeout=2)
+
+    assert waited and 0.15 <= waited[0] < 1
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3", default=5.0) == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", default=5.0) == 0.0
+    assert parse_retry_after(None, default=5.0) == 5.0
+    assert parse_retry_after("bientôt", default=5.0) == 5.0
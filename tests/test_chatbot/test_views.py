@@ -24,7 +24,7 @@ def test_chatbot_query_requires_authentication(client):
 def test_chatbot_query_persists_each_exchange(client, monkeypatch):
     user = User.objects.create_user(username="bob", password="pass123")
     client.force_login(user)
-    monkeypatch.setattr("chatbot.views._route_message", lambda _message: "legal")
+    monkeypatch.setattr("chatbot.views._route_message", lambda _message, **_kwargs: "legal")
     monkeypatch.setattr("chatbot.views._handle_legal_query", lambda _message: "Réponse test")
 
     for message in ["Question 1", "Question 2"]:
@@ -72,3 +72,42 @@ def test_multi_department_navigation_keeps_single_signature_entry(client):
     assert navigation.count("TECHNIQUE") == 1
     assert navigation.count("Signatures") == 1
     assert "Dossiers techniques" not in navigation
+
+
+@pytest.mark.django_db
+def test_dashboard_permissions_are_loaded_once_per_request(client):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    group, _ = Group.objects.get_or_create(name="POLE_FINANCIER")
+    user = User.objects.create_user(username="snapshot-finance", email="snapshot-finance@example.com")
+    user.groups.add(group)
+    client.force_login(user)
+    client.get("/")
+
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    group_queries = [query["sql"] for query in captured if "auth_user_groups" in query["sql"]]
+    assert len(group_queries) == 1
+
+
+@pytest.mark.django_db
+def test_permission_snapshot_follows_group_changes():
+    from user_access.user_test_functions import has_finance_access, has_technique_access
+
+    finance, _ = Group.objects.get_or_create(name="POLE_FINANCIER")
+    technique, _ = Group.objects.get_or_create(name="POLE_TECHNIQUE")
+    user = User.objects.create_user(username="snapshot-groups", email="snapshot-groups@example.com")
+
+    assert has_finance_access(user) is False
+    user.groups.add(finance)
+    assert has_finance_access(user) is True
+    technique.user_set.add(user)
+    assert has_technique_access(user) is True
+    user.groups.clear()
+    assert has_finance_access(user) is False
+    user.is_staff = True
+    user.save()
+    assert has_finance_access(user) is True
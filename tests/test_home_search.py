@@ -0,0 +1,161 @@
+import importlib
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import connection
+
+from home.models import SearchEntry
+from home.search import search
+from home.tasks import index_search_entries
+from invoices.models import ActeurExterne, Client, Entreprise, Facture, Fournisseur
+from signatures.models import Document
+from technique.models import DocumentTechnique, TechnicalProject
+
+
+@pytest.fixture
+def search_data(db):
+    supplier = Fournisseur.objects.create(id=ActeurExterne.objects.create(id="SUP-S"), nom="Charpentes Martin")
+    client = Client.objects.create(id=ActeurExterne.objects.create(id="CLI-S"))
+    Entreprise.objects.create(id=client, nom="Client Recherche")
+    project = TechnicalProject.objects.create(reference="TECH-777", name="Résidence des Lilas")
+    facture = Facture.objects.create(
+        id="FAC-777", numero_facture="FA-777", titre="Travaux toiture", fournisseur=supplier, client=client,
+    )
+    document = Document.objects.create(titre="Contrat charpente", fichier="contrat.pdf")
+    doc_tech = DocumentTechnique.objects.create(
+        titre="Devis charpente", fichier="devis.pdf", project=project, texte_brut="Charpente bois.",
+    )
+    return {"facture": facture, "document": document, "project": project, "doc_tech": doc_tech}
+
+
+def _user(username, *groups, **flags):
+    user = User.objects.create_user(username=username, **flags)
+    for name in groups:
+        user.groups.add(Group.objects.get_or_create(name=name)[0])
+    return user
+
+
+def test_index_follows_saves_and_deletes(search_data):
+    assert SearchEntry.objects.count() == 4
+    entry = SearchEntry.objects.get(source="facture", object_id="FAC-777")
+    assert "Charpentes Martin" in entry.body and "Client Recherche" in entry.body
+
+    search_data["project"].name = "Résidence des Tilleuls"
+    search_data["project"].save()
+    assert SearchEntry.objects.get(source="projet").title == "Résidence des Tilleuls"
+
+    search_data["document"].delete()
+    assert not SearchEntry.objects.filter(source="document").exists()
+
+
+def test_renaming_related_objects_updates_dependent_entries(search_data):
+    entreprise = search_data["facture"].client.entreprise
+    entreprise.nom = "Client Renommé"
+    entreprise.save()
+    search_data["project"].name = "Résidence des Tilleuls"
+    search_data["project"].save()
+    Facture.objects.filter(pk="FAC-777").update(dossier=search_data["project"])
+    search_data["project"].reference = "TECH-778"
+    search_data["project"].save(update_fields=["reference"])
+
+    facture_entry = SearchEntry.objects.get(source="facture")
+    assert "Client Renommé" in facture_entry.body and "TECH-778" in facture_entry.body
+    doc_tech_entry = SearchEntry.objects.get(source="document_technique")
+    assert doc_tech_entry.reference == "TECH-778" and "Tilleuls" in doc_tech_entry.body
+
+
+def test_indexing_is_queued_after_commit(search_data, settings, django_capture_on_commit_callbacks):
+    settings.SEARCH_INDEX_EXECUTION = "celery"
+    author = _user("auteur", first_name="Jeanne")
+
+    with patch("home.tasks.index_search_entries.delay") as delay_mock:
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            search_data["document"].titre = "Contrat couverture"
+            search_data["document"].save()
+            # Rien n'est écrit dans la requête : la tâche le fera
+            assert SearchEntry.objects.get(source="document").title == "Contrat charpente"
+        assert len(callbacks) == 1
+        delay_mock.assert_called_once_with("document", {"pk__in": [search_data["document"].pk]})
+
+        delay_mock.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            author.save(update_fields=["last_login"])
+        assert callbacks == []
+
+    index_search_entries("document", {"pk__in": [search_data["document"].pk]})
+    assert SearchEntry.objects.get(source="document").title == "Contrat couverture"
+
+
+def test_search_ranks_across_sources_and_filters_permissions(search_data, django_assert_max_num_queries):
+    ceo = _user("ceo", is_superuser=True, is_staff=True)
+    technique = _user("technique", "POLE_TECHNIQUE")
+
+    with django_assert_max_num_queries(6):
+        sections = search(ceo, "Lilas")
+    assert [source for source, _ in sections] == ["projet", "document_technique"]
+    assert sections[0][1] == [search_data["project"]]
+    assert dict(search(ceo, "FAC-777")) == {"facture": [search_data["facture"]]}
+
+    sections = dict(search(technique, "charpente"))
+    assert set(sections) == {"document_technique"}
+    assert dict(search(ceo, "charpente")).keys() == {"facture", "document", "document_technique"}
+    assert search(_user("sans-groupe"), "charpente") == []
+
+
+def test_search_limits_results_per_source(search_data):
+    for index in range(4):
+        TechnicalProject.objects.create(reference=f"LIM-{index}", name=f"Dossier limite {index}")
+
+    sections = dict(search(_user("technique", "POLE_TECHNIQUE"), "limite", limit_per_source=3))
+
+    assert len(sections["projet"]) == 3
+
+
+def test_global_search_view_renders_invoice_results(client, search_data):
+    finance = _user("finance", "POLE_FINANCIER")
+    client.force_login(finance)
+
+    response = client.get("/recherche/", {"q": "Charpentes Martin"})
+
+    assert response.status_code == 200
+    assert response.context["factures"] == [search_data["facture"]]
+    assert "Client Recherche" in response.content.decode()
+
+
+def test_rebuild_command_restores_index(search_data):
+    SearchEntry.objects.all().delete()
+    TechnicalProject.objects.filter(pk=search_data["project"].pk).update(name="Renommé en masse")
+
+    call_command("rebuild_search_index", "--source", "projet", "--source", "facture", stdout=None)
+
+    assert SearchEntry.objects.filter(source="projet", title="Renommé en masse").exists()
+    assert SearchEntry.objects.filter(source="facture").count() == 1
+    assert not SearchEntry.objects.filter(source="document").exists()
+
+
+def test_backfill_migration_fills_an_empty_index(search_data):
+    backfill = importlib.import_module("home.migrations.0002_backfill_search_index").backfill_search_index
+    schema_editor = SimpleNamespace(connection=connection)
+    SearchEntry.objects.all().delete()
+
+    backfill(apps, schema_editor)
+
+    assert SearchEntry.objects.count() == 4
+    SearchEntry.objects.filter(source="projet").update(title="Déjà indexé")
+    backfill(apps, schema_editor)
+    assert SearchEntry.objects.get(source="projet").title == "Déjà indexé"
+
+
+@pytest.mark.django_db
+def test_benchmark_command_runs_on_seeded_dataset(capsys):
+    call_command("benchmark_global_search", "--seed", "30", "--repeat", "2", "--query", "BENCH-0012")
+
+    output = capsys.readouterr().out
+    print(output)
+    assert "'BENCH-0012' : icontains" in output
+    assert not TechnicalProject.objects.exists()
+    assert not SearchEntry.objects.exists()
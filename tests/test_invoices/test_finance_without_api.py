@@ -1,3 +1,4 @@
+import io
 from datetime import date, timedelta
 
 import pytest
@@ -5,6 +6,7 @@ from django.contrib.auth.models import Group, User
 from django.core import mail
 from django.utils import timezone
 from unittest.mock import patch
+from openpyxl import load_workbook
 
 from invoices.forms import FactureForm
 from invoices.models import (
@@ -21,7 +23,8 @@ from invoices.models import (
     Societe,
 )
 from management.models import OAuthToken
-from invoices.services.quality import get_invoice_anomalies
+from config.db_metrics import count_queries
+from invoices.services.quality import count_invoice_anomalies, get_invoice_anomalies
 from invoices.tasks import check_and_send_invoice_reminders
 from invoices.views_dashboard import DashboardView
 from technique.models import DocumentTechnique, TechnicalProject
@@ -619,3 +622,101 @@ def test_finance_user_can_change_invoice_status(client, finance_user, invoice, s
     assert response.status_code == 302
     invoice.refresh_from_db()
     assert invoice.statut == "paid"
+
+
+@pytest.mark.django_db
+def test_invoice_excel_export_is_streamed(client, finance_user, invoice):
+    client.force_login(finance_user)
+
+    response = client.get("/finance/", {"export": "xlsx"})
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Disposition"] == 'attachment; filename="factures.xlsx"'
+    sheet = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+    assert sheet.title == "Factures"
+    assert [cell.value for cell in sheet[2]] == [
+        "FAC-001",
+        "FA-2026-001",
+        str(invoice.societe),
+        "Affaire Démo",
+        "TECH-001 - Projet Test",
+        "Financier",
+        "Fournisseur Énergie",
+        1234.5,
+        "En cours",
+        None,
+        invoice.echeance.strftime("%Y-%m-%d"),
+        "Normal",
+        None,
+    ]
+
+
+@pytest.mark.django_db
+def test_invoice_export_job_applies_list_filters(client, finance_user, invoice, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    client.force_login(finance_user)
+
+    matching = client.post(
+        "/api/exports/", {"kind": "factures", "format": "xlsx", "statut": "ongoing"}
+    ).json()["job"]
+    empty = client.post(
+        "/api/exports/", {"kind": "factures", "format": "pdf", "statut": "paid"}
+    ).json()["job"]
+
+    assert matching["status"] == "done"
+    assert empty["status"] == "done"
+    download = client.get(matching["download_url"])
+    sheet = load_workbook(io.BytesIO(b"".join(download.streaming_content))).active
+    assert [row[0] for row in sheet.iter_rows(min_row=2, values_only=True)] == ["FAC-001"]
+
+
+def _dashboard_context(rf, user):
+    view = DashboardView()
+    view.setup(rf.get("/finance/dashboard/"))
+    view.request.user = user
+    context = view.get_context_data()
+    # Les classements sont évalués par le template
+    list(context["risky_suppliers"])
+    list(context["top_suppliers"])
+    return context
+
+
+def _seed_dashboard_invoices(count, supplier, client_entity, societe, offset=0):
+    for index in range(count):
+        project = TechnicalProject.objects.create(
+            reference=f"BENCH-{offset + index}", name=f"Projet {index}"
+        )
+        invoice = Facture.objects.create(
+            id=f"FAC-BENCH-{offset + index}",
+            numero_facture="DUP" if index % 4 == 0 else f"N-{offset + index}",
+            societe=societe if index % 3 else None,
+            affaire="Doublon" if index % 4 == 0 else str(project),
+            dossier=project if index % 5 else None,
+            fournisseur=supplier,
+            client=client_entity,
+            montant=None if index % 7 == 0 else 100,
+            statut=["ongoing", "received", "paid"][index % 3],
+            echeance=timezone.now() + timedelta(days=(index % 5) - 2),
+        )
+        if invoice.statut == "paid":
+            FactureHistorique.objects.create(facture=invoice, action="status_change", new_status="paid")
+
+
+@pytest.mark.django_db
+def test_dashboard_query_count_is_bounded(rf, finance_user, supplier, client_entity, societe):
+    _seed_dashboard_invoices(3, supplier, client_entity, societe)
+    with count_queries() as small:
+        small_context = _dashboard_context(rf, finance_user)
+    assert small_context["anomaly_count"] == len(get_invoice_anomalies(Facture.objects.all()))
+
+    _seed_dashboard_invoices(40, supplier, client_entity, societe, offset=100)
+    with count_queries() as large:
+        context = _dashboard_context(rf, finance_user)
+
+    print(f"\n[bench dashboard] requêtes SQL : 3 factures={small.count}, 43 factures={large.count}")
+    assert large.count == small.count
+    assert large.count <= 9
+    assert context["kpi"]["total_count"] == 43
+    assert context["anomaly_count"] == len(get_invoice_anomalies(Facture.objects.all()))
+    assert count_invoice_anomalies(Facture.objects.all()) == context["anomaly_count"]
@@ -172,3 +172,21 @@ def test_invalid_or_expired_sender_token_is_reported(invoice_setup):
 
     assert result["success"] is False
     assert "jeton Gmail" in result["message"]
+
+
+@pytest.mark.django_db
+def test_reminder_run_uses_constant_queries_and_reports_summary(invoice_setup):
+    EmailFournisseur.objects.all().delete()
+    for index in range(2):
+        invoice_setup["create_invoice"](f"FAC-SMALL-{index}", 4)
+    small = check_and_send_invoice_reminders()
+    FactureHistorique.objects.all().delete()
+
+    for index in range(20):
+        invoice_setup["create_invoice"](f"FAC-LARGE-{index}", 4)
+    large = check_and_send_invoice_reminders()
+
+    assert large["relances_ignorees"] == 22
+    assert FactureHistorique.objects.filter(action="reminder_skipped").count() == 22
+    assert large["requetes_sql"] == small["requetes_sql"]
+    assert large["duree_secondes"] >= 0
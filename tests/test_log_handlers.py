@@ -0,0 +1,69 @@
+import datetime
+import logging
+import threading
+import time
+
+from config.log_handlers import QueuedDailyFileHandler
+
+
+def _logger(handler, name):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _log_file(tmp_path):
+    return tmp_path / f"{datetime.date.today():%Y-%m-%d}.log"
+
+
+def test_queued_handler_writes_formatted_records_in_batches(tmp_path):
+    handler = QueuedDailyFileHandler(tmp_path, batch_size=50)
+    handler.setFormatter(logging.Formatter("{levelname} {name}: {message}", style="{"))
+    logger = _logger(handler, "tests.audit.batch")
+    writes = []
+    emit_batch = handler.file_handler.emit_batch
+    handler.file_handler.emit_batch = lambda records: (writes.append(len(records)), emit_batch(records))
+
+    try:
+        for index in range(120):
+            logger.info("ACTION %s", index)
+        handler.flush()
+        lines = _log_file(tmp_path).read_text(encoding="utf-8").splitlines()
+    finally:
+        handler.close()
+
+    assert lines[0] == "INFO tests.audit.batch: ACTION 0"
+    assert len(lines) == 120
+    assert sum(writes) == 120
+    assert max(writes) <= 50
+
+
+def test_queued_handler_counts_dropped_records_and_drains_on_close(tmp_path):
+    handler = QueuedDailyFileHandler(tmp_path, queue_size=2, batch_size=10)
+    logger = _logger(handler, "tests.audit.overflow")
+    release = threading.Event()
+    emit_batch = handler.file_handler.emit_batch
+
+    def slow_emit_batch(records):
+        release.wait(5)
+        emit_batch(records)
+
+    handler.file_handler.emit_batch = slow_emit_batch
+    logger.info("premier")
+    deadline = time.monotonic() + 2
+    while not handler.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for index in range(5):
+        logger.info("suivant %s", index)
+
+    assert handler.dropped == 3
+    release.set()
+    handler.close()
+
+    content = _log_file(tmp_path).read_text(encoding="utf-8")
+    assert "premier" in content
+    assert "suivant 0" in content and "suivant 1" in content
+    assert "suivant 2" not in content
+    assert "3 enregistrement(s) de log perdu(s)" in content
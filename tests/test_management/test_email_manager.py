@@ -1,4 +1,5 @@
 import base64
+import time
 from datetime import timedelta
 from email import message_from_bytes
 from unittest.mock import MagicMock, patch
@@ -110,3 +111,124 @@ def test_expired_google_token_is_refreshed(google_user):
     refresh.assert_called_once_with("refresh", "google")
     token.refresh_from_db()
     assert token.refresh_token == "new-refresh"
+
+
+@pytest.mark.django_db
+def test_gmail_service_is_built_once_and_reused(google_user):
+    from management.oauth_utils import get_gmail_service, get_gmail_service_stats
+
+    with patch("googleapiclient.discovery.build", return_value=MagicMock()) as build:
+        first = get_gmail_service(google_user)
+        second = get_gmail_service(google_user)
+        google_user.oauth_token.save()  # sauvegarde sans changement de token
+        third = get_gmail_service(google_user)
+
+    assert first is second is third
+    assert build.call_count == 1
+    assert build.call_args.kwargs["static_discovery"] is True
+    stats = get_gmail_service_stats()
+    assert stats["builds"] == 1
+    assert stats["hits"] == 2
+
+
+@pytest.mark.django_db
+def test_gmail_service_swaps_refreshed_credentials_without_rebuild(google_user):
+    from management.oauth_utils import get_gmail_service, get_gmail_service_stats
+
+    with patch("googleapiclient.discovery.build", return_value=MagicMock()) as build:
+        get_gmail_service(google_user)
+        credentials = build.call_args.kwargs["credentials"]
+        later = timezone.now() + timedelta(hours=2)
+        with (
+            patch("django.utils.timezone.now", return_value=later),
+            patch(
+                "management.oauth_utils.refresh_access_token",
+                return_value={
+                    "access_token": "new-access",
+                    "refresh_token": "refresh",
+                    "token_expiry": later + timedelta(hours=1),
+                },
+            ) as refresh,
+        ):
+            get_gmail_service(google_user)
+            get_gmail_service(google_user)
+
+    refresh.assert_called_once()
+    assert build.call_count == 1
+    assert credentials.token == "new-access"
+    assert get_gmail_service_stats()["credential_swaps"] == 1
+
+
+@pytest.mark.django_db
+def test_gmail_service_is_rebuilt_when_refresh_token_rotates(google_user):
+    from management.oauth_utils import get_gmail_service, get_gmail_service_stats
+
+    with patch("googleapiclient.discovery.build", side_effect=lambda *a, **k: MagicMock()) as build:
+        first = get_gmail_service(google_user)
+        later = timezone.now() + timedelta(hours=2)
+        with (
+            patch("django.utils.timezone.now", return_value=later),
+            patch(
+                "management.oauth_utils.refresh_access_token",
+                return_value={
+                    "access_token": "new-access",
+                    "refresh_token": "rotated",
+                    "token_expiry": later + timedelta(hours=1),
+                },
+            ),
+        ):
+            second = get_gmail_service(google_user)
+            third = get_gmail_service(google_user)
+
+    assert first is not second
+    assert second is third
+    assert build.call_count == 2
+    assert build.call_args.kwargs["credentials"].refresh_token == "rotated"
+    assert get_gmail_service_stats()["credential_swaps"] == 0
+
+
+@pytest.mark.django_db
+def test_expired_gmail_services_of_finished_threads_are_swept(google_user, settings):
+    from management import oauth_utils
+    from management.oauth_utils import get_gmail_service, get_gmail_service_stats
+
+    settings.GMAIL_SERVICE_CACHE_TTL = 60
+
+    with patch("googleapiclient.discovery.build", side_effect=lambda *a, **k: MagicMock()):
+        get_gmail_service(google_user)
+        # Entrée d'un thread terminé : plus jamais relue sous cette clé
+        entry = oauth_utils._gmail_services.popitem()[1]
+        oauth_utils._gmail_services[(google_user.pk, -1)] = entry
+        with patch(
+            "management.oauth_utils.time.monotonic",
+            return_value=time.monotonic() + 61,
+        ):
+            get_gmail_service(google_user)
+
+    stats = get_gmail_service_stats()
+    assert stats["cached"] == 1
+    assert stats["evictions"] == 1
+
+
+@pytest.mark.django_db
+def test_gmail_service_is_evicted_on_token_change_and_ttl(google_user, settings):
+    from management.oauth_utils import get_gmail_service, get_gmail_service_stats
+
+    settings.GMAIL_SERVICE_CACHE_TTL = 60
+
+    with patch("googleapiclient.discovery.build", side_effect=lambda *a, **k: MagicMock()) as build:
+        first = get_gmail_service(google_user)
+        token = google_user.oauth_token
+        token.access_token = "reconnected"
+        token.save()
+        second = get_gmail_service(google_user)
+        with patch(
+            "management.oauth_utils.time.monotonic",
+            return_value=time.monotonic() + 61,
+        ):
+            third = get_gmail_service(google_user)
+
+    assert first is not second
+    assert third is not second
+    assert build.call_count == 3
+    assert get_gmail_service_stats()["evictions"] == 2
@@ -0,0 +1,147 @@
+import io
+import os
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from management import exports
+from management.exports import purge_export_jobs
+from management.models import ExportJob
+from technique.models import DocumentTechnique, TechnicalProject
+
+
+@pytest.fixture
+def export_user(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return User.objects.create_superuser(
+        username="export_admin",
+        email="export_admin@example.com",
+        password="testpass123",
+    )
+
+
+@pytest.fixture
+def logged_client(client, export_user):
+    client.force_login(export_user)
+    return client
+
+
+@pytest.mark.django_db
+def test_export_job_renders_and_reuses_identical_requests(logged_client):
+    TechnicalProject.objects.create(reference="ADM-JOB-1", name="Dossier job", affaire="Dossier job")
+    TechnicalProject.objects.create(
+        reference="ADM-JOB-2",
+        name="Promotion job",
+        affaire="Promotion job",
+        activite_metier="promotion_immobiliere",
+    )
+    payload = {"kind": "dossiers_administratifs", "format": "xlsx", "q": "job"}
+
+    render = MagicMock(wraps=exports._render_dossiers_xlsx)
+    access_test, renderers = exports.EXPORT_KINDS["dossiers_administratifs"]
+    with patch.dict(
+        exports.EXPORT_KINDS,
+        {"dossiers_administratifs": (access_test, {**renderers, "xlsx": render})},
+    ):
+        first = logged_client.post("/api/exports/", payload)
+        second = logged_client.post("/api/exports/", {**payload, "page": "3"})
+        other = logged_client.post("/api/exports/", {**payload, "q": "promotion"})
+
+    assert first.status_code == 202
+    job = first.json()["job"]
+    assert job["status"] == "done"
+    assert job["progress"] == 100
+    assert second.status_code == 200
+    assert second.json()["reused"] is True
+    assert second.json()["job"]["id"] == job["id"]
+    assert other.json()["job"]["id"] != job["id"]
+    assert render.call_count == 2
+
+    status = logged_client.get(job["status_url"]).json()["job"]
+    download = logged_client.get(status["download_url"])
+    workbook = load_workbook(io.BytesIO(b"".join(download.streaming_content)))
+    assert workbook.sheetnames == ["Promotion immobilière", "Autres dossiers"]
+    assert workbook["Promotion immobilière"]["A2"].value == "ADM-JOB-2"
+    assert workbook["Autres dossiers"]["A2"].value == "ADM-JOB-1"
+
+
+@pytest.mark.django_db
+def test_failed_export_job_is_reported_and_not_reused(logged_client):
+    payload = {"kind": "budget_dossier", "format": "pdf", "pk": "999999"}
+
+    first = logged_client.post("/api/exports/", payload).json()["job"]
+    second = logged_client.post("/api/exports/", payload).json()
+
+    assert first["status"] == "failed"
+    assert first["error"]
+    assert first["download_url"] == ""
+    assert second["reused"] is False
+    assert logged_client.get(f"/api/exports/{first['id']}/download/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_jobs_are_private_and_kind_checked(client, logged_client, export_user):
+    project = TechnicalProject.objects.create(reference="TECH-BUDGET", name="Budget")
+    job = logged_client.post(
+        "/api/exports/", {"kind": "budget_dossier", "format": "pdf", "pk": project.pk}
+    ).json()["job"]
+    assert job["status"] == "done"
+
+    assert logged_client.post("/api/exports/", {"kind": "inconnu", "format": "pdf"}).status_code == 403
+    assert logged_client.post(
+        "/api/exports/", {"kind": "budget_dossier", "format": "xlsx"}
+    ).status_code == 403
+
+    intruder = User.objects.create_user(username="intrus", email="intrus@example.com")
+    client.force_login(intruder)
+    assert client.get(f"/api/exports/{job['id']}/").status_code == 404
+    assert client.get(f"/api/exports/{job['id']}/download/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_purge_removes_expired_jobs_and_files(logged_client, settings):
+    settings.EXPORT_JOB_RETENTION_HOURS = 1
+    project = TechnicalProject.objects.create(reference="TECH-PURGE", name="Purge")
+    logged_client.post("/api/exports/", {"kind": "budget_dossier", "format": "pdf", "pk": project.pk})
+    job = ExportJob.objects.get()
+    path = job.file.path
+
+    assert purge_export_jobs(now=timezone.now()) == 0
+    assert purge_export_jobs(now=timezone.now() + timedelta(hours=2)) == 1
+    assert not ExportJob.objects.exists()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.django_db
+def test_export_buttons_go_through_the_job_api(logged_client):
+    project = TechnicalProject.objects.create(reference="ADM-BTN-1", name="Dossier bouton")
+    document = DocumentTechnique.objects.create(
+        project=project, titre="Promesse", fichier="promesse.pdf", resume="Résumé du document.",
+    )
+    pages = {
+        reverse("invoices:list"): ['data-export-kind="factures" data-export-format="xlsx"'],
+        reverse("admin_dossiers"): ['data-export-kind="dossiers_administratifs" data-export-format="pdf"'],
+        reverse("technique:dossier_detail", args=[project.pk]): [
+            f'data-export-kind="budget_dossier" data-export-format="pdf" data-export-pk="{project.pk}"'
+        ],
+        reverse("technique:documents_detail", args=[document.pk]): [
+            f'data-export-kind="resume_document" data-export-format="pdf" data-export-pk="{document.pk}"'
+        ],
+    }
+    for url, markers in pages.items():
+        html = logged_client.get(url).content.decode()
+        assert "js/exports.js" in html, url
+        for marker in markers:
+            assert marker in html, url
+
+    # Ce que le script envoie pour le bouton « Résumé PDF »
+    response = logged_client.post("/api/exports/", {"kind": "resume_document", "format": "pdf", "pk": document.pk})
+    job = response.json()["job"]
+    assert job["status"] == "done"
+    download = logged_client.get(job["download_url"])
+    assert b"".join(download.streaming_content).startswith(b"%PDF")
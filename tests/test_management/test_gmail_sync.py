@@ -0,0 +1,175 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import Group
+from django.utils import timezone
+
+from management.gmail_service import execute_batched, list_messages, sync_conversation_journal
+from management.models import GmailConversation, OAuthToken
+from tests.gmail_stub import StubGmailService
+
+
+@pytest.fixture
+def gmail_user(user_factory):
+    group = Group.objects.get_or_create(name="POLE_ADMINISTRATIF")[0]
+    user = user_factory(username="gmail-sync", email="admin@example.com")
+    user.groups.add(group)
+    OAuthToken.objects.create(
+        user=user,
+        provider="google",
+        email=user.email,
+        access_token="access",
+        refresh_token="refresh",
+        token_expiry=timezone.now() + timedelta(hours=1),
+    )
+    return user
+
+
+@pytest.fixture
+def stub_mailbox():
+    stub = StubGmailService("admin@example.com")
+    for index in range(40):
+        stub.add_message(
+            f"sent-{index}",
+            f"thread-{index}",
+            "admin@example.com",
+            f"client{index}@example.com",
+            ["SENT"],
+        )
+    with (
+        patch("management.gmail_service.get_gmail_service", return_value=stub),
+        patch("management.gmail_service.time.sleep"),
+    ):
+        yield stub
+
+
+def _run(user, stub):
+    stub.reset_counters()
+    stats = sync_conversation_journal(user, limit=100)
+    return stats, stub.api_calls, stub.round_trips
+
+
+@pytest.mark.django_db
+def test_incremental_sync_only_applies_new_history(gmail_user, stub_mailbox):
+    full_stats, full_calls, full_trips = _run(gmail_user, stub_mailbox)
+    token = OAuthToken.objects.get(user=gmail_user)
+    assert full_stats == {"synced": 40, "replied": 0}
+    assert token.gmail_history_id == str(stub_mailbox.history_id)
+
+    idle_stats, idle_calls, idle_trips = _run(gmail_user, stub_mailbox)
+    assert idle_stats == {"synced": 0, "replied": 0}
+
+    stub_mailbox.add_message(
+        "reply-3", "thread-3", "client3@example.com", "admin@example.com", ["INBOX"]
+    )
+    stub_mailbox.add_message(
+        "new-sent", "thread-new", "admin@example.com", "new@example.com", ["SENT"]
+    )
+    stub_mailbox.add_message(
+        "spam", "thread-other", "promo@example.com", "admin@example.com", ["INBOX"]
+    )
+    delta_stats, delta_calls, delta_trips = _run(gmail_user, stub_mailbox)
+
+    assert delta_stats == {"synced": 2, "replied": 1}
+    assert GmailConversation.objects.get(thread_id="thread-3").status == "replied"
+    assert GmailConversation.objects.filter(thread_id="thread-new").exists()
+    assert not GmailConversation.objects.filter(thread_id="thread-other").exists()
+
+    print(
+        f"\n[bench gmail journal] appels API / allers-retours HTTP par passage : "
+        f"complet={full_calls}/{full_trips}, incrémental vide={idle_calls}/{idle_trips}, "
+        f"incrémental 3 messages={delta_calls}/{delta_trips}"
+    )
+    # 1 profil (curseur) + 1 liste + 40 messages + 40 threads
+    assert (full_calls, full_trips) == (1 + 1 + 40 + 40, 4)
+    assert (idle_calls, idle_trips) == (1, 1)
+    assert (delta_calls, delta_trips) == (1 + 2, 2)
+
+
+@pytest.mark.django_db
+def test_expired_history_cursor_falls_back_to_full_sync(gmail_user, stub_mailbox):
+    OAuthToken.objects.filter(user=gmail_user).update(gmail_history_id="5")
+    stub_mailbox.expired_before = 500
+
+    stats, _, _ = _run(gmail_user, stub_mailbox)
+
+    assert stats == {"synced": 40, "replied": 0}
+    assert stub_mailbox.calls["users.history.list"] == 1
+    assert stub_mailbox.calls["users.messages.list"] == 1
+    token = OAuthToken.objects.get(user=gmail_user)
+    assert token.gmail_history_id == str(stub_mailbox.history_id)
+
+
+@pytest.mark.django_db
+def test_full_sync_saves_mailbox_cursor_not_last_sent(gmail_user, stub_mailbox):
+    for index in range(5):
+        stub_mailbox.add_message(f"in-{index}", f"in-{index}", "promo@example.com", "admin@example.com", ["INBOX"])
+
+    _run(gmail_user, stub_mailbox)
+
+    token = OAuthToken.objects.get(user=gmail_user)
+    assert token.gmail_history_id == str(stub_mailbox.history_id)
+
+
+@pytest.mark.django_db
+def test_new_conversation_keeps_first_sent_message(gmail_user, stub_mailbox):
+    _run(gmail_user, stub_mailbox)
+    stub_mailbox.add_message("first", "thread-late", "admin@example.com", "late@example.com", ["SENT"])
+    stub_mailbox.add_message("second", "thread-late", "admin@example.com", "late@example.com", ["SENT"])
+
+    _run(gmail_user, stub_mailbox)
+
+    conversation = GmailConversation.objects.get(thread_id="thread-late")
+    assert (conversation.initial_message_id, conversation.last_message_id) == ("first", "second")
+
+
+def test_batches_are_capped_and_rate_limited_items_are_retried():
+    stub = StubGmailService("admin@example.com")
+    for index in range(250):
+        stub.add_message(f"m-{index}", f"t-{index}", "a@example.com", "b@example.com", ["INBOX"])
+    stub.failures = {"m-7": [429, 429], "m-9": [404]}
+    requests = {
+        message_id: stub.users().messages().get(userId="me", id=message_id)
+        for message_id in stub.messages
+    }
+
+    with patch("management.gmail_service.time.sleep") as sleep:
+        results, errors = execute_batched(stub, requests)
+
+    assert stub.batch_sizes == [100, 100, 50, 1, 1]
+    assert len(results) == 249
+    assert results["m-7"]["id"] == "m-7"
+    assert list(errors) == ["m-9"]
+    assert [call.args[0] for call in sleep.call_args_list] == [1.0, 2.0]
+
+
+@pytest.mark.django_db
+def test_list_messages_keeps_order_and_skips_failed_items(gmail_user, stub_mailbox):
+    stub_mailbox.failures = {"sent-38": [403]}
+    messages = list_messages(gmail_user, label_ids=["SENT"], limit=3)
+
+    assert [message["id"] for message in messages] == ["sent-39", "sent-37"]
+    assert stub_mailbox.round_trips == 2
+
+
+@pytest.mark.django_db
+def test_failed_thread_fetch_keeps_cursor_for_next_run(gmail_user, stub_mailbox):
+    _run(gmail_user, stub_mailbox)
+    cursor = OAuthToken.objects.get(user=gmail_user).gmail_history_id
+    stub_mailbox.add_message("late", "thread-late", "admin@example.com", "late@example.com", ["SENT"])
+    stub_mailbox.add_message("gone", "thread-gone", "admin@example.com", "gone@example.com", ["SENT"])
+    stub_mailbox.failures = {"thread-late": [403], "thread-gone": [404]}
+
+    stats, _, _ = _run(gmail_user, stub_mailbox)
+
+    assert stats == {"synced": 0, "replied": 0}
+    assert OAuthToken.objects.get(user=gmail_user).gmail_history_id == cursor
+
+    stub_mailbox.failures = {"thread-gone": [404]}
+    stats, _, _ = _run(gmail_user, stub_mailbox)
+
+    # Le thread supprimé (404) ne bloque pas le curseur
+    assert stats == {"synced": 1, "replied": 0}
+    assert GmailConversation.objects.filter(thread_id="thread-late").exists()
+    assert OAuthToken.objects.get(user=gmail_user).gmail_history_id == str(stub_mailbox.history_id)
@@ -5,6 +5,7 @@ from unittest.mock import patch
 
 import pytest
 from django.contrib.auth.models import Group, User
+from django.core import mail
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 from openpyxl import Workbook, load_workbook
@@ -20,7 +21,8 @@ from management.models import (
     TypeActivite,
     ValeurChampPersonnaliseDossier,
 )
-from management.tasks import check_and_send_activite_reminders
+from config.db_metrics import count_queries
+from management.tasks import _activite_reminder_message, check_and_send_activite_reminders
 from invoices.models import Societe
 from technique.models import DocumentTechnique, TechnicalProject, TechnicalProjectHistory
 
@@ -840,7 +842,7 @@ def test_admin_dossiers_export_xlsx(client, admin_user, dossier):
 
     assert response.status_code == 200
     assert response["Content-Disposition"] == 'attachment; filename="dossiers_administratifs.xlsx"'
-    workbook = load_workbook(io.BytesIO(response.content))
+    workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
     assert workbook.sheetnames == ["Promotion immobilière", "Autres dossiers"]
 
     promotion_sheet = workbook["Promotion immobilière"]
@@ -1147,7 +1149,7 @@ def test_custom_admin_field_export_and_import_xlsx(client, admin_user, categorie
     )
 
     response = client.get("/administratif/dossiers/export/")
-    workbook = load_workbook(io.BytesIO(response.content))
+    workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
     sheet = workbook["Autres dossiers"]
 
     headers = [cell.value for cell in sheet[1]]
@@ -1301,6 +1303,118 @@ def test_activity_reminder_after_due_date_uses_configured_rule(settings, respons
     ).count() == 1
 
 
+def _seed_due_activities(count, dossier, type_activite, responsable, offset=0):
+    for index in range(count):
+        activity = Activite.objects.create(
+            id=f"{2000 + offset + index}",
+            titre=f"Échéance {index}",
+            dossier=dossier,
+            type=type_activite,
+            date=timezone.now() + timedelta(days=3),
+            date_type="date",
+            statut="todo",
+            priorite="normal",
+            responsable=responsable,
+            created_by=responsable,
+        )
+        RappelActivite.objects.create(activite=activity, timing="before", days=3)
+        # Rappel hors échéance : ne doit pas être chargé
+        RappelActivite.objects.create(activite=activity, timing="before", days=1)
+
+
+@pytest.mark.django_db
+def test_activity_reminders_use_constant_queries_and_one_connection(
+    settings, responsable, dossier, type_activite
+):
+    settings.EMAIL_HOST_USER = "fallback@example.com"
+    _seed_due_activities(3, dossier, type_activite, responsable)
+    with count_queries() as small:
+        check_and_send_activite_reminders()
+
+    _seed_due_activities(30, dossier, type_activite, responsable, offset=100)
+    mail.outbox = []
+    with patch("management.tasks.get_connection", wraps=mail.get_connection) as connection_mock:
+        with count_queries() as large:
+            result = check_and_send_activite_reminders()
+
+    assert result["rappels_envoyes"] == 30
+    assert result["doublons_ignores"] == 3
+    assert result["activites_traitees"] == 33
+    assert len(mail.outbox) == 30
+    assert connection_mock.call_count == 1
+    assert large.count == small.count
+    assert HistoriqueRappelActivite.objects.filter(statut="sent").count() == 33
+
+
+@pytest.mark.django_db
+def test_failed_activity_reminder_is_retried_and_history_updated(
+    settings, responsable, dossier, type_activite
+):
+    settings.EMAIL_HOST_USER = "fallback@example.com"
+    _seed_due_activities(1, dossier, type_activite, responsable)
+
+    with patch("management.tasks.EmailMessage.send", side_effect=OSError("smtp down")):
+        failed = check_and_send_activite_reminders()
+    retried = check_and_send_activite_reminders()
+
+    assert failed["erreurs"] == 1
+    assert retried["rappels_envoyes"] == 1
+    history = HistoriqueRappelActivite.objects.get()
+    assert history.statut == "sent"
+    assert history.erreur == ""
+
+
+@pytest.mark.django_db
+def test_activity_reminder_error_is_isolated_and_history_kept(
+    settings, responsable, dossier, type_activite
+):
+    settings.EMAIL_HOST_USER = "fallback@example.com"
+    _seed_due_activities(3, dossier, type_activite, responsable)
+    build_message = _activite_reminder_message
+
+    def flaky_message(activite, rule):
+        if activite.titre == "Échéance 1":
+            raise ValueError("modèle invalide")
+        return build_message(activite, rule)
+
+    with patch("management.tasks._activite_reminder_message", side_effect=flaky_message):
+        result = check_and_send_activite_reminders()
+
+    assert (result["rappels_envoyes"], result["erreurs"]) == (2, 1)
+    assert HistoriqueRappelActivite.objects.filter(statut="sent").count() == 2
+
+
+@pytest.mark.django_db
+def test_activity_reminder_history_survives_smtp_close_error(
+    settings, responsable, dossier, type_activite
+):
+    settings.EMAIL_HOST_USER = "fallback@example.com"
+    _seed_due_activities(2, dossier, type_activite, responsable)
+
+    with patch("django.core.mail.backends.locmem.EmailBackend.close", side_effect=OSError("quit failed")):
+        check_and_send_activite_reminders()
+    retried = check_and_send_activite_reminders()
+
+    assert HistoriqueRappelActivite.objects.filter(statut="sent").count() == 2
+    assert (retried["rappels_envoyes"], retried["doublons_ignores"]) == (0, 2)
+
+
+@pytest.mark.django_db
+def test_activity_reminder_smtp_open_failure_is_recorded(
+    settings, responsable, dossier, type_activite
+):
+    settings.EMAIL_HOST_USER = "fallback@example.com"
+    _seed_due_activities(2, dossier, type_activite, responsable)
+
+    with patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("connexion refusée")), \
+            patch("management.tasks.EmailMessage.send") as send_mock:
+        result = check_and_send_activite_reminders()
+
+    send_mock.assert_not_called()
+    assert (result["success"], result["erreurs"]) == (True, 2)
+    assert set(HistoriqueRappelActivite.objects.values_list("statut", "erreur")) == {("failed", "connexion refusée")}
+
+
 @pytest.mark.django_db
 def test_activity_reminder_rule_create_and_delete(client, admin_user):
     client.force_login(admin_user)
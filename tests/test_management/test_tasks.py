@@ -10,6 +10,7 @@ from django.utils import timezone
 from management.gmail_service import send_conversation_reminder, sync_conversation_journal
 from invoices.models import ActeurExterne, Contact
 from management.models import (
+    DefaultModeleRelance,
     EmailClient,
     GmailConversation,
     GmailConversationEvent,
@@ -65,10 +66,11 @@ def test_sync_creates_journal_and_reply_has_priority(admin_gmail_user):
     }
 
     with (
+        patch("management.gmail_service._current_history_id", return_value="1"),
         patch("management.gmail_service.list_messages", return_value=[sent]),
         patch(
-            "management.gmail_service.get_thread",
-            return_value={"messages": [sent, reply]},
+            "management.gmail_service.get_threads",
+            return_value=({"thread-1": {"messages": [sent, reply]}}, {}),
         ),
     ):
         stats = sync_conversation_journal(admin_gmail_user)
@@ -250,3 +252,188 @@ def test_celery_journal_sends_only_open_conversations(admin_gmail_user):
     assert send.call_count == 1
     assert send.call_args.kwargs["conversation"] == open_conversation
     assert send.call_args.kwargs["source"] == "automatic"
+
+
+@pytest.mark.django_db
+def test_auto_relance_planner_uses_first_email_client_in_primary_key_order(admin_gmail_user):
+    actor = ActeurExterne.objects.create(id="ORDER-CLIENT")
+    avocat = Metier.objects.create(nom="avocat")
+    notaire = Metier.objects.create(nom="notaire")
+    for contact_id, metier in (("ORDER-B", avocat), ("ORDER-A", notaire)):
+        contact = Contact.objects.create(id=contact_id, acteur=actor)
+        EmailClient.objects.create(contact=contact, metier=metier, email="etude@example.com")
+    ModeleRelance.objects.create(utilisateur=admin_gmail_user, metier=avocat, message="Relance avocat")
+    ModeleRelance.objects.create(utilisateur=admin_gmail_user, metier=notaire, message="Relance notaire")
+    TempsRelance.objects.create(id=admin_gmail_user, temps=5)
+    GmailConversation.objects.create(
+        owner=admin_gmail_user,
+        thread_id="thread-order",
+        subject="Acte",
+        recipient="Étude <etude@example.com>",
+        status="open",
+        sent_at=timezone.now() - timedelta(days=10),
+    )
+
+    with (
+        patch("management.tasks.sync_conversation_journal"),
+        patch(
+            "management.tasks.send_conversation_reminder",
+            return_value={"success": True},
+        ) as send,
+    ):
+        check_and_send_auto_relances()
+
+    # Même choix que EmailClient.objects.filter(email=...).first()
+    assert EmailClient.objects.filter(email="etude@example.com").first().metier == notaire
+    assert send.call_args.kwargs["body"] == "Relance notaire"
+
+
+def _seed_relance_conversations(user, count):
+    actor = ActeurExterne.objects.get_or_create(id="PLAN-CLIENT")[0]
+    contact = Contact.objects.get_or_create(id="PLAN-CONTACT", acteur=actor)[0]
+    metier = Metier.objects.get_or_create(nom="notaire")[0]
+    DefaultModeleRelance.objects.get_or_create(metier=metier, defaults={"message": "Relance"})
+    for index in range(count):
+        email = f"notaire{count}-{index}@example.com"
+        EmailClient.objects.create(contact=contact, metier=metier, email=email)
+        conversation = GmailConversation.objects.create(
+            owner=user,
+            thread_id=f"plan-{count}-{index}",
+            subject="Pièces",
+            recipient=f"Notaire <{email}>",
+            status="open",
+            # Une conversation sur deux tombe sur l'intervalle de 5 jours
+            sent_at=timezone.now() - timedelta(days=10 if index % 2 else 9),
+        )
+        if index % 4 == 1:
+            GmailConversationEvent.objects.create(
+                conversation=conversation,
+                event_type="reminder_sent",
+            )
+
+
+@pytest.mark.django_db
+def test_auto_relance_planner_query_count_is_independent_of_volume(admin_gmail_user):
+    TempsRelance.objects.create(id=admin_gmail_user, temps=5)
+
+    def run():
+        with (
+            patch("management.tasks.sync_conversation_journal"),
+            patch(
+                "management.tasks.send_conversation_reminder",
+                return_value={"success": True},
+            ) as send,
+        ):
+            return check_and_send_auto_relances(), send.call_count
+
+    _seed_relance_conversations(admin_gmail_user, 4)
+    small, small_sent = run()
+    GmailConversation.objects.all().delete()
+    _seed_relance_conversations(admin_gmail_user, 40)
+    large, large_sent = run()
+
+    assert (small_sent, large_sent) == (1, 10)
+    assert large["emails_traites"] == 40
+    assert large["debug"]["modulo_check"] == 20
+    assert large["debug"]["modele_relance_not_found"] == 20
+    assert large["queries"] == small["queries"]
+    assert large["queries"] <= 10
+
+
+@pytest.mark.django_db
+def test_auto_relances_fan_out_one_chord_subtask_per_user(admin_gmail_user, user_factory):
+    other = user_factory(username="other-gmail", email="other@example.com")
+    OAuthToken.objects.create(
+        user=other,
+        provider="google",
+        email=other.email,
+        access_token="access",
+        refresh_token="refresh",
+        token_expiry=timezone.now() + timedelta(hours=1),
+    )
+
+    with patch("management.tasks.chord") as chord:
+        chord.return_value.return_value.id = "chord-id"
+        result = check_and_send_auto_relances(mode="chord")
+
+    header = list(chord.call_args.args[0])
+    body = chord.return_value.call_args.args[0]
+    assert sorted(signature.args[0] for signature in header) == sorted(
+        [admin_gmail_user.pk, other.pk]
+    )
+    assert {signature.task for signature in header} == {
+        "management.tasks.process_user_auto_relances"
+    }
+    assert body.task == "management.tasks.merge_auto_relance_results"
+    assert result == {"success": True, "mode": "chord", "utilisateurs": 2, "task_id": "chord-id"}
+
+
+@pytest.mark.django_db
+def test_auto_relances_thread_pool_is_bounded_and_merged(admin_gmail_user, user_factory, settings):
+    import threading
+    import time
+
+    for index in range(5):
+        user = user_factory(username=f"pool-{index}", email=f"pool{index}@example.com")
+        OAuthToken.objects.create(
+            user=user,
+            provider="google",
+            email=user.email,
+            access_token="access",
+            refresh_token="refresh",
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+    settings.GMAIL_RELANCE_THREADS = 2
+    running = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def fake_process(user_id):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.02)
+        with lock:
+            running["now"] -= 1
+        return {
+            "success": True,
+            "utilisateurs": 1,
+            "emails_traites": 3,
+            "relances_envoyees": 1,
+            "erreurs": 0,
+            "queries": 7,
+            "debug": {"modulo_check": 2, "default_temps_relance_not_found": True},
+        }
+
+    with patch("management.tasks._process_user_auto_relances", side_effect=fake_process):
+        result = check_and_send_auto_relances(mode="threads")
+
+    assert running["max"] == 2
+    assert result["utilisateurs"] == 6
+    assert result["relances_envoyees"] == 6
+    assert result["emails_traites"] == 18
+    assert result["queries"] == 42
+    assert result["debug"]["modulo_check"] == 12
+    assert result["debug"]["default_temps_relance_not_found"] is True
+
+
+@pytest.mark.django_db
+def test_locked_mailbox_is_not_processed_twice(admin_gmail_user, settings):
+    from django.core.cache import cache
+    from management.tasks import _user_relance_lock_key
+
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.add(_user_relance_lock_key(admin_gmail_user.pk), "beat précédent", 60)
+
+    with patch("management.tasks.sync_conversation_journal") as sync:
+        result = check_and_send_auto_relances(mode="serial")
+
+    sync.assert_not_called()
+    assert result["utilisateurs_verrouilles"] == 1
+
+    cache.delete(_user_relance_lock_key(admin_gmail_user.pk))
+    with patch("management.tasks.sync_conversation_journal") as sync:
+        result = check_and_send_auto_relances(mode="serial")
+
+    sync.assert_called_once()
+    assert result["utilisateurs_verrouilles"] == 0
+    assert cache.get(_user_relance_lock_key(admin_gmail_user.pk)) is None
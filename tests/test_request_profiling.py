@@ -0,0 +1,74 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from config.middleware import RequestProfilingMiddleware
+
+
+@pytest.fixture
+def profiling_settings(settings, tmp_path):
+    settings.REQUEST_PROFILING_ENABLED = True
+    settings.REQUEST_PROFILING_SLOW_MS = 0
+    settings.REQUEST_PROFILING_DUPLICATE_THRESHOLD = 3
+    settings.REQUEST_PROFILING_DUMP_DIR = tmp_path / "profiles"
+    return settings
+
+
+def _n_plus_one_view(request):
+    for user_id in range(4):
+        User.objects.filter(pk=user_id).exists()
+    User.objects.count()
+    return HttpResponse("ok")
+
+
+def test_profiling_middleware_is_opt_in(settings):
+    settings.REQUEST_PROFILING_ENABLED = False
+    with pytest.raises(MiddlewareNotUsed):
+        RequestProfilingMiddleware(_n_plus_one_view)
+
+
+@pytest.mark.django_db
+def test_slow_request_journal_reports_sql_and_repeated_statements(profiling_settings):
+    request = RequestFactory().get("/finance/?page=2")
+    request.user = AnonymousUser()
+
+    with patch("config.middleware.slow_request_logger") as slow_logger, \
+            patch("config.middleware.performance_logger") as performance_logger:
+        response = RequestProfilingMiddleware(_n_plus_one_view)(request)
+
+    assert 'sql;dur=' in response["Server-Timing"]
+    assert "X-Profile-Dump" not in response
+    entry = json.loads(slow_logger.warning.call_args.args[0])
+    assert entry["path"] == "/finance/?page=2"
+    assert entry["sql_count"] == 5
+    assert entry["top_statements"][0]["count"] == 4
+    assert "auth_user" in entry["top_statements"][0]["sql"]
+    assert len(entry["top_statements"]) == 1
+    assert performance_logger.warning.call_count == 1
+
+
+@pytest.mark.django_db
+def test_superuser_can_request_cprofile_dump(profiling_settings):
+    profiling_settings.REQUEST_PROFILING_SLOW_MS = 60_000
+    factory = RequestFactory()
+    superuser = User.objects.create_superuser("profil", "profil@example.com", "x")
+    regular = User.objects.create_user("simple", "simple@example.com", "x")
+    middleware = RequestProfilingMiddleware(lambda request: HttpResponse("ok"))
+
+    request = factory.get("/finance/", {"_profile": "1"})
+    request.user = regular
+    assert "X-Profile-Dump" not in middleware(request)
+
+    request = factory.get("/finance/", {"_profile": "1"})
+    request.user = superuser
+    with patch("config.middleware.slow_request_logger") as slow_logger:
+        response = middleware(request)
+
+    dump = profiling_settings.REQUEST_PROFILING_DUMP_DIR / response["X-Profile-Dump"]
+    assert dump.exists() and dump.suffix == ".prof"
+    slow_logger.warning.assert_not_called()
@@ -4,6 +4,7 @@ Tests de l'analyse de documents juridiques via API Groq
 """
 import pytest
 import json
+import time
 
 from unittest.mock import Mock, patch
 from requests.exceptions import HTTPError, Timeout, ConnectionError
@@ -96,7 +97,7 @@ def invalid_json_response():
 @pytest.fixture
 def mock_groq_api_success(valid_api_response):
     """Mock de l'API Groq avec succès"""
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = valid_api_response
@@ -107,7 +108,7 @@ def mock_groq_api_success(valid_api_response):
 @pytest.fixture
 def mock_groq_api_rate_limit():
     """Mock de l'API Groq avec rate limiting (429)"""
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_response = Mock()
         mock_response.status_code = 429
         mock_response.raise_for_status.side_effect = HTTPError("429 Too Many Requests")
@@ -118,7 +119,7 @@ def mock_groq_api_rate_limit():
 @pytest.fixture
 def mock_groq_api_timeout():
     """Mock de l'API Groq avec timeout"""
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_post.side_effect = Timeout("Request timeout")
         yield mock_post
 
@@ -126,7 +127,7 @@ def mock_groq_api_timeout():
 @pytest.fixture
 def mock_groq_api_connection_error():
     """Mock de l'API Groq avec erreur de connexion"""
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_post.side_effect = ConnectionError("Connection failed")
         yield mock_post
 
@@ -370,7 +371,8 @@ class TestGroqApiCall:
 
     def test_call_groq_with_correct_payload(self, mock_groq_api_success):
         """Test que le payload envoyé est correct"""
-        from technique.services.ai_summary import _call_groq_chunk, SYSTEM_CHUNK, MODEL
+        from django.conf import settings
+        from technique.services.ai_summary import _call_groq_chunk, SYSTEM_CHUNK
 
         chunk_text = "Test chunk"
         _call_groq_chunk(chunk_text)
@@ -378,7 +380,7 @@ class TestGroqApiCall:
         call_args = mock_groq_api_success.call_args
         payload = call_args.kwargs['json']
 
-        assert payload['model'] == MODEL
+        assert payload['model'] == settings.LLM_MODEL
         assert payload['temperature'] == 0.1
         assert payload['max_tokens'] == 900
         assert len(payload['messages']) == 2
@@ -391,7 +393,7 @@ class TestGroqApiCall:
         """Test avec une réponse JSON invalide de l'API"""
         from technique.services.ai_summary import _call_groq_chunk
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = invalid_json_response
@@ -454,8 +456,8 @@ class TestSummarizeDocument:
         result = summarize_document(sample_long_text)
 
         assert mock_groq_api_success.call_count >= 2
-        expected_sleeps = mock_groq_api_success.call_count - 1
-        assert mock_sleep.call_count == expected_sleeps
+        # Plus de pause fixe entre extraits : le débit est réglé par le limiteur
+        assert mock_sleep.call_count == 0
 
         assert "resume" in result
         assert isinstance(result["clauses_importantes"], list)
@@ -498,7 +500,7 @@ class TestSummarizeDocument:
             }
         ]
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_responses = []
             for resp in responses:
                 mock_response = Mock()
@@ -539,7 +541,7 @@ class TestSummarizeDocument:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -575,7 +577,7 @@ class TestSummarizeDocument:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -606,7 +608,7 @@ class TestSummarizeDocument:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -641,7 +643,7 @@ class TestSummarizeDocument:
             None
         ]
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_post.side_effect = [
                 Mock(status_code=200, json=lambda: responses[0]),
                 ConnectionError("Network error")
@@ -681,7 +683,7 @@ class TestIntegration:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -731,7 +733,7 @@ class TestEdgeCases:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -761,7 +763,7 @@ class TestEdgeCases:
             }]
         }
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = api_response
@@ -770,4 +772,63 @@ class TestEdgeCases:
             result = summarize_document(sample_short_text)
 
             assert result["prix"] == "Non identifié"
-            assert result["dates"] == "Non identifié"
\ No newline at end of file
+            assert result["dates"] == "Non identifié"
+
+class TestConcurrentSummary:
+    """Résumé parallèle sous le limiteur partagé"""
+
+    def test_chunks_are_merged_in_document_order(self, settings):
+        """Les extraits sont fusionnés dans l'ordre, quel que soit l'ordre des réponses"""
+        from chatbot.groq_stub import GroqStubServer, default_responder
+        from technique.services import ai_summary
+
+        settings.AI_SUMMARY_MAX_WORKERS = 4
+
+        def responder(payload):
+            # Les premiers extraits répondent le plus lentement
+            index = int(payload["messages"][-1]["content"].split()[1])
+            time.sleep(0.05 * (5 - index))
+            return default_responder(payload)
+
+        texte = "".join(
+            (f"Extrait {index} " + "mot " * ai_summary.CHUNK_SIZE_CHARS)[:ai_summary.CHUNK_SIZE_CHARS]
+            for index in range(5)
+        )
+        with GroqStubServer(responder=responder) as stub:
+            settings.LLM_API_URL = stub.url
+            result = ai_summary.summarize_document(texte)
+
+        assert stub.calls == 5
+        assert stub.max_in_flight > 1
+        assert [line.split()[2] for line in result["resume"].splitlines()] == ["0", "1", "2", "3", "4"]
+
+    def test_rate_limit_retries_exactly_max_attempts(self):
+        """Un 429 persistant lève une erreur après MAX_RETRIES_PER_CHUNK tentatives"""
+        from technique.services.ai_summary import MAX_RETRIES_PER_CHUNK, _call_groq_chunk
+
+        limiter = Mock()
+        with patch("requests.Session.post") as mock_post, \
+                patch("chatbot.llm_client.groq_rate_limiter", return_value=limiter), \
+                patch("time.sleep"):
+            mock_post.return_value = Mock(status_code=429, headers={"Retry-After": "7"})
+            with pytest.raises(HTTPError):
+                _call_groq_chunk("Extrait")
+
+        assert mock_post.call_count == MAX_RETRIES_PER_CHUNK
+        assert limiter.acquire.call_count == MAX_RETRIES_PER_CHUNK
+        limiter.defer.assert_called_once_with(7.0)
+
+    def test_retry_after_defers_the_next_attempt(self, settings, valid_api_response):
+        """Après un 429, la tentative suivante réussit une fois le délai Retry-After écoulé"""
+        from technique.services.ai_summary import _call_groq_chunk
+
+        limiter = Mock()
+        ok = Mock(status_code=200)
+        ok.json.return_value = valid_api_response
+        with patch("requests.Session.post", side_effect=[Mock(status_code=429, headers={}), ok]), \
+                patch("chatbot.llm_client.groq_rate_limiter", return_value=limiter):
+            result = _call_groq_chunk("Extrait")
+
+        assert "250 000" in result["prix"]
+        # Sans en-tête Retry-After, la pause est celle du backoff commun
+        limiter.defer.assert_called_once_with(settings.LLM_RETRY_BACKOFF_SECONDS)
@@ -0,0 +1,117 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+from chatbot.llm_client import LLMResponse
+from technique.models import EmailClassificationJob, TechnicalEmail, TechnicalProject
+from technique.services import bulk_classify
+from technique.services.ai_classify import classify_and_save_batch, classify_emails
+
+
+@pytest.fixture
+def projects(db):
+    return [
+        TechnicalProject.objects.create(reference="LOT-001", name="Villa Les Pins"),
+        TechnicalProject.objects.create(reference="LOT-002", name="Résidence Les Pins"),
+        TechnicalProject.objects.create(reference="LOT-003", name="Immeuble Garibaldi"),
+    ]
+
+
+def _emails(count, user=None):
+    return [
+        TechnicalEmail.objects.create(
+            subject=f"Point chantier {index}", body="Point sur le chantier Les Pins",
+            sender=f"contact@societe{index}.fr", received_at=timezone.now(), imported_by=user,
+        )
+        for index in range(count)
+    ]
+
+
+def _batch_answer(items):
+    return LLMResponse(json.dumps([
+        {"email_id": email_id, "project_id": project_id, "confidence": "high", "reason": "ok"}
+        for email_id, project_id in items
+    ]))
+
+
+@pytest.mark.django_db
+def test_one_llm_call_for_the_whole_batch(projects):
+    emails = _emails(3)
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.return_value = _batch_answer(
+            [(emails[0].pk, projects[0].pk), (emails[1].pk, projects[1].pk), (emails[2].pk, projects[1].pk)]
+        )
+        results = classify_emails(emails, TechnicalProject.objects.all())
+
+    assert client_mock.return_value.chat.call_count == 1
+    call = client_mock.return_value.chat.call_args
+    prompt = call.args[0][1]["content"]
+    assert call.kwargs["purpose"] == "classement_email_lot"
+    # Le bloc projets n'est envoyé qu'une fois pour les trois emails
+    assert prompt.count(f"id={projects[0].pk} ") == 1
+    assert all(f"email_id={email.pk}" in prompt for email in emails)
+    assert [results[email.pk]["project_id"] for email in emails] == [projects[0].pk, projects[1].pk, projects[1].pk]
+    assert {result["method"] for result in results.values()} == {"llm"}
+
+
+@pytest.mark.django_db
+def test_missing_item_falls_back_to_single_call(projects):
+    emails = _emails(2)
+    single = LLMResponse(json.dumps({"project_id": projects[1].pk, "confidence": "high", "reason": "ok"}))
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.side_effect = [
+            _batch_answer([(emails[0].pk, projects[0].pk), (emails[1].pk, "LOT-002")]),
+            single,
+        ]
+        results = classify_emails(emails, TechnicalProject.objects.all())
+
+    purposes = [call.kwargs["purpose"] for call in client_mock.return_value.chat.call_args_list]
+    assert purposes == ["classement_email_lot", "classement_email"]
+    assert results[emails[0].pk]["project_id"] == projects[0].pk
+    assert results[emails[1].pk]["project_id"] == projects[1].pk
+
+
+@pytest.mark.django_db
+def test_project_outside_shared_block_is_rejected(projects, settings):
+    settings.EMAIL_CLASSIFY_CANDIDATES = 2
+    settings.EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE = 0
+    emails = _emails(2)
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.return_value = _batch_answer(
+            [(emails[0].pk, projects[2].pk), (emails[1].pk, projects[0].pk)]
+        )
+        results = classify_and_save_batch(emails, TechnicalProject.objects.all())
+
+    assert results[emails[0].pk]["project_id"] is None
+    assert not results[emails[0].pk]["saved"]
+    assert results[emails[1].pk]["saved"]
+    assert TechnicalEmail.objects.get(pk=emails[1].pk).project == projects[0]
+
+
+@pytest.mark.django_db
+def test_bulk_job_sends_batches(projects, user_factory, settings):
+    settings.EMAIL_CLASSIFY_BATCH_SIZE = 2
+    user = user_factory(username="tech-lot", email="tech-lot@example.com")
+    emails = _emails(3, user=user)
+    job = EmailClassificationJob.objects.create(requested_by=user)
+
+    def answer(messages, **kwargs):
+        if kwargs["purpose"] == "classement_email":
+            return LLMResponse(json.dumps({"project_id": projects[1].pk, "confidence": "high"}))
+        prompt = messages[1]["content"]
+        return _batch_answer((email.pk, projects[1].pk) for email in emails if f"email_id={email.pk}" in prompt)
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock, \
+            patch("technique.tasks.enqueue_email_attachment_processing", return_value={"launched": False}):
+        client_mock.return_value.chat.side_effect = answer
+        job = bulk_classify.run_bulk_classification(job.pk)
+
+    purposes = [call.kwargs["purpose"] for call in client_mock.return_value.chat.call_args_list]
+    assert purposes == ["classement_email_lot", "classement_email"]
+    assert (job.status, job.processed, job.classified, job.llm_calls) == ("done", 3, 3, 3)
+    assert TechnicalEmail.objects.filter(project=projects[1], status="classified").count() == 3
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import Group
+from django.urls import reverse
+from django.utils import timezone
+
+from technique.models import EmailClassificationJob, TechnicalEmail, TechnicalProject
+from technique.services import bulk_classify
+from technique.services.ai_classify import ProjectCatalog
+
+
+@pytest.fixture
+def technique_user(db, user_factory):
+    user = user_factory(username="tech-bulk", email="tech-bulk@example.com")
+    user.groups.add(Group.objects.get_or_create(name="POLE_TECHNIQUE")[0])
+    return user
+
+
+@pytest.fixture
+def project(db):
+    return TechnicalProject.objects.create(reference="TECH-BULK", name="Projet classement")
+
+
+def _create_emails(user, count):
+    return [
+        TechnicalEmail.objects.create(
+            subject=f"Email {index}",
+            sender="sender@example.com",
+            body="Contenu",
+            received_at=timezone.now() - timedelta(minutes=index),
+            imported_by=user,
+        )
+        for index in range(count)
+    ]
+
+
+def _classify_into(project):
+    def fake_classify(email, catalog, bypass_cache=False):
+        email.project = project
+        email.status = "classified"
+        email.save(update_fields=["project", "status"])
+        return {"success": True, "saved": True, "project_id": project.pk, "confidence": "high"}
+
+    return fake_classify
+
+
+@pytest.mark.django_db
+def test_bulk_view_returns_job_without_classifying(client, technique_user, settings):
+    settings.EMAIL_CLASSIFICATION_EXECUTION = "celery"
+    _create_emails(technique_user, 3)
+    client.force_login(technique_user)
+
+    with patch("technique.tasks.run_email_classification_job.delay") as delay_mock, \
+            patch("technique.services.ai_classify.classify_and_save") as classify_mock:
+        response = client.post(reverse("technique:email_classify_bulk"))
+
+    assert response.status_code == 202
+    job = response.json()["job"]
+    assert job["status"] == "pending"
+    assert job["total"] == 3
+    assert job["status_url"] == reverse("technique:email_classify_job_status", args=[job["id"]])
+    classify_mock.assert_not_called()
+    delay_mock.assert_not_called()  # envoyé au commit de la transaction
+
+
+@pytest.mark.django_db
+def test_second_request_reuses_active_job(client, technique_user, settings):
+    settings.EMAIL_CLASSIFICATION_EXECUTION = "celery"
+    client.force_login(technique_user)
+
+    with patch("technique.tasks.run_email_classification_job.delay"):
+        first = client.post(reverse("technique:email_classify_bulk"))
+        second = client.post(reverse("technique:email_classify_bulk"))
+
+    assert first.status_code == 202
+    assert second.status_code == 200
+    assert second.json()["reused"] is True
+    assert second.json()["job"]["id"] == first.json()["job"]["id"]
+    assert EmailClassificationJob.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_stale_active_job_is_abandoned(technique_user, settings):
+    settings.EMAIL_CLASSIFICATION_EXECUTION = "celery"
+    stale = EmailClassificationJob.objects.create(requested_by=technique_user, status="running")
+    EmailClassificationJob.objects.filter(pk=stale.pk).update(
+        updated_at=timezone.now() - timedelta(minutes=settings.EMAIL_CLASSIFICATION_JOB_STALE_MINUTES + 1)
+    )
+
+    with patch("technique.tasks.run_email_classification_job.delay"):
+        job, reused = bulk_classify.request_bulk_classification(technique_user)
+
+    assert not reused
+    assert job.pk != stale.pk
+    stale.refresh_from_db()
+    assert stale.status == "failed"
+    assert stale.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_run_builds_project_catalog_once(technique_user, project, settings):
+    settings.EMAIL_CLASSIFY_BATCH_SIZE = 1
+    _create_emails(technique_user, 3)
+    job = EmailClassificationJob.objects.create(requested_by=technique_user)
+
+    with patch("technique.services.ai_classify.classify_and_save", side_effect=_classify_into(project)) as classify_mock, \
+            patch("technique.services.ai_classify.build_project_catalog", wraps=bulk_classify.ai_classify.build_project_catalog) as catalog_mock, \
+            patch("technique.tasks.enqueue_email_attachment_processing", return_value={"launched": False}):
+        job = bulk_classify.run_bulk_classification(job.pk)
+
+    assert catalog_mock.call_count == 1
+    catalogs = {id(call.args[1]) for call in classify_mock.call_args_list}
+    assert len(catalogs) == 1
+    assert isinstance(classify_mock.call_args.args[1], ProjectCatalog)
+    assert job.status == "done"
+    assert (job.total, job.processed, job.classified) == (3, 3, 3)
+    assert job.started_at is not None and job.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_cancel_stops_running_job(technique_user, project, settings):
+    settings.EMAIL_CLASSIFY_BATCH_SIZE = 1
+    _create_emails(technique_user, 4)
+    job = EmailClassificationJob.objects.create(requested_by=technique_user)
+    classify = _classify_into(project)
+
+    def classify_then_cancel(email, catalog, bypass_cache=False):
+        result = classify(email, catalog)
+        bulk_classify.cancel_bulk_classification(job)
+        return result
+
+    with patch("technique.services.ai_classify.classify_and_save", side_effect=classify_then_cancel) as classify_mock, \
+            patch("technique.tasks.enqueue_email_attachment_processing", return_value={"launched": False}):
+        job = bulk_classify.run_bulk_classification(job.pk)
+
+    assert classify_mock.call_count == 1
+    assert job.status == "cancelled"
+    assert job.processed == 1
+    assert TechnicalEmail.objects.filter(status="unassigned").count() == 3
+
+
+@pytest.mark.django_db
+def test_cancel_pending_job_marks_it_cancelled(technique_user):
+    job = EmailClassificationJob.objects.create(requested_by=technique_user)
+
+    bulk_classify.cancel_bulk_classification(job)
+    job = bulk_classify.run_bulk_classification(job.pk)
+
+    assert job.status == "cancelled"
+    assert job.processed == 0
+
+
+@pytest.mark.django_db
+def test_job_endpoints_are_scoped_to_owner(client, technique_user, user_factory):
+    other = user_factory(username="tech-other", email="tech-other@example.com")
+    other.groups.add(Group.objects.get(name="POLE_TECHNIQUE"))
+    job = EmailClassificationJob.objects.create(requested_by=technique_user)
+
+    client.force_login(other)
+    assert client.get(reverse("technique:email_classify_job_status", args=[job.pk])).status_code == 404
+    assert client.post(reverse("technique:email_classify_job_cancel", args=[job.pk])).status_code == 404
+
+    client.force_login(technique_user)
+    response = client.post(reverse("technique:email_classify_job_cancel", args=[job.pk]))
+    assert response.status_code == 200
+    assert response.json()["job"]["status"] == "cancelled"
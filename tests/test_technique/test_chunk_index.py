@@ -0,0 +1,166 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+
+from chatbot.views import _build_rag_context
+from technique.models import ChunkTerm, DocumentChunk, DocumentTechnique, TechnicalProject
+from technique.services.chunk_index import search_chunks, split_passages, tokenize
+from technique.tasks import index_technique_documents
+
+
+def test_passages_overlap_and_terms_are_folded():
+    words = [f"mot{index}" for index in range(25)]
+
+    passages = split_passages(" ".join(words), size=10, overlap=3)
+
+    assert passages[0].split() == words[:10]
+    assert passages[1].split()[:3] == words[7:10]
+    assert passages[-1].split()[-1] == "mot24"
+    assert tokenize("Pénalités de RETARD à l'Échéance") == ["penalites", "retard", "echeance"]
+
+
+@pytest.mark.django_db
+def test_bm25_returns_relevant_passage_instead_of_document_head():
+    project = TechnicalProject.objects.create(reference="RAG-BM25", name="Résidence Les Pins")
+    filler = " ".join(["généralités administratives du contrat"] * 120)
+    target = DocumentTechnique.objects.create(
+        project=project,
+        titre="Marché de travaux",
+        fichier="documents_tech/marche.pdf",
+        texte_brut=f"{filler} La pénalité de retard de livraison est de 500 euros par jour. {filler}",
+    )
+    DocumentTechnique.objects.create(
+        titre="Note de retard",
+        fichier="documents_tech/note.pdf",
+        texte_brut="Le courrier est arrivé en retard. " + filler,
+    )
+
+    chunks = search_chunks("Quelle pénalité de retard de livraison ?", limit=2)
+    context = _build_rag_context("Quelle pénalité de retard de livraison ?", max_passages=1)
+
+    assert chunks[0].document == target
+    assert chunks[0].position > 0
+    assert chunks[0].score >= chunks[1].score
+    assert "500 euros par jour" in context
+    assert "RAG-BM25 - Résidence Les Pins" in context
+
+
+@pytest.mark.django_db
+def test_reindexing_replaces_passages_and_rebuild_command_covers_all_documents():
+    doc = DocumentTechnique.objects.create(titre="Bail", fichier="bail.pdf", texte_brut="loyer annuel")
+    doc.texte_brut = "dépôt de garantie"
+    doc.save()
+
+    assert list(DocumentChunk.objects.values_list("text", flat=True)) == ["dépôt de garantie"]
+    assert not ChunkTerm.objects.filter(term="loyer").exists()
+
+    DocumentChunk.objects.all().delete()
+    call_command("rebuild_chunk_index")
+    assert search_chunks("garantie")[0].document == doc
+
+
+@pytest.mark.django_db
+def test_documents_upload_indexes_passages(client, admin_user, tmp_path, settings):
+    settings.MEDIA_ROOT = tmp_path
+    client.force_login(admin_user)
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    with (
+        patch("technique.views.extract_text_from_file", return_value="Clause de réitération chez le notaire."),
+        patch("technique.views.summarize_document", return_value={"resume": "Résumé court."}),
+    ):
+        response = client.post(
+            "/pole-technique/documents/upload/",
+            {"titre": "Promesse", "fichier": SimpleUploadedFile("promesse.txt", b"x")},
+        )
+
+    assert response.status_code == 302
+    assert [chunk.text for chunk in search_chunks("réitération notaire")] == [
+        "Clause de réitération chez le notaire."
+    ]
+
+
+def _header_terms(document):
+    return set(ChunkTerm.objects.filter(chunk__document=document).values_list("term", flat=True))
+
+
+@pytest.mark.django_db
+def test_documents_update_reindexes_title_and_project(client, admin_user):
+    old_project = TechnicalProject.objects.create(reference="RAG-OLD", name="Villa Mimosa")
+    new_project = TechnicalProject.objects.create(reference="RAG-NEW", name="Résidence Acacias")
+    doc = DocumentTechnique.objects.create(
+        project=old_project, titre="Bail", fichier="bail.pdf", texte_brut="loyer annuel",
+    )
+    client.force_login(admin_user)
+
+    response = client.post(
+        f"/pole-technique/documents/{doc.pk}/edit/",
+        {"titre": "Promesse de vente", "project": new_project.pk},
+    )
+
+    assert response.status_code == 302
+    terms = _header_terms(doc)
+    assert {"promesse", "vente", "acacias"} <= terms
+    assert not {"bail", "mimosa"} & terms
+    assert search_chunks("Acacias")[0].document == doc
+
+
+@pytest.mark.django_db
+def test_project_rename_reindexes_its_documents_only_when_header_changes():
+    project = TechnicalProject.objects.create(reference="RAG-REN", name="Villa Mimosa")
+    doc = DocumentTechnique.objects.create(project=project, titre="Bail", fichier="bail.pdf", texte_brut="loyer")
+
+    with patch("technique.chunk_index_signals.enqueue_document_indexing") as index_mock:
+        project.status = "termine"
+        project.save()
+    index_mock.assert_not_called()
+
+    project.name = "Résidence Acacias"
+    project.save()
+
+    assert "acacias" in _header_terms(doc)
+    assert "mimosa" not in _header_terms(doc)
+
+    project.delete()
+    assert not {"acacias", "rag"} & _header_terms(doc)
+
+
+@pytest.mark.django_db
+def test_indexing_is_queued_after_commit_and_skips_unrelated_saves(settings, django_capture_on_commit_callbacks):
+    settings.CHUNK_INDEX_EXECUTION = "celery"
+    project = TechnicalProject.objects.create(reference="RAG-Q", name="Villa Mimosa")
+
+    with patch("technique.tasks.index_technique_documents.delay") as delay_mock:
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            doc = DocumentTechnique.objects.create(
+                project=project, titre="Bail", fichier="bail.pdf", texte_brut="loyer annuel",
+            )
+            # Rien n'est écrit dans la requête : la tâche le fera
+            assert not DocumentChunk.objects.exists()
+        assert len(callbacks) == 1
+        delay_mock.assert_called_once_with([doc.pk])
+
+        delay_mock.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            doc.fichier = "bail-v2.pdf"
+            doc.save(update_fields=["fichier"])
+            project.status = "termine"
+            project.save(update_fields=["status"])
+        assert callbacks == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            project.name = "Résidence Acacias"
+            project.save()
+        delay_mock.assert_called_once_with([doc.pk])
+
+    index_technique_documents([doc.pk, doc.pk + 1000])
+    assert search_chunks("Acacias")[0].document == doc
+
+
+@pytest.mark.django_db
+def test_benchmark_command_runs_on_generated_corpus(capsys):
+    call_command("benchmark_chunk_index", "--documents", "20", "--words", "200", "--repeat", "1")
+
+    assert "BM25" in capsys.readouterr().out
+    assert not DocumentTechnique.objects.exists()
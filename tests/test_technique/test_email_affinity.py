@@ -0,0 +1,203 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from management.models import OAuthToken
+from technique.models import EmailAffinity, EmailClassificationJob, TechnicalEmail, TechnicalProject
+from technique.services import bulk_classify
+from technique.services.ai_classify import classify_and_save
+from technique.services.email_affinity import (
+    affinity_keys,
+    apply_affinities,
+    learn_from_email,
+    rebuild_affinities,
+    resolve_affinity,
+)
+from tests.gmail_stub import StubGmailService
+
+
+@pytest.fixture
+def technique_user(db, user_factory):
+    user = user_factory(username="tech-affinity", email="tech-affinity@example.com")
+    user.groups.add(Group.objects.get_or_create(name="POLE_TECHNIQUE")[0])
+    return user
+
+
+@pytest.fixture
+def projects(db):
+    return [
+        TechnicalProject.objects.create(reference="AFF-001", name="Résidence du Parc"),
+        TechnicalProject.objects.create(reference="AFF-002", name="Villa Haussmann"),
+    ]
+
+
+def _email(user, sender="Maître Roux <roux@etude-roux.fr>", thread_id="", **kwargs):
+    return TechnicalEmail.objects.create(
+        subject=kwargs.pop("subject", "Pièces"),
+        sender=sender,
+        thread_id=thread_id,
+        received_at=timezone.now(),
+        imported_by=user,
+        **kwargs,
+    )
+
+
+def _classified(user, project, **kwargs):
+    email = _email(user, project=project, status="classified", **kwargs)
+    learn_from_email(email)
+    return email
+
+
+def test_public_domains_are_not_keys():
+    email = TechnicalEmail(sender="Jean <Jean.Martin@Gmail.com>", thread_id="t-1", imported_by_id=7)
+
+    assert affinity_keys(email) == [("thread", "7:t-1"), ("sender", "jean.martin@gmail.com")]
+
+
+@pytest.mark.django_db
+def test_sender_rule_needs_enough_classified_emails(technique_user, projects):
+    _classified(technique_user, projects[0])
+    assert resolve_affinity(_email(technique_user)) is None
+
+    _classified(technique_user, projects[0])
+    match = resolve_affinity(_email(technique_user))
+
+    assert (match["project_id"], match["kind"], match["count"]) == (projects[0].pk, "sender", 2)
+
+
+@pytest.mark.django_db
+def test_thread_rule_wins_over_sender_and_is_scoped_to_mailbox(technique_user, user_factory, projects):
+    for _ in range(3):
+        _classified(technique_user, projects[0])
+    _classified(technique_user, projects[1], sender="archi@cabinet.fr", thread_id="thread-42")
+
+    match = resolve_affinity(_email(technique_user, thread_id="thread-42"))
+    other_user = user_factory(username="tech-other", email="tech-other@example.com")
+    other_match = resolve_affinity(_email(other_user, thread_id="thread-42"))
+
+    assert (match["project_id"], match["kind"]) == (projects[1].pk, "thread")
+    assert (other_match["project_id"], other_match["kind"]) == (projects[0].pk, "sender")
+
+
+@pytest.mark.django_db
+def test_ambiguous_sender_and_corrections_do_not_resolve(technique_user, projects):
+    for _ in range(3):
+        _classified(technique_user, projects[0])
+    corrected = _classified(technique_user, projects[0])
+    previous_project_id = corrected.project_id
+    corrected.project = projects[1]
+    corrected.save(update_fields=["project"])
+    learn_from_email(corrected, previous_project_id)
+    _classified(technique_user, projects[1])
+
+    counts = dict(
+        EmailAffinity.objects.filter(kind="sender").values_list("project_id", "count")
+    )
+    assert counts == {projects[0].pk: 3, projects[1].pk: 2}
+    # 3 emails sur 5 : sous le seuil EMAIL_AFFINITY_MIN_SHARE
+    assert resolve_affinity(_email(technique_user)) is None
+
+
+@pytest.mark.django_db
+def test_affinity_skips_llm_and_does_not_reinforce_itself(technique_user, projects):
+    _classified(technique_user, projects[1])
+    _classified(technique_user, projects[1])
+    email = _email(technique_user, subject="Sans indice")
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        result = classify_and_save(email, TechnicalProject.objects.all())
+
+    client_mock.assert_not_called()
+    assert (result["method"], result["confidence"], result["saved"]) == ("affinity", "high", True)
+    email.refresh_from_db()
+    assert (email.project, email.status) == (projects[1], "classified")
+    assert EmailAffinity.objects.get(kind="sender", project=projects[1]).count == 2
+
+
+@pytest.mark.django_db
+def test_archived_project_is_not_applied(technique_user, projects):
+    _classified(technique_user, projects[0])
+    _classified(technique_user, projects[0])
+    TechnicalProject.objects.filter(pk=projects[0].pk).update(archived_at=timezone.now())
+    email = _email(technique_user)
+
+    assert apply_affinities([email]) == []
+    email.refresh_from_db()
+    assert email.status == "unassigned"
+
+
+@pytest.mark.django_db
+def test_manual_assignment_learns_thread(client, technique_user, projects):
+    email = _email(technique_user, thread_id="thread-7")
+    client.force_login(technique_user)
+
+    with patch("technique.tasks.enqueue_email_attachment_processing", return_value={"launched": False}):
+        client.post(reverse("technique:mail_assign_project", args=[email.pk]), {"project_id": projects[1].pk})
+        client.post(reverse("technique:mail_assign_project", args=[email.pk]), {"project_id": projects[0].pk})
+
+    thread_key = f"{technique_user.pk}:thread-7"
+    counts = dict(EmailAffinity.objects.filter(kind="thread", key=thread_key).values_list("project_id", "count"))
+    assert counts == {projects[0].pk: 1, projects[1].pk: 0}
+
+
+@pytest.mark.django_db
+def test_gmail_import_classifies_known_threads_without_llm(technique_user, projects, tmp_path, settings):
+    settings.MEDIA_ROOT = tmp_path
+    OAuthToken.objects.create(
+        user=technique_user, provider="google", email=technique_user.email,
+        access_token="access", refresh_token="refresh", token_expiry=timezone.now() + timedelta(hours=1),
+    )
+    _classified(technique_user, projects[0], thread_id="thread-known", external_id="old-1")
+    stub = StubGmailService(technique_user.email)
+    stub.add_message("new-1", "thread-known", "archi@cabinet.fr", technique_user.email, ["INBOX"])
+    stub.add_message("new-2", "thread-other", "archi@cabinet.fr", technique_user.email, ["INBOX"])
+
+    from technique.services.gmail_import import import_technique_emails
+
+    with patch("technique.services.gmail_import.get_gmail_service", return_value=stub), \
+            patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        stats = import_technique_emails(technique_user)
+
+    client_mock.assert_not_called()
+    assert (stats["imported"], stats["affinity_classified"]) == (2, 1)
+    known = TechnicalEmail.objects.get(external_id="new-1")
+    assert (known.project, known.status) == (projects[0], "classified")
+    assert TechnicalEmail.objects.get(external_id="new-2").status == "unassigned"
+
+
+@pytest.mark.django_db
+def test_bulk_job_reports_llm_calls_avoided(technique_user, projects):
+    _classified(technique_user, projects[0])
+    _classified(technique_user, projects[0])
+    _email(technique_user)
+    _email(technique_user, sender="inconnu@autre.fr", subject="Question")
+    job = EmailClassificationJob.objects.create(requested_by=technique_user)
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock, \
+            patch("technique.tasks.enqueue_email_attachment_processing", return_value={"launched": False}):
+        client_mock.return_value.chat.return_value.content = '{"project_id": null, "confidence": "low"}'
+        job = bulk_classify.run_bulk_classification(job.pk)
+
+    assert (job.resolved_without_llm, job.llm_calls) == (1, 1)
+    assert job.llm_avoided_percent == 50
+    assert client_mock.return_value.chat.call_count == 1
+
+
+@pytest.mark.django_db
+def test_rebuild_and_stats_command(technique_user, projects, capsys):
+    for _ in range(2):
+        _email(technique_user, project=projects[0], status="classified", thread_id="t-1")
+    _email(technique_user)
+    _email(technique_user, sender="inconnu@autre.fr")
+
+    call_command("email_affinities", "--rebuild")
+
+    assert rebuild_affinities() == 3
+    output = capsys.readouterr().out
+    assert "1 fil(s), 1 expéditeur(s), 1 domaine(s)" in output
+    assert "1 email(s) non classé(s) sur 2 résolus par les règles (50% d'appels LLM évités)" in output
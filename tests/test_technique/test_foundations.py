@@ -220,7 +220,9 @@ def test_bulk_email_classification_only_processes_current_user_emails(
     with patch("technique.services.ai_classify.classify_and_save", side_effect=fake_classify) as classify_mock:
         response = client.post(reverse("technique:email_classify_bulk"))
 
-    assert response.status_code == 200
+    # Job créé puis exécuté dans la requête (EMAIL_CLASSIFICATION_EXECUTION = "sync")
+    assert response.status_code == 202
+    assert response.json()["job"]["status"] == "done"
     assert classify_mock.call_count == 1
     assert classify_mock.call_args.args[0].pk == owned_email.pk
     other_email.refresh_from_db()
@@ -1,3 +1,6 @@
+import hashlib
+from datetime import timedelta
+from io import BytesIO
 from unittest.mock import patch
 
 import pytest
@@ -11,6 +14,7 @@ from technique.models import (
     TechnicalProject,
 )
 from technique.services.attachment_processing import process_attachment
+from technique.services.documents import extract_text_from_file
 
 
 @pytest.fixture
@@ -144,3 +148,155 @@ def test_project_change_updates_linked_document_without_recreating(attachment_se
     assert result["updated"] is True
     assert attachment.linked_document_id == document_id
     assert attachment.linked_document.project == new_project
+
+
+@pytest.mark.django_db
+def test_gmail_import_batches_messages_and_attachments(attachment_setup):
+    from management.models import OAuthToken
+    from technique.services.gmail_import import import_technique_emails
+    from tests.gmail_stub import StubGmailService
+
+    user = attachment_setup["user"]
+    OAuthToken.objects.create(
+        user=user,
+        provider="google",
+        email=user.email,
+        access_token="access",
+        refresh_token="refresh",
+        token_expiry=timezone.now() + timedelta(hours=1),
+    )
+    stub = StubGmailService(user.email)
+    for index in range(12):
+        stub.add_message(
+            f"inbox-{index}",
+            f"thread-{index}",
+            "notaire@example.com",
+            user.email,
+            ["INBOX"],
+            attachments=[(f"acte-{index}-{n}.pdf", b"%PDF-1.4 test") for n in range(2)],
+        )
+    TechnicalEmail.objects.create(
+        external_id="inbox-0",
+        subject="Déjà importé",
+        received_at=timezone.now(),
+        imported_by=user,
+    )
+    stub.failures = {"inbox-5-att-1": [429]}
+
+    with (
+        override_settings(MEDIA_ROOT=attachment_setup["media_root"]),
+        patch("technique.services.gmail_import.get_gmail_service", return_value=stub),
+        patch("management.gmail_service.time.sleep"),
+    ):
+        stats = import_technique_emails(user)
+
+    assert stats["imported"] == 11
+    assert stats["skipped"] == 1
+    assert stats["attachments_imported"] == 22
+    assert stats["attachment_errors"] == 0
+    # 1 profil (curseur) + 1 liste + 1 lot de messages + 1 lot de PJ
+    # + 1 nouvel essai après le 429
+    assert stub.round_trips == 5
+    assert TechnicalEmailAttachment.objects.filter(email__imported_by=user).count() == 22
+
+
+def _import_with_stub(attachment_setup, messages):
+    from management.models import OAuthToken
+    from technique.services.gmail_import import import_technique_emails
+    from tests.gmail_stub import StubGmailService
+
+    user = attachment_setup["user"]
+    OAuthToken.objects.create(
+        user=user,
+        provider="google",
+        email=user.email,
+        access_token="access",
+        refresh_token="refresh",
+        token_expiry=timezone.now() + timedelta(hours=1),
+    )
+    stub = StubGmailService(user.email)
+    for message_id, attachments in messages:
+        stub.add_message(message_id, message_id, "notaire@example.com", user.email, ["INBOX"], attachments=attachments)
+    with patch("technique.services.gmail_import.get_gmail_service", return_value=stub):
+        stats = import_technique_emails(user)
+    return stub, stats
+
+
+@pytest.mark.django_db
+def test_attachment_is_decoded_in_chunks_with_its_hash(attachment_setup):
+    content = bytes(range(256)) * 3 + b"fin"
+
+    with patch("technique.services.gmail_import.BASE64_CHUNK_CHARS", 8):
+        _, stats = _import_with_stub(attachment_setup, [("msg-1", [("plan.pdf", content)])])
+
+    attachment = TechnicalEmailAttachment.objects.get(original_name="plan.pdf")
+    assert stats["attachments_imported"] == 1
+    assert attachment.size == len(content)
+    assert attachment.sha256 == hashlib.sha256(content).hexdigest()
+    with attachment.file.open("rb") as stored:
+        assert stored.read() == content
+
+
+@pytest.mark.django_db
+def test_attachments_are_fetched_within_byte_budget(attachment_setup, settings):
+    settings.TECHNIQUE_ATTACHMENT_BATCH_BYTES = 25
+    settings.TECHNIQUE_ATTACHMENT_MAX_BYTES = 100
+    messages = [
+        ("msg-1", [("a.pdf", b"x" * 10), ("b.pdf", b"y" * 10)]),
+        ("msg-2", [("c.pdf", b"z" * 10), ("big.pdf", b"w" * 101)]),
+    ]
+
+    stub, stats = _import_with_stub(attachment_setup, messages)
+
+    # Lot de messages, puis PJ par lots de 25 octets annoncés au plus
+    assert stub.batch_sizes == [2, 2, 1]
+    assert stub.calls["users.messages.attachments.get"] == 3
+    assert (stats["attachments_imported"], stats["attachments_skipped"]) == (3, 1)
+    skipped = TechnicalEmailAttachment.objects.get(original_name="big.pdf")
+    assert (skipped.processing_status, skipped.size, bool(skipped.file)) == ("skipped", 101, False)
+    assert "non téléchargée" in skipped.processing_error
+    assert process_attachment(skipped.pk)["status"] == "skipped"
+
+
+@pytest.mark.django_db
+def test_same_content_reuses_the_stored_file(attachment_setup):
+    content = b"%PDF-1.4 acte"
+
+    _import_with_stub(attachment_setup, [("msg-1", [("acte.pdf", content)]), ("msg-2", [("acte (1).pdf", content)])])
+
+    names = set(TechnicalEmailAttachment.objects.values_list("file", flat=True))
+    assert TechnicalEmailAttachment.objects.count() == 2
+    assert len(names) == 1
+
+
+@pytest.mark.django_db
+def test_document_points_to_attachment_file(attachment_setup):
+    attachment = attachment_setup["create_attachment"]()
+    with patch(
+        "technique.services.attachment_processing.summarize_document",
+        return_value=summary(),
+    ):
+        result = process_attachment(attachment.pk)
+
+    attachment.refresh_from_db()
+    assert result["created"] is True
+    assert attachment.linked_document.texte_brut == "Texte du contrat"
+    assert attachment.linked_document.fichier.name == attachment.file.name
+
+
+@pytest.mark.django_db
+def test_docx_text_is_read_from_stored_file(attachment_setup):
+    import docx
+
+    buffer = BytesIO()
+    document = docx.Document()
+    document.add_paragraph("Clause de réitération")
+    document.save(buffer)
+    attachment = attachment_setup["create_attachment"]("acte.docx", buffer.getvalue())
+
+    attachment.file.open("rb")
+    text = extract_text_from_file(attachment.file)
+
+    assert text == "Clause de réitération"
+    assert attachment.file.tell() == 0
+    attachment.file.close()
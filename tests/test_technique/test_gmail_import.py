@@ -0,0 +1,185 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from management.models import OAuthToken
+from technique.models import TechnicalEmail
+from technique.services.gmail_import import import_technique_emails
+from technique.tasks import import_technique_mailboxes
+from tests.gmail_stub import StubGmailService
+
+
+@pytest.fixture
+def mailbox(db, user_factory, tmp_path, settings):
+    settings.MEDIA_ROOT = tmp_path
+    settings.TECHNIQUE_GMAIL_IMPORT_PAGE_SIZE = 5
+    user = user_factory(username="tech-import", email="tech-import@example.com")
+    token = OAuthToken.objects.create(
+        user=user, provider="google", email=user.email,
+        access_token="access", refresh_token="refresh", token_expiry=timezone.now() + timedelta(hours=1),
+    )
+    stub = StubGmailService(user.email)
+    for index in range(12):
+        stub.add_message(f"inbox-{index}", f"thread-{index}", "archi@cabinet.fr", user.email, ["INBOX"])
+    return user, token, stub
+
+
+def _import(user, stub):
+    stub.reset_counters()
+    with patch("technique.services.gmail_import.get_gmail_service", return_value=stub), \
+            CaptureQueriesContext(connection) as queries:
+        stats = import_technique_emails(user)
+    dedup_queries = [
+        query for query in queries.captured_queries
+        if query["sql"].startswith("SELECT") and '"external_id" IN' in query["sql"]
+    ]
+    return stats, len(dedup_queries)
+
+
+@pytest.mark.django_db
+def test_first_import_reads_every_page(mailbox):
+    user, token, stub = mailbox
+
+    stats, dedup_queries = _import(user, stub)
+
+    assert (stats["mode"], stats["pages"], stats["imported"]) == ("full", 3, 12)
+    assert stub.calls["users.messages.list"] == 3
+    assert dedup_queries == 3
+    token.refresh_from_db()
+    assert token.technique_history_id == str(stub.history_id)
+    assert token.gmail_history_id == ""
+
+
+@pytest.mark.django_db
+def test_next_import_only_reads_history(mailbox):
+    user, token, stub = mailbox
+    _import(user, stub)
+    stub.add_message("inbox-new", "thread-new", "archi@cabinet.fr", user.email, ["INBOX"])
+    stub.add_message("sent-new", "thread-new", user.email, "archi@cabinet.fr", ["SENT"])
+
+    stats, dedup_queries = _import(user, stub)
+
+    assert (stats["mode"], stats["imported"], stats["skipped"]) == ("incremental", 1, 0)
+    assert stub.calls["users.messages.list"] == 0
+    assert stub.calls["users.messages.get"] == 1
+    assert dedup_queries == 1
+    assert TechnicalEmail.objects.filter(imported_by=user).count() == 13
+    token.refresh_from_db()
+    assert token.technique_history_id == str(stub.history_id)
+
+
+@pytest.mark.django_db
+def test_expired_cursor_falls_back_until_known_page(mailbox):
+    user, token, stub = mailbox
+    _import(user, stub)
+    for index in range(3):
+        stub.add_message(f"burst-{index}", f"burst-{index}", "archi@cabinet.fr", user.email, ["INBOX"])
+    stub.expired_before = stub.history_id + 1
+
+    stats, _ = _import(user, stub)
+
+    # Première page : 3 nouveaux + 2 connus ; la deuxième, déjà connue, arrête le parcours
+    assert (stats["mode"], stats["imported"], stats["pages"]) == ("full", 3, 2)
+    assert stub.calls["users.messages.get"] == 3
+
+
+@pytest.mark.django_db
+def test_cursor_stays_put_when_a_message_fails(mailbox):
+    user, token, stub = mailbox
+    _import(user, stub)
+    cursor = OAuthToken.objects.get(pk=token.pk).technique_history_id
+    stub.add_message("flaky", "thread-flaky", "archi@cabinet.fr", user.email, ["INBOX"])
+    stub.failures = {"flaky": [403]}
+
+    stats, _ = _import(user, stub)
+    token.refresh_from_db()
+
+    assert (stats["imported"], stats["errors"]) == (0, 1)
+    assert token.technique_history_id == cursor
+
+    stats, _ = _import(user, stub)
+    assert stats["imported"] == 1
+
+
+@pytest.mark.django_db
+def test_message_deleted_before_fetch_does_not_pin_cursor(mailbox):
+    user, token, stub = mailbox
+    _import(user, stub)
+    stub.add_message("gone", "thread-gone", "archi@cabinet.fr", user.email, ["INBOX"])
+    stub.failures = {"gone": [404]}
+
+    stats, _ = _import(user, stub)
+    token.refresh_from_db()
+
+    assert (stats["imported"], stats["skipped"], stats["errors"]) == (0, 1, 0)
+    assert token.technique_history_id == str(stub.history_id)
+
+
+@pytest.mark.django_db
+def test_import_button_queues_task_and_reports_result(client, mailbox):
+    user, _, _ = mailbox
+    user.groups.add(Group.objects.get_or_create(name="POLE_TECHNIQUE")[0])
+    client.force_login(user)
+
+    with patch("technique.tasks.import_technique_mailbox.delay") as delay_mock:
+        delay_mock.return_value.id = "task-1"
+        response = client.post(reverse("technique:email_import"))
+
+    assert response.status_code == 202
+    delay_mock.assert_called_once_with(user.pk)
+    status_url = response.json()["status_url"]
+    stats = {
+        "imported": 2, "skipped": 0, "errors": 0, "affinity_classified": 1, "attachments_imported": 0,
+        "attachment_errors": 0, "attachments_skipped": 0, "attachment_processing_launched": 0,
+    }
+    with patch("celery.result.AsyncResult") as result_mock:
+        result_mock.return_value.ready.return_value = False
+        pending = client.get(status_url).json()
+        result_mock.return_value.ready.return_value = True
+        result_mock.return_value.failed.return_value = False
+        result_mock.return_value.result = {"success": True, "user_id": user.pk, **stats}
+        done = client.get(status_url).json()
+        result_mock.return_value.result = {"success": True, "user_id": user.pk + 1, **stats}
+        other = client.get(status_url)
+
+    assert pending == {"success": True, "done": False}
+    assert (done["done"], done["imported"], done["affinity_classified"]) == (True, 2, 1)
+    assert other.status_code == 404
+
+
+@pytest.mark.django_db
+def test_sync_import_button_keeps_small_cap(client, mailbox, settings):
+    user, _, stub = mailbox
+    user.groups.add(Group.objects.get_or_create(name="POLE_TECHNIQUE")[0])
+    settings.TECHNIQUE_GMAIL_IMPORT_EXECUTION = "sync"
+    client.force_login(user)
+
+    with patch("technique.services.gmail_import.import_technique_emails", wraps=import_technique_emails) as import_mock, \
+            patch("technique.services.gmail_import.get_gmail_service", return_value=stub):
+        response = client.post(reverse("technique:email_import"))
+
+    import_mock.assert_called_once_with(user=user, max_results=50)
+    assert (response.json()["queued"], response.json()["imported"]) == (False, 12)
+
+
+@pytest.mark.django_db
+def test_scheduled_import_targets_technique_mailboxes(mailbox, user_factory):
+    user, _, _ = mailbox
+    user.groups.add(Group.objects.get_or_create(name="POLE_TECHNIQUE")[0])
+    other = user_factory(username="admin-import", email="admin-import@example.com")
+    OAuthToken.objects.create(
+        user=other, provider="google", email=other.email,
+        access_token="access", refresh_token="refresh", token_expiry=timezone.now() + timedelta(hours=1),
+    )
+
+    with patch("technique.tasks.import_technique_mailbox.delay") as delay_mock:
+        result = import_technique_mailboxes()
+
+    delay_mock.assert_called_once_with(user.pk)
+    assert result["utilisateurs"] == 1
@@ -0,0 +1,150 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from chatbot.llm_client import LLMResponse
+from technique.models import TechnicalEmail, TechnicalProject
+from technique.services.ai_classify import build_project_catalog, classify_and_save, classify_email
+from technique.services.email_affinity import learn_from_email
+from technique.services.project_ranking import build_project_index, clear_winner
+
+
+def _email(subject="Suivi", body="", sender="contact@example.com", **kwargs):
+    return TechnicalEmail(subject=subject, body=body, sender=sender, received_at=timezone.now(), **kwargs)
+
+
+def _llm_answer(project_id, confidence="high"):
+    content = json.dumps({"project_id": project_id, "confidence": confidence, "reason": "ok"})
+    return LLMResponse(content)
+
+
+@pytest.fixture
+def projects(db):
+    return [
+        TechnicalProject.objects.create(
+            reference="TECH-001", name="Résidence Les Lilas", adresse_bien="12 rue Garibaldi, 69003 Lyon",
+        ),
+        TechnicalProject.objects.create(
+            reference="TECH-002", name="Villa Les Pins", affaire="Durand / Moreau",
+        ),
+        TechnicalProject.objects.create(
+            reference="TECH-003", name="Résidence Les Pins", adresse_bien="4 avenue Foch, 69006 Lyon",
+        ),
+    ]
+
+
+@pytest.mark.django_db
+def test_reference_written_differently_is_matched(projects):
+    index = build_project_index(projects)
+
+    candidates = index.rank(_email(subject="RE: tech 002 - compromis signé"))
+
+    assert candidates[0].project == projects[1]
+    assert candidates[0].reference_match
+    assert clear_winner(candidates) == candidates[0]
+
+
+@pytest.mark.django_db
+def test_rare_terms_outrank_shared_ones(projects):
+    index = build_project_index(projects)
+
+    candidates = index.rank(_email(body="Travaux de la résidence avenue Foch : devis joint."))
+
+    assert candidates[0].project == projects[2]
+    assert not candidates[0].reference_match
+    assert {candidate.project for candidate in candidates} <= set(projects)
+
+
+@pytest.mark.django_db
+def test_sender_history_ranks_previous_project(projects):
+    learn_from_email(TechnicalEmail.objects.create(
+        subject="Acte", sender="Maître Roux <roux@notaires.fr>", received_at=timezone.now(),
+        project=projects[0], status="classified",
+    ))
+    index = build_project_index(projects)
+
+    candidates = index.rank(_email(subject="Pièces", sender="ROUX@notaires.fr"))
+
+    assert [candidate.project for candidate in candidates] == [projects[0]]
+    # L'historique seul ne suffit pas à se passer du LLM
+    assert clear_winner(candidates) is None
+
+
+@pytest.mark.django_db
+def test_clear_winner_skips_llm_and_saves(projects, user_factory):
+    user = user_factory(username="ranking", email="ranking@example.com")
+    email = TechnicalEmail.objects.create(
+        subject="Dossier TECH-003 : réception", sender="a@example.com",
+        received_at=timezone.now(), imported_by=user,
+    )
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        result = classify_and_save(email, TechnicalProject.objects.all())
+
+    client_mock.assert_not_called()
+    assert result["method"] == "local"
+    assert result["confidence"] == "high"
+    assert result["saved"]
+    email.refresh_from_db()
+    assert (email.project, email.status) == (projects[2], "classified")
+
+
+@pytest.mark.django_db
+def test_only_top_candidates_are_sent_to_llm(projects, settings):
+    settings.EMAIL_CLASSIFY_CANDIDATES = 2
+    for index in range(40):
+        TechnicalProject.objects.create(reference=f"AAA-{index:03d}", name=f"Immeuble {index}")
+    catalog = build_project_catalog(TechnicalProject.objects.order_by("reference"))
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.return_value = _llm_answer(projects[2].pk)
+        result = classify_email(_email(body="Point sur le chantier Les Pins"), catalog)
+
+    prompt = client_mock.return_value.chat.call_args.args[0][1]["content"]
+    assert f"id={projects[2].pk} " in prompt
+    assert f"id={projects[1].pk} " in prompt
+    assert "AAA-" not in prompt
+    assert prompt.count("- id=") == 2
+    assert (result["project_id"], result["method"]) == (projects[2].pk, "llm")
+
+
+@pytest.mark.django_db
+def test_weak_lexical_match_does_not_hide_other_projects(projects):
+    catalog = build_project_catalog(TechnicalProject.objects.order_by("reference"))
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.return_value = _llm_answer(projects[1].pk)
+        result = classify_email(_email(body="Une question sur la résidence"), catalog)
+
+    prompt = client_mock.return_value.chat.call_args.args[0][1]["content"]
+    # Seul « résidence » relie l'email à TECH-001 et TECH-003 : TECH-002 reste proposé
+    assert all(f"id={project.pk} " in prompt for project in projects)
+    assert prompt.index(f"id={projects[0].pk} ") < prompt.index(f"id={projects[1].pk} ")
+    assert result["project_id"] == projects[1].pk
+
+
+@pytest.mark.django_db
+def test_llm_answer_outside_candidates_is_rejected(projects, settings):
+    settings.EMAIL_CLASSIFY_CANDIDATES = 2
+    settings.EMAIL_CLASSIFY_CANDIDATE_MIN_SCORE = 0
+    catalog = build_project_catalog(projects)
+
+    with patch("technique.services.ai_classify.get_llm_client") as client_mock:
+        client_mock.return_value.chat.return_value = _llm_answer(projects[0].pk)
+        result = classify_email(_email(body="Point sur le chantier Les Pins"), catalog)
+
+    assert result["project_id"] is None
+    assert result["confidence"] == "low"
+
+
+@pytest.mark.django_db
+def test_benchmark_command_runs_on_generated_fixtures(capsys):
+    call_command("benchmark_email_classification", "--projects", "60", "--emails", "80")
+
+    output = capsys.readouterr().out
+    assert "60 dossier(s), 80 email(s)" in output
+    assert "classés sans LLM" in output
+    assert not TechnicalProject.objects.exists()
@@ -1,4 +1,76 @@
-from django.contrib.auth.models import User
+from dataclasses import dataclass
+
+
+# Noms de groupes ouvrant l'accès à au moins un pôle géré
+POLE_GROUPS = frozenset({
+    "POLE_FINANCIER",
+    "POLE_ADMINISTRATIF",
+    "POLE_TECHNIQUE",
+    "POLE_PROMOTION",
+    "POLE_DEVELOPPEMENT",
+    "POLE_INVESTISSEMENT",
+})
+
+_SNAPSHOT_ATTR = "_permission_snapshot"
+# Incrémentée à chaque modification de groupes (voir authentication.signals) :
+# un instantané plus ancien est rechargé au prochain accès.
+_snapshot_generation = 0
+
+
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    """Droits d'un utilisateur, chargés une seule fois par requête."""
+
+    is_authenticated: bool
+    is_superuser: bool
+    is_staff: bool
+    groups: frozenset
+    generation: int
+
+    def in_group(self, *names):
+        return not self.groups.isdisjoint(names)
+
+
+def get_permission_snapshot(user):
+    """
+    Renvoie l'instantané des droits de l'utilisateur, mémorisé sur l'objet
+    (request.user vit le temps de la requête) : une seule requête SQL pour
+    les groupes, quel que soit le nombre de contrôles effectués.
+
+    Args:
+        user (User):  L'utilisateur
+    """
+    snapshot = getattr(user, _SNAPSHOT_ATTR, None)
+    if snapshot is not None and snapshot.generation == _snapshot_generation:
+        return snapshot
+
+    generation = _snapshot_generation
+    if getattr(user, "is_authenticated", False) and user.pk is not None:
+        snapshot = PermissionSnapshot(
+            is_authenticated=True,
+            is_superuser=bool(user.is_superuser),
+            is_staff=bool(user.is_staff),
+            groups=frozenset(user.groups.values_list("name", flat=True)),
+            generation=generation,
+        )
+    else:
+        snapshot = PermissionSnapshot(False, False, False, frozenset(), generation)
+    setattr(user, _SNAPSHOT_ATTR, snapshot)
+    return snapshot
+
+
+def invalidate_permission_snapshot(user=None):
+    """
+    Périme les instantanés de droits. Sans utilisateur, tous les instantanés
+    du processus sont rechargés au prochain accès.
+    """
+    global _snapshot_generation
+    _snapshot_generation += 1
+    if user is not None:
+        try:
+            delattr(user, _SNAPSHOT_ATTR)
+        except AttributeError:
+            pass
 
 
 def has_finance_access(user):
@@ -8,8 +80,8 @@ def has_finance_access(user):
     Args:
         user (User):  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
-    return user.is_staff or user.groups.filter(name="POLE_FINANCIER").exists()
+    snapshot = get_permission_snapshot(user)
+    return snapshot.is_staff or snapshot.in_group("POLE_FINANCIER")
 
 def has_administratif_access(user):
     """
@@ -18,8 +90,8 @@ def has_administratif_access(user):
     Args:
         user (User):  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
-    return user.is_superuser or user.is_staff or user.groups.filter(name="POLE_ADMINISTRATIF").exists()
+    snapshot = get_permission_snapshot(user)
+    return snapshot.is_superuser or snapshot.is_staff or snapshot.in_group("POLE_ADMINISTRATIF")
 
 def has_technique_access(user):
     """
@@ -32,19 +104,15 @@ def has_technique_access(user):
     Args:
         user (User) :  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
-    return (
-        user.is_superuser
-        or user.groups.filter(name="POLE_TECHNIQUE").exists()
-        or user.groups.filter(name="CEO").exists()
-    )
+    snapshot = get_permission_snapshot(user)
+    return snapshot.is_superuser or snapshot.in_group("POLE_TECHNIQUE", "CEO")
 
 
 def can_view_technical_dossiers(user):
     """Autorise la consultation des dossiers techniques sans ouvrir le reste du pôle."""
     if not getattr(user, "is_authenticated", False):
         return False
-    return has_technique_access(user) or user.groups.filter(name="POLE_ADMINISTRATIF").exists()
+    return has_technique_access(user) or get_permission_snapshot(user).in_group("POLE_ADMINISTRATIF")
 
 def has_ceo_access(user):
     """
@@ -53,8 +121,7 @@ def has_ceo_access(user):
     Args:
         user (User):  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
-    return user.is_superuser
+    return get_permission_snapshot(user).is_superuser
 
 
 def has_all_poles_access(user):
@@ -64,19 +131,12 @@ def has_all_poles_access(user):
     Args:
         user (User):  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
+    snapshot = get_permission_snapshot(user)
 
-    if user.is_superuser or user.is_staff:
+    if snapshot.is_superuser or snapshot.is_staff:
         return True
 
-    return (
-        user.groups.filter(name="POLE_FINANCIER").exists()
-        or user.groups.filter(name="POLE_ADMINISTRATIF").exists()
-        or user.groups.filter(name="POLE_TECHNIQUE").exists()
-        or user.groups.filter(name="POLE_PROMOTION").exists()
-        or user.groups.filter(name="POLE_DEVELOPPEMENT").exists()
-        or user.groups.filter(name="POLE_INVESTISSEMENT").exists()
-    )
+    return snapshot.in_group(*POLE_GROUPS)
 
 
 def has_collaborateur_access(user):
@@ -86,8 +146,8 @@ def has_collaborateur_access(user):
     Args:
         user (User):  L'utilisateur
     """
-    user = User.objects.get(username=user.username)
-    return not (user.is_superuser or user.is_staff) and user.groups.filter(name="COLLABORATEUR").exists()
+    snapshot = get_permission_snapshot(user)
+    return not (snapshot.is_superuser or snapshot.is_staff) and snapshot.in_group("COLLABORATEUR")
 
 def can_read_facture(user):
     """
@@ -117,11 +177,8 @@ def can_change_facture_status(user):
     """
     if not getattr(user, "is_authenticated", False):
         return False
-    user = User.objects.get(username=user.username)
-    return (
-        user.is_superuser
-        or user.groups.filter(name="POLE_FINANCIER").exists()
-    )
+    snapshot = get_permission_snapshot(user)
+    return snapshot.is_superuser or snapshot.in_group("POLE_FINANCIER")
 
 
 def is_facture_creator(user, facture):
@@ -145,7 +202,6 @@ def can_edit_facture(user, facture):
         user (User):  L'utilisateur
         facture (Facture):  La facture
     """
-    user = User.objects.get(username=user.username)
     if can_change_facture_status(user) or has_finance_access(user):
         return True
     if getattr(user, "is_authenticated", False):
@@ -168,8 +224,6 @@ def can_edit_facture_field(user, facture, field):
         facture (Facture):  La facture
         field (str):  Le nom du champ
     """
-    user = User.objects.get(username=user.username)
-    
     # Finance peut éditer tous les champs
     if has_finance_access(user):
         if field == 'statut':